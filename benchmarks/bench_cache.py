@@ -0,0 +1,137 @@
+"""Count network round trips for reference data across repeated pipeline runs.
+
+Each simulated run fetches the panel list, one panel's regions, the assay
+types and the project list from a local stub server that sends ETags and
+answers If-None-Match with 304. The runs are repeated without the cache,
+with the cache inside its TTL, and with a zero TTL so every call is
+revalidated. Reports the requests and body bytes the server sent for each,
+and checks that a small size cap evicts the least recently used entries.
+
+Example usage:
+    python bench_cache.py --runs 20 --regions 20000
+"""
+
+import argparse
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import simplejson as json
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from fabric_client import FabricSession
+from fabric_client.cache import ResponseCache, cached_get
+from stub_server import StubHandler, StubServer
+
+ENDPOINTS = ['/panels/', '/panels/1/regions', '/assay_types', '/projects/']
+
+
+class ReferenceDataHandler(StubHandler):
+    """Serve fixed reference payloads with ETags, counting what is sent.
+    """
+
+    def do_GET(self):
+        path = self.path.split('?')[0]
+        body = self.server.payloads[path]
+        etag = '"{}"'.format(hashlib.md5(body).hexdigest())
+        self.server.requests += 1
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.server.body_bytes += len(body)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def reference_payloads(regions):
+    """Return the JSON body served for each endpoint.
+    """
+    panel_regions = [{'chromosome': str(index % 22 + 1), 'start': index * 1000,
+                      'end': index * 1000 + 500, 'gene_symbol': 'GENE{}'.format(index)}
+                     for index in range(regions)]
+    payloads = {'/panels/': [{'id': index, 'name': 'Panel {}'.format(index)} for index in range(200)],
+                '/panels/1/regions': panel_regions,
+                '/assay_types': {'objects': [{'id': index, 'name': 'Assay {}'.format(index)}
+                                             for index in range(20)]},
+                '/projects/': {'objects': [{'id': index, 'name': 'Project {}'.format(index)}
+                                           for index in range(500)]}}
+    return dict((path, json.dumps(payload).encode('utf-8')) for path, payload in payloads.items())
+
+
+def run_pipelines(server, runs, cache_dir=None, ttl=None):
+    """Fetch every endpoint once per run, opening a fresh cache handle for
+    each run as a new pipeline process would.
+    """
+    server.httpd.requests = 0
+    server.httpd.body_bytes = 0
+    session = FabricSession(pool_size=1)
+    start = time.perf_counter()
+    for _ in range(runs):
+        cache = ResponseCache(cache_dir, ttl=ttl) if cache_dir else None
+        for path in ENDPOINTS:
+            response = cached_get(session, server.url + path, cache)
+            response.raise_for_status()
+            response.json()
+        if cache is not None:
+            cache.close()
+    seconds = time.perf_counter() - start
+    session.close()
+    return {'requests': server.httpd.requests,
+            'body_bytes': server.httpd.body_bytes,
+            'seconds': round(seconds, 3)}
+
+
+def main():
+    """Main function. Benchmark reference data fetches with and without the cache.
+    """
+    parser = argparse.ArgumentParser(description='Benchmark the local response cache.')
+    parser.add_argument('--runs', metavar='runs', type=int, default=20)
+    parser.add_argument('--regions', metavar='regions', type=int, default=20000,
+                        help='number of regions in the panel regions payload')
+    args = parser.parse_args()
+
+    payloads = reference_payloads(args.regions)
+    directory = tempfile.mkdtemp(prefix='fabric_cache_bench_')
+    results = {'runs': args.runs, 'calls': args.runs * len(ENDPOINTS)}
+    try:
+        with StubServer(handler=ReferenceDataHandler) as server:
+            server.httpd.payloads = payloads
+            results['no_cache'] = run_pipelines(server, args.runs)
+            results['cached'] = run_pipelines(server, args.runs, os.path.join(directory, 'ttl'),
+                                              ttl=3600)
+            results['revalidated'] = run_pipelines(server, args.runs,
+                                                   os.path.join(directory, 'revalidate'), ttl=0)
+
+            # Room for the last two small payloads only: the regions payload
+            # is too big to store, and the panel list must be evicted as the
+            # least recently used entry
+            cap = len(payloads['/assay_types']) + len(payloads['/projects/'])
+            with ResponseCache(os.path.join(directory, 'capped'), max_bytes=cap) as cache:
+                session = FabricSession(pool_size=1)
+                for path in ENDPOINTS:
+                    cached_get(session, server.url + path, cache)
+                evicted = cached_get(session, server.url + '/panels/', cache).from_cache is False
+                results['size_cap'] = {'max_bytes': cap, 'stored_bytes': cache.size(),
+                                       'lru_evicted': evicted}
+                session.close()
+                if cache.size() > cap or not evicted:
+                    sys.exit("Cache did not evict down to its size cap")
+    finally:
+        shutil.rmtree(directory)
+
+    sys.stdout.write(json.dumps(results, indent=4))
+    sys.stdout.write('\n')
+
+
+if __name__ == "__main__":
+    main()
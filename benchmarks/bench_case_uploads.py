@@ -0,0 +1,103 @@
+"""Compare serial and concurrent member genome uploads for a trio case.
+
+Creates a case container on a local stub server that throttles each
+connection's upload bandwidth, then uploads three member VCFs of different
+sizes one after another and then all at once with AsyncCaseContainerClient.
+Concurrent wall-clock time should be close to that of the largest file
+rather than the sum of all three.
+
+Example usage:
+    python bench_case_uploads.py --sizes_mb 30 20 10 --bandwidth_mb 50
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+import simplejson as json
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from fabric_client import FabricSession
+from fabric_client.aio import AsyncCaseContainerClient
+from fabric_client.case_containers import post_case_container, post_member_genome
+from stub_server import StubHandler, StubServer
+
+
+class CaseContainerHandler(StubHandler):
+    """Answers case container creation with one upload url per member and
+    accepts member genome uploads.
+    """
+
+    def do_POST(self):
+        if self.path.endswith('/genome'):
+            self._reply({'bytes_received': self._drain()}, status=201)
+            return
+        body = bytearray()
+        self._read_body(body.extend)
+        payload = json.loads(bytes(body))
+        base = 'http://{}:{}'.format(*self.server.server_address)
+        urls = [{'member_id': i + 1,
+                 'url': '{}/case_containers/1/members/{}/genome'.format(base, i + 1)}
+                for i in range(len(payload.get('members', [])))]
+        self._reply({'case_container_id': 1, 'urls': urls})
+
+
+def main():
+    """Main function. Benchmark serial versus concurrent trio uploads.
+    """
+    parser = argparse.ArgumentParser(description='Benchmark concurrent member uploads.')
+    parser.add_argument('--sizes_mb', metavar='MB', type=int, nargs='+', default=[30, 20, 10])
+    parser.add_argument('--bandwidth_mb', metavar='MB', type=float, default=50.0,
+                        help='per-connection upload bandwidth of the stub server')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    vcf_files = []
+    for i, size_mb in enumerate(args.sizes_mb):
+        vcf_file = os.path.join(workdir, 'member{}.vcf.gz'.format(i))
+        with open(vcf_file, 'wb') as f:
+            f.write(os.urandom(size_mb * 1024 * 1024))
+        vcf_files.append(vcf_file)
+
+    results = {}
+    with StubServer(bandwidth=args.bandwidth_mb * 1024 * 1024, handler=CaseContainerHandler) as server:
+        session = FabricSession(pool_size=len(vcf_files))
+        members = [{'accession': 'member{}'.format(i)} for i in range(len(vcf_files))]
+        case = post_case_container(session, {'members': members}, base_url=server.url).json()
+        uploads = [{'url': url['url'], 'genome_name': os.path.basename(vcf_file),
+                    'vcf_file': vcf_file, 'checksum': 'skip'}
+                   for url, vcf_file in zip(case['urls'], vcf_files)]
+
+        start = time.time()
+        per_file = []
+        for upload in uploads:
+            file_start = time.time()
+            post_member_genome(session, **upload).raise_for_status()
+            per_file.append(time.time() - file_start)
+        results['serial_seconds'] = round(time.time() - start, 3)
+        results['largest_file_seconds'] = round(max(per_file), 3)
+
+        async def upload_all():
+            async with AsyncCaseContainerClient(session, base_url=server.url,
+                                                max_concurrency=len(uploads)) as client:
+                return await client.upload_genomes(uploads)
+
+        start = time.time()
+        responses = asyncio.run(upload_all())
+        results['concurrent_seconds'] = round(time.time() - start, 3)
+        results['all_uploaded'] = all(getattr(r, 'status_code', None) == 201 for r in responses)
+        results['speedup'] = round(results['serial_seconds'] / results['concurrent_seconds'], 2)
+        session.close()
+
+    for vcf_file in vcf_files:
+        os.remove(vcf_file)
+    os.rmdir(workdir)
+    sys.stdout.write(json.dumps(results, indent=4))
+    sys.stdout.write('\n')
+
+
+if __name__ == "__main__":
+    main()
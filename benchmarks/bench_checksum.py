@@ -0,0 +1,150 @@
+"""Compare a separate checksum pass with hashing during the upload.
+
+Writes a synthetic gzipped VCF and uploads it to a local stub server twice:
+once the old way (checksum the file, then upload it) and once through
+HashingReader, which hashes the bytes as they are sent. Both use the fe3
+multipart form. Reports how many bytes were read from disk and how long each
+took; the stub checks that the checksum field matches the file part it
+received.
+
+Example usage:
+    python bench_checksum.py --size_mb 512
+"""
+
+import argparse
+import gzip
+import hashlib
+import os
+import random
+import sys
+import tempfile
+import time
+
+import simplejson as json
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from fabric_client import FabricSession
+from fabric_client.checksum import file_digest
+from fabric_client.multipart import hashing_multipart_stream
+from stub_server import StubHandler, StubServer
+
+
+class CountingFile(object):
+    """File wrapper counting the bytes read from disk.
+    """
+    mode = 'rb'
+
+    def __init__(self, file_handle):
+        self.file_handle = file_handle
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        data = self.file_handle.read(size)
+        self.bytes_read += len(data)
+        return data
+
+    def readinto(self, buf):
+        count = self.file_handle.readinto(buf)
+        self.bytes_read += count
+        return count
+
+    def fileno(self):
+        return self.file_handle.fileno()
+
+    def tell(self):
+        return self.file_handle.tell()
+
+    def seek(self, *args):
+        return self.file_handle.seek(*args)
+
+
+class ChecksumCheckingHandler(StubHandler):
+    """Receives a multipart upload and checks its trailing md5 field.
+    """
+
+    def do_POST(self):
+        body = bytearray()
+        self._read_body(body.extend)
+        boundary = self.headers['Content-Type'].split('boundary=')[1].encode('ascii')
+        parts = bytes(body).split(b'--' + boundary)
+        file_part = [p for p in parts if b'filename=' in p][0]
+        file_bytes = file_part.split(b'\r\n\r\n', 1)[1][:-2]
+        checksum_part = [p for p in parts if b'name="checksum"' in p][0]
+        sent = checksum_part.split(b'\r\n\r\n', 1)[1].strip().decode('ascii')
+        self.server.checksum_ok = sent == hashlib.md5(file_bytes).hexdigest()
+        self._reply({'checksum': sent}, status=201)
+
+
+def write_synthetic_vcf(file_name, size_mb):
+    """Write a gzipped VCF of roughly size_mb compressed megabytes, by
+    repeating a block of random records far larger than gzip's window.
+    """
+    bases = 'ACGT'
+    lines = []
+    position = 0
+    for _ in range(100000):
+        position += random.randint(1, 500)
+        lines.append('chr1\t{}\t.\t{}\t{}\t{}\tPASS\tDP={}\tGT:DP\t0/1:{}\n'.format(
+            position, random.choice(bases), random.choice(bases),
+            random.randint(10, 99), random.randint(5, 200), random.randint(5, 200)))
+    block = ''.join(lines).encode('ascii')
+    with gzip.open(file_name, 'wb', compresslevel=1) as f:
+        f.write(b'##fileformat=VCFv4.2\n#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\tSAMPLE\n')
+        while os.path.getsize(file_name) < size_mb * 1024 * 1024:
+            f.write(block)
+
+
+def main():
+    """Main function. Benchmark two-pass versus single-pass checksums.
+    """
+    parser = argparse.ArgumentParser(description='Benchmark checksum-while-uploading.')
+    parser.add_argument('--size_mb', metavar='MB', type=int, default=128)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    file_name = os.path.join(workdir, 'synthetic.vcf.gz')
+    write_synthetic_vcf(file_name, args.size_mb)
+    size = os.path.getsize(file_name)
+    results = {'file_bytes': size}
+
+    with StubServer(handler=ChecksumCheckingHandler) as server:
+        session = FabricSession()
+        url = '{}/case_containers/1/members/1/genome'.format(server.url)
+
+        # Old way: a checksum pass, then the upload reads the file again
+        start = time.time()
+        with open(file_name, 'rb') as f:
+            counting = CountingFile(f)
+            checksum = hashlib.md5()
+            for block in iter(lambda: counting.read(1024 * 1024), b''):
+                checksum.update(block)
+            counting.seek(0)
+            session.post(url, data={'genome_name': 'bench', 'checksum': checksum.hexdigest()},
+                         files={'genome_file': counting})
+        results['two_pass'] = {'bytes_read': counting.bytes_read,
+                               'read_passes': round(float(counting.bytes_read) / size, 2),
+                               'seconds': round(time.time() - start, 3),
+                               'checksum_matches': server.httpd.checksum_ok}
+
+        # New way: hash while the multipart body streams
+        start = time.time()
+        with open(file_name, 'rb') as f:
+            counting = CountingFile(f)
+            content_type, body = hashing_multipart_stream({'genome_name': 'bench'}, 'genome_file',
+                                                          file_name, counting)
+            session.post(url, data=body, headers={'Content-Type': content_type})
+        results['single_pass'] = {'bytes_read': counting.bytes_read,
+                                  'read_passes': round(float(counting.bytes_read) / size, 2),
+                                  'seconds': round(time.time() - start, 3),
+                                  'checksum_matches': server.httpd.checksum_ok}
+        results['checksum_matches_file'] = file_digest(file_name) == checksum.hexdigest()
+        session.close()
+
+    os.remove(file_name)
+    os.rmdir(workdir)
+    sys.stdout.write(json.dumps(results, indent=4))
+    sys.stdout.write('\n')
+
+
+if __name__ == "__main__":
+    main()
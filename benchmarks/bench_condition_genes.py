@@ -0,0 +1,153 @@
+"""Compare upload_condition_genes.py --check with --index on a primed workspace.
+
+A stub `/condition_genes/` endpoint holds --existing pairs and answers
+listing pages, per-pair lookups and creates after --latency_ms each. A
+gzipped CSV of --rows rows, half of them already present and some repeated,
+is uploaded by the real script twice against fresh copies of the workspace:
+once with --check (a lookup per row, then a create), once with --index
+(one listing, then concurrent rate-limited creates). Reports requests by
+kind, wall time, and whether any pair was created twice.
+
+Example usage:
+    python bench_condition_genes.py --rows 1000 --existing 20000 --latency_ms 20
+"""
+
+import argparse
+import csv
+import gzip
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import parse_qs, urlparse
+
+import simplejson as json
+
+from stub_server import StubHandler, StubServer
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'fe2', 'python',
+                      'PanelWorkflows', 'upload_condition_genes.py')
+FIELDS = ['cui', 'gene_symbol', 'condition', 'inheritance', 'prevalence', 'penetrance', 'notes',
+          'age_of_onset', 'pmids']
+
+
+class ConditionGenesHandler(StubHandler):
+    """In-memory `/condition_genes/` listing, lookup and create.
+    """
+
+    def do_GET(self):
+        time.sleep(self.server.latency)
+        query = dict((key, values[0]) for key, values in parse_qs(urlparse(self.path).query).items())
+        if 'cui' in query:
+            self.server.counts['lookups'] += 1
+            found = (query['cui'], query['gene_symbol']) in self.server.pairs
+            self._reply({'objects': [{'CUI': query['cui'], 'gene_symbol': query['gene_symbol']}]
+                         if found else []})
+            return
+        self.server.counts['listing_pages'] += 1
+        offset, limit = int(query.get('offset', 0)), int(query.get('limit', 1000))
+        self._reply({'objects': [{'id': index, 'CUI': cui, 'gene_symbol': gene_symbol}
+                                 for index, (cui, gene_symbol)
+                                 in enumerate(self.server.listing[offset:offset + limit], offset)],
+                     'meta': {'total_count': len(self.server.listing), 'offset': offset}})
+
+    def do_POST(self):
+        time.sleep(self.server.latency)
+        chunks = []
+        self._read_body(chunks.append)
+        payload = json.loads(b''.join(chunks))
+        key = (payload['CUI'], payload['gene_symbol'])
+        self.server.counts['creates'] += 1
+        if key in self.server.pairs:
+            self.server.counts['duplicates_created'] += 1
+        self.server.pairs.add(key)
+        self._reply(dict(payload, id=len(self.server.pairs)))
+
+
+def pair(number):
+    return 'C{:07d}'.format(number), 'GENE{}'.format(number)
+
+
+def write_rows(path, rows, existing, seed=0):
+    """Write a gzipped CSV of rows pairs, half already in the workspace and
+    one in twenty repeated.
+    """
+    rng = random.Random(seed)
+    with gzip.open(path, 'wt') as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        written = []
+        for index in range(rows):
+            if written and rng.random() < 0.05:
+                cui, gene_symbol = rng.choice(written)
+            elif index % 2:
+                cui, gene_symbol = pair(rng.randrange(existing))
+            else:
+                cui, gene_symbol = pair(existing + index)
+            written.append((cui, gene_symbol))
+            writer.writerow({'cui': cui, 'gene_symbol': gene_symbol, 'condition': 'Condition',
+                             'inheritance': 'AD', 'prevalence': 'NULL', 'penetrance': 'NULL',
+                             'notes': 'NULL', 'age_of_onset': 'NULL', 'pmids': 'NULL'})
+
+
+def run(server, path, existing, options):
+    server.httpd.listing = [pair(number) for number in range(existing)]
+    server.httpd.pairs = set(server.httpd.listing)
+    server.httpd.counts = dict.fromkeys(['listing_pages', 'lookups', 'creates',
+                                         'duplicates_created'], 0)
+    env = dict(os.environ, FABRIC_API_URL=server.url, FABRIC_API_LOGIN='login',
+               FABRIC_API_PASSWORD='password')
+    start = time.time()
+    process = subprocess.run([sys.executable, SCRIPT, path] + options, env=env,
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                             universal_newlines=True)
+    seconds = time.time() - start
+    if process.returncode:
+        sys.exit(process.stderr)
+    result = dict(server.httpd.counts, seconds=round(seconds, 2),
+                  pairs_after=len(server.httpd.pairs))
+    if process.stdout:
+        result['summary'] = process.stdout.strip().splitlines()
+    return result
+
+
+def main():
+    """Main function. Benchmark per-row checks versus the local index.
+    """
+    parser = argparse.ArgumentParser(description='Benchmark condition-gene priming.')
+    parser.add_argument('--rows', metavar='rows', type=int, default=1000)
+    parser.add_argument('--existing', metavar='existing', type=int, default=20000)
+    parser.add_argument('--latency_ms', metavar='ms', type=float, default=20.0)
+    parser.add_argument('--workers', metavar='workers', type=int, default=8)
+    parser.add_argument('--rate', metavar='per_second', type=float, default=100.0)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='fabric_condition_genes_bench_')
+    try:
+        path = os.path.join(directory, 'condition_genes.csv.gz')
+        write_rows(path, args.rows, args.existing)
+        with StubServer(handler=ConditionGenesHandler) as server:
+            server.httpd.latency = args.latency_ms / 1000.0
+            results = {'rows': args.rows,
+                       'existing': args.existing,
+                       'check': run(server, path, args.existing, ['--check']),
+                       'index': run(server, path, args.existing,
+                                    ['--index', '--workers', str(args.workers),
+                                     '--rate', str(args.rate)])}
+    finally:
+        shutil.rmtree(directory)
+    if results['index']['pairs_after'] != results['check']['pairs_after']:
+        sys.exit("--index and --check left different workspaces")
+    if results['index']['duplicates_created']:
+        sys.exit("--index created pairs that already existed")
+
+    results['speedup'] = round(results['check']['seconds'] / results['index']['seconds'], 1)
+    sys.stdout.write(json.dumps(results, indent=4))
+    sys.stdout.write('\n')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Bytes sent and genomes created when upload_genomes_folder.py is re-run,
+with and without the local upload index.
+
+A folder of --genomes distinct VCFs of --genome_mb each, plus a copy of
+one of them under another name, is uploaded to the simulator (in its own
+process) the way a re-run after a failure would: first with only half the
+files present, then with all of them, then again unchanged. The same is
+done with --no_dedup. Fails unless, with the index, every file's contents
+reach the server exactly once, the unchanged re-run sends nothing, and each
+file maps to the same genome in every run.
+
+Example usage:
+    python bench_dedup.py --genomes 8 --genome_mb 32
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+import simplejson as json
+
+from fabric_simulator import spawn
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'fe2', 'python',
+                      'GenomeWorkflows', 'upload_genomes_folder.py')
+LINE = b'1\t100000\t.\tA\tG\t50\tPASS\tDP=30\n'
+
+
+def write_vcf(path, size, sample):
+    block = LINE * (1024 * 1024 // len(LINE))
+    with open(path, 'wb') as f:
+        f.write('##fileformat=VCFv4.2\n##sample={}\n'.format(sample).encode('utf-8'))
+        while f.tell() < size:
+            f.write(block[:size - f.tell()])
+
+
+def upload(url, folder, env, options):
+    """Run upload_genomes_folder.py once. Returns its measurements and the
+    genome id it reported for each file.
+    """
+    stats = requests.get(url + '/_simulator/stats').json()
+    start = time.time()
+    output = subprocess.check_output([sys.executable, SCRIPT, '1', folder] + options, env=env,
+                                     stderr=subprocess.DEVNULL)
+    seconds = time.time() - start
+    after = requests.get(url + '/_simulator/stats').json()
+    genomes = json.loads(output)
+    return {'seconds': round(seconds, 2),
+            'uploads': after.get('PUT upload_genome', 0) - stats.get('PUT upload_genome', 0),
+            'bytes_sent': after.get('bytes_received', 0) - stats.get('bytes_received', 0)}, \
+        dict((genome['genome_label'], genome['genome_id']) for genome in genomes)
+
+
+def main():
+    """Main function. Measure re-runs of a folder upload.
+    """
+    parser = argparse.ArgumentParser(description='Benchmark the upload dedup index.')
+    parser.add_argument('--genomes', metavar='genomes', type=int, default=8)
+    parser.add_argument('--genome_mb', metavar='MB', type=int, default=32)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='fabric_dedup_bench_')
+    simulator, url = spawn()
+    results = {'genomes': args.genomes, 'genome_mb': args.genome_mb}
+    try:
+        sources = os.path.join(workdir, 'sources')
+        os.mkdir(sources)
+        names = []
+        for number in range(args.genomes):
+            names.append('sample_{:03d}.vcf'.format(number))
+            write_vcf(os.path.join(sources, names[-1]), args.genome_mb * 1024 * 1024,
+                      'sample{}'.format(number))
+        names.append('sample_000_copy.vcf')
+        shutil.copy(os.path.join(sources, names[0]), os.path.join(sources, names[-1]))
+
+        for mode, options in (('dedup', []), ('no_dedup', ['--no_dedup'])):
+            folder = os.path.join(workdir, mode)
+            os.mkdir(folder)
+            env = dict(os.environ, FABRIC_API_URL=url, FABRIC_API_LOGIN='login',
+                       FABRIC_API_PASSWORD='password',
+                       FABRIC_API_CACHE_DIR=os.path.join(workdir, mode + '_cache'))
+            runs = {}
+            seen = {}
+            half = len(names) // 2
+            for run, present in (('first_half', names[:half]), ('all', names),
+                                 ('unchanged', names)):
+                for name in present:
+                    if not os.path.exists(os.path.join(folder, name)):
+                        os.link(os.path.join(sources, name), os.path.join(folder, name))
+                runs[run], genome_ids = upload(url, folder, env, options + ['--no_compress'])
+                if mode == 'dedup':
+                    for name, genome_id in genome_ids.items():
+                        if seen.setdefault(name, genome_id) != genome_id:
+                            sys.exit("{} was uploaded again as genome {}".format(name, genome_id))
+            results[mode] = runs
+
+        dedup = results['dedup']
+        unique_bytes = args.genomes * args.genome_mb * 1024 * 1024
+        if sum(run['bytes_sent'] for run in dedup.values()) != unique_bytes:
+            sys.exit("With the index, {} bytes were sent for {} bytes of distinct files".format(
+                sum(run['bytes_sent'] for run in dedup.values()), unique_bytes))
+        if dedup['unchanged']['uploads']:
+            sys.exit("The unchanged re-run uploaded {} files".format(dedup['unchanged']['uploads']))
+    finally:
+        simulator.kill()
+        shutil.rmtree(workdir)
+
+    for mode in ('dedup', 'no_dedup'):
+        results[mode]['total_mb_sent'] = round(sum(
+            run['bytes_sent'] for run in results[mode].values()) / 1048576.0, 1)
+    sys.stdout.write(json.dumps(results, indent=4))
+    sys.stdout.write('\n')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Download throughput of a large VCF export for each chunk size.
+
+A stub serves a synthetic VCF of --size_mb from memory. The baseline reads
+it with iter_content(1024) and writes each block to a Python file object, as
+the variant scripts used to. write_response() then streams it to a file
+descriptor at each chunk size, and once more with BGZF compression. Output
+goes to /dev/null, so the figures are client (and stub) CPU bound; the best
+of --repeat runs is reported. Checks that the BGZF output decompresses to
+the original body.
+
+Example usage:
+    python bench_download_chunks.py --size_mb 256
+"""
+
+import argparse
+import gzip
+import os
+import sys
+import tempfile
+import time
+
+import simplejson as json
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from fabric_client import FabricSession
+from fabric_client.downloads import write_response
+from stub_server import StubHandler, StubServer
+
+CHUNK_SIZES_KB = (1, 8, 64, 256, 1024, 4096)
+
+
+def vcf_body(size):
+    """Synthetic VCF text of exactly size bytes.
+    """
+    header = b'##fileformat=VCFv4.2\n#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n'
+    lines = [header]
+    total = len(header)
+    position = 10000
+    while total < size:
+        position += 137
+        line = 'chr{}\t{}\t.\tA\tG\t50\tPASS\tDP={};AF=0.{}\n'.format(
+            position % 22 + 1, position, position % 97, position % 1000).encode('utf-8')
+        lines.append(line)
+        total += len(line)
+    return b''.join(lines)[:size]
+
+
+class VcfHandler(StubHandler):
+    """Serve the server's VCF body to any GET.
+    """
+
+    def do_GET(self):
+        body = self.server.body
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        view = memoryview(body)
+        for start in range(0, len(body), 1024 * 1024):
+            self.wfile.write(view[start:start + 1024 * 1024])
+
+
+def best_rate(run, size, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        run()
+        seconds = time.time() - start
+        best = seconds if best is None else min(best, seconds)
+    return round(size / best / (1024 * 1024), 1)
+
+
+def main():
+    """Main function. Measure download MB/s per chunk size.
+    """
+    parser = argparse.ArgumentParser(description='Benchmark streaming download chunk sizes.')
+    parser.add_argument('--size_mb', metavar='MB', type=int, default=256)
+    parser.add_argument('--repeat', metavar='repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    size = args.size_mb * 1024 * 1024
+    session = FabricSession(pool_size=1)
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    with StubServer(handler=VcfHandler) as server:
+        server.httpd.body = vcf_body(size)
+        url = server.url + '/reports/1/variants?format=VCF'
+
+        def legacy():
+            response = session.get(url, stream=True)
+            with open(os.devnull, 'wb') as out:
+                for block in response.iter_content(1024):
+                    out.write(block)
+
+        results = {'size_mb': args.size_mb,
+                   'legacy_1kb_file_object_mb_s': best_rate(legacy, size, args.repeat),
+                   'write_response_mb_s': {}}
+        for chunk_kb in CHUNK_SIZES_KB:
+            run = lambda: write_response(session.get(url, stream=True), devnull,
+                                         chunk_size=chunk_kb * 1024)
+            results['write_response_mb_s'][str(chunk_kb) + 'kb'] = best_rate(run, size, args.repeat)
+
+        run = lambda: write_response(session.get(url, stream=True), devnull, bgzip=True)
+        results['bgzip_1024kb_mb_s'] = best_rate(run, size, 1)
+
+        with tempfile.TemporaryFile() as compressed:
+            write_response(session.get(url, stream=True), compressed.fileno(), bgzip=True)
+            compressed.seek(0)
+            data = compressed.read()
+        results['bgzip_ratio'] = round(float(size) / len(data), 1)
+        if gzip.decompress(data) != server.httpd.body:
+            sys.exit("BGZF output does not decompress to the original body")
+    os.close(devnull)
+    session.close()
+
+    sys.stdout.write(json.dumps(results, indent=4))
+    sys.stdout.write('\n')
+
+
+if __name__ == "__main__":
+    main()
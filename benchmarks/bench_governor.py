@@ -0,0 +1,145 @@
+"""Throughput and failures against a throttling API, with and without the governor.
+
+A stub server admits at most --server_rate requests per second, answering
+429 with a Retry-After header beyond that, and at most --server_concurrency
+requests at once, answering 503 beyond that, also with Retry-After. --threads threads send
+--requests requests through one FabricSession, four reads to every write,
+three ways: with no governor, as the scripts used to; with the default
+governor, which only reacts to 429s and 503s; and with the governor's read
+and write rates and in-flight limits set to what the server sustains.
+Reports requests that finally failed, retries, throttled responses and
+successful requests per second.
+
+Example usage:
+    python bench_governor.py --requests 1000 --server_rate 100
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import simplejson as json
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from fabric_client import FabricSession
+from fabric_client.governor import READ, UPLOAD, WRITE, EndpointLimit, Governor
+from stub_server import StubHandler, StubServer
+
+
+class ThrottlingHandler(StubHandler):
+    """Serve requests within the server's rate and concurrency limits, and
+    turn the rest away.
+    """
+
+    def _admit(self):
+        server = self.server
+        with server.lock:
+            now = time.time()
+            server.tokens = min(server.rate, server.tokens + (now - server.updated) * server.rate)
+            server.updated = now
+            if server.active >= server.concurrency:
+                server.rejected += 1
+                return 503
+            if server.tokens < 1:
+                server.rejected += 1
+                return 429
+            server.tokens -= 1
+            server.active += 1
+            return None
+
+    def _serve(self):
+        self._drain()
+        status = self._admit()
+        if status == 429:
+            self.send_response(429)
+            self.send_header('Retry-After', '1')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if status == 503:
+            self.send_response(503)
+            self.send_header('Retry-After', '1')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        try:
+            time.sleep(self.server.latency)
+            self._reply({'path': self.path})
+        finally:
+            with self.server.lock:
+                self.server.active -= 1
+
+    do_GET = _serve
+    do_POST = _serve
+
+
+def run(server, governor, threads, count):
+    server.httpd.tokens = float(server.httpd.rate)
+    server.httpd.updated = time.time()
+    server.httpd.rejected = 0
+    session = FabricSession(pool_size=threads, governor=governor)
+    outcomes = {'ok': 0, 'failed': 0}
+    lock = threading.Lock()
+
+    def call(number):
+        if number % 5:
+            response = session.get('{}/reports/{}'.format(server.url, number))
+        else:
+            response = session.post('{}/reports/{}/notes'.format(server.url, number),
+                                    data=json.dumps({'note': 'checked'}))
+        with lock:
+            outcomes['ok' if response.status_code == 200 else 'failed'] += 1
+
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(call, range(count)))
+    seconds = time.time() - start
+    session.close()
+    return dict(outcomes, seconds=round(seconds, 2),
+                ok_per_second=round(outcomes['ok'] / seconds, 1),
+                rejected_by_server=server.httpd.rejected,
+                retries=governor.retries if governor else 0)
+
+
+def main():
+    """Main function. Benchmark the governor against a throttling server.
+    """
+    parser = argparse.ArgumentParser(description='Benchmark the request governor.')
+    parser.add_argument('--requests', metavar='requests', type=int, default=1000)
+    parser.add_argument('--threads', metavar='threads', type=int, default=32)
+    parser.add_argument('--server_rate', metavar='per_second', type=float, default=100.0)
+    parser.add_argument('--server_concurrency', metavar='requests', type=int, default=16)
+    parser.add_argument('--latency_ms', metavar='ms', type=float, default=20.0)
+    args = parser.parse_args()
+
+    with StubServer(handler=ThrottlingHandler) as server:
+        server.httpd.lock = threading.Lock()
+        server.httpd.rate = args.server_rate
+        server.httpd.concurrency = args.server_concurrency
+        server.httpd.active = 0
+        server.httpd.latency = args.latency_ms / 1000.0
+
+        results = {'requests': args.requests, 'threads': args.threads,
+                   'no_governor': run(server, False, args.threads, args.requests)}
+        results['default_governor'] = run(server, Governor(), args.threads, args.requests)
+        # Split the server's rate and concurrency between reads and writes
+        # in the proportion they are sent
+        tuned = Governor({READ: EndpointLimit(rate=args.server_rate * 0.8 * 0.95,
+                                              max_in_flight=args.server_concurrency * 3 // 4),
+                          WRITE: EndpointLimit(rate=args.server_rate * 0.2 * 0.95,
+                                               max_in_flight=args.server_concurrency // 4),
+                          UPLOAD: EndpointLimit(max_in_flight=1)})
+        results['tuned_governor'] = run(server, tuned, args.threads, args.requests)
+    for name in ('default_governor', 'tuned_governor'):
+        if results[name]['failed']:
+            sys.exit("{} left {} requests failed".format(name, results[name]['failed']))
+
+    sys.stdout.write(json.dumps(results, indent=4))
+    sys.stdout.write('\n')
+
+
+if __name__ == "__main__":
+    main()
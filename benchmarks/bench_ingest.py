@@ -0,0 +1,141 @@
+"""Delay from a genome being completely written into a drop folder to its
+being uploaded and archived by watch_genomes_folder.py.
+
+Runs the watcher against the simulator (each in its own process) while a
+writer thread plays a sequencer: --files VCFs of --genome_mb are written
+one after another, each in 16 slow pieces, half of them followed by a .done
+marker and half left to settle. Records, per file, the seconds from its
+last write (or marker) to its appearance in the archive folder. Fails
+unless every file is uploaded exactly once, whole, and archived.
+
+Example usage:
+    python bench_ingest.py --files 12 --genome_mb 16 --settle 2
+"""
+
+import argparse
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+import simplejson as json
+
+from fabric_simulator import spawn
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'fe2', 'python',
+                      'GenomeWorkflows', 'watch_genomes_folder.py')
+LINE = b'1\t100000\t.\tA\tG\t50\tPASS\tDP=30\n'
+PIECES = 16
+
+
+def write_genomes(folder, count, size, pause, completed):
+    """Write count VCFs into folder slowly, recording in completed the
+    time each became complete.
+    """
+    piece = (LINE * (size // PIECES // len(LINE) + 1))[:size // PIECES]
+    for number in range(count):
+        name = 'sample{:03d}.vcf'.format(number)
+        path = os.path.join(folder, name)
+        with open(path, 'wb') as f:
+            f.write('##fileformat=VCFv4.2\n##sample={}\n'.format(number).encode('utf-8'))
+            for _ in range(PIECES):
+                f.write(piece)
+                f.flush()
+                time.sleep(pause)
+        if number % 2 == 0:
+            with open(path + '.done', 'w'):
+                pass
+        completed[name] = time.time()
+
+
+def summarize(delays):
+    delays = sorted(delays)
+    if not delays:
+        return {}
+    return {'files': len(delays),
+            'median_seconds': round(delays[len(delays) // 2], 2),
+            'max_seconds': round(delays[-1], 2)}
+
+
+def main():
+    """Main function. Measure drop-folder ingestion delay.
+    """
+    parser = argparse.ArgumentParser(description='Benchmark the drop folder watcher.')
+    parser.add_argument('--files', metavar='files', type=int, default=12)
+    parser.add_argument('--genome_mb', metavar='MB', type=int, default=16)
+    parser.add_argument('--settle', metavar='seconds', type=float, default=2.0)
+    parser.add_argument('--workers', metavar='workers', type=int, default=4)
+    parser.add_argument('--pause_ms', metavar='ms', type=float, default=50.0,
+                        help='pause between the pieces of each file')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='fabric_ingest_bench_')
+    drop = os.path.join(workdir, 'drop')
+    archive = os.path.join(workdir, 'archive')
+    os.mkdir(drop)
+    simulator, url = spawn()
+    env = dict(os.environ, FABRIC_API_URL=url, FABRIC_API_LOGIN='login',
+               FABRIC_API_PASSWORD='password', FABRIC_API_CACHE_DIR=os.path.join(workdir, 'cache'))
+    output_path = os.path.join(workdir, 'ingested.jsonl')
+    size = args.genome_mb * 1024 * 1024
+    completed = {}
+    archived = {}
+    try:
+        with open(output_path, 'wb') as output:
+            watcher = subprocess.Popen([sys.executable, SCRIPT, '1', drop, archive,
+                                        '--settle', str(args.settle), '--poll', '0.5',
+                                        '--workers', str(args.workers)],
+                                       env=env, stdout=output, stderr=subprocess.DEVNULL)
+            writer = threading.Thread(target=write_genomes,
+                                      args=(drop, args.files, size, args.pause_ms / 1000.0,
+                                            completed))
+            start = time.time()
+            writer.start()
+            deadline = start + 120 + args.files * PIECES * args.pause_ms / 1000.0
+            while len(archived) < args.files and time.time() < deadline:
+                if os.path.isdir(archive):
+                    for name in os.listdir(archive):
+                        if not name.endswith('.done'):
+                            archived.setdefault(name, time.time())
+                time.sleep(0.02)
+            writer.join()
+            watcher.send_signal(signal.SIGTERM)
+            watcher.wait()
+        stats = requests.get(url + '/_simulator/stats').json()
+        with open(output_path) as f:
+            records = [json.loads(line) for line in f]
+    finally:
+        simulator.kill()
+        shutil.rmtree(workdir)
+
+    if len(archived) != args.files:
+        sys.exit("Only {} of {} files were archived".format(len(archived), args.files))
+    if stats.get('PUT upload_genome') != args.files or len(records) != args.files:
+        sys.exit("{} uploads and {} output lines for {} files".format(
+            stats.get('PUT upload_genome'), len(records), args.files))
+    # Each file is its header plus PIECES pieces
+    expected = sum(size // PIECES * PIECES + len('##fileformat=VCFv4.2\n##sample={}\n'.format(n))
+                   for n in range(args.files))
+    if stats.get('bytes_received') != expected:
+        sys.exit("The simulator received {} bytes, expected {}".format(
+            stats.get('bytes_received'), expected))
+
+    delays = dict((name, archived[name] - completed[name]) for name in archived)
+    names = sorted(delays)
+    results = {'files': args.files, 'genome_mb': args.genome_mb, 'settle': args.settle,
+               'workers': args.workers,
+               'done_marker': summarize([delays[name] for name in names[0::2]]),
+               'size_stable': summarize([delays[name] for name in names[1::2]]),
+               'mb_per_second_of_uploads': round(sum(
+                   record['mb_per_second'] or 0 for record in records) / len(records), 1)}
+    sys.stdout.write(json.dumps(results, indent=4))
+    sys.stdout.write('\n')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""Compare one find_job.py polling loop per job with the job tracker.
+
+A stub `/jobs` endpoint moves each job from QUEUED to RUNNING to COMPLETED
+over tens of seconds, and answers each lookup after --latency_ms. The
+baseline runs one loop per UUID in parallel, each looking its job up every
+--interval seconds on a new connection, as a shell loop around find_job.py
+does. The tracker polls all of them with track_jobs() from one process.
+Reports requests, connections opened, how long after finishing each job was
+noticed, and the tracker's state file summary.
+
+Example usage:
+    python bench_job_tracker.py --jobs 100 --latency_ms 100
+"""
+
+import argparse
+import os
+import threading
+import random
+import shutil
+import sys
+import tempfile
+import time
+import uuid as uuid_module
+from urllib.parse import parse_qs, urlparse
+
+import simplejson as json
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from fabric_client import FabricSession
+from fabric_client.jobs import JobStateFile, fetch_job_status, job_report, track_jobs
+from stub_server import StubHandler, StubServer
+
+
+class JobsHandler(StubHandler):
+    """Answer GET /jobs?uuid= from the server's job timelines.
+    """
+
+    def do_GET(self):
+        time.sleep(self.server.latency)
+        uuid = parse_qs(urlparse(self.path).query)['uuid'][0]
+        queued, running, completed = self.server.timelines[uuid]
+        now = time.time()
+        self.server.requests += 1
+        if now >= completed:
+            status = 'COMPLETED'
+            self.server.noticed.setdefault(uuid, now - completed)
+        elif now >= running:
+            status = 'RUNNING'
+        else:
+            status = 'QUEUED'
+        self._reply([{'uuid': uuid, 'status': status}])
+
+
+def start_jobs(server, count, seed=0):
+    """Give count new jobs timelines starting now, and return their UUIDs.
+    """
+    rng = random.Random(seed)
+    now = time.time()
+    server.httpd.timelines = {}
+    server.httpd.noticed = {}
+    server.httpd.requests = 0
+    for _ in range(count):
+        running = now + rng.uniform(1.0, 5.0)
+        server.httpd.timelines[str(uuid_module.uuid4())] = (now, running,
+                                                           running + rng.uniform(10.0, 30.0))
+    return list(server.httpd.timelines)
+
+
+def summary(server, seconds, connections):
+    delays = sorted(server.httpd.noticed.values())
+    return {'requests': server.httpd.requests,
+            'connections': server.connections - connections,
+            'seconds': round(seconds, 2),
+            'mean_notice_delay_s': round(sum(delays) / len(delays), 2),
+            'max_notice_delay_s': round(delays[-1], 2)}
+
+
+def per_job_loops(server, count, interval):
+    uuids = start_jobs(server, count)
+    connections = server.connections
+    start = time.time()
+
+    def poll(uuid):
+        while True:
+            # A new process per lookup means a new connection per lookup
+            session = FabricSession(pool_size=1)
+            status = fetch_job_status(session, uuid, server.url)
+            session.close()
+            if status == 'COMPLETED':
+                return
+            time.sleep(interval)
+
+    threads = [threading.Thread(target=poll, args=(uuid,)) for uuid in uuids]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summary(server, time.time() - start, connections)
+
+
+def tracker(server, count, interval, max_interval, workers, state_path):
+    uuids = start_jobs(server, count)
+    state = JobStateFile(state_path)
+    for uuid in uuids:
+        state.add(uuid)
+    state.save()
+    session = FabricSession(pool_size=workers)
+    connections = server.connections
+    start = time.time()
+    track_jobs(JobStateFile(state_path), lambda uuid: fetch_job_status(session, uuid, server.url),
+               min_interval=interval, max_interval=max_interval, workers=workers)
+    session.close()
+    result = summary(server, time.time() - start, connections)
+    result['report'] = job_report(JobStateFile(state_path))
+    return result
+
+
+def main():
+    """Main function. Benchmark per-job polling loops versus the job tracker.
+    """
+    parser = argparse.ArgumentParser(description='Benchmark the secondary-analysis job tracker.')
+    parser.add_argument('--jobs', metavar='jobs', type=int, default=100)
+    parser.add_argument('--latency_ms', metavar='ms', type=float, default=100.0,
+                        help='server time per lookup')
+    parser.add_argument('--interval', metavar='seconds', type=float, default=1.0,
+                        help='fixed polling interval, and the tracker\'s minimum interval')
+    parser.add_argument('--max_interval', metavar='seconds', type=float, default=4.0)
+    parser.add_argument('--workers', metavar='workers', type=int, default=8)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='fabric_jobs_bench_')
+    try:
+        with StubServer(handler=JobsHandler) as server:
+            server.httpd.latency = args.latency_ms / 1000.0
+            results = {'jobs': args.jobs,
+                       'per_job_loops': per_job_loops(server, args.jobs, args.interval),
+                       'tracker': tracker(server, args.jobs, args.interval, args.max_interval,
+                                          args.workers, os.path.join(directory, 'jobs.json'))}
+    finally:
+        shutil.rmtree(directory)
+    if results['tracker']['report']['finished'] != args.jobs:
+        sys.exit("Tracker state file does not show every job finished")
+
+    sys.stdout.write(json.dumps(results, indent=4))
+    sys.stdout.write('\n')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Compare peak memory of response.json() with incremental variant parsing.
+
+Serves synthetic report variant listings of growing size from a local stub
+server and fetches each one in a fresh client process, once with
+response.json() (as the scripts used to do) and once through
+fabric_client.jsonstream, writing NDJSON to /dev/null either way. Reports
+the client's peak RSS, which should stay flat for the streaming parser as the
+report grows.
+
+Example usage:
+    python bench_json_stream.py --variants 10000,100000,500000
+"""
+
+import argparse
+import os
+import re
+import resource
+import subprocess
+import sys
+import time
+
+import simplejson as json
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from fabric_client import FabricSession
+from fabric_client.jsonstream import iter_response_items, write_ndjson
+from stub_server import StubHandler, StubServer
+
+
+def synthetic_variant(index):
+    """Return one report variant shaped like the API's JSON.
+    """
+    return {'id': index,
+            'chromosome': str(index % 22 + 1),
+            'start_on_chrom': 10000 + index * 37,
+            'end_on_chrom': 10001 + index * 37,
+            'ref': 'A',
+            'alt': 'G',
+            'genotype': 'het',
+            'status': 'REVIEWED',
+            'to_report': False,
+            'gene_symbol': 'GENE{}'.format(index % 20000),
+            'hgvs_c': 'c.{}A>G'.format(index % 5000),
+            'effect': 'missense_variant',
+            'quality': 99.5,
+            'allele_frequency': 0.0012,
+            'notes': []}
+
+
+class VariantListingHandler(StubHandler):
+    """Stream GET /reports/<count>/variants as {"objects": [...]} with
+    chunked encoding, generating variants on the fly.
+    """
+
+    def do_GET(self):
+        count = int(re.search(r'/reports/(\d+)/', self.path).group(1))
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        block = []
+
+        def flush():
+            data = ''.join(block).encode('utf-8')
+            self.wfile.write('{:x}\r\n'.format(len(data)).encode('ascii') + data + b'\r\n')
+            del block[:]
+
+        block.append('{{"total": {}, "objects": ['.format(count))
+        for index in range(count):
+            if index:
+                block.append(', ')
+            block.append(json.dumps(synthetic_variant(index)))
+            if len(block) >= 512:
+                flush()
+        block.append(']}')
+        flush()
+        self.wfile.write(b'0\r\n\r\n')
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (ru_maxrss is KB on Linux).
+    """
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0, 1)
+
+
+def run_client(url, mode):
+    """Fetch and write one listing, then report time and peak RSS as JSON.
+    """
+    session = FabricSession(pool_size=1)
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as out:
+        if mode == 'json':
+            response = session.get(url)
+            response.raise_for_status()
+            count = write_ndjson(response.json()['objects'], out)
+        else:
+            response = session.get(url, stream=True)
+            response.raise_for_status()
+            count = write_ndjson(iter_response_items(response), out)
+    seconds = time.perf_counter() - start
+    session.close()
+    sys.stdout.write(json.dumps({'variants': count,
+                                 'seconds': round(seconds, 3),
+                                 'peak_rss_mb': peak_rss_mb()}))
+
+
+def measure(url, mode):
+    """Run one client in a fresh process so each peak RSS is independent.
+    """
+    output = subprocess.check_output([sys.executable, os.path.abspath(__file__),
+                                      '--client', url, '--mode', mode])
+    return json.loads(output)
+
+
+def main():
+    """Main function. Benchmark peak memory of full versus streaming parsing.
+    """
+    parser = argparse.ArgumentParser(description='Benchmark full versus streaming JSON parsing.')
+    parser.add_argument('--variants', metavar='counts', type=str, default='10000,100000,300000',
+                        help='comma-separated report sizes, in variants')
+    parser.add_argument('--client', metavar='url', type=str, help=argparse.SUPPRESS)
+    parser.add_argument('--mode', metavar='mode', type=str, choices=['json', 'stream'],
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.client:
+        run_client(args.client, args.mode)
+        return
+
+    results = []
+    with StubServer(handler=VariantListingHandler) as server:
+        for count in [int(value) for value in args.variants.split(',')]:
+            url = '{}/reports/{}/variants'.format(server.url, count)
+            full = measure(url, 'json')
+            streamed = measure(url, 'stream')
+            if full['variants'] != count or streamed['variants'] != count:
+                sys.exit("Expected {} variants, got {} and {}".format(
+                    count, full['variants'], streamed['variants']))
+            results.append({'variants': count, 'response_json': full, 'streaming': streamed})
+
+    sys.stdout.write(json.dumps(results, indent=4))
+    sys.stdout.write('\n')
+
+
+if __name__ == "__main__":
+    main()
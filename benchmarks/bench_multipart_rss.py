@@ -0,0 +1,113 @@
+"""Peak memory of a case member VCF upload, whatever the size of the VCF.
+
+Runs fe3 post_new_case.py against the simulator (in its own process) to
+create a case and upload a --size_gb synthetic VCF (a sparse file, so it
+takes no disk space) as the proband's genome, and records the script's peak
+RSS. Fails unless the peak stays under --max_rss_mb, the whole file reaches
+the simulator and the form was sent with a Content-Length rather than
+chunked. For comparison, a --baseline_mb file is posted the way the script
+used to, with requests' files= argument, which builds the form in memory.
+
+Example usage:
+    python bench_multipart_rss.py --size_gb 8 --max_rss_mb 100
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+import simplejson as json
+
+from fabric_simulator import spawn
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'fe3', 'python',
+                      'post_new_case.py')
+FILES_UPLOAD = """
+import sys
+import requests
+with open(sys.argv[2], 'rb') as f:
+    response = requests.post(sys.argv[1], data={'genome_name': 'baseline'},
+                             files={'genome_file': f})
+sys.exit(response.status_code != 201)
+"""
+
+
+def write_sparse_vcf(path, size):
+    with open(path, 'wb') as f:
+        f.write(b'##fileformat=VCFv4.2\n#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n')
+        f.truncate(size)
+
+
+def measure(command, env):
+    """Run command; returns its seconds and peak RSS in MB, or exits if it
+    fails.
+    """
+    start = time.time()
+    process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL)
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if process.returncode:
+        sys.exit("{} exited with {}".format(' '.join(command), process.returncode))
+    # ru_maxrss is in kilobytes on Linux
+    return round(time.time() - start, 2), round(usage.ru_maxrss / 1024.0, 1)
+
+
+def main():
+    """Main function. Measure peak RSS of a large streamed member upload.
+    """
+    parser = argparse.ArgumentParser(description='Benchmark multipart upload memory.')
+    parser.add_argument('--size_gb', metavar='GB', type=float, default=8.0)
+    parser.add_argument('--max_rss_mb', metavar='MB', type=float, default=100.0)
+    parser.add_argument('--baseline_mb', metavar='MB', type=int, default=512)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='fabric_multipart_bench_')
+    simulator, url = spawn()
+    stats_url = url + '/_simulator/stats'
+    env = dict(os.environ, FABRIC_API_URL=url, FABRIC_API_LOGIN='login',
+               FABRIC_API_PASSWORD='password', FABRIC_API_CACHE_DIR=os.path.join(workdir, 'cache'))
+    try:
+        size = int(args.size_gb * 1024 ** 3)
+        vcf = os.path.join(workdir, 'proband.vcf')
+        write_sparse_vcf(vcf, size)
+        seconds, peak = measure([sys.executable, SCRIPT, '--analysis', 'PANEL', '--test_id', '1',
+                                 '--genome', 'proband', '--vcf', vcf, '--accession', 'RSS1',
+                                 '--sex', 'FEMALE'], env)
+        stats = requests.get(stats_url).json()
+        results = {'streamed': {'file_bytes': size, 'seconds': seconds, 'peak_rss_mb': peak,
+                                'mb_per_second': round(size / 1048576.0 / seconds, 1),
+                                'bytes_received_by_server': stats.get('bytes_received', 0),
+                                'chunked': bool(stats.get('chunked_uploads'))}}
+        os.remove(vcf)
+
+        size = args.baseline_mb * 1024 ** 2
+        write_sparse_vcf(vcf, size)
+        seconds, peak = measure([sys.executable, '-c', FILES_UPLOAD,
+                                 url + '/case_containers/1/members/1/genome', vcf], env)
+        results['files_argument'] = {'file_bytes': size, 'seconds': seconds,
+                                     'peak_rss_mb': peak}
+    finally:
+        simulator.kill()
+        shutil.rmtree(workdir)
+
+    streamed = results['streamed']
+    if streamed['bytes_received_by_server'] < streamed['file_bytes']:
+        sys.exit("The simulator received only {} bytes".format(
+            streamed['bytes_received_by_server']))
+    if streamed['chunked']:
+        sys.exit("The form was sent chunked rather than with a Content-Length")
+    if streamed['peak_rss_mb'] > args.max_rss_mb:
+        sys.exit("Peak RSS {} MB is over the {} MB bound".format(streamed['peak_rss_mb'],
+                                                                 args.max_rss_mb))
+
+    sys.stdout.write(json.dumps(results, indent=4))
+    sys.stdout.write('\n')
+
+
+if __name__ == "__main__":
+    main()
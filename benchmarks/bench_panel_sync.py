@@ -0,0 +1,210 @@
+"""Compare building a panel catalog one post_panel.py call at a time with --sync.
+
+A stub `/panels/` API keeps panels and their genes in memory and answers
+each request after --latency_ms. The baseline creates each of --panels
+panels and then adds its genes, one after the other, as a loop over
+post_panel.py does. post_panel.py --sync then builds the same catalog on an
+empty workspace, re-syncs it unchanged, syncs again after a few definitions
+are edited, and once more without its state file. Reports requests by kind
+and wall time for each run, and checks the workspace ends up matching the
+definitions.
+
+Example usage:
+    python bench_panel_sync.py --panels 500 --genes 50 --latency_ms 20
+"""
+
+import argparse
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+import simplejson as json
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from fabric_client import FabricSession
+from fabric_client.panel_sync import STATE_FILE_NAME, load_panel_definitions
+from stub_server import StubHandler, StubServer
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'fe2', 'python',
+                      'PanelWorkflows', 'post_panel.py')
+
+
+class PanelsHandler(StubHandler):
+    """In-memory panels: listing, create, edit, and regions get and add.
+    """
+
+    def _count(self, kind):
+        with self.server.lock:
+            self.server.counts[kind] = self.server.counts.get(kind, 0) + 1
+
+    def _body(self):
+        chunks = []
+        self._read_body(chunks.append)
+        return json.loads(b''.join(chunks))
+
+    def do_GET(self):
+        time.sleep(self.server.latency)
+        url = urlparse(self.path)
+        parts = [part for part in url.path.split('/') if part]
+        if len(parts) == 1:
+            self._count('list')
+            query = dict((key, values[0]) for key, values in parse_qs(url.query).items())
+            offset, limit = int(query.get('offset', 0)), int(query.get('limit', 1000))
+            panels = [self.server.panels[panel_id] for panel_id in sorted(self.server.panels)]
+            self._reply({'objects': panels[offset:offset + limit],
+                         'meta': {'total_count': len(panels), 'offset': offset}})
+        else:
+            self._count('get_regions')
+            genes = self.server.genes[int(parts[1])]
+            self._reply({'objects': [{'gene_symbol': gene} for gene in sorted(genes)]})
+
+    def do_POST(self):
+        time.sleep(self.server.latency)
+        parts = [part for part in urlparse(self.path).path.split('/') if part]
+        payload = self._body()
+        if len(parts) == 1:
+            self._count('create')
+            with self.server.lock:
+                panel_id = len(self.server.panels) + 1
+                self.server.panels[panel_id] = dict(payload, id=panel_id)
+                self.server.genes[panel_id] = set()
+            self._reply(self.server.panels[panel_id])
+        else:
+            self._count('add_genes')
+            genes = self.server.genes[int(parts[1])]
+            genes.update(payload['gene_symbols'].split(','))
+            self._reply({'id': int(parts[1]), 'genes': len(genes)})
+
+    def do_PUT(self):
+        time.sleep(self.server.latency)
+        self._count('edit')
+        panel_id = int([part for part in urlparse(self.path).path.split('/') if part][1])
+        self.server.panels[panel_id] = dict(self._body(), id=panel_id)
+        self._reply(self.server.panels[panel_id])
+
+
+def write_catalog(directory, panels, genes, seed=0):
+    rng = random.Random(seed)
+    gene_pool = ['GENE{}'.format(number) for number in range(20000)]
+    for number in range(panels):
+        definition = {'name': 'Panel {}'.format(number),
+                      'test_code': 'TC-{:04d}'.format(number),
+                      'description': 'Synthetic panel {}'.format(number),
+                      'gene_symbols': rng.sample(gene_pool, genes)}
+        with open(os.path.join(directory, 'panel_{:04d}.json'.format(number)), 'w') as f:
+            json.dump(definition, f)
+
+
+def edit_catalog(directory, count):
+    """Add a gene to count definitions and change the description of count
+    others.
+    """
+    for number in range(count * 2):
+        path = os.path.join(directory, 'panel_{:04d}.json'.format(number))
+        with open(path) as f:
+            definition = json.load(f)
+        if number < count:
+            definition['gene_symbols'].append('NEWGENE{}'.format(number))
+        else:
+            definition['description'] += ' (revised)'
+        with open(path, 'w') as f:
+            json.dump(definition, f)
+
+
+def reset(server):
+    server.httpd.panels = {}
+    server.httpd.genes = {}
+    server.httpd.lock = threading.Lock()
+
+
+def run_sync(server, directory, workers):
+    server.httpd.counts = {}
+    env = dict(os.environ, FABRIC_API_URL=server.url, FABRIC_API_LOGIN='login',
+               FABRIC_API_PASSWORD='password')
+    start = time.time()
+    process = subprocess.run([sys.executable, SCRIPT, '--sync', directory,
+                              '--workers', str(workers)], env=env, stdout=subprocess.PIPE,
+                             stderr=subprocess.PIPE, universal_newlines=True)
+    seconds = time.time() - start
+    if process.returncode:
+        sys.exit(process.stdout + process.stderr)
+    return dict(requests=dict(server.httpd.counts), seconds=round(seconds, 2),
+                summary=process.stdout.strip().splitlines()[-2:])
+
+
+def run_serial(server, directory):
+    """Create each panel, then add its genes, one panel after another.
+    """
+    server.httpd.counts = {}
+    session = FabricSession(pool_size=1)
+    start = time.time()
+    for definition in load_panel_definitions(directory):
+        payload = dict((field, definition.get(field)) for field in
+                       ('name', 'description', 'methodology', 'limitations', 'fda_disclosure',
+                        'test_code'))
+        panel_id = session.post(server.url + '/panels/', data=json.dumps(payload)).json()['id']
+        session.post('{}/panels/{}/regions'.format(server.url, panel_id),
+                     data=json.dumps({'gene_symbols': ','.join(definition['gene_symbols'])}))
+    session.close()
+    return dict(requests=dict(server.httpd.counts), seconds=round(time.time() - start, 2))
+
+
+def check_workspace(server, directory):
+    by_code = dict((panel['test_code'], panel) for panel in server.httpd.panels.values())
+    for definition in load_panel_definitions(directory):
+        panel = by_code[definition['test_code']]
+        if panel['description'] != definition['description']:
+            sys.exit("Panel {} has the wrong description".format(definition['test_code']))
+        if sorted(server.httpd.genes[panel['id']]) != definition['gene_symbols']:
+            sys.exit("Panel {} has the wrong genes".format(definition['test_code']))
+
+
+def main():
+    """Main function. Benchmark serial panel creation versus panel sync.
+    """
+    parser = argparse.ArgumentParser(description='Benchmark panel catalog sync.')
+    parser.add_argument('--panels', metavar='panels', type=int, default=500)
+    parser.add_argument('--genes', metavar='genes', type=int, default=50,
+                        help='genes per panel')
+    parser.add_argument('--latency_ms', metavar='ms', type=float, default=20.0)
+    parser.add_argument('--workers', metavar='workers', type=int, default=8)
+    parser.add_argument('--edits', metavar='edits', type=int, default=5,
+                        help='definitions given a new gene, and others a new description')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='fabric_panel_sync_bench_')
+    try:
+        write_catalog(directory, args.panels, args.genes)
+        with StubServer(handler=PanelsHandler) as server:
+            server.httpd.latency = args.latency_ms / 1000.0
+            reset(server)
+            results = {'panels': args.panels, 'serial_build': run_serial(server, directory)}
+            check_workspace(server, directory)
+
+            reset(server)
+            results['sync_build'] = run_sync(server, directory, args.workers)
+            check_workspace(server, directory)
+            results['sync_unchanged'] = run_sync(server, directory, args.workers)
+            edit_catalog(directory, args.edits)
+            results['sync_edited'] = run_sync(server, directory, args.workers)
+            check_workspace(server, directory)
+            os.remove(os.path.join(directory, STATE_FILE_NAME))
+            results['sync_without_state'] = run_sync(server, directory, args.workers)
+            check_workspace(server, directory)
+    finally:
+        shutil.rmtree(directory)
+    if results['sync_unchanged']['requests'] != {'list': 1}:
+        sys.exit("Unchanged re-sync made more than one listing call")
+
+    sys.stdout.write(json.dumps(results, indent=4))
+    sys.stdout.write('\n')
+
+
+if __name__ == "__main__":
+    main()
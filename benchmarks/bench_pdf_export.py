@@ -0,0 +1,165 @@
+"""Compare one get_clinical_report_pdf.py run per report with the bulk exporter.
+
+A stub serves `/reports/<id>/pdf_report` after --latency_ms (the server
+rendering the PDF) at --bandwidth_mb per connection. The baseline fetches
+each PDF in turn on a new connection and writes `response.content`, as a
+shell loop around get_clinical_report_pdf.py does. The exporter downloads
+them with export_report_pdfs(), then runs again to show that unchanged
+reports are skipped, and once more after some reports get a new version.
+The stub gives every PDF the same Content-Disposition file name, as a server
+naming them by template might. Checks that every PDF arrives intact, under a
+name of its own, and that no partial files are left behind.
+
+Example usage:
+    python bench_pdf_export.py --reports 100 --size_kb 2048 --workers 8
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import simplejson as json
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from fabric_client import FabricSession
+from fabric_client.report_pdfs import export_report_pdfs
+from stub_server import StubHandler, StubServer
+
+
+# Where export_report_pdfs() saves each report's PDF
+EXPORT_NAME = '{}_report.pdf'
+
+
+def pdf_body(report_id, size):
+    """Deterministic stand-in for a report's PDF.
+    """
+    line = '%PDF-1.4 report {}\n'.format(report_id).encode('utf-8')
+    return (line * (size // len(line) + 1))[:size]
+
+
+class PdfHandler(StubHandler):
+    """Serve GET /reports/<id>/pdf_report with the same Content-Disposition
+    file name for every report.
+    """
+
+    def do_GET(self):
+        report_id = int(self.path.strip('/').split('/')[1])
+        time.sleep(self.server.latency)
+        body = pdf_body(report_id, self.server.pdf_size)
+        self.server.pdfs_sent += 1
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/pdf')
+        self.send_header('Content-Disposition',
+                         'attachment; filename="report.pdf"')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        for start in range(0, len(body), 65536):
+            block = body[start:start + 65536]
+            if self.server.bandwidth:
+                time.sleep(float(len(block)) / self.server.bandwidth)
+            self.wfile.write(block)
+
+
+def check_directory(directory, reports, size, name='report_{}.pdf'):
+    for report in reports:
+        with open(os.path.join(directory, name.format(report['id'])), 'rb') as f:
+            if f.read() != pdf_body(report['id'], size):
+                sys.exit("PDF for report {} is corrupt".format(report['id']))
+    pdfs = [name for name in os.listdir(directory) if name.endswith('.pdf')]
+    if len(pdfs) != len(reports):
+        sys.exit("{} PDFs for {} reports".format(len(pdfs), len(reports)))
+    leftovers = [name for name in os.listdir(directory) if name.endswith('.part')]
+    if leftovers:
+        sys.exit("Partial files left behind: {}".format(leftovers))
+
+
+def serial_loop(server, reports, directory):
+    connections = server.connections
+    start = time.time()
+    for report in reports:
+        # A new process per report means a new connection per report
+        session = FabricSession(pool_size=1)
+        response = session.get('{}/reports/{}/pdf_report'.format(server.url, report['id']))
+        with open(os.path.join(directory, 'report_{}.pdf'.format(report['id'])), 'wb') as f:
+            f.write(response.content)
+        session.close()
+    return {'seconds': round(time.time() - start, 2),
+            'connections': server.connections - connections}
+
+
+def exporter(server, reports, directory, workers, chunk_size):
+    session = FabricSession(pool_size=workers)
+    connections = server.connections
+    sent = server.httpd.pdfs_sent
+    start = time.time()
+    results = export_report_pdfs(session, reports, directory, workers=workers,
+                                 base_url=server.url, chunk_size=chunk_size)
+    seconds = time.time() - start
+    session.close()
+    outcomes = {}
+    for _, outcome, _ in results:
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+    return {'seconds': round(seconds, 2),
+            'connections': server.connections - connections,
+            'pdfs_sent': server.httpd.pdfs_sent - sent,
+            'outcomes': outcomes}
+
+
+def main():
+    """Main function. Benchmark serial PDF downloads versus the bulk exporter.
+    """
+    parser = argparse.ArgumentParser(description='Benchmark bulk clinical report PDF export.')
+    parser.add_argument('--reports', metavar='reports', type=int, default=100)
+    parser.add_argument('--size_kb', metavar='KB', type=int, default=2048)
+    parser.add_argument('--latency_ms', metavar='ms', type=float, default=200.0,
+                        help='server time to render each PDF')
+    parser.add_argument('--bandwidth_mb', metavar='MB/s', type=float, default=50.0,
+                        help='download bandwidth per connection')
+    parser.add_argument('--workers', metavar='workers', type=int, default=8)
+    parser.add_argument('--chunk_size', metavar='KB', type=int, default=1024)
+    args = parser.parse_args()
+
+    size = args.size_kb * 1024
+    reports = [{'id': report_id, 'version': 1} for report_id in range(1, args.reports + 1)]
+    directory = tempfile.mkdtemp(prefix='fabric_pdf_bench_')
+    try:
+        with StubServer(connect_delay=0.05, bandwidth=args.bandwidth_mb * 1024 * 1024,
+                        handler=PdfHandler) as server:
+            server.httpd.latency = args.latency_ms / 1000.0
+            server.httpd.pdf_size = size
+            server.httpd.pdfs_sent = 0
+
+            serial_directory = os.path.join(directory, 'serial')
+            os.makedirs(serial_directory)
+            results = {'reports': args.reports,
+                       'pdf_kb': args.size_kb,
+                       'serial': serial_loop(server, reports, serial_directory)}
+            check_directory(serial_directory, reports, size)
+
+            export_directory = os.path.join(directory, 'export')
+            chunk_size = args.chunk_size * 1024
+            results['exporter'] = exporter(server, reports, export_directory, args.workers,
+                                           chunk_size)
+            check_directory(export_directory, reports, size, name=EXPORT_NAME)
+            results['exporter_unchanged'] = exporter(server, reports, export_directory,
+                                                     args.workers, chunk_size)
+            for report in reports[::10]:
+                report['version'] += 1
+            results['exporter_tenth_changed'] = exporter(server, reports, export_directory,
+                                                         args.workers, chunk_size)
+            check_directory(export_directory, reports, size, name=EXPORT_NAME)
+    finally:
+        shutil.rmtree(directory)
+
+    if results['exporter_unchanged']['pdfs_sent']:
+        sys.exit("Unchanged reports were downloaded again")
+    results['speedup'] = round(results['serial']['seconds'] / results['exporter']['seconds'], 1)
+    sys.stdout.write(json.dumps(results, indent=4))
+    sys.stdout.write('\n')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""Time, bytes sent and peak memory for a folder upload of a plain VCF sent
+as is, compressed first and then sent, and compressed while it is sent.
+
+Writes a --size_mb synthetic VCF and uploads it with
+upload_genomes_folder.py to the simulator (in its own process), limited to
+--bandwidth_mb per connection, once with --no_compress and once with the
+default on-the-fly BGZF pipeline, recording the script's peak RSS. For
+comparison, the same file is bgzipped to disk with BgzfWriter and the
+result uploaded. Reports how long the pipeline's sender waited on
+compression, and fails unless its output decompresses to the original file.
+
+Example usage:
+    python bench_pipeline.py --size_mb 512 --bandwidth_mb 10
+"""
+
+import argparse
+import gzip
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+import simplejson as json
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from fabric_client import FabricSession
+from fabric_client.bgzf import BgzfWriter
+from fabric_client.pipeline import BgzfPipeline
+from fabric_client.sendfile import FileBody
+from fabric_simulator import spawn
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'fe2', 'python',
+                      'GenomeWorkflows', 'upload_genomes_folder.py')
+
+
+def write_vcf(path, size, seed=1):
+    rng = random.Random(seed)
+    bases = 'ACGT'
+    with open(path, 'w') as f:
+        f.write('##fileformat=VCFv4.2\n#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\tS1\n')
+        position = 10000
+        lines = []
+        while f.tell() < size:
+            for _ in range(10000):
+                position += rng.randint(1, 400)
+                depth = rng.randint(8, 90)
+                alt = rng.randint(0, depth)
+                lines.append('{}\t{}\trs{}\t{}\t{}\t{:.1f}\tPASS\tDP={};AF={:.3f}\tGT:AD:DP\t{}:{},{}:{}\n'
+                             .format(position // 50000000 + 1, position, rng.randint(1, 99999999),
+                                     rng.choice(bases), rng.choice(bases), rng.uniform(20, 999),
+                                     depth, float(alt) / depth, rng.choice(('0/1', '1/1', '0/0')),
+                                     depth - alt, alt, depth))
+            f.write(''.join(lines))
+            del lines[:]
+        f.truncate(size)
+
+
+def measure(command, env):
+    """Run command; returns its seconds and peak RSS in MB, or exits if it
+    fails.
+    """
+    start = time.time()
+    process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL)
+    _, status, usage = os.wait4(process.pid, 0)
+    if os.waitstatus_to_exitcode(status):
+        sys.exit("{} exited with {}".format(' '.join(command), os.waitstatus_to_exitcode(status)))
+    # ru_maxrss is in kilobytes on Linux
+    return round(time.time() - start, 2), round(usage.ru_maxrss / 1024.0, 1)
+
+
+def bytes_received(url):
+    return requests.get(url + '/_simulator/stats').json().get('bytes_received', 0)
+
+
+def main():
+    """Main function. Compare plain, compress-then-send and pipelined uploads.
+    """
+    parser = argparse.ArgumentParser(description='Benchmark pipelined VCF compression.')
+    parser.add_argument('--size_mb', metavar='MB', type=int, default=512)
+    parser.add_argument('--bandwidth_mb', metavar='MB/s', type=float, default=10.0)
+    parser.add_argument('--workers', metavar='threads', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='fabric_pipeline_bench_')
+    simulator, url = spawn('--bandwidth_mb', args.bandwidth_mb)
+    env = dict(os.environ, FABRIC_API_URL=url, FABRIC_API_LOGIN='login',
+               FABRIC_API_PASSWORD='password')
+    results = {'file_mb': args.size_mb, 'bandwidth_mb': args.bandwidth_mb,
+               'workers': args.workers}
+    try:
+        folder = os.path.join(workdir, 'genomes')
+        os.mkdir(folder)
+        vcf = os.path.join(folder, 'sample.vcf')
+        write_vcf(vcf, args.size_mb * 1024 * 1024)
+        command = [sys.executable, SCRIPT, '1', folder,
+                   '--compress_workers', str(args.workers)]
+
+        for name, options in (('uncompressed', ['--no_compress']), ('pipelined', [])):
+            sent = bytes_received(url)
+            # A cache directory of its own, so that the upload is not skipped
+            # as a duplicate of the one before it or of an earlier run
+            seconds, peak = measure(command + options, dict(
+                env, FABRIC_API_CACHE_DIR=os.path.join(workdir, name + '_cache')))
+            results[name] = {'seconds': seconds, 'peak_rss_mb': peak,
+                             'bytes_sent': bytes_received(url) - sent}
+
+        # Compress to disk first, then upload the .vcf.gz
+        session = FabricSession(governor=False, tracer=False)
+        start = time.time()
+        compressed = os.path.join(workdir, 'sample.vcf.gz')
+        with open(vcf, 'rb') as source, open(compressed, 'wb') as target:
+            writer = BgzfWriter(target)
+            shutil.copyfileobj(source, writer, 1024 * 1024)
+            writer.close()
+        compress_seconds = time.time() - start
+        with open(compressed, 'rb') as file_handle:
+            session.put(url + '/projects/1/genomes', data=FileBody(file_handle),
+                        params={'genome_label': 'serial'})
+        results['compress_then_send'] = {'seconds': round(time.time() - start, 2),
+                                         'compress_seconds': round(compress_seconds, 2),
+                                         'bytes_sent': os.path.getsize(compressed)}
+
+        # How long the network sat idle waiting on compression, and a check
+        # that the pipeline's output is the file bgzipped
+        with open(vcf, 'rb') as file_handle:
+            pipeline = BgzfPipeline(file_handle, workers=args.workers)
+            session.put(url + '/projects/1/genomes', data=pipeline,
+                        params={'genome_label': 'pipelined'})
+        results['pipelined']['compress_wait_seconds'] = round(pipeline.compress_wait, 2)
+        with open(vcf, 'rb') as file_handle:
+            output = os.path.join(workdir, 'pipelined.vcf.gz')
+            with open(output, 'wb') as f:
+                for block in BgzfPipeline(file_handle, workers=args.workers):
+                    f.write(block)
+        with open(vcf, 'rb') as original, gzip.open(output, 'rb') as roundtrip:
+            while True:
+                expected = original.read(1024 * 1024)
+                if roundtrip.read(1024 * 1024) != expected:
+                    sys.exit("The pipelined upload does not decompress to the original VCF")
+                if not expected:
+                    break
+        session.close()
+    finally:
+        simulator.kill()
+        shutil.rmtree(workdir)
+
+    for name in ('uncompressed', 'pipelined'):
+        if not results[name]['bytes_sent']:
+            sys.exit("The {} upload sent nothing".format(name))
+    results['compression_ratio'] = round(
+        float(results['uncompressed']['bytes_sent']) / results['pipelined']['bytes_sent'], 2)
+    sys.stdout.write(json.dumps(results, indent=4))
+    sys.stdout.write('\n')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Compare fixed-interval polling with StatusWatcher for many reports.
+
+Simulates reports that wait, process for 30 minutes to a few hours, then
+become READY TO REVIEW, on a simulated clock so hours of polling run in
+seconds. The naive loop checks every unfinished report each --interval
+seconds, as the shell loops around get_report_status.py did. StatusWatcher
+starts at the same interval and backs off while a report's status is
+unchanged. Reports the number of status requests and how long after becoming
+ready each report was noticed.
+
+Example usage:
+    python bench_report_watch.py --reports 300 --interval 30
+"""
+
+import argparse
+import os
+import random
+import sys
+
+import simplejson as json
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from fabric_client.watch import StatusWatcher
+
+TERMINAL = 'READY TO REVIEW'
+
+
+class SimulatedClock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += max(seconds, 0)
+
+
+class SimulatedReports(object):
+    """Report status timelines, answering status checks at the clock's time.
+    """
+
+    def __init__(self, count, clock, seed=0):
+        rng = random.Random(seed)
+        self.clock = clock
+        self.timelines = {}
+        for report_id in range(count):
+            started = rng.uniform(0, 600)
+            ready = started + rng.uniform(30 * 60, 3 * 3600)
+            self.timelines[report_id] = (started, ready)
+        self.requests = 0
+        self.noticed = {}
+
+    def status(self, report_id):
+        self.requests += 1
+        started, ready = self.timelines[report_id]
+        now = self.clock()
+        if now >= ready:
+            self.noticed.setdefault(report_id, now - ready)
+            return TERMINAL
+        return 'PROCESSING' if now >= started else 'WAITING'
+
+    def summary(self):
+        delays = sorted(self.noticed.values())
+        return {'requests': self.requests,
+                'requests_per_report': round(float(self.requests) / len(self.timelines), 1),
+                'all_ready': len(delays) == len(self.timelines),
+                'mean_notice_delay_s': round(sum(delays) / len(delays), 1),
+                'max_notice_delay_s': round(delays[-1], 1)}
+
+
+def naive_polling(count, interval):
+    clock = SimulatedClock()
+    reports = SimulatedReports(count, clock)
+    pending = list(range(count))
+    while pending:
+        pending = [report_id for report_id in pending if reports.status(report_id) != TERMINAL]
+        clock.sleep(interval)
+    return reports.summary()
+
+
+def watcher_polling(count, interval, max_interval):
+    clock = SimulatedClock()
+    reports = SimulatedReports(count, clock)
+    watcher = StatusWatcher(reports.status, [TERMINAL], min_interval=interval,
+                            max_interval=max_interval, workers=1, clock=clock, sleep=clock.sleep)
+    watcher.watch(list(range(count)))
+    return reports.summary()
+
+
+def main():
+    """Main function. Benchmark naive polling versus the adaptive watcher.
+    """
+    parser = argparse.ArgumentParser(description='Benchmark report status polling.')
+    parser.add_argument('--reports', metavar='reports', type=int, default=300)
+    parser.add_argument('--interval', metavar='seconds', type=float, default=30.0,
+                        help='fixed polling interval, and the watcher\'s minimum interval')
+    parser.add_argument('--max_interval', metavar='seconds', type=float, default=600.0)
+    args = parser.parse_args()
+
+    results = {'reports': args.reports,
+               'naive': naive_polling(args.reports, args.interval),
+               'watcher': watcher_polling(args.reports, args.interval, args.max_interval)}
+    results['request_reduction'] = round(float(results['naive']['requests']) /
+                                         results['watcher']['requests'], 1)
+    sys.stdout.write(json.dumps(results, indent=4))
+    sys.stdout.write('\n')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Exercise resumable chunked uploads against a server that drops connections.
+
+The stand-in server accepts Content-Range chunks, keeps what it has
+acknowledged per upload id, and drops the connection part way through a
+chunk with the given probability. The client is run with a small retry
+budget so it also gets interrupted outright; each interruption is resumed
+by starting a fresh upload from the journal, as a re-run would.
+
+The run fails unless the reassembled file matches the source byte for byte.
+Bytes re-sent are those of chunks cut off mid-transfer, never bytes the
+server had already acknowledged.
+
+Example usage:
+    python bench_resumable.py --size_mb 64 --chunk_mb 4 --drop_rate 0.2
+"""
+
+import argparse
+import hashlib
+import os
+import random
+import sys
+import tempfile
+import time
+
+import simplejson as json
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from fabric_client import FabricSession
+from fabric_client.resumable import UploadInterrupted, resumable_upload
+from stub_server import StubHandler, StubServer
+
+try:
+    from urllib.parse import parse_qs, urlparse
+except ImportError:
+    from urlparse import parse_qs, urlparse
+
+
+class FlakyUploadHandler(StubHandler):
+    """Content-Range upload endpoint that randomly drops connections.
+    """
+
+    def _range_reply(self, held, total):
+        if held == total:
+            self._reply({'genome_id': 1, 'bytes_received': held}, status=201)
+            return
+        self.send_response(308)
+        if held:
+            self.send_header('Range', 'bytes=0-{}'.format(held - 1))
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_PUT(self):
+        upload_id = parse_qs(urlparse(self.path).query)['upload_id'][0]
+        received = self.server.uploads.setdefault(upload_id, bytearray())
+        spec, total = self.headers['Content-Range'].split(' ')[1].split('/')
+        total = int(total)
+        length = int(self.headers.get('Content-Length') or 0)
+
+        if spec == '*':
+            self._drain()
+            self._range_reply(len(received), total)
+            return
+
+        start = int(spec.split('-')[0])
+        if random.random() < self.server.drop_rate:
+            # Read part of the chunk, then hang up without answering
+            self.server.bytes_received += len(self.rfile.read(random.randint(0, length)))
+            self.server.drops += 1
+            self.close_connection = True
+            self.connection.shutdown(2)
+            return
+
+        body = self.rfile.read(length)
+        self.server.bytes_received += len(body)
+        if start == len(received):
+            received.extend(body)
+        self._range_reply(len(received), total)
+
+
+def main():
+    """Main function. Upload a random file through a flaky server and
+    verify it arrives intact.
+    """
+    parser = argparse.ArgumentParser(description='Resumable upload under dropped connections.')
+    parser.add_argument('--size_mb', metavar='MB', type=int, default=32)
+    parser.add_argument('--chunk_mb', metavar='MB', type=int, default=2)
+    parser.add_argument('--drop_rate', metavar='p', type=float, default=0.2)
+    parser.add_argument('--max_retries', metavar='n', type=int, default=2)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    file_name = os.path.join(workdir, 'synthetic.vcf')
+    with open(file_name, 'wb') as f:
+        for _ in range(args.size_mb):
+            f.write(os.urandom(1024 * 1024))
+
+    with StubServer(handler=FlakyUploadHandler) as server:
+        server.httpd.uploads = {}
+        server.httpd.drop_rate = args.drop_rate
+        server.httpd.drops = 0
+        server.httpd.bytes_received = 0
+
+        url = '{}/projects/1/genomes'.format(server.url)
+        reruns = 0
+        start = time.time()
+        while True:
+            session = FabricSession()
+            try:
+                response = resumable_upload(session, url, file_name,
+                                            chunk_size=args.chunk_mb * 1024 * 1024,
+                                            max_retries=args.max_retries)
+                break
+            except UploadInterrupted:
+                reruns += 1
+            finally:
+                session.close()
+        elapsed = time.time() - start
+
+        with open(file_name, 'rb') as f:
+            expected = hashlib.sha256(f.read()).hexdigest()
+        received = hashlib.sha256(bytes(list(server.httpd.uploads.values())[0])).hexdigest()
+        size = os.path.getsize(file_name)
+        results = {'bytes': size,
+                   'bytes_received': server.httpd.bytes_received,
+                   'resent_ratio': round(float(server.httpd.bytes_received - size) / size, 3),
+                   'dropped_connections': server.httpd.drops,
+                   'reruns_from_journal': reruns,
+                   'seconds': round(elapsed, 3),
+                   'status': response.status_code,
+                   'intact': expected == received}
+
+    os.remove(file_name)
+    os.rmdir(workdir)
+    sys.stdout.write(json.dumps(results, indent=4))
+    sys.stdout.write('\n')
+    if not results['intact']:
+        sys.exit("Reassembled upload does not match the source file")
+
+
+if __name__ == "__main__":
+    main()
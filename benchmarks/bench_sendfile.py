@@ -0,0 +1,148 @@
+"""CPU and throughput of raw genome PUTs sent from a file object versus a
+FileBody.
+
+Writes a --size_mb VCF and PUTs it --repeat times to a sink server in its
+own process, which reads each body into one reused buffer and answers with
+the number of bytes received, so that nearly all the CPU time is the
+client's. Four ways of sending are compared: the open file (what the
+upload scripts used to pass), a FileBody (sent with os.sendfile), and the
+same two while computing an md5 on the way (HashingReader, as
+upload_genome.py used to, versus a hashing FileBody). Fails unless the sink
+received every byte and the checksums match the file's.
+
+Example usage:
+    python bench_sendfile.py --size_mb 1024 --repeat 3
+"""
+
+import argparse
+import multiprocessing
+import os
+import resource
+import socket
+import sys
+import tempfile
+import time
+
+import simplejson as json
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from fabric_client import FabricSession
+from fabric_client.checksum import HashingReader, file_digest
+from fabric_client.sendfile import FileBody
+
+LINE = b'1\t100000\t.\tA\tG\t50\tPASS\tDP=30;AF=0.5\tGT:AD:DP\t0/1:15,15:30\n'
+
+
+def sink(listener):
+    """Answer every request on listener's connections with the size of its
+    body, one connection at a time.
+    """
+    buf = bytearray(1024 * 1024)
+    view = memoryview(buf)
+    while True:
+        conn, _ = listener.accept()
+        reader = conn.makefile('rb')
+        while True:
+            headers = {}
+            line = reader.readline()
+            if not line:
+                break
+            while line not in (b'\r\n', b''):
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+                line = reader.readline()
+            remaining = int(headers.get('content-length', 0))
+            received = 0
+            while remaining:
+                count = reader.readinto(view[:min(remaining, len(buf))])
+                if not count:
+                    break
+                received += count
+                remaining -= count
+            body = json.dumps({'genome_id': 1, 'bytes_received': received}).encode('utf-8')
+            conn.sendall(b'HTTP/1.1 201 Created\r\nContent-Type: application/json\r\n'
+                         b'Content-Length: ' + str(len(body)).encode('ascii') + b'\r\n\r\n' + body)
+        reader.close()
+        conn.close()
+
+
+def write_vcf(path, size):
+    block = LINE * (1024 * 1024 // len(LINE))
+    with open(path, 'wb') as f:
+        written = 0
+        while written < size:
+            f.write(block[:size - written])
+            written += min(len(block), size - written)
+
+
+def run(session, url, path, body_for, repeat):
+    """PUT the file repeat times with body_for(file_handle) as the body.
+    Returns the measurements and the last body.
+    """
+    size = os.path.getsize(path)
+    cpu = resource.getrusage(resource.RUSAGE_SELF)
+    start = time.time()
+    for _ in range(repeat):
+        with open(path, 'rb') as file_handle:
+            body = body_for(file_handle)
+            response = session.put(url, data=body, params={'genome_label': 'sendfile'})
+        if response.json()['bytes_received'] != size:
+            sys.exit("The sink received {} of {} bytes".format(
+                response.json()['bytes_received'], size))
+    seconds = time.time() - start
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    cpu_seconds = usage.ru_utime + usage.ru_stime - cpu.ru_utime - cpu.ru_stime
+    gb = size * repeat / float(1024 ** 3)
+    return {'seconds': round(seconds, 2),
+            'mb_per_second': round(size * repeat / 1048576.0 / seconds, 1),
+            'cpu_seconds_per_gb': round(cpu_seconds / gb, 3)}, body
+
+
+def main():
+    """Main function. Compare raw PUT bodies.
+    """
+    parser = argparse.ArgumentParser(description='Benchmark sendfile genome uploads.')
+    parser.add_argument('--size_mb', metavar='MB', type=int, default=1024)
+    parser.add_argument('--repeat', metavar='count', type=int, default=3)
+    args = parser.parse_args()
+
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(8)
+    server = multiprocessing.Process(target=sink, args=(listener,))
+    server.daemon = True
+    server.start()
+    url = 'http://127.0.0.1:{}/projects/1/genomes'.format(listener.getsockname()[1])
+    session = FabricSession(pool_size=1, governor=False, tracer=False)
+
+    handle, path = tempfile.mkstemp(suffix='.vcf')
+    os.close(handle)
+    results = {'file_mb': args.size_mb, 'repeat': args.repeat}
+    try:
+        write_vcf(path, args.size_mb * 1024 * 1024)
+        md5 = file_digest(path)
+        # Warm the page cache so every run reads from memory
+        results['file_object'], _ = run(session, url, path, lambda f: f, 1)
+        results['file_object'], _ = run(session, url, path, lambda f: f, args.repeat)
+        results['file_body'], _ = run(session, url, path, FileBody, args.repeat)
+        results['hashing_reader_md5'], reader = run(
+            session, url, path, lambda f: HashingReader(f, algorithms=('md5',)), args.repeat)
+        results['file_body_md5'], body = run(
+            session, url, path, lambda f: FileBody(f, algorithms=('md5',)), args.repeat)
+        if reader.hexdigest() != md5 or body.hexdigest() != md5:
+            sys.exit("Checksums computed during upload do not match the file")
+    finally:
+        session.close()
+        server.terminate()
+        os.remove(path)
+
+    for name, baseline in (('file_body', 'file_object'), ('file_body_md5', 'hashing_reader_md5')):
+        results[name]['cpu_saving'] = round(
+            1 - results[name]['cpu_seconds_per_gb'] / results[baseline]['cpu_seconds_per_gb'], 3)
+
+    sys.stdout.write(json.dumps(results, indent=4))
+    sys.stdout.write('\n')
+
+
+if __name__ == "__main__":
+    main()
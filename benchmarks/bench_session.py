@@ -0,0 +1,74 @@
+"""Compare cold-connection latency with pooled keep-alive latency.
+
+Runs a local stub server and issues the same GET repeatedly, first with a
+bare requests.get per call (a new connection every time, as the scripts
+used to do) and then through the shared fabric_client session.
+
+Example usage:
+    python bench_session.py --calls 500 --connect_delay_ms 20
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import requests
+import simplejson as json
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from fabric_client import FabricSession
+from stub_server import StubServer
+
+
+def time_calls(get, url, calls):
+    """Issue calls GETs with the given callable and return per-call latencies.
+    """
+    latencies = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        get(url).raise_for_status()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def summarize(latencies):
+    """Return mean/p50/p95 latency in milliseconds.
+    """
+    ordered = sorted(latencies)
+    return {'calls': len(ordered),
+            'mean_ms': round(1000 * sum(ordered) / len(ordered), 3),
+            'p50_ms': round(1000 * ordered[len(ordered) // 2], 3),
+            'p95_ms': round(1000 * ordered[int(len(ordered) * 0.95) - 1], 3)}
+
+
+def main():
+    """Main function. Benchmark cold versus pooled connections.
+    """
+    parser = argparse.ArgumentParser(description='Benchmark cold versus pooled connections.')
+    parser.add_argument('--calls', metavar='calls', type=int, default=200)
+    parser.add_argument('--connect_delay_ms', metavar='ms', type=float, default=10.0,
+                        help='simulated handshake cost per new connection')
+    args = parser.parse_args()
+
+    results = {}
+    with StubServer(connect_delay=args.connect_delay_ms / 1000.0) as server:
+        url = '{}/projects/1/genomes'.format(server.url)
+
+        before = server.connections
+        results['cold'] = summarize(time_calls(requests.get, url, args.calls))
+        results['cold']['connections'] = server.connections - before
+
+        before = server.connections
+        session = FabricSession(pool_size=1)
+        results['pooled'] = summarize(time_calls(session.get, url, args.calls))
+        results['pooled']['connections'] = server.connections - before
+        session.close()
+
+    results['speedup'] = round(results['cold']['mean_ms'] / results['pooled']['mean_ms'], 2)
+    sys.stdout.write(json.dumps(results, indent=4))
+    sys.stdout.write('\n')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Cost of request tracing, and whether its traces account for every request.
+
+--threads threads send --requests requests through one FabricSession to
+the simulator, run in its own process so that only the client's CPU time is
+counted: small report GETs, a streamed VCF download and a genome PUT
+for every 50 GETs. This is done without a tracer, with a jsonl tracer and
+with an otlp tracer writing to a temporary file. Reports requests per second
+and CPU seconds for each run, and checks that the trace has one line per
+request, that each line's phases add up to no more than its duration, and
+that the bytes received match what the simulator sent.
+
+Example usage:
+    python bench_tracing.py --requests 3000 --threads 8
+"""
+
+import argparse
+import os
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import simplejson as json
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from fabric_client import FabricSession
+from fabric_client.tracing import Tracer
+from fabric_simulator import spawn
+
+GENOME = b'1\t100000\t.\tA\tG\t50\tPASS\tDP=30\n' * 4096
+
+
+def bytes_sent_by(url):
+    return FabricSession(governor=False, tracer=False).get(url + '/_simulator/stats').json().get(
+        'bytes_sent', 0)
+
+
+def run(url, tracer, threads, count):
+    session = FabricSession(pool_size=threads, governor=False, tracer=tracer)
+
+    def call(number):
+        if number % 50 == 1:
+            response = session.get(url + '/reports/1/variants', params={'format': 'VCF'},
+                                   stream=True)
+            for _ in response.iter_content(65536):
+                pass
+        elif number % 50 == 2:
+            response = session.put(url + '/projects/1/genomes', data=GENOME,
+                                   params={'genome_label': 'traced'})
+        else:
+            response = session.get('{}/reports/{}'.format(url, number % 20 + 1))
+        response.close()
+
+    cpu = resource.getrusage(resource.RUSAGE_SELF)
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(call, range(count)))
+    seconds = time.time() - start
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    session.close()
+    return {'seconds': round(seconds, 2),
+            'requests_per_second': round(count / seconds, 1),
+            'cpu_seconds': round(usage.ru_utime + usage.ru_stime - cpu.ru_utime - cpu.ru_stime, 2)}
+
+
+def check_jsonl(path, count, bytes_sent):
+    with open(path) as f:
+        records = [json.loads(line) for line in f]
+    if len(records) != count:
+        sys.exit("Trace has {} lines for {} requests".format(len(records), count))
+    for record in records:
+        if sum(record['phases'].values()) > record['duration'] + 0.001:
+            sys.exit("Phases outlast the request: {}".format(record))
+    received = sum(record['bytes_received'] for record in records)
+    # Both count bodies with their chunk framing, but not headers
+    if abs(received - bytes_sent) > 0.01 * bytes_sent:
+        sys.exit("Trace received {} bytes, simulator sent {}".format(received, bytes_sent))
+    return {'lines': len(records), 'bytes_received': received,
+            'new_connections': sum(1 for record in records if not record['connection_reused'])}
+
+
+def main():
+    """Main function. Benchmark tracing overhead.
+    """
+    parser = argparse.ArgumentParser(description='Benchmark request tracing.')
+    parser.add_argument('--requests', metavar='requests', type=int, default=3000)
+    parser.add_argument('--threads', metavar='threads', type=int, default=8)
+    parser.add_argument('--latency_ms', metavar='ms', type=float, default=2.0)
+    args = parser.parse_args()
+
+    results = {'requests': args.requests, 'threads': args.threads}
+    simulator, url = spawn('--latency_ms', args.latency_ms, '--variants', 2000)
+    try:
+        results['untraced'] = run(url, False, args.threads, args.requests)
+        for format in ('jsonl', 'otlp'):
+            trace = tempfile.NamedTemporaryFile(mode='w', suffix='.' + format, delete=False)
+            try:
+                tracer = Tracer(trace, format)
+                bytes_sent = bytes_sent_by(url)
+                results[format] = run(url, tracer, args.threads, args.requests)
+                tracer.close()
+                results[format]['trace_mb'] = round(os.path.getsize(trace.name) / 1e6, 2)
+                if format == 'jsonl':
+                    results[format].update(check_jsonl(trace.name, args.requests,
+                                                       bytes_sent_by(url) - bytes_sent))
+            finally:
+                os.remove(trace.name)
+            results[format]['cpu_overhead'] = round(
+                results[format]['cpu_seconds'] / results['untraced']['cpu_seconds'] - 1, 3)
+    finally:
+        simulator.kill()
+
+    sys.stdout.write(json.dumps(results, indent=4))
+    sys.stdout.write('\n')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Compare a list of variant dicts with VariantTable for a WGS-sized report.
+
+Builds the same synthetic report both ways, each in a fresh process, and
+reports the process's peak RSS plus the time taken by a set of typical
+filters (one chromosome, a region, a status, and a combined query), run
+twice. The second run shows queries served from VariantTable's
+per-chromosome position index, which the first region query builds. Filters
+on the dict list return references to the matching dicts and VariantTable
+filters use select(), which returns the matching row indices. The dict list
+shares its string values between variants, unlike dicts decoded from JSON,
+so its memory figure is a lower bound.
+
+Example usage:
+    python bench_variant_table.py --variants 5000000
+"""
+
+import argparse
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+
+import simplejson as json
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from fabric_client.variant_table import VariantTable
+
+CHROMOSOMES = [str(number) for number in range(1, 23)] + ['X', 'Y', 'M']
+STATUSES = ['UNREVIEWED', 'REVIEWED', 'CONFIRMED', 'FAILED_CONFIRMATION']
+BASES = 'ACGT'
+
+QUERIES = [('chrom', {'chrom': '7'}),
+           ('region', {'chrom': '17', 'start': 2000000, 'end': 2100000}),
+           ('status', {'status': 'CONFIRMED'}),
+           ('combined', {'chrom': ['1', '2'], 'start': 1000000, 'end': 50000000,
+                         'status': ['REVIEWED', 'CONFIRMED'], 'min_score': 0.5})]
+
+
+def synthetic_variants(count, seed=0):
+    """Yield count variant dicts spread over the genome, in position order.
+    """
+    rng = random.Random(seed)
+    per_chrom = count // len(CHROMOSOMES) + 1
+    index = 0
+    for chrom in CHROMOSOMES:
+        position = 10000
+        for _ in range(per_chrom):
+            if index == count:
+                return
+            position += rng.randint(1, 1200)
+            ref = rng.choice(BASES)
+            alt = rng.choice(BASES.replace(ref, '')) if rng.random() < 0.9 else ref + 'T'
+            yield {'id': index,
+                   'chromosome': chrom,
+                   'start_on_chrom': position,
+                   'end_on_chrom': position + len(ref) - 1,
+                   'ref': ref,
+                   'alt': alt,
+                   'status': rng.choice(STATUSES),
+                   'score': round(rng.random(), 3) if rng.random() < 0.8 else None}
+            index += 1
+
+
+def filter_dicts(variants, chrom=None, start=None, end=None, status=None, min_score=None):
+    """Filter a list of variant dicts the way the scripts would.
+    """
+    chroms = set([chrom] if isinstance(chrom, str) else chrom or ())
+    statuses = set([status] if isinstance(status, str) else status or ())
+    return [variant for variant in variants
+            if (not chroms or variant['chromosome'] in chroms)
+            and (start is None or variant['end_on_chrom'] >= start)
+            and (end is None or variant['start_on_chrom'] <= end)
+            and (not statuses or variant['status'] in statuses)
+            and (min_score is None or (variant['score'] is not None
+                                       and variant['score'] >= min_score))]
+
+
+def peak_rss_mb():
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0, 1)
+
+
+def run_client(count, mode):
+    """Build the report in one representation, time the queries, and print
+    the results as JSON.
+    """
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    if mode == 'dicts':
+        variants = list(synthetic_variants(count))
+        run_filter = lambda kwargs: len(filter_dicts(variants, **kwargs))
+    else:
+        variants = VariantTable.from_variants(synthetic_variants(count))
+        run_filter = lambda kwargs: len(variants.select(**kwargs))
+    result = {'build_seconds': round(time.perf_counter() - start, 2),
+              'rss_mb': round(peak_rss_mb() - baseline, 1),
+              'filters': {}}
+    for name, kwargs in QUERIES:
+        timings = []
+        for _ in range(2):
+            start = time.perf_counter()
+            matched = run_filter(kwargs)
+            timings.append(round(1000 * (time.perf_counter() - start), 1))
+        result['filters'][name] = {'matched': matched, 'ms': timings[0], 'repeat_ms': timings[1]}
+    sys.stdout.write(json.dumps(result))
+
+
+def measure(count, mode):
+    output = subprocess.check_output([sys.executable, os.path.abspath(__file__),
+                                      '--variants', str(count), '--mode', mode])
+    return json.loads(output)
+
+
+def main():
+    """Main function. Benchmark memory and filter speed of dicts versus VariantTable.
+    """
+    parser = argparse.ArgumentParser(description='Benchmark variant dicts versus VariantTable.')
+    parser.add_argument('--variants', metavar='count', type=int, default=5000000)
+    parser.add_argument('--mode', metavar='mode', type=str, choices=['dicts', 'table'],
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_client(args.variants, args.mode)
+        return
+
+    results = {'variants': args.variants,
+               'dicts': measure(args.variants, 'dicts'),
+               'table': measure(args.variants, 'table')}
+    for name, _ in QUERIES:
+        if results['dicts']['filters'][name]['matched'] != results['table']['filters'][name]['matched']:
+            sys.exit("Filter {} matched different variants".format(name))
+    results['memory_ratio'] = round(results['dicts']['rss_mb'] / max(results['table']['rss_mb'], 0.1), 1)
+    sys.stdout.write(json.dumps(results, indent=4))
+    sys.stdout.write('\n')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+"""End-to-end throughput of the core fe2/fe3 workflows against the simulator.
+
+Starts a FabricSimulator and runs the real scripts against it, each in its
+own process, recording wall time, CPU time and peak RSS of the process
+along with the requests and bytes the simulator saw:
+
+    upload_genome            upload_genome.py in one PUT, computing the checksum
+                             or given --checksum, and in resumable chunks
+    upload_genomes_folder    upload_genomes_folder.py, and the manifest
+                             version with --workers
+    report_variants          get_report_variants.py as JSON (--ndjson) and VCF
+    export_analysis          export_analysis.py streamed (--ndjson) and paged (--all)
+    new_cases                post_new_case.py --batch
+    report_launches          launch_panel_report_existing_genome.py,
+                             launch_panel_report_new_genome.py and
+                             launch_solo_report.py, one process per report
+
+Results are written as JSON to --output (stdout by default), with the
+commit, interpreter and settings they were measured with. A workflow whose
+script fails is recorded with its error rather than stopping the run.
+Given --baseline, an earlier results file, each rate that fell or time or
+peak RSS that grew by more than --tolerance is listed under "regressions"
+and the exit status is 1.
+
+Example usages:
+    python bench_workflows.py --output results.json
+    python bench_workflows.py --baseline results.json --tolerance 0.25
+    python bench_workflows.py --only report_variants export_analysis --variants 1000000
+"""
+
+import argparse
+import hashlib
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import simplejson as json
+
+from fabric_simulator import FabricSimulator
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+FE2 = os.path.join(ROOT, 'fe2', 'python')
+FE3 = os.path.join(ROOT, 'fe3', 'python')
+VCF_HEADER = b'##fileformat=VCFv4.2\n#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n'
+RESULTS_VERSION = 1
+# Metrics compared against a baseline, by suffix: whether higher is better
+COMPARED_METRICS = (('_per_second', True), ('seconds', False), ('peak_rss_mb', False))
+
+
+def write_vcf(path, size, sample='S1'):
+    """Write a plain VCF of about size bytes; files for different samples
+    differ, so none is skipped as an already uploaded duplicate.
+    """
+    line = b'1\t100000\t.\tA\tG\t50\tPASS\tDP=30\n'
+    block = line * (1024 * 1024 // len(line))
+    header = VCF_HEADER.replace(b'\n', '\n##sample={}\n'.format(sample).encode('utf-8'), 1)
+    with open(path, 'wb') as f:
+        f.write(header)
+        written = len(header)
+        while written < size:
+            data = block[:size - written]
+            f.write(data)
+            written += len(data)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL).decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Suite(object):
+    """Run scripts against one simulator and measure each run.
+    """
+
+    def __init__(self, simulator, python, scratch):
+        self.simulator = simulator
+        self.python = python
+        self.scratch = scratch
+        # A private cache directory, so that no upload is skipped as a
+        # duplicate of one from an earlier benchmark run
+        self.env = dict(os.environ, FABRIC_API_URL=simulator.url, FABRIC_API_LOGIN='login',
+                        FABRIC_API_PASSWORD='password',
+                        FABRIC_API_CACHE_DIR=os.path.join(scratch, 'cache'))
+
+    def run(self, script, args, cwd=None, expect=None):
+        """Run one script to completion. Returns its measurements; raises
+        RuntimeError if it fails, or if any simulator stat (a request count,
+        or bytes_received) is below its minimum in expect.
+        """
+        self.simulator.reset_stats()
+        stdout_path = os.path.join(self.scratch, 'stdout')
+        stderr_path = os.path.join(self.scratch, 'stderr')
+        with open(stdout_path, 'wb') as stdout, open(stderr_path, 'wb') as stderr:
+            start = time.time()
+            process = subprocess.Popen([self.python, script] + [str(arg) for arg in args],
+                                       env=self.env, cwd=cwd, stdout=stdout, stderr=stderr)
+            # wait4 gives the resource usage of this process alone
+            _, status, usage = os.wait4(process.pid, 0)
+            seconds = time.time() - start
+        process.returncode = os.waitstatus_to_exitcode(status)
+        if process.returncode:
+            with open(stderr_path, 'rb') as f:
+                error = f.read().decode('utf-8', 'replace').strip().splitlines()
+            raise RuntimeError('{} exited with {}: {}'.format(
+                os.path.basename(script), process.returncode, error[-1] if error else ''))
+        stats = self.simulator.stats
+        for name, count in (expect or {}).items():
+            if stats.get(name, 0) < count:
+                raise RuntimeError('{}: simulator saw {} {}, expected at least {}'.format(
+                    os.path.basename(script), stats.get(name, 0), name, count))
+        return {'seconds': round(seconds, 3),
+                'cpu_seconds': round(usage.ru_utime + usage.ru_stime, 3),
+                # ru_maxrss is in kilobytes on Linux
+                'peak_rss_mb': round(usage.ru_maxrss / 1024.0, 1),
+                'requests': sum(count for name, count in stats.items()
+                                if name.split(' ')[0] in ('GET', 'POST', 'PUT', 'PATCH', 'DELETE')),
+                'bytes_received_by_server': stats.get('bytes_received', 0),
+                'bytes_sent_by_server': stats.get('bytes_sent', 0),
+                'output_bytes': os.path.getsize(stdout_path)}
+
+    def run_many(self, count, script, make_args, cwd=None, expect=None):
+        """Run a script count times in a row, summing the measurements.
+        """
+        total = {}
+        for number in range(count):
+            for name, value in self.run(script, make_args(number), cwd=cwd,
+                                        expect=expect).items():
+                total[name] = max(total.get(name, 0), value) if name == 'peak_rss_mb' \
+                    else total.get(name, 0) + value
+        total['seconds'] = round(total['seconds'], 3)
+        total['cpu_seconds'] = round(total['cpu_seconds'], 3)
+        return total
+
+
+def rates(result, **amounts):
+    """Add amount-per-second rates to a result.
+    """
+    for name, amount in amounts.items():
+        result[name + '_per_second'] = round(amount / max(result['seconds'], 1e-6), 2)
+    return result
+
+
+def bench_upload_genome(suite, args):
+    path = os.path.join(suite.scratch, 'genome.vcf')
+    write_vcf(path, args.genome_mb * 1024 * 1024)
+    script = os.path.join(FE2, 'GenomeWorkflows', 'upload_genome.py')
+    with open(path, 'rb') as f:
+        checksum = hashlib.md5(f.read()).hexdigest()
+    results = {}
+    for name, extra in (('plain', []), ('given_checksum', ['--checksum', checksum]),
+                        ('resumable', ['--resumable'])):
+        result = suite.run(script, [1, 'benchmark', 'female', path] + extra)
+        results[name] = rates(result, mb=args.genome_mb)
+    os.remove(path)
+    return results
+
+
+def bench_upload_genomes_folder(suite, args):
+    folder = os.path.join(suite.scratch, 'genomes')
+    os.mkdir(folder)
+    size = args.folder_genome_mb * 1024 * 1024
+    with open(os.path.join(folder, 'manifest.csv'), 'w') as manifest:
+        manifest.write('filename,label,external_id,sex,format\n')
+        for number in range(args.genomes):
+            name = 'sample_{:03d}.vcf'.format(number)
+            write_vcf(os.path.join(folder, name), size, sample='sample{}'.format(number))
+            manifest.write('{},sample{},{},unspecified,vcf\n'.format(name, number, number))
+    total_mb = args.genomes * args.folder_genome_mb
+    results = {'serial': rates(suite.run(os.path.join(FE2, 'GenomeWorkflows',
+                                                      'upload_genomes_folder.py'), [1, folder]),
+                               mb=total_mb, genomes=args.genomes)}
+    results['manifest_workers'] = rates(suite.run(
+        os.path.join(FE2, 'GenomeWorkflows', 'upload_genomes_folder_with_manifest.py'),
+        [1, folder, '--workers', args.workers]), mb=total_mb, genomes=args.genomes)
+    shutil.rmtree(folder)
+    return results
+
+
+def bench_report_variants(suite, args):
+    script = os.path.join(FE2, 'ClinicalReportLaunchers', 'get_report_variants.py')
+    return {'json_ndjson': rates(suite.run(script, [1, '--ndjson']), variants=args.variants),
+            'vcf': rates(suite.run(script, [1, '--format', 'VCF']), variants=args.variants)}
+
+
+def bench_export_analysis(suite, args):
+    script = os.path.join(FE2, 'AnalysisLaunchers', 'export_analysis.py')
+    return {'streamed': rates(suite.run(script, ['--id', 1, '--filter_id', 1, '--ndjson']),
+                              variants=args.variants),
+            'paged': rates(suite.run(script, ['--id', 1, '--filter_id', 1, '--all', '--ndjson']),
+                           variants=args.variants)}
+
+
+def bench_new_cases(suite, args):
+    folder = os.path.join(suite.scratch, 'cases')
+    os.mkdir(folder)
+    write_vcf(os.path.join(folder, 'proband.vcf'), args.case_genome_mb * 1024 * 1024)
+    manifest = os.path.join(folder, 'manifest.csv')
+    with open(manifest, 'w') as f:
+        f.write('analysis,test_id,accession,sex,genome,vcf\n')
+        for number in range(args.cases):
+            f.write('PANEL,1,CASE{0},FEMALE,case{0},proband.vcf\n'.format(number))
+    result = suite.run(os.path.join(FE3, 'post_new_case.py'),
+                       ['--batch', manifest, '--concurrency', args.workers,
+                        '--results', os.path.join(folder, 'results.json')], cwd=folder)
+    shutil.rmtree(folder)
+    return {'batch': rates(result, cases=args.cases)}
+
+
+def bench_report_launches(suite, args):
+    path = os.path.join(suite.scratch, 'launch.vcf')
+    size = args.case_genome_mb * 1024 * 1024
+    write_vcf(path, size)
+    launchers = os.path.join(FE2, 'ClinicalReportLaunchers')
+    # Each launch must create its report, and a launch with a new genome
+    # must send all of it, or its time means nothing
+    created = {'POST create_report': 1}
+    uploaded = dict(created, bytes_received=size)
+    runs = (('panel_existing_genome', 'launch_panel_report_existing_genome.py', created,
+             lambda number: [1, 1, 'ACC{}'.format(number)]),
+            ('panel_new_genome', 'launch_panel_report_new_genome.py', uploaded,
+             lambda number: ['--project_id', 1, 'launch', 'female', path, 1,
+                             'ACC{}'.format(number)]),
+            ('solo', 'launch_solo_report.py', uploaded,
+             lambda number: [1, path, 'launch', 'f', '', 'vcf', 'ACC{}'.format(number)]))
+    results = {}
+    for name, script, expect, make_args in runs:
+        try:
+            result = suite.run_many(args.launches, os.path.join(launchers, script), make_args,
+                                    expect=expect)
+            results[name] = rates(result, reports=args.launches)
+        except RuntimeError as e:
+            results[name] = {'error': str(e)}
+    os.remove(path)
+    return results
+
+
+WORKFLOWS = (('upload_genome', bench_upload_genome),
+             ('upload_genomes_folder', bench_upload_genomes_folder),
+             ('report_variants', bench_report_variants),
+             ('export_analysis', bench_export_analysis),
+             ('new_cases', bench_new_cases),
+             ('report_launches', bench_report_launches))
+
+
+def compare(results, baseline, tolerance):
+    """List the metrics in results that are worse than in baseline by more
+    than tolerance (a fraction).
+    """
+    regressions = []
+    for workflow, runs in results['workflows'].items():
+        for run, metrics in runs.items():
+            old = baseline.get('workflows', {}).get(workflow, {}).get(run)
+            if not old or 'error' in old:
+                continue
+            if 'error' in metrics:
+                regressions.append({'metric': '{}.{}'.format(workflow, run),
+                                    'error': metrics['error']})
+                continue
+            for name, value in metrics.items():
+                for suffix, higher_is_better in COMPARED_METRICS:
+                    if not name.endswith(suffix) or not old.get(name):
+                        continue
+                    change = (value - old[name]) / float(old[name])
+                    if (-change if higher_is_better else change) > tolerance:
+                        regressions.append({'metric': '{}.{}.{}'.format(workflow, run, name),
+                                            'baseline': old[name], 'value': value,
+                                            'change': round(change, 3)})
+    return regressions
+
+
+def main():
+    """Main function. Benchmark the core workflows against the simulator.
+    """
+    parser = argparse.ArgumentParser(description='Benchmark the core workflows end to end.')
+    parser.add_argument('--output', metavar='results_file', type=str,
+                        help='write results here instead of stdout')
+    parser.add_argument('--baseline', metavar='results_file', type=str,
+                        help='earlier results to check for regressions')
+    parser.add_argument('--tolerance', metavar='fraction', type=float, default=0.2)
+    parser.add_argument('--only', metavar='workflow', nargs='+',
+                        choices=[name for name, _ in WORKFLOWS])
+    parser.add_argument('--python', metavar='interpreter', type=str, default=sys.executable,
+                        help='interpreter to run the scripts with')
+    parser.add_argument('--latency_ms', metavar='ms', type=float, default=10.0)
+    parser.add_argument('--bandwidth_mb', metavar='MB/s', type=float,
+                        help='per-connection bandwidth (unlimited by default)')
+    parser.add_argument('--genome_mb', metavar='MB', type=int, default=256)
+    parser.add_argument('--genomes', metavar='genomes', type=int, default=8)
+    parser.add_argument('--folder_genome_mb', metavar='MB', type=int, default=32)
+    parser.add_argument('--variants', metavar='variants', type=int, default=200000)
+    parser.add_argument('--cases', metavar='cases', type=int, default=20)
+    parser.add_argument('--case_genome_mb', metavar='MB', type=int, default=4)
+    parser.add_argument('--launches', metavar='reports', type=int, default=10)
+    parser.add_argument('--workers', metavar='workers', type=int, default=4)
+    args = parser.parse_args()
+
+    settings = dict(vars(args))
+    for name in ('output', 'baseline', 'tolerance', 'only'):
+        settings.pop(name)
+    results = {'version': RESULTS_VERSION,
+               'started': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+               'commit': git_commit(),
+               'python': platform.python_version(),
+               'platform': platform.platform(),
+               'cpus': os.cpu_count(),
+               'settings': settings,
+               'workflows': {}}
+    scratch = tempfile.mkdtemp(prefix='fabric_workflow_bench_')
+    simulator = FabricSimulator(
+        latency=args.latency_ms / 1000.0,
+        bandwidth=args.bandwidth_mb * 1024 * 1024 if args.bandwidth_mb else None,
+        variants=args.variants, job_seconds=1.0)
+    try:
+        with simulator:
+            suite = Suite(simulator, args.python, scratch)
+            for name, bench in WORKFLOWS:
+                if args.only and name not in args.only:
+                    continue
+                sys.stderr.write("Running {}\n".format(name))
+                try:
+                    results['workflows'][name] = bench(suite, args)
+                except RuntimeError as e:
+                    results['workflows'][name] = {'all': {'error': str(e)}}
+    finally:
+        shutil.rmtree(scratch)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            results['regressions'] = compare(results, json.load(f), args.tolerance)
+
+    output = json.dumps(results, indent=4, sort_keys=True) + '\n'
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        sys.stdout.write(output)
+    if results.get('regressions'):
+        sys.exit("{} regressions against {}".format(len(results['regressions']), args.baseline))
+
+
+if __name__ == "__main__":
+    main()
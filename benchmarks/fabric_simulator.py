@@ -0,0 +1,780 @@
+"""Local stand-in for the Fabric API, for running the example scripts offline.
+
+The simulator implements the endpoints the fe2 and fe3 scripts call
+(projects and genome uploads, including resumable ones; reports, their
+variants, PDFs, patient fields and status; analyses; variant reports; jobs;
+panels and regions; condition genes; assay types; case containers and
+member uploads) against in-memory data seeded from --seed. Variant listings
+are synthetic, --variants per report, generated and streamed as they are
+sent in JSON, VCF or CSV, so payloads of any size cost the server no memory.
+
+Every request first waits --latency_ms (plus up to --jitter_ms), may be
+turned away by the --max_rps rate limit (429) or --max_concurrency limit
+(503), and may fail by --error_rate (500 or 503 with Retry-After) or have
+its connection dropped by --drop_rate. Request and response bodies move at
+--bandwidth_mb per connection. Counts of requests per endpoint, bytes and
+injected faults are kept in `stats` and served at GET /_simulator/stats.
+
+Run it and point the scripts at it:
+    python fabric_simulator.py --port 8000 --latency_ms 50 --variants 100000
+    export FABRIC_API_URL=http://127.0.0.1:8000
+    export FABRIC_API_LOGIN=login FABRIC_API_PASSWORD=password
+    python ../fe2/python/ClinicalReportLaunchers/get_report_variants.py 1 --ndjson
+
+or start it from a benchmark with `with FabricSimulator(...) as simulator:`
+and use simulator.url.
+"""
+
+import argparse
+import collections
+import itertools
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from urllib.parse import parse_qs, urlparse
+
+from stub_server import StubHandler, StubServer
+
+CHROMOSOMES = [str(number) for number in range(1, 23)] + ['X', 'Y']
+BASES = 'ACGT'
+VARIANT_STATUSES = ('REVIEWED', 'CONFIRMED', 'FAILED_CONFIRMATION', 'NOT_REVIEWED')
+REPORT_STATUSES = ('WAITING', 'RUNNING', 'READY TO REVIEW', 'FINAL')
+JOB_TIMELINE = (('QUEUED', 0.0), ('RUNNING', 0.2), ('COMPLETED', 1.0))
+# Variants per encoded block of a streamed listing
+STREAM_BATCH = 500
+WRITE_BLOCK = 64 * 1024
+
+
+def synthetic_variant(report_id, index, seed=0):
+    """The index'th variant of a report, the same on every call.
+    """
+    rng = random.Random((seed * 1000003 + report_id) * 1000003 + index)
+    chromosome = CHROMOSOMES[index * len(CHROMOSOMES) // 1000000 % len(CHROMOSOMES)]
+    start = 10000 + index * 2500 + rng.randrange(2000)
+    ref = rng.choice(BASES)
+    alt = rng.choice(BASES.replace(ref, ''))
+    return {'id': report_id * 10000000 + index,
+            'chromosome': chromosome,
+            'start_on_chrom': start,
+            'end_on_chrom': start + 1,
+            'ref': ref,
+            'alt': alt,
+            'gene_symbol': 'GENE{}'.format(rng.randrange(20000)),
+            'status': rng.choice(VARIANT_STATUSES),
+            'to_report': rng.random() < 0.05,
+            'score': round(rng.random(), 4),
+            'genotype': rng.choice(('0/1', '1/1'))}
+
+
+def synthetic_pdf(report_id, size):
+    line = '%PDF-1.4 simulated report {}\n'.format(report_id).encode('utf-8')
+    return (line * (size // len(line) + 1))[:size]
+
+
+def encode_variants(variants, _format):
+    """Yield a variant listing as blocks of bytes in JSON, VCF or CSV.
+    """
+    if _format == 'VCF':
+        yield (b'##fileformat=VCFv4.2\n'
+               b'#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n')
+        line = '{chromosome}\t{start_on_chrom}\t{id}\t{ref}\t{alt}\t50\tPASS\tGENE={gene_symbol};SCORE={score}\n'
+    elif _format == 'CSV':
+        yield b'id,chromosome,start_on_chrom,end_on_chrom,ref,alt,gene_symbol,status,score\n'
+        line = ('{id},{chromosome},{start_on_chrom},{end_on_chrom},{ref},{alt},{gene_symbol},'
+                '{status},{score}\n')
+    else:
+        yield b'{"objects": ['
+        first = True
+        for batch in iter(lambda: list(itertools.islice(variants, STREAM_BATCH)), []):
+            text = ', '.join(json.dumps(variant) for variant in batch)
+            yield (text if first else ', ' + text).encode('utf-8')
+            first = False
+        yield b']}'
+        return
+    for batch in iter(lambda: list(itertools.islice(variants, STREAM_BATCH)), []):
+        yield ''.join(line.format(**variant) for variant in batch).encode('utf-8')
+
+
+class SimulatorState(object):
+    """The simulated workspace: every object the API serves, in memory.
+    """
+
+    def __init__(self, seed=0, variants=1000, projects=5, reports=20, pdf_size=512 * 1024,
+                 job_seconds=30.0):
+        self.seed = seed
+        self.variants = variants
+        self.pdf_size = pdf_size
+        self.job_seconds = job_seconds
+        self.lock = threading.Lock()
+        self.ids = collections.defaultdict(lambda: itertools.count(1))
+        self.projects = {}
+        self.genomes = {}
+        self.reports = {}
+        self.analyses = {}
+        self.panels = {}
+        self.panel_genes = {}
+        self.condition_genes = {}
+        self.jobs = {}
+        self.case_containers = {}
+        self.uploads = {}
+        self.assay_types = dict((number, {'id': number, 'name': name}) for number, name
+                                in enumerate(('Exome', 'Genome', 'Panel'), 1))
+        rng = random.Random(seed)
+        for number in range(projects):
+            project = self.add('projects', {'name': 'Project {}'.format(number + 1),
+                                            'description': 'Simulated project'})
+            self.add('genomes', {'project_id': project['id'], 'genome_label': 'Seed genome',
+                                 'genome_sex': 'unspecified', 'assembly_version': 'hg19',
+                                 'external_id': None, 'status': 'READY'})
+        for number in range(reports):
+            genome_id = rng.choice(list(self.genomes))
+            self.add('reports', {'status': rng.choice(REPORT_STATUSES), 'version': 1,
+                                 'accession_id': 'ACC{:05d}'.format(number + 1),
+                                 'genome_id': genome_id, 'report_type': 'Panel',
+                                 'patient_fields': {}})
+        for number in range(reports):
+            self.add('analyses', {'name': 'Analysis {}'.format(number + 1),
+                                  'genome_id': rng.choice(list(self.genomes)),
+                                  'status': 'COMPLETED'})
+
+    def add(self, kind, fields):
+        """Store a new object of kind, giving it the next id of that kind.
+        """
+        with self.lock:
+            object_id = next(self.ids[kind])
+            item = dict(fields, id=object_id)
+            getattr(self, kind)[object_id] = item
+            return item
+
+    def job_status(self, job):
+        progress = (time.time() - job['created']) / self.job_seconds
+        status = JOB_TIMELINE[0][0]
+        for name, starts_at in JOB_TIMELINE:
+            if progress >= starts_at:
+                status = name
+        return status
+
+    def variants_of(self, report_id, query):
+        """Synthetic variants of a report, filtered and sliced by the query.
+        """
+        offset = int(query.get('offset', ['0'])[0])
+        limit = query.get('limit')
+        statuses = query.get('status')
+        chrom = query.get('chrom')
+        if not (statuses or chrom):
+            # Unfiltered pages start at their offset rather than skipping to it
+            stop = min(offset + int(limit[0]), self.variants) if limit else self.variants
+            return (synthetic_variant(report_id, index, self.seed)
+                    for index in range(offset, stop))
+        variants = (synthetic_variant(report_id, index, self.seed)
+                    for index in range(self.variants))
+        if statuses:
+            variants = (variant for variant in variants if variant['status'] in statuses)
+        if chrom:
+            variants = (variant for variant in variants if variant['chromosome'] == chrom[0])
+        return itertools.islice(variants, offset, offset + int(limit[0]) if limit else None)
+
+
+ROUTES = []
+
+
+def route(method, pattern):
+    """Register a SimulatorHandler method for requests matching pattern.
+    """
+    def register(function):
+        ROUTES.append((method, re.compile('^' + pattern + '$'), function))
+        return function
+    return register
+
+
+def paged(items, query):
+    items = list(items)
+    offset = int(query.get('offset', ['0'])[0])
+    limit = query.get('limit')
+    return {'objects': items[offset:offset + int(limit[0])] if limit else items[offset:],
+            'meta': {'total_count': len(items), 'offset': offset}}
+
+
+class SimulatorHandler(StubHandler):
+    """Apply the configured faults, then dispatch to a route.
+    """
+
+    def _admit(self):
+        """Return the status to turn the request away with, or None.
+        """
+        server = self.server
+        with server.lock:
+            server.active += 1
+            if server.max_rps:
+                now = time.time()
+                server.tokens = min(server.max_rps,
+                                    server.tokens + (now - server.updated) * server.max_rps)
+                server.updated = now
+                if server.tokens < 1:
+                    return 429
+                server.tokens -= 1
+            if server.max_concurrency and server.active > server.max_concurrency:
+                return 503
+            roll = server.rng.random()
+            if roll < server.drop_rate:
+                return 'drop'
+            if roll < server.drop_rate + server.error_rate:
+                return server.rng.choice((500, 503))
+        return None
+
+    def _count(self, name, amount=1):
+        with self.server.lock:
+            self.server.stats[name] = self.server.stats.get(name, 0) + amount
+
+    def _write(self, data):
+        bandwidth = self.server.bandwidth
+        for start in range(0, len(data), WRITE_BLOCK):
+            block = data[start:start + WRITE_BLOCK]
+            if bandwidth:
+                time.sleep(float(len(block)) / bandwidth)
+            self.wfile.write(block)
+        self._count('bytes_sent', len(data))
+
+    def _send(self, body, status=200, content_type='application/json', headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != 'HEAD':
+            self._write(body)
+
+    def _reply(self, payload, status=200):
+        self._send(json.dumps(payload).encode('utf-8'), status)
+
+    def _stream(self, blocks, content_type, headers=None):
+        """Send blocks with chunked transfer encoding, as they are made.
+        """
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for block in blocks:
+            if block:
+                self._write('{:x}\r\n'.format(len(block)).encode('ascii') + block + b'\r\n')
+        self.wfile.write(b'0\r\n\r\n')
+
+    def _body_json(self):
+        chunks = []
+        self._count('bytes_received', self._read_body(chunks.append))
+        body = b''.join(chunks)
+        if not body:
+            return {}
+        try:
+            return json.loads(body)
+        except ValueError:
+            return {}
+
+    def _handle(self):
+        url = urlparse(self.path)
+        path = url.path.rstrip('/') or '/'
+        self.query = parse_qs(url.query)
+        time.sleep(self.server.latency + random.uniform(0, self.server.jitter))
+        if path == '/_simulator/stats':
+            self._reply(dict(self.server.stats, connections=self.server.connections))
+            return
+        try:
+            fault = self._admit()
+            if fault == 'drop':
+                self._count('dropped')
+                self.close_connection = True
+                self.connection.shutdown(2)
+                return
+            if fault is not None:
+                self._count('rejected_{}'.format(fault))
+                self._drain()
+                retry = {'Retry-After': '1'} if fault in (429, 503) else None
+                self._send(json.dumps({'description': 'Simulated error'}).encode('utf-8'),
+                           status=fault, headers=retry)
+                return
+            for method, pattern, function in ROUTES:
+                match = pattern.match(path)
+                if match and method == self.command:
+                    self._count('{} {}'.format(method, function.__name__))
+                    function(self, *[int(group) if group.isdigit() else group
+                                     for group in match.groups()])
+                    return
+            self._drain()
+            self._count('not_found')
+            self._reply({'description': 'No simulated endpoint for {} {}'.format(
+                self.command, path)}, status=404)
+        finally:
+            with self.server.lock:
+                self.server.active -= 1
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _handle
+
+    def _get(self, kind, object_id):
+        item = getattr(self.server.state, kind).get(object_id)
+        if item is None:
+            self._reply({'description': 'Not found'}, status=404)
+        return item
+
+    # Projects and genomes
+
+    @route('GET', '/projects')
+    def list_projects(self):
+        self._reply(paged(self.server.state.projects.values(), self.query))
+
+    @route('POST', '/projects')
+    def create_project(self):
+        self._reply(self.server.state.add('projects', self._body_json()))
+
+    @route('GET', '/projects/(\\d+)/genomes')
+    def list_project_genomes(self, project_id):
+        self._reply(paged((genome for genome in self.server.state.genomes.values()
+                           if genome['project_id'] == project_id), self.query))
+
+    @route('GET', '/projects/(\\d+)/genomes/(\\d+)')
+    def get_project_genome(self, project_id, genome_id):
+        genome = self._get('genomes', genome_id)
+        if genome:
+            self._reply(genome)
+
+    def _new_genome(self, project_id, received):
+        query = dict((key, values[0]) for key, values in self.query.items())
+        genome = self.server.state.add('genomes', {
+            'project_id': project_id, 'genome_label': query.get('genome_label'),
+            'genome_sex': query.get('genome_sex'), 'external_id': query.get('external_id'),
+            'assembly_version': query.get('assembly_version'), 'checksum': query.get('checksum'),
+            'status': 'PROCESSING', 'bytes': received})
+        return dict(genome, genome_id=genome['id'])
+
+    @route('PUT', '/projects/(\\d+)/genomes')
+    def upload_genome(self, project_id):
+        content_range = self.headers.get('Content-Range')
+        if not content_range:
+            received = self._read_body(lambda chunk: None)
+            self._count('bytes_received', received)
+            self._reply(self._new_genome(project_id, received))
+            return
+        # Resumable upload: chunks of one file arrive as Content-Range PUTs
+        upload_id = self.query.get('upload_id', [''])[0]
+        spec, total = content_range.split(' ')[1].split('/')
+        with self.server.state.lock:
+            held = self.server.state.uploads.setdefault(upload_id, [0])
+        if spec != '*':
+            start = int(spec.split('-')[0])
+            received = self._read_body(lambda chunk: None)
+            self._count('bytes_received', received)
+            if start == held[0]:
+                held[0] += received
+        else:
+            self._drain()
+        if held[0] >= int(total):
+            self._send(json.dumps(self._new_genome(project_id, held[0])).encode('utf-8'), 201)
+            return
+        headers = {'Range': 'bytes=0-{}'.format(held[0] - 1)} if held[0] else None
+        self._send(b'', status=308, headers=headers)
+
+    route('POST', '/projects/(\\d+)/genomes')(upload_genome)
+
+    @route('GET', '/genomes')
+    def list_genomes(self):
+        self._reply(paged(self.server.state.genomes.values(), self.query))
+
+    @route('GET', '/genomes/(\\d+)')
+    def get_genome(self, genome_id):
+        genome = self._get('genomes', genome_id)
+        if genome:
+            self._reply(genome)
+
+    @route('PUT', '/genomes/(\\d+)')
+    def edit_genome(self, genome_id):
+        changes = self._body_json()
+        genome = self._get('genomes', genome_id)
+        if genome:
+            genome.update(changes)
+            self._reply(genome)
+
+    @route('DELETE', '/genomes/(\\d+)')
+    def delete_genome(self, genome_id):
+        self.server.state.genomes.pop(genome_id, None)
+        self._reply({'deleted': genome_id})
+
+    @route('DELETE', '/projects/(\\d+)/genomes/(\\d+)')
+    def delete_project_genome(self, project_id, genome_id):
+        self.delete_genome(genome_id)
+
+    # Reports
+
+    @route('GET', '/reports')
+    def list_reports(self):
+        reports = self.server.state.reports.values()
+        for field in ('status', 'accession_id', 'genome_id'):
+            if field in self.query:
+                reports = [report for report in reports
+                           if str(report.get(field)) in self.query[field]]
+        self._reply(paged(reports, self.query))
+
+    @route('POST', '/reports')
+    def create_report(self):
+        fields = self._body_json()
+        report = self.server.state.add('reports', dict(
+            fields, status='WAITING', version=1, patient_fields={},
+            created_on=time.strftime('%Y-%m-%dT%H:%M:%S'), created_by=1, workspace_id=1))
+        self._reply({'clinical_report': report})
+
+    @route('GET', '/reports/(\\d+)')
+    def get_report(self, report_id):
+        report = self._get('reports', report_id)
+        if report:
+            self._reply(report)
+
+    @route('PUT', '/reports/(\\d+)')
+    def edit_report(self, report_id):
+        fields = self._body_json()
+        report = self._get('reports', report_id)
+        if report:
+            report.update((key, value) for key, value in fields.items() if value is not None)
+            report['version'] += 1
+            self._reply({'clinical_report': report})
+
+    @route('GET', '/reports/(\\d+)/patient_fields')
+    def get_patient_fields(self, report_id):
+        report = self._get('reports', report_id)
+        if report:
+            self._reply(report['patient_fields'])
+
+    @route('POST', '/reports/(\\d+)/patient_fields')
+    def set_patient_fields(self, report_id):
+        fields = self._body_json()
+        report = self._get('reports', report_id)
+        if report:
+            report['patient_fields'].update(fields)
+            report['version'] += 1
+            self._reply(report['patient_fields'])
+
+    route('PUT', '/reports/(\\d+)/patient_fields')(set_patient_fields)
+
+    @route('POST', '/reports/(\\d+)/update_status')
+    def update_report_status(self, report_id):
+        fields = self._body_json()
+        report = self._get('reports', report_id)
+        if report:
+            report['status'] = fields.get('status', report['status'])
+            report['version'] += 1
+            self._reply(report)
+
+    route('PUT', '/reports/(\\d+)/update_status')(update_report_status)
+
+    @route('POST', '/reports/(\\d+)/qc_data')
+    def post_qc_data(self, report_id):
+        self._reply(dict(self._body_json(), report_id=report_id))
+
+    @route('GET', '/reports/(\\d+)/(pdf_report|pdf_preview)')
+    def get_report_pdf(self, report_id, kind):
+        if self._get('reports', report_id):
+            self._send(synthetic_pdf(report_id, self.server.state.pdf_size),
+                       content_type='application/pdf',
+                       headers={'Content-Disposition': 'attachment; filename="report_{}{}.pdf"'
+                                .format(report_id, '_preview' if kind == 'pdf_preview' else '')})
+
+    def _variant_listing(self, report_id):
+        _format = self.query.get('format', ['JSON'])[0].upper()
+        content_type = {'VCF': 'text/plain', 'CSV': 'text/csv'}.get(_format, 'application/json')
+        filename = 'variants_{}.{}'.format(report_id, _format.lower())
+        self._stream(encode_variants(self.server.state.variants_of(report_id, self.query),
+                                     _format), content_type,
+                     headers={'Content-Disposition': 'attachment; filename={}'.format(filename)})
+
+    @route('GET', '/reports/(\\d+)/variants')
+    def get_report_variants(self, report_id):
+        if self._get('reports', report_id):
+            self._variant_listing(report_id)
+
+    route('GET', '/reports/(\\d+)/variants/scored')(get_report_variants)
+    route('GET', '/reports/(\\d+)/selectable_variants')(get_report_variants)
+    route('GET', '/reports/(\\d+)/structural_variants')(get_report_variants)
+
+    @route('GET', '/reports/(\\d+)/variants/(\\d+)')
+    def get_report_variant(self, report_id, variant_id):
+        self._reply(synthetic_variant(report_id, variant_id % 10000000, self.server.state.seed))
+
+    @route('PUT', '/reports/(\\d+)/variants/(\\d+)')
+    def edit_report_variant(self, report_id, variant_id):
+        variant = synthetic_variant(report_id, variant_id % 10000000, self.server.state.seed)
+        self._reply(dict(variant, **self._body_json()))
+
+    route('PATCH', '/reports/(\\d+)/variants/(\\d+)')(edit_report_variant)
+
+    @route('POST', '/reports/(\\d+)/variants')
+    def add_report_variant(self, report_id):
+        self._reply(dict(self._body_json(), report_id=report_id))
+
+    @route('POST', '/reports/(\\d+)/variants/(\\d+)/internal_notes')
+    def add_variant_note(self, report_id, variant_id):
+        self._reply(dict(self._body_json(), report_id=report_id, variant_id=variant_id))
+
+    # Analyses and variant reports
+
+    @route('GET', '/analysis')
+    def list_analyses(self):
+        self._reply(paged(self.server.state.analyses.values(), self.query))
+
+    @route('POST', '/analysis')
+    def launch_analysis(self):
+        self._reply(self.server.state.add('analyses', dict(self._body_json(),
+                                                           status='RUNNING')))
+
+    @route('GET', '/analysis/(\\d+)')
+    def get_analysis(self, analysis_id):
+        analysis = self._get('analyses', analysis_id)
+        if analysis:
+            self._reply(analysis)
+
+    @route('DELETE', '/analysis/(\\d+)')
+    def delete_analysis(self, analysis_id):
+        self.server.state.analyses.pop(analysis_id, None)
+        self._reply({'deleted': analysis_id})
+
+    @route('GET', '/analysis/(\\d+)/variants')
+    def get_analysis_variants(self, analysis_id):
+        self._variant_listing(analysis_id)
+
+    route('GET', '/analysis/(\\d+)/structural_variants')(get_analysis_variants)
+    route('GET', '/variant_reports/(\\d+)/variants')(get_analysis_variants)
+
+    @route('POST', '/analysis/(\\d+)/variants')
+    def export_analysis_variants(self, analysis_id):
+        # The export options (offset, limit, format, ...) come in the body
+        options = self._body_json()
+        self.query = dict((key, [str(value)]) for key, value in options.items()
+                          if value is not None and not isinstance(value, (dict, list)))
+        self._variant_listing(analysis_id)
+
+    # Jobs
+
+    @route('POST', '/jobs')
+    def create_job(self):
+        fields = self._body_json()
+        job = {'uuid': str(uuid.uuid4()), 'accession_id': fields.get('accession_id'),
+               'created': time.time()}
+        with self.server.state.lock:
+            self.server.state.jobs[job['uuid']] = job
+        self._reply({'uuid': job['uuid'], 'status': self.server.state.job_status(job)})
+
+    @route('GET', '/jobs')
+    def find_job(self):
+        job_uuid = self.query.get('uuid', [None])[0]
+        with self.server.state.lock:
+            # Jobs not created here start when first looked up
+            job = self.server.state.jobs.setdefault(job_uuid, {'uuid': job_uuid,
+                                                               'created': time.time()})
+        self._reply([{'uuid': job_uuid, 'accession_id': job.get('accession_id'),
+                      'status': self.server.state.job_status(job)}])
+
+    # Panels and condition genes
+
+    @route('GET', '/panels')
+    def list_panels(self):
+        panels = self.server.state.panels.values()
+        for field in ('name', 'description', 'test_code'):
+            if field in self.query:
+                panels = [panel for panel in panels if panel.get(field) in self.query[field]]
+        self._reply(paged(panels, self.query))
+
+    @route('POST', '/panels')
+    def create_panel(self):
+        panel = self.server.state.add('panels', self._body_json())
+        self.server.state.panel_genes[panel['id']] = set()
+        self._reply(panel)
+
+    @route('GET', '/panels/(\\d+)')
+    def get_panel(self, panel_id):
+        panel = self._get('panels', panel_id)
+        if panel:
+            self._reply(panel)
+
+    @route('PUT', '/panels/(\\d+)')
+    def edit_panel(self, panel_id):
+        fields = self._body_json()
+        panel = self._get('panels', panel_id)
+        if panel:
+            panel.update(fields)
+            self._reply(panel)
+
+    @route('GET', '/panels/(\\d+)/regions')
+    def get_panel_regions(self, panel_id):
+        genes = self.server.state.panel_genes.get(panel_id, set())
+        self._reply({'objects': [{'gene_symbol': gene} for gene in sorted(genes)]})
+
+    @route('POST', '/panels/(\\d+)/regions')
+    def add_panel_regions(self, panel_id):
+        gene_symbols = self._body_json().get('gene_symbols') or []
+        if isinstance(gene_symbols, str):
+            gene_symbols = gene_symbols.split(',')
+        genes = self.server.state.panel_genes.setdefault(panel_id, set())
+        genes.update(gene.strip() for gene in gene_symbols if gene.strip())
+        self._reply({'panel_id': panel_id, 'gene_count': len(genes)})
+
+    @route('GET', '/condition_genes')
+    def list_condition_genes(self):
+        condition_genes = self.server.state.condition_genes.values()
+        if 'cui' in self.query:
+            condition_genes = [item for item in condition_genes
+                               if item.get('CUI') in self.query['cui']
+                               and item.get('gene_symbol') in self.query.get('gene_symbol', [])]
+        self._reply(paged(condition_genes, self.query))
+
+    @route('POST', '/condition_genes')
+    def create_condition_gene(self):
+        self._reply(self.server.state.add('condition_genes', self._body_json()))
+
+    @route('GET', '/assay_types')
+    def list_assay_types(self):
+        self._reply(paged(self.server.state.assay_types.values(), self.query))
+
+    @route('GET', '/assay_types/(\\d+)')
+    def get_assay_type(self, assay_type_id):
+        assay_type = self._get('assay_types', assay_type_id)
+        if assay_type:
+            self._reply(assay_type)
+
+    # Case containers
+
+    @route('POST', '/case_containers')
+    def create_case_container(self):
+        payload = self._body_json()
+        case = self.server.state.add('case_containers', {'payload': payload})
+        urls = []
+        for member in payload.get('members') or [{}]:
+            member_id = next(self.server.state.ids['members'])
+            urls.append({'member_id': member_id,
+                         'relationship': member.get('relationship'),
+                         'url': '{}/case_containers/{}/members/{}/genome'.format(
+                             self.server.url, case['id'], member_id)})
+        self._reply({'case_container_id': case['id'], 'urls': urls})
+
+    @route('POST', '/case_containers/(\\d+)/members/(\\d+)/genome')
+    def upload_member_genome(self, case_id, member_id):
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            self._count('chunked_uploads')
+        received = self._read_body(lambda chunk: None)
+        self._count('bytes_received', received)
+        self._send(json.dumps({'case_container_id': case_id, 'member_id': member_id,
+                               'bytes_received': received}).encode('utf-8'), 201)
+
+
+def spawn(*options):
+    """Run the simulator in a child process with these command line
+    options, so that its CPU time and memory are not counted as the
+    caller's. Returns the process and the simulator's URL.
+    """
+    probe = socket.socket()
+    probe.bind(('127.0.0.1', 0))
+    port = probe.getsockname()[1]
+    probe.close()
+    process = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--port', str(port)] +
+                               [str(option) for option in options], stderr=subprocess.DEVNULL)
+    for _ in range(100):
+        try:
+            socket.create_connection(('127.0.0.1', port)).close()
+            return process, 'http://127.0.0.1:{}'.format(port)
+        except OSError:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError('The simulator did not start on port {}'.format(port))
+
+
+class FabricSimulator(StubServer):
+    """Run the simulator in a daemon thread; see the module docstring for
+    the options.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, bandwidth=None, error_rate=0.0, drop_rate=0.0,
+                 max_rps=None, max_concurrency=None, connect_delay=0.0, host='127.0.0.1',
+                 port=0, **state_options):
+        super(FabricSimulator, self).__init__(connect_delay=connect_delay, bandwidth=bandwidth,
+                                              handler=SimulatorHandler, host=host, port=port)
+        httpd = self.httpd
+        httpd.state = SimulatorState(**state_options)
+        httpd.latency = latency
+        httpd.jitter = jitter
+        httpd.error_rate = error_rate
+        httpd.drop_rate = drop_rate
+        httpd.max_rps = max_rps
+        httpd.max_concurrency = max_concurrency
+        httpd.tokens = float(max_rps or 0)
+        httpd.updated = time.time()
+        httpd.active = 0
+        httpd.lock = threading.Lock()
+        httpd.rng = random.Random(state_options.get('seed', 0))
+        httpd.stats = {}
+        httpd.url = self.url
+
+    @property
+    def state(self):
+        return self.httpd.state
+
+    @property
+    def stats(self):
+        return dict(self.httpd.stats, connections=self.connections)
+
+    def reset_stats(self):
+        with self.httpd.lock:
+            self.httpd.stats = {}
+        self.httpd.connections = 0
+
+
+def main():
+    """Main function. Serve the simulated API until interrupted.
+    """
+    parser = argparse.ArgumentParser(description='Run a local simulated Fabric API.')
+    parser.add_argument('--host', metavar='host', type=str, default='127.0.0.1')
+    parser.add_argument('--port', metavar='port', type=int, default=8000)
+    parser.add_argument('--latency_ms', metavar='ms', type=float, default=0.0)
+    parser.add_argument('--jitter_ms', metavar='ms', type=float, default=0.0)
+    parser.add_argument('--connect_delay_ms', metavar='ms', type=float, default=0.0,
+                        help='delay per new connection, like a TLS handshake')
+    parser.add_argument('--bandwidth_mb', metavar='MB/s', type=float,
+                        help='per-connection bandwidth (unlimited by default)')
+    parser.add_argument('--error_rate', metavar='fraction', type=float, default=0.0)
+    parser.add_argument('--drop_rate', metavar='fraction', type=float, default=0.0)
+    parser.add_argument('--max_rps', metavar='per_second', type=float)
+    parser.add_argument('--max_concurrency', metavar='requests', type=int)
+    parser.add_argument('--variants', metavar='variants', type=int, default=1000,
+                        help='synthetic variants per report')
+    parser.add_argument('--reports', metavar='reports', type=int, default=20)
+    parser.add_argument('--projects', metavar='projects', type=int, default=5)
+    parser.add_argument('--pdf_kb', metavar='KB', type=int, default=512)
+    parser.add_argument('--job_seconds', metavar='seconds', type=float, default=30.0,
+                        help='time for a job to go from QUEUED to COMPLETED')
+    parser.add_argument('--seed', metavar='seed', type=int, default=0)
+    args = parser.parse_args()
+
+    simulator = FabricSimulator(
+        latency=args.latency_ms / 1000.0, jitter=args.jitter_ms / 1000.0,
+        bandwidth=args.bandwidth_mb * 1024 * 1024 if args.bandwidth_mb else None,
+        error_rate=args.error_rate, drop_rate=args.drop_rate, max_rps=args.max_rps,
+        max_concurrency=args.max_concurrency, connect_delay=args.connect_delay_ms / 1000.0,
+        host=args.host, port=args.port, seed=args.seed, variants=args.variants,
+        projects=args.projects, reports=args.reports, pdf_size=args.pdf_kb * 1024,
+        job_seconds=args.job_seconds)
+    sys.stderr.write("Simulated Fabric API at {}\n".format(simulator.url))
+    sys.stderr.write("export FABRIC_API_URL={}\n".format(simulator.url))
+    try:
+        simulator.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        simulator.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
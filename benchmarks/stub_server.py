@@ -0,0 +1,107 @@
+"""Minimal local HTTP/1.1 server standing in for the Fabric API in benchmarks.
+
+Every GET answers with a small JSON body and every PUT/POST drains its body
+and answers with a JSON receipt. connect_delay is slept once per accepted
+connection, to model the TCP+TLS handshake round trips a real client pays
+for each new connection, and bandwidth (bytes per second, per connection)
+throttles how fast request bodies are read.
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        self.server.connections += 1
+        if self.server.connect_delay:
+            time.sleep(self.server.connect_delay)
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, payload, status=200):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self, sink):
+        """Read the request body, plain or chunked, passing each block to
+        sink. Returns the number of body bytes read.
+        """
+        bandwidth = self.server.bandwidth
+        if bandwidth:
+            def throttled(chunk, sink=sink):
+                time.sleep(float(len(chunk)) / bandwidth)
+                sink(chunk)
+            sink = throttled
+        received = 0
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            while True:
+                length = int(self.rfile.readline().split(b';')[0], 16)
+                if not length:
+                    self.rfile.readline()
+                    return received
+                sink(self.rfile.read(length))
+                self.rfile.readline()
+                received += length
+        length = int(self.headers.get('Content-Length') or 0)
+        while received < length:
+            chunk = self.rfile.read(min(65536, length - received))
+            if not chunk:
+                break
+            sink(chunk)
+            received += len(chunk)
+        return received
+
+    def _drain(self):
+        return self._read_body(lambda chunk: None)
+
+    def do_GET(self):
+        self._reply({'path': self.path, 'objects': []})
+
+    def do_PUT(self):
+        self._reply({'path': self.path, 'bytes_received': self._drain()})
+
+    do_POST = do_PUT
+
+
+class StubServer(object):
+    """Run a StubHandler server on a local port (a random free one by
+    default) in a daemon thread.
+    """
+
+    def __init__(self, connect_delay=0.0, bandwidth=None, handler=StubHandler, host='127.0.0.1',
+                 port=0):
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.httpd.connect_delay = connect_delay
+        self.httpd.bandwidth = bandwidth
+        self.httpd.connections = 0
+        self.thread = threading.Thread(target=self.httpd.serve_forever)
+        self.thread.daemon = True
+
+    @property
+    def url(self):
+        return 'http://{}:{}'.format(*self.httpd.server_address[:2])
+
+    @property
+    def connections(self):
+        return self.httpd.connections
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.httpd.shutdown()
+        self.httpd.server_close()
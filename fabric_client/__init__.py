@@ -0,0 +1,5 @@
+"""Shared client code for the Fabric Genomics API example scripts.
+"""
+
+from fabric_client.session import (FABRIC_API_URL, FabricSession, close_session,
+                                   get_session)
@@ -0,0 +1,89 @@
+"""asyncio front end for the shared session.
+
+requests is blocking, so AsyncSession runs each call on a bounded thread
+pool and awaits it; the calls still share the pooled keep-alive session.
+This lets independent requests, such as the member genome uploads of a new
+case container, run at the same time from ordinary asyncio code.
+"""
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from fabric_client.case_containers import post_case_container, post_member_genome
+from fabric_client.session import FABRIC_API_URL, get_session
+
+DEFAULT_CONCURRENCY = 8
+
+
+class AsyncSession(object):
+    """Await blocking session calls from asyncio, at most max_concurrency
+    at a time.
+    """
+
+    def __init__(self, session=None, max_concurrency=DEFAULT_CONCURRENCY):
+        self.max_concurrency = max_concurrency
+        self.session = session or get_session(pool_size=max_concurrency)
+        if getattr(self.session, 'pool_size', max_concurrency) < max_concurrency:
+            self.session.resize_pool(max_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency)
+
+    async def run(self, func, *args, **kwargs):
+        """Run any blocking callable on the pool and return its result.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor,
+                                          functools.partial(func, *args, **kwargs))
+
+    async def request(self, method, url, **kwargs):
+        return await self.run(self.session.request, method, url, **kwargs)
+
+    async def get(self, url, **kwargs):
+        return await self.request('GET', url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request('POST', url, **kwargs)
+
+    async def put(self, url, **kwargs):
+        return await self.request('PUT', url, **kwargs)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+
+class AsyncCaseContainerClient(AsyncSession):
+    """asyncio client for /case_containers and the member genome upload urls.
+    """
+
+    def __init__(self, session=None, base_url=FABRIC_API_URL,
+                 max_concurrency=DEFAULT_CONCURRENCY):
+        super(AsyncCaseContainerClient, self).__init__(session=session,
+                                                       max_concurrency=max_concurrency)
+        self.base_url = base_url
+
+    async def create_case_container(self, payload, **kwargs):
+        """Create a case container. Returns the response.
+        """
+        return await self.run(post_case_container, self.session, payload,
+                              base_url=self.base_url, **kwargs)
+
+    async def upload_genome(self, url, genome_name, vcf_file, **kwargs):
+        """Upload one member genome. Returns the response.
+        """
+        return await self.run(post_member_genome, self.session, url, genome_name,
+                              vcf_file, **kwargs)
+
+    async def upload_genomes(self, uploads, **kwargs):
+        """Upload member genomes at the same time. uploads is a list of
+        dicts of upload_genome() arguments (url, genome_name, vcf_file and
+        optionally assembly_version, platform, checksum). Returns one
+        response or exception per upload, in the same order.
+        """
+        calls = [self.upload_genome(**dict(kwargs, **upload)) for upload in uploads]
+        return await asyncio.gather(*calls, return_exceptions=True)
@@ -0,0 +1,67 @@
+"""BGZF (blocked gzip) compression, as written by bgzip and read by tabix.
+
+A BGZF file is a series of gzip members, each holding at most 64 KB of
+input and recording its own compressed size in a "BC" extra field, ended by
+a fixed empty block. Any gzip reader can decompress it, and tools that index
+VCFs (tabix, bcftools) require it.
+"""
+
+import struct
+import zlib
+
+# Input bytes per block; htslib uses the same, so that even incompressible
+# data fits the 64 KB block limit
+BLOCK_SIZE = 0xff00
+DEFAULT_LEVEL = 6
+# The empty block that marks the end of a BGZF file
+EOF_BLOCK = (b'\x1f\x8b\x08\x04\x00\x00\x00\x00\x00\xff\x06\x00BC\x02\x00\x1b\x00'
+             b'\x03\x00\x00\x00\x00\x00\x00\x00\x00\x00')
+
+
+def compress_block(data, level=DEFAULT_LEVEL):
+    """Return data, at most BLOCK_SIZE bytes, as one BGZF block.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    compressed = compressor.compress(data) + compressor.flush()
+    # Gzip header with FEXTRA set, then the BC subfield holding the block
+    # size minus one. 18 header bytes + data + 8 trailer bytes
+    header = struct.pack('<4BI2BH2BHH', 0x1f, 0x8b, 8, 4, 0, 0, 0xff, 6, 66, 67, 2,
+                         len(compressed) + 25)
+    return header + compressed + struct.pack('<II', zlib.crc32(data) & 0xffffffff, len(data))
+
+
+class BgzfWriter(object):
+    """File-like writer that BGZF-compresses everything written to it into
+    stream, any object with a write() method. close() writes the last block
+    and the end-of-file marker but leaves stream open.
+    """
+
+    def __init__(self, stream, level=DEFAULT_LEVEL):
+        self.stream = stream
+        self.level = level
+        self.buffer = bytearray()
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def write(self, data):
+        self.bytes_in += len(data)
+        self.buffer += data
+        if len(self.buffer) >= BLOCK_SIZE:
+            view = memoryview(self.buffer)
+            full = len(self.buffer) - len(self.buffer) % BLOCK_SIZE
+            for start in range(0, full, BLOCK_SIZE):
+                self._write_block(view[start:start + BLOCK_SIZE])
+            view.release()
+            del self.buffer[:full]
+
+    def _write_block(self, data):
+        block = compress_block(data, self.level)
+        self.stream.write(block)
+        self.bytes_out += len(block)
+
+    def close(self):
+        if self.buffer:
+            self._write_block(bytes(self.buffer))
+            self.buffer = bytearray()
+        self.stream.write(EOF_BLOCK)
+        self.bytes_out += len(EOF_BLOCK)
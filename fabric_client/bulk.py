@@ -0,0 +1,127 @@
+"""Rate-limited concurrent bulk operations.
+
+bulk_apply() runs one API call per item (creates, updates, deletes) on a
+pool of workers over the pooled session, never starting more than `rate`
+calls per second, and returns a BulkSummary of what happened. Items are
+pulled from the input lazily with a bounded number in flight, so a
+generator over a large file is never read ahead far.
+"""
+
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+DEFAULT_WORKERS = 8
+# Failures kept in a summary, for reporting; the count is always exact
+MAX_FAILURES_KEPT = 100
+
+
+class RateLimiter(object):
+    """Token bucket allowing rate calls per second on average, in bursts of
+    up to burst calls. A rate of None (or 0) never waits.
+    """
+
+    def __init__(self, rate, burst=None, clock=time.time, sleep=time.sleep):
+        self.rate = float(rate or 0)
+        self.capacity = float(burst or max(1.0, self.rate))
+        self.tokens = self.capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """Block until tokens calls are allowed. Callers take their tokens
+        at once, going into debt if need be, and sleep off the debt, so
+        concurrent callers are served in order.
+        """
+        if not self.rate:
+            return
+        with self._lock:
+            now = self.clock()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= tokens
+            delay = -self.tokens / self.rate
+        if delay > 0:
+            self.sleep(delay)
+
+
+class BulkSummary(object):
+    """Counts and timing of a bulk run, plus the first failures seen.
+    """
+
+    def __init__(self):
+        self.succeeded = 0
+        self.failed = 0
+        self.failures = []
+        self.started = time.time()
+        self.finished = None
+
+    @property
+    def seconds(self):
+        return (self.finished or time.time()) - self.started
+
+    def as_dict(self):
+        seconds = self.seconds
+        total = self.succeeded + self.failed
+        return {'succeeded': self.succeeded,
+                'failed': self.failed,
+                'seconds': round(seconds, 2),
+                'per_second': round(total / seconds, 1) if seconds else None}
+
+
+def bulk_apply(function, items, workers=DEFAULT_WORKERS, rate=None, on_result=None):
+    """Call function(item) for every item concurrently, at most rate calls
+    per second. on_result(item, result, error) is called from the caller's
+    thread as each call completes, with error None on success. Returns a
+    BulkSummary.
+    """
+    limiter = RateLimiter(rate)
+    summary = BulkSummary()
+
+    def call(item):
+        limiter.acquire()
+        return function(item)
+
+    def collect(done):
+        for future in done:
+            item = pending.pop(future)
+            try:
+                result, error = future.result(), None
+            except Exception as e:
+                result, error = None, e
+            if error is None:
+                summary.succeeded += 1
+            else:
+                summary.failed += 1
+                if len(summary.failures) < MAX_FAILURES_KEPT:
+                    summary.failures.append((item, str(error)))
+            if on_result:
+                on_result(item, result, error)
+
+    pending = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for item in items:
+            # Keep a couple of calls queued per worker, but no more
+            if len(pending) >= workers * 2:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            pending[executor.submit(call, item)] = item
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            collect(done)
+    summary.finished = time.time()
+    return summary
+
+
+def write_summary(summary, label='', stream=sys.stderr):
+    """Write a one-line summary, then each failure kept, to stream.
+    """
+    counts = summary.as_dict()
+    stream.write("{}{} succeeded, {} failed in {}s ({}/s)\n".format(
+        label + ': ' if label else '', counts['succeeded'], counts['failed'], counts['seconds'],
+        counts['per_second']))
+    for item, error in summary.failures:
+        stream.write("  failed {}: {}\n".format(item, error))
@@ -0,0 +1,234 @@
+"""Persistent on-disk cache for read-mostly reference endpoints.
+
+Panels, panel regions, assay types and projects change rarely, yet every
+pipeline run fetches them again. cached_get() keeps successful GET
+responses in a small SQLite database, keyed by API user and full URL
+(including query parameters):
+
+- a response younger than the TTL is served without touching the network;
+- an older one is revalidated with If-None-Match / If-Modified-Since, and a
+  304 answer refreshes it without downloading the body again;
+- once the stored bodies exceed the size cap, the least recently used
+  entries are evicted.
+
+The location, TTL and size cap default to FABRIC_API_CACHE_DIR (else
+~/.cache/fabric_api), FABRIC_API_CACHE_TTL (seconds, 3600) and
+FABRIC_API_CACHE_MAX_MB (100).
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+DEFAULT_TTL = 3600
+DEFAULT_MAX_MB = 100
+CACHE_FILE_NAME = 'responses.sqlite3'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    headers TEXT NOT NULL,
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    stored_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+)
+"""
+
+
+def _env_number(name, default, cast=int):
+    try:
+        return cast(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def default_cache_dir():
+    """Return the cache directory, honouring FABRIC_API_CACHE_DIR.
+    """
+    return os.environ.get('FABRIC_API_CACHE_DIR') or os.path.join(
+        os.path.expanduser('~'), '.cache', 'fabric_api')
+
+
+class ResponseCache(object):
+    """SQLite-backed store of GET responses with a TTL and an LRU size cap.
+    """
+
+    def __init__(self, directory=None, ttl=None, max_bytes=None):
+        self.directory = directory or default_cache_dir()
+        self.ttl = ttl if ttl is not None else _env_number('FABRIC_API_CACHE_TTL', DEFAULT_TTL,
+                                                           float)
+        if max_bytes is None:
+            max_bytes = _env_number('FABRIC_API_CACHE_MAX_MB', DEFAULT_MAX_MB, float) * 1024 * 1024
+        self.max_bytes = int(max_bytes)
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        self.path = os.path.join(self.directory, CACHE_FILE_NAME)
+        self._lock = threading.Lock()
+        # Other pipeline processes may share the file, so wait on their locks
+        self._db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        with self._db:
+            self._db.execute(_SCHEMA)
+            self._db.execute('CREATE INDEX IF NOT EXISTS responses_accessed_at '
+                             'ON responses (accessed_at)')
+
+    def close(self):
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @staticmethod
+    def key(url, user=None):
+        """Cache key for one URL as seen by one API user.
+        """
+        return hashlib.sha256('{}\n{}'.format(user or '', url).encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Return the stored entry for key as a dict, or None.
+        """
+        with self._lock:
+            row = self._db.execute(
+                'SELECT url, status, headers, body, etag, last_modified, stored_at '
+                'FROM responses WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        names = ('url', 'status', 'headers', 'body', 'etag', 'last_modified', 'stored_at')
+        entry = dict(zip(names, row))
+        entry['headers'] = json.loads(entry['headers'])
+        return entry
+
+    def is_fresh(self, entry):
+        return time.time() - entry['stored_at'] < self.ttl
+
+    def put(self, key, response):
+        """Store a successful response and evict old entries past the cap.
+        """
+        body = response.content
+        if len(body) > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute(
+                'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (key, response.url, response.status_code, json.dumps(dict(response.headers)),
+                 sqlite3.Binary(body), len(body), response.headers.get('ETag'),
+                 response.headers.get('Last-Modified'), now, now))
+            self._evict()
+
+    def touch(self, key, refreshed=False):
+        """Mark key as just used, and as just revalidated if refreshed.
+        """
+        now = time.time()
+        with self._lock, self._db:
+            if refreshed:
+                self._db.execute('UPDATE responses SET stored_at = ?, accessed_at = ? '
+                                 'WHERE key = ?', (now, now, key))
+            else:
+                self._db.execute('UPDATE responses SET accessed_at = ? WHERE key = ?',
+                                 (now, key))
+
+    def _evict(self):
+        total = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._db.execute('SELECT key, size FROM responses ORDER BY accessed_at')
+        evicted = []
+        for key, size in rows.fetchall():
+            if total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            total -= size
+        self._db.executemany('DELETE FROM responses WHERE key = ?', evicted)
+
+    def size(self):
+        """Total size of the stored bodies, in bytes.
+        """
+        with self._lock:
+            return self._db.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+    def clear(self):
+        with self._lock, self._db:
+            self._db.execute('DELETE FROM responses')
+
+
+def _cached_response(entry):
+    """Rebuild a requests.Response from a stored entry.
+    """
+    response = requests.Response()
+    response.status_code = entry['status']
+    response.headers = CaseInsensitiveDict(entry['headers'])
+    response._content = bytes(entry['body'])
+    response.url = entry['url']
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+    response.from_cache = True
+    return response
+
+
+def _no_store(response):
+    return 'no-store' in response.headers.get('Cache-Control', '').lower()
+
+
+def cached_get(session, url, cache=None, params=None, **kwargs):
+    """GET url through cache, or straight through session when cache is None.
+
+    The returned response has a from_cache attribute, True when it was served
+    (or revalidated) from the cache.
+    """
+    if cache is None:
+        response = session.get(url, params=params, **kwargs)
+        response.from_cache = False
+        return response
+
+    full_url = requests.Request('GET', url, params=params).prepare().url
+    auth = kwargs.get('auth') or session.auth
+    key = cache.key(full_url, getattr(auth, 'username', None))
+    entry = cache.get(key)
+    if entry is not None and cache.is_fresh(entry):
+        cache.hits += 1
+        cache.touch(key)
+        return _cached_response(entry)
+
+    headers = dict(kwargs.pop('headers', None) or {})
+    if entry is not None:
+        if entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+    response = session.get(full_url, headers=headers, **kwargs)
+
+    if entry is not None and response.status_code == 304:
+        cache.revalidated += 1
+        cache.touch(key, refreshed=True)
+        return _cached_response(entry)
+
+    cache.misses += 1
+    response.from_cache = False
+    if response.status_code == 200 and not _no_store(response):
+        cache.put(key, response)
+    return response
+
+
+def open_cache(no_cache=False):
+    """Return the default ResponseCache, or None when caching is turned off
+    with no_cache (the scripts' --no-cache option).
+    """
+    if no_cache:
+        return None
+    return ResponseCache()
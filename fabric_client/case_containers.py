@@ -0,0 +1,58 @@
+"""Requests for the FE3 /case_containers workflow.
+
+A case container is created with one POST; its response lists one upload
+url per member, of the form /case_containers/{id}/members/{member_id}/genome,
+to which each member's VCF is posted as a multipart form.
+"""
+
+import json
+
+from fabric_client.checksum import HashingReader
+from fabric_client.multipart import hashing_multipart_stream, multipart_stream
+from fabric_client.session import FABRIC_API_URL
+
+
+def case_container_payload(analysis_types, test_id, members, hpo_ids, platform,
+                           assembly_version="b38"):
+    """Build the JSON payload for a new case container.
+    """
+    payload = {"analysis_types": analysis_types,
+               "assembly_version": assembly_version,
+               "members": members,
+               "hpo_terms": hpo_ids}
+    if platform:
+        payload["sequencing_platform"] = platform
+    if test_id:
+        payload["test_id"] = test_id
+    return payload
+
+
+def post_case_container(session, payload, base_url=FABRIC_API_URL, **kwargs):
+    """POST a case container payload. Returns the response.
+    """
+    url = "{}/case_containers".format(base_url)
+    return session.post(url, data=json.dumps(payload), **kwargs)
+
+
+def post_member_genome(session, url, genome_name, vcf_file, assembly_version="b38",
+                       platform=None, checksum=None, **kwargs):
+    """POST a member's VCF to its upload url, streaming the file from disk.
+    Without a checksum, the md5 is computed during the upload and sent after
+    the file part. Returns the response.
+    """
+    payload = {"genome_name": genome_name,
+               "assembly_version": assembly_version}
+    if checksum:
+        payload["checksum"] = checksum
+    if platform:
+        payload["sequencing_platform"] = platform
+
+    with open(vcf_file, 'rb') as file_handle:
+        if checksum:
+            content_type, body = multipart_stream(payload, "genome_file", vcf_file,
+                                                  HashingReader(file_handle, algorithms=()))
+        else:
+            content_type, body = hashing_multipart_stream(payload, "genome_file", vcf_file,
+                                                          file_handle)
+        headers = dict(kwargs.pop('headers', None) or {}, **{"Content-Type": content_type})
+        return session.post(url, data=body, headers=headers, **kwargs)
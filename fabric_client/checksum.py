@@ -0,0 +1,82 @@
+"""Compute VCF checksums while the file is being uploaded.
+
+Operators used to compute a checksum up front and pass it with --checksum,
+which meant reading every multi-GB VCF twice. HashingReader hashes the bytes
+in the same pass that sends them: each block is read with readinto() into a
+single reused buffer, fed to the hash objects and handed to the HTTP layer as
+a memoryview of that buffer, so the file contents are never copied.
+"""
+
+import hashlib
+import os
+
+DEFAULT_BUFFER_SIZE = 1024 * 1024
+DEFAULT_ALGORITHM = 'md5'
+
+
+class HashingReader(object):
+    """Read-only file wrapper that hashes everything read through it.
+
+    read() returns a memoryview into an internal buffer that is reused by
+    the next call, so callers must finish with each block (as http.client
+    and urllib3 do, by sending it) before reading again. A read() never
+    returns more than buffer_size bytes.
+    """
+
+    def __init__(self, file_handle, algorithms=(DEFAULT_ALGORITHM,),
+                 buffer_size=DEFAULT_BUFFER_SIZE):
+        self.file_handle = file_handle
+        self.hashes = dict((name, hashlib.new(name)) for name in algorithms)
+        self.bytes_read = 0
+        self._buffer = bytearray(buffer_size)
+        self._view = memoryview(self._buffer)
+        self._size = os.fstat(file_handle.fileno()).st_size - file_handle.tell()
+
+    def __len__(self):
+        return self._size
+
+    def read(self, size=-1):
+        if size is None or size < 0 or size > len(self._buffer):
+            size = len(self._buffer)
+        count = self.file_handle.readinto(self._view[:size])
+        block = self._view[:count]
+        for hash_object in self.hashes.values():
+            hash_object.update(block)
+        self.bytes_read += count
+        return block
+
+    def __iter__(self):
+        while True:
+            block = self.read()
+            if not block:
+                return
+            yield block
+
+    def hexdigest(self, algorithm=DEFAULT_ALGORITHM):
+        return self.hashes[algorithm].hexdigest()
+
+
+def update_from_file(hash_object, file_handle, start, end, buffer_size=DEFAULT_BUFFER_SIZE):
+    """Feed bytes [start, end) of an open file into hash_object, leaving
+    the file position at end.
+    """
+    buf = bytearray(buffer_size)
+    view = memoryview(buf)
+    file_handle.seek(start)
+    remaining = end - start
+    while remaining > 0:
+        count = file_handle.readinto(view[:min(remaining, buffer_size)])
+        if not count:
+            break
+        hash_object.update(view[:count])
+        remaining -= count
+    return hash_object
+
+
+def file_digest(file_name, algorithm=DEFAULT_ALGORITHM, buffer_size=DEFAULT_BUFFER_SIZE):
+    """Hex digest of a whole file, read once through a reused buffer.
+    """
+    with open(file_name, 'rb') as file_handle:
+        size = os.fstat(file_handle.fileno()).st_size
+        return update_from_file(hashlib.new(algorithm), file_handle, 0, size,
+                                buffer_size=buffer_size).hexdigest()
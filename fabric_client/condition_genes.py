@@ -0,0 +1,34 @@
+"""Local index of a workspace's condition-gene pairs.
+
+Checking `/condition_genes/?cui=&gene_symbol=` before every create costs a
+round trip per row. load_condition_gene_index() instead pages through the
+whole `/condition_genes/` listing once, with prefetching, into a set of
+(CUI, gene symbol) keys that rows can be checked against locally.
+"""
+
+from fabric_client.pagination import DEFAULT_PAGE_SIZE, DEFAULT_PREFETCH, iter_items, page_items
+from fabric_client.session import FABRIC_API_URL
+
+
+def condition_gene_key(cui, gene_symbol):
+    """Case-insensitive key for a condition-gene pair.
+    """
+    return (cui or '').strip().upper(), (gene_symbol or '').strip().upper()
+
+
+def load_condition_gene_index(session, base_url=FABRIC_API_URL, page_size=DEFAULT_PAGE_SIZE,
+                              prefetch=DEFAULT_PREFETCH, **kwargs):
+    """Return the set of keys of every condition-gene pair in the workspace.
+    """
+    url = "{}/condition_genes/".format(base_url)
+
+    def fetch_page(offset, limit):
+        result = session.get(url, params={'offset': offset, 'limit': limit}, **kwargs)
+        result.raise_for_status()
+        return page_items(result.json())
+
+    index = set()
+    for condition_gene in iter_items(fetch_page, page_size=page_size, prefetch=prefetch):
+        cui = condition_gene.get('CUI') or condition_gene.get('cui')
+        index.add(condition_gene_key(cui, condition_gene.get('gene_symbol')))
+    return index
@@ -0,0 +1,88 @@
+"""Streaming downloads straight to disk.
+
+save_response() writes a streamed response (one made with stream=True) to
+a temporary file next to its destination in large blocks, then renames it
+into place. The body is never held in memory, and a reader never sees a
+half-written file: an interrupted download leaves the previous file, if
+any, untouched.
+
+write_response() streams a body to an open file descriptor, such as stdout,
+with os.write() and no intermediate Python file object, optionally
+compressing it to BGZF on the way. chunk_size sets how much is read from the
+socket per step: per-chunk overhead dominates below ~64 KB.
+"""
+
+import os
+import tempfile
+
+from fabric_client.bgzf import BgzfWriter
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+
+def content_disposition_filename(response, default=None):
+    """Return the file name from a response's Content-Disposition header,
+    or default if it has none.
+    """
+    disposition = response.headers.get('content-disposition') or ''
+    if 'filename=' not in disposition:
+        return default
+    filename = disposition.split('filename=')[-1].split(';')[0].strip().strip('"')
+    # Never let the server choose a path outside the destination directory
+    return os.path.basename(filename) or default
+
+
+class FdWriter(object):
+    """Minimal file-like writer over a raw file descriptor.
+    """
+
+    def __init__(self, fd):
+        self.fd = fd
+
+    def write(self, data):
+        # os.write may write less than asked to a pipe, so loop until done
+        view = memoryview(data)
+        while view:
+            view = view[os.write(self.fd, view):]
+
+
+def write_response(response, fd=1, chunk_size=DEFAULT_CHUNK_SIZE, bgzip=False):
+    """Stream response's body to file descriptor fd, BGZF-compressed if
+    bgzip is set. Returns the number of body bytes read. Flush any Python
+    file object over fd (e.g. sys.stdout) before calling this.
+    """
+    writer = FdWriter(fd)
+    if bgzip:
+        writer = BgzfWriter(writer)
+    read = 0
+    try:
+        for block in response.iter_content(chunk_size):
+            writer.write(block)
+            read += len(block)
+        if bgzip:
+            writer.close()
+    finally:
+        response.close()
+    return read
+
+
+def save_response(response, path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Stream response's body into path atomically. Returns the number of
+    bytes written.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path) + '.',
+                                     suffix='.part')
+    written = 0
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for block in response.iter_content(chunk_size):
+                f.write(block)
+                written += len(block)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    finally:
+        response.close()
+    return written
@@ -0,0 +1,303 @@
+"""Shared rate limit, concurrency limit and retry policy for API calls.
+
+Every request made through a FabricSession passes through its Governor.
+Requests fall into three endpoint classes: reads (GET, HEAD, OPTIONS),
+uploads (a PUT or POST with a body to /projects/<id>/genomes, to a case
+member's /genome or to a /files endpoint) and other writes. Each class has
+its own token-bucket rate limit and cap on requests in flight, so a burst of
+reads cannot starve uploads or the reverse. The in-flight cap covers the
+whole transfer: a request made with stream=True keeps its place until its
+body has been read or the response is closed.
+
+A 429 or 503 response pauses its whole class, for the Retry-After time if
+the server gave one, so that all threads back off together rather than each
+finding out separately; this holds for requests that are not retried too.
+The request is then retried after a jittered, exponentially growing delay if
+it is safe to repeat: idempotent methods (GET, HEAD, OPTIONS, PUT, DELETE)
+on 429, 502, 503 and 504 and on connection errors, and any method on 429, or
+on 503 with Retry-After, which the server sends before doing any work.
+Requests whose body is a stream (a file or generator) are never retried,
+since the body cannot be sent twice, and neither are requests sent with
+retry=False: the chunks of a resumable upload are sent that way, since
+resumable.py retries them itself and re-syncs with the server between
+attempts. Each class's concurrency also adapts to throttling (see
+EndpointLimit).
+
+The limits are read from the environment:
+
+    FABRIC_API_READ_RATE, FABRIC_API_WRITE_RATE, FABRIC_API_UPLOAD_RATE
+        requests per second for each class (unlimited by default)
+    FABRIC_API_MAX_READS, FABRIC_API_MAX_WRITES, FABRIC_API_MAX_UPLOADS
+        requests in flight for each class (32, 16 and 8 by default)
+    FABRIC_API_MAX_RETRIES
+        retries per request (5 by default; 0 turns retries off)
+"""
+
+import email.utils
+import os
+import random
+import re
+import threading
+import time
+import weakref
+
+from requests.exceptions import ConnectionError, Timeout
+from urllib.parse import urlparse
+
+from fabric_client.bulk import RateLimiter
+
+READ, WRITE, UPLOAD = 'read', 'write', 'upload'
+DEFAULT_MAX_IN_FLIGHT = {READ: 32, WRITE: 16, UPLOAD: 8}
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BACKOFF = 0.5
+DEFAULT_MAX_BACKOFF = 30.0
+# Longest Retry-After honoured; longer ones are treated as this
+MAX_RETRY_AFTER = 300.0
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'])
+RETRY_STATUSES = frozenset([429, 502, 503, 504])
+THROTTLE_STATUSES = frozenset([429, 503])
+# Paths whose PUT or POST bodies are genome or file contents
+UPLOAD_PATHS = re.compile(r'/projects/\d+/genomes/?$|/members/\d+/genome/?$|/files/?$')
+
+
+def endpoint_class(method, url, has_body=True):
+    """Classify a request as READ, WRITE or UPLOAD.
+    """
+    method = method.upper()
+    if method in ('GET', 'HEAD', 'OPTIONS'):
+        return READ
+    if method in ('POST', 'PUT') and has_body and UPLOAD_PATHS.search(urlparse(url).path):
+        return UPLOAD
+    return WRITE
+
+
+def is_replayable(kwargs):
+    """Whether a request's body can be sent again: no body, or one held in
+    memory rather than read from a file or generator.
+    """
+    if kwargs.get('files'):
+        return False
+    data = kwargs.get('data')
+    return data is None or isinstance(data, (bytes, str, dict, list, tuple))
+
+
+def retry_after(response, now=None):
+    """Seconds to wait according to a response's Retry-After header, given
+    either as seconds or as an HTTP date, or None if it has none.
+    """
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = email.utils.parsedate_to_datetime(value).timestamp() - (now or time.time())
+        except (TypeError, ValueError):
+            return None
+    return min(max(seconds, 0.0), MAX_RETRY_AFTER)
+
+
+def _release_when_done(response, release):
+    """Call release() once, when a streamed response is closed, its body
+    has been read (urllib3 then releases the connection) or it is garbage
+    collected unread.
+    """
+    lock = threading.Lock()
+    done = []
+
+    def release_once(*args):
+        with lock:
+            if done:
+                return
+            done.append(True)
+        release()
+
+    def wrap(owner, name):
+        original = getattr(owner, name, None)
+        if original is None:
+            return
+
+        def wrapper(*args, **kwargs):
+            try:
+                return original(*args, **kwargs)
+            finally:
+                release_once()
+        setattr(owner, name, wrapper)
+
+    wrap(response, 'close')
+    wrap(response.raw, 'release_conn')
+    weakref.finalize(response, release_once)
+
+
+def _env_number(name, default, convert=float):
+    try:
+        return convert(os.environ[name])
+    except (KeyError, ValueError):
+        return default
+
+
+class EndpointLimit(object):
+    """Rate limit, in-flight cap and shared pause of one endpoint class.
+
+    Within max_in_flight, the number of requests let through at once is an
+    adaptive window: halved when the server throttles, and grown again by
+    one request per window's worth of successes, so the class settles at
+    the concurrency the server actually sustains.
+    """
+
+    def __init__(self, rate=None, max_in_flight=None, burst=None, clock=time.time,
+                 sleep=time.sleep):
+        self.limiter = RateLimiter(rate, burst, clock=clock, sleep=sleep)
+        self.max_in_flight = max_in_flight
+        self.window = float(max_in_flight) if max_in_flight else None
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self._condition = threading.Condition()
+
+    def enter(self):
+        """Wait for a free place in the window and take it.
+        """
+        with self._condition:
+            while self.window is not None and self.in_flight >= int(self.window):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def leave(self, succeeded=True):
+        with self._condition:
+            self.in_flight -= 1
+            if self.window is not None and succeeded:
+                self.window = min(float(self.max_in_flight), self.window + 1.0 / self.window)
+            self._condition.notify_all()
+
+    def throttle(self):
+        """Halve the window after the server pushed back.
+        """
+        with self._condition:
+            if self.window is not None:
+                self.window = max(1.0, self.window / 2.0)
+
+
+class Governor(object):
+    """Apply per-class limits and retries around a send function.
+    """
+
+    def __init__(self, limits=None, max_retries=DEFAULT_MAX_RETRIES, backoff=DEFAULT_BACKOFF,
+                 max_backoff=DEFAULT_MAX_BACKOFF, clock=time.time, sleep=time.sleep):
+        self.limits = dict((kind, EndpointLimit(max_in_flight=DEFAULT_MAX_IN_FLIGHT[kind],
+                                                clock=clock, sleep=sleep))
+                           for kind in DEFAULT_MAX_IN_FLIGHT)
+        self.limits.update(limits or {})
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.clock = clock
+        self.sleep = sleep
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+        self.throttled = 0
+
+    @classmethod
+    def from_env(cls):
+        """Build a Governor from the FABRIC_API_* limit variables.
+        """
+        limits = {}
+        for kind, name in ((READ, 'READS'), (WRITE, 'WRITES'), (UPLOAD, 'UPLOADS')):
+            limits[kind] = EndpointLimit(
+                rate=_env_number('FABRIC_API_{}_RATE'.format(kind.upper()), None),
+                max_in_flight=_env_number('FABRIC_API_MAX_{}'.format(name),
+                                          DEFAULT_MAX_IN_FLIGHT[kind], int) or None)
+        return cls(limits, max_retries=_env_number('FABRIC_API_MAX_RETRIES',
+                                                   DEFAULT_MAX_RETRIES, int))
+
+    def backoff_delay(self, attempt):
+        """Full-jitter exponential backoff for the given retry number.
+        """
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def _wait_for(self, limit):
+        while True:
+            delay = limit.paused_until - self.clock()
+            if delay <= 0:
+                break
+            # Spread the requests held by a pause over a short window after
+            # it, rather than releasing them all at the same instant
+            self.sleep(delay + random.uniform(0, self.backoff))
+        limit.limiter.acquire()
+
+    def _pause(self, limit, response, attempt):
+        """Hold back every request of limit's class after a 429 or 503, not
+        just the one throttled, shrinking its window once per pause. Returns
+        the pause and the server's Retry-After (None if it gave none).
+        """
+        with self._lock:
+            self.throttled += 1
+        server_delay = retry_after(response)
+        if server_delay is not None:
+            delay = server_delay + random.uniform(0, server_delay * 0.1)
+        else:
+            delay = self.backoff_delay(attempt)
+        now = self.clock()
+        if now >= limit.paused_until:
+            limit.throttle()
+        limit.paused_until = max(limit.paused_until, now + delay)
+        return delay, server_delay
+
+    def _retry_delay(self, method, limit, response, error, attempt, replayable):
+        """Seconds to wait before retrying, or None not to retry.
+        """
+        delay, server_delay = self.backoff_delay(attempt), None
+        if error is None and response.status_code in THROTTLE_STATUSES:
+            # Even a request that is not retried here pauses its class
+            delay, server_delay = self._pause(limit, response, attempt)
+        if attempt >= self.max_retries or not replayable:
+            return None
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+        if error is not None:
+            return delay if idempotent else None
+        status = response.status_code
+        if status not in RETRY_STATUSES:
+            return None
+        if not (idempotent or status == 429 or server_delay is not None):
+            return None
+        return delay
+
+    def call(self, send, method, url, retry=True, **kwargs):
+        """Send a request with send(method, url, **kwargs) under the limits
+        of its endpoint class, retrying it if that is safe and retry is
+        true. Returns the last response, or raises the last connection error.
+        """
+        has_body = kwargs.get('data') is not None or bool(kwargs.get('files'))
+        limit = self.limits[endpoint_class(method, url, has_body)]
+        replayable = retry and is_replayable(kwargs)
+        attempt = 0
+        while True:
+            self._wait_for(limit)
+            limit.enter()
+            response, error = None, None
+            try:
+                response = send(method, url, **kwargs)
+            except (ConnectionError, Timeout) as e:
+                error = e
+            finally:
+                succeeded = (response is not None and response.status_code < 500
+                             and response.status_code != 429)
+                if response is not None and kwargs.get('stream'):
+                    # The body is still to come; keep the place until it has
+                    _release_when_done(response, lambda ok=succeeded: limit.leave(ok))
+                else:
+                    limit.leave(succeeded)
+            with self._lock:
+                self.requests += 1
+            delay = self._retry_delay(method, limit, response, error, attempt, replayable)
+            if delay is None:
+                if error is not None:
+                    raise error
+                return response
+            if response is not None:
+                response.close()
+            with self._lock:
+                self.retries += 1
+            attempt += 1
+            self.sleep(delay)
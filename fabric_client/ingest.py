@@ -0,0 +1,294 @@
+"""Unattended ingestion of genomes written into a drop folder.
+
+DropFolder scans a directory for VCFs (.vcf, .vcf.gz, .vcf.bz2) that have
+been completely written: those with a sidecar <file name>.done marker, or,
+unless markers are required, those whose size and modification time have
+not changed for settle_seconds. Ingester polls a DropFolder every
+poll_interval seconds and uploads each ready file on a bounded pool of
+worker threads, with the genome attributes (label, sex, external id) taken
+from a manifest or a file name rule. Each uploaded file, and its marker,
+is then moved into an archive directory, and a line of JSON describing it
+is written to the output. A failed upload leaves the file where it is, to
+be retried retry_seconds later.
+
+With an UploadIndex, a file whose contents were already uploaded to the
+project (say, by a run killed before it could archive the file) is
+archived without being sent again.
+"""
+
+import csv
+import os
+import re
+import shutil
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import simplejson as json
+
+from fabric_client.session import FABRIC_API_URL
+from fabric_client.upload_index import upload_once
+from fabric_client.uploads import upload_file
+
+GENOME_FORMATS = ('vcf', 'vcf.gz', 'vcf.bz2')
+DONE_SUFFIX = '.done'
+DEFAULT_POLL_INTERVAL = 1.0
+DEFAULT_SETTLE_SECONDS = 5.0
+DEFAULT_RETRY_SECONDS = 60.0
+DEFAULT_WORKERS = 4
+
+
+def genome_format(file_name):
+    """Return the genome format of file_name ('vcf', 'vcf.gz' or
+    'vcf.bz2'), or None if it is not a genome file.
+    """
+    for format in sorted(GENOME_FORMATS, key=len, reverse=True):
+        if file_name.endswith('.' + format):
+            return format
+    return None
+
+
+def load_manifest(path):
+    """Read a manifest in the upload_genomes_folder_with_manifest.py layout
+    (filename, label, external_id, sex) into genome attributes by file name.
+    A missing manifest is empty.
+    """
+    if not os.path.exists(path):
+        return {}
+    manifest = {}
+    with open(path) as f:
+        reader = csv.reader(f)
+        next(reader, None)  # Skip the header
+        for row in reader:
+            if len(row) >= 4:
+                manifest[row[0]] = {'genome_label': row[1],
+                                    'external_id': row[2],
+                                    'genome_sex': row[3]}
+    return manifest
+
+
+class FilenameRule(object):
+    """Genome attributes from a file name, matched against pattern, a
+    regular expression whose named groups label, sex and external_id fill
+    in those attributes. By default the label is the file name without its
+    genome extension. Names the pattern does not match get no attributes.
+    """
+
+    def __init__(self, pattern=None, sex='unspecified'):
+        self.pattern = re.compile(pattern) if pattern else None
+        self.sex = sex
+
+    def __call__(self, file_name):
+        groups = {'label': file_name[:-len(genome_format(file_name)) - 1]}
+        if self.pattern is not None:
+            match = self.pattern.match(file_name)
+            if match is None:
+                return None
+            groups.update((name, value) for name, value in match.groupdict().items()
+                          if value is not None)
+        return {'genome_label': groups['label'][:100],
+                'external_id': groups.get('external_id', ''),
+                'genome_sex': groups.get('sex', self.sex)}
+
+
+class GenomeAttributes(object):
+    """Look up a file's attributes in the manifest at manifest_path, which
+    is re-read whenever it changes, then with rule. Returns None for a file
+    neither one describes (yet).
+    """
+
+    def __init__(self, manifest_path=None, rule=None):
+        self.manifest_path = manifest_path
+        self.rule = rule
+        self._manifest = {}
+        self._manifest_mtime = None
+
+    def __call__(self, file_name):
+        if self.manifest_path is not None:
+            mtime = (os.stat(self.manifest_path).st_mtime_ns
+                     if os.path.exists(self.manifest_path) else None)
+            if mtime != self._manifest_mtime:
+                self._manifest = load_manifest(self.manifest_path)
+                self._manifest_mtime = mtime
+            if file_name in self._manifest:
+                return self._manifest[file_name]
+        return self.rule(file_name) if self.rule is not None else None
+
+
+class DropFolder(object):
+    """The genome files in directory that are completely written.
+    """
+
+    def __init__(self, directory, settle_seconds=DEFAULT_SETTLE_SECONDS, require_done=False):
+        self.directory = directory
+        self.settle_seconds = settle_seconds
+        self.require_done = require_done
+        # file name -> ((size, mtime), time since which it has had that
+        # size and mtime)
+        self._seen = {}
+
+    def ready(self, now=None):
+        """Return the names of the genome files that are ready to upload.
+        """
+        now = now if now is not None else time.time()
+        names = set(os.listdir(self.directory))
+        ready = []
+        for name in sorted(names):
+            if genome_format(name) is None:
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                # Moved away since the listing
+                continue
+            if name + DONE_SUFFIX in names:
+                ready.append(name)
+                continue
+            if self.require_done:
+                continue
+            signature = (stat.st_size, stat.st_mtime_ns)
+            seen = self._seen.get(name)
+            if seen is None:
+                # A file already sitting there has been unchanged since it
+                # was last modified
+                seen = self._seen[name] = (signature, min(now, stat.st_mtime))
+            elif seen[0] != signature:
+                seen = self._seen[name] = (signature, now)
+            if now - seen[1] >= self.settle_seconds:
+                ready.append(name)
+        for name in list(self._seen):
+            if name not in names:
+                del self._seen[name]
+        return ready
+
+
+def archive_path(archive_dir, file_name):
+    """Where to archive file_name: archive_dir/file_name, or with a numeric
+    suffix if a file of that name was archived before.
+    """
+    path = os.path.join(archive_dir, file_name)
+    number = 1
+    while os.path.exists(path):
+        path = os.path.join(archive_dir, '{}.{}'.format(file_name, number))
+        number += 1
+    return path
+
+
+class Ingester(object):
+    """Upload the ready files of drop folder `folder` to project_id through
+    session, and archive them into archive_dir.
+
+    attributes(file_name) gives each file's genome attributes, or None to
+    leave it until it does. kwargs (such as auth) are passed on to every
+    upload request.
+    """
+
+    def __init__(self, session, project_id, folder, archive_dir, attributes,
+                 workers=DEFAULT_WORKERS, index=None, retry_seconds=DEFAULT_RETRY_SECONDS,
+                 base_url=FABRIC_API_URL, output=None, **kwargs):
+        self.session = session
+        self.project_id = project_id
+        self.folder = folder
+        self.archive_dir = archive_dir
+        self.attributes = attributes
+        self.workers = workers
+        self.index = index
+        self.retry_seconds = retry_seconds
+        self.base_url = base_url
+        self.output = output or sys.stdout
+        self.kwargs = kwargs
+        self.ingested = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+        self._in_flight = set()
+        self._retry_at = {}
+        if not os.path.isdir(archive_dir):
+            os.makedirs(archive_dir)
+
+    def _write(self, record):
+        with self._lock:
+            self.output.write(json.dumps(record) + '\n')
+            self.output.flush()
+
+    def ingest(self, file_name, attributes, ready_at):
+        """Upload one file and archive it. Returns the genome JSON object.
+        """
+        path = os.path.join(self.folder.directory, file_name)
+        url = '{}/projects/{}/genomes'.format(self.base_url, self.project_id)
+        params = {'genome_label': attributes['genome_label'],
+                  'genome_sex': attributes['genome_sex'],
+                  'external_id': attributes['external_id'],
+                  'assembly_version': 'hg19',
+                  'format': genome_format(file_name)}
+        stats = {}
+
+        def upload():
+            response, upload_stats = upload_file(self.session, 'PUT', url, path, params=params,
+                                                 **self.kwargs)
+            stats.update(upload_stats)
+            return response.json()
+
+        genome = upload_once(self.index, self.project_id, path, upload)
+        if genome.get('genome_id') is None:
+            raise IOError('Upload of {} failed: {}'.format(file_name, genome))
+        archived = archive_path(self.archive_dir, file_name)
+        shutil.move(path, archived)
+        if os.path.exists(path + DONE_SUFFIX):
+            shutil.move(path + DONE_SUFFIX, archived + DONE_SUFFIX)
+        self._write({'file_name': file_name,
+                     'genome_id': genome['genome_id'],
+                     'genome_label': attributes['genome_label'],
+                     'archived_as': archived,
+                     'uploaded': bool(stats),
+                     'mb_per_second': stats.get('mb_per_second'),
+                     'seconds_since_ready': round(time.time() - ready_at, 3)})
+        return genome
+
+    def _run_one(self, file_name, attributes, ready_at):
+        try:
+            self.ingest(file_name, attributes, ready_at)
+            with self._lock:
+                self.ingested += 1
+        except Exception as e:
+            sys.stderr.write('{}: {}; retrying in {:.0f}s\n'.format(file_name, e,
+                                                                    self.retry_seconds))
+            with self._lock:
+                self.failed += 1
+                self._retry_at[file_name] = time.time() + self.retry_seconds
+        finally:
+            with self._lock:
+                self._in_flight.discard(file_name)
+
+    def scan(self, executor):
+        """Submit every ready file not already uploading or waiting for a
+        retry to executor. Returns the number submitted.
+        """
+        now = time.time()
+        submitted = 0
+        for file_name in self.folder.ready(now):
+            with self._lock:
+                if file_name in self._in_flight or self._retry_at.get(file_name, 0) > now:
+                    continue
+            attributes = self.attributes(file_name)
+            if attributes is None:
+                continue
+            with self._lock:
+                self._in_flight.add(file_name)
+                self._retry_at.pop(file_name, None)
+            executor.submit(self._run_one, file_name, attributes, now)
+            submitted += 1
+        return submitted
+
+    def run(self, stop=None, poll_interval=DEFAULT_POLL_INTERVAL, once=False):
+        """Scan every poll_interval seconds until stop (a threading.Event) is
+        set, then wait for the uploads in progress. With once, return as
+        soon as the files ready at the first scan are done.
+        """
+        stop = stop or threading.Event()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            while not stop.is_set():
+                self.scan(executor)
+                if once:
+                    break
+                stop.wait(poll_interval)
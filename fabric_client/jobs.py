@@ -0,0 +1,167 @@
+"""Local tracking of submitted secondary-analysis jobs.
+
+JobStateFile keeps every job UUID submitted from this machine in a small
+JSON file, with the status history seen for each job, so a tracker can be
+stopped and restarted at any point. track_jobs() polls `/jobs` for all
+unfinished UUIDs with a StatusWatcher (per-job backoff, concurrent batches
+over the pooled session) and records each change. job_report() summarizes
+throughput and time spent in each status, to show where jobs stall. Status
+times are when a change was first seen, so they are accurate to within one
+polling interval.
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+
+from fabric_client.session import FABRIC_API_URL
+from fabric_client.watch import StatusWatcher
+
+DEFAULT_STATE_FILE = 'jobs_state.json'
+DEFAULT_TERMINAL_STATUSES = ('COMPLETED', 'FAILED', 'CANCELLED')
+
+
+class JobStateFile(object):
+    """JSON file of tracked jobs, keyed by UUID, rewritten atomically.
+    """
+
+    def __init__(self, path=DEFAULT_STATE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self.jobs = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.jobs = json.load(f).get('jobs', {})
+
+    def save(self):
+        """Write the state to a temporary file and rename it into place, so
+        a crash never leaves a half-written state file.
+        """
+        with self._lock:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.jobs_state_')
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump({'jobs': self.jobs}, f, indent=2, sort_keys=True)
+                os.replace(temp_path, self.path)
+            except Exception:
+                os.remove(temp_path)
+                raise
+
+    def add(self, uuid, accession_id=None, submitted_at=None):
+        """Start tracking a newly submitted job.
+        """
+        with self._lock:
+            self.jobs[uuid] = {'accession_id': accession_id,
+                               'submitted_at': submitted_at or time.time(),
+                               'status': None,
+                               'history': []}
+
+    def record(self, uuid, status, seen_at=None):
+        """Record the status seen for a job, if it differs from the last one.
+        """
+        with self._lock:
+            job = self.jobs[uuid]
+            if status != job['status']:
+                job['status'] = status
+                job['history'].append([status, seen_at or time.time()])
+
+    def pending(self, terminal_statuses=DEFAULT_TERMINAL_STATUSES):
+        """UUIDs of jobs not yet in a terminal status, oldest first.
+        """
+        return sorted((uuid for uuid, job in self.jobs.items()
+                       if job['status'] not in terminal_statuses),
+                      key=lambda uuid: self.jobs[uuid]['submitted_at'])
+
+
+def job_status(payload):
+    """Return the status in a `/jobs?uuid=` response, which may be the job
+    itself, a list holding it, or a page of results.
+    """
+    if isinstance(payload, dict) and 'objects' in payload:
+        payload = payload['objects']
+    if isinstance(payload, list):
+        if not payload:
+            raise ValueError("Job not found")
+        payload = payload[0]
+    try:
+        return payload['status']
+    except KeyError:
+        raise ValueError(payload.get('description') or "No status in job response")
+
+
+def fetch_job_status(session, uuid, base_url=FABRIC_API_URL, **kwargs):
+    """Look up one job's status through session.
+    """
+    result = session.get("{}/jobs".format(base_url), params={'uuid': uuid}, **kwargs)
+    result.raise_for_status()
+    return job_status(result.json())
+
+
+def track_jobs(state, fetch_status, terminal_statuses=DEFAULT_TERMINAL_STATUSES,
+               on_change=None, timeout=None, **watcher_options):
+    """Poll every pending job in state until it finishes, saving each change
+    to the state file. Returns the StatusWatcher used, for its request count.
+    """
+    def record_change(uuid, old_status, new_status):
+        state.record(uuid, new_status)
+        state.save()
+        if on_change:
+            on_change(uuid, old_status, new_status)
+
+    watcher = StatusWatcher(fetch_status, terminal_statuses, on_change=record_change,
+                            **watcher_options)
+    pending = state.pending(terminal_statuses)
+    # Seed the watcher with the statuses already on file, so a restarted
+    # tracker only reports real changes
+    watcher.watch(pending, timeout=timeout,
+                  initial=dict((uuid, state.jobs[uuid]['status']) for uuid in pending))
+    return watcher
+
+
+def time_in_states(job, now=None):
+    """Return seconds spent in each status by one job. The current status of
+    an unfinished job counts up to now.
+    """
+    now = now or time.time()
+    history = job['history']
+    spent = {}
+    for index, (status, since) in enumerate(history):
+        until = history[index + 1][1] if index + 1 < len(history) else now
+        spent[status] = spent.get(status, 0.0) + max(0.0, until - since)
+    return spent
+
+
+def job_report(state, terminal_statuses=DEFAULT_TERMINAL_STATUSES, now=None):
+    """Summarize the tracked jobs: counts by status, throughput of finished
+    jobs per hour, and mean and max time spent in each non-terminal status.
+    """
+    now = now or time.time()
+    jobs = list(state.jobs.values())
+    by_status = {}
+    durations = {}
+    finished_at = []
+    for job in jobs:
+        by_status[job['status']] = by_status.get(job['status'], 0) + 1
+        if job['status'] in terminal_statuses and job['history']:
+            finished_at.append(job['history'][-1][1])
+        for status, seconds in time_in_states(job, now).items():
+            if status not in terminal_statuses:
+                durations.setdefault(status, []).append(seconds)
+
+    report = {'jobs': len(jobs),
+              'by_status': by_status,
+              'finished': len(finished_at),
+              'throughput_per_hour': None,
+              'time_in_state': {}}
+    if finished_at:
+        started = min(job['submitted_at'] for job in jobs)
+        hours = max(max(finished_at) - started, 1.0) / 3600.0
+        report['throughput_per_hour'] = round(len(finished_at) / hours, 2)
+    for status, seconds in durations.items():
+        report['time_in_state'][status] = {'jobs': len(seconds),
+                                           'mean_seconds': round(sum(seconds) / len(seconds), 1),
+                                           'max_seconds': round(max(seconds), 1)}
+    return report
@@ -0,0 +1,149 @@
+"""Incremental parsing of large JSON variant listings.
+
+Report and analysis endpoints return every variant in one JSON document,
+either as a bare list or as an object holding the list under `variants` or
+`objects`. iter_json_items() decodes that list one element at a time from the
+raw response chunks, so only the element being decoded (plus one network
+chunk) is held in memory, however many variants the report has.
+"""
+
+import codecs
+import json
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+DEFAULT_KEYS = ('variants', 'objects')
+
+_WHITESPACE = ' \t\n\r'
+
+
+class _Buffer(object):
+    """Rolling text buffer over an iterable of byte (or text) chunks.
+    """
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.text = ''
+        self.pos = 0
+        self.exhausted = False
+
+    def fill(self):
+        """Append the next chunk, dropping text already consumed. Returns
+        False once the chunks are exhausted.
+        """
+        if self.exhausted:
+            return False
+        for chunk in self.chunks:
+            if isinstance(chunk, bytes):
+                chunk = self.decoder.decode(chunk)
+            if chunk:
+                self.text = self.text[self.pos:] + chunk
+                self.pos = 0
+                return True
+        self.exhausted = True
+        tail = self.decoder.decode(b'', final=True)
+        if tail:
+            self.text = self.text[self.pos:] + tail
+            self.pos = 0
+        return False
+
+    def peek(self):
+        """Skip whitespace and return the next character, or '' at the end.
+        """
+        while True:
+            text = self.text
+            pos = self.pos
+            while pos < len(text) and text[pos] in _WHITESPACE:
+                pos += 1
+            self.pos = pos
+            if pos < len(text):
+                return text[pos]
+            if not self.fill():
+                return ''
+
+    def expect(self, chars):
+        char = self.peek()
+        if char not in chars:
+            raise ValueError("Expected one of {!r} at offset {}, found {!r}".format(
+                chars, self.pos, char or 'end of input'))
+        self.pos += 1
+        return char
+
+    def decode_value(self, decoder):
+        """Decode the complete JSON value starting at the next character.
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = decoder.raw_decode(self.text, self.pos)
+            except ValueError:
+                if self.fill():
+                    continue
+                raise
+            # A number running to the end of the buffer may continue in the
+            # next chunk, so only trust a value followed by more input
+            if end == len(self.text) and self.fill():
+                continue
+            self.pos = end
+            return value
+
+
+def _find_array(buffer, decoder, keys):
+    """Position buffer just inside the item list. Returns False when the
+    document holds no such list.
+    """
+    char = buffer.expect('[{')
+    if char == '[':
+        return True
+    if buffer.peek() == '}':
+        return False
+    while True:
+        key = buffer.decode_value(decoder)
+        buffer.expect(':')
+        if key in keys and buffer.peek() == '[':
+            buffer.pos += 1
+            return True
+        # Other envelope values (counts, metadata) are small, decode and drop
+        buffer.decode_value(decoder)
+        if buffer.expect(',}') == '}':
+            return False
+
+
+def iter_json_items(chunks, keys=DEFAULT_KEYS):
+    """Yield the elements of the variant list in a JSON document delivered
+    as an iterable of chunks. The list is either the whole document or the
+    value of the first top-level key in keys.
+    """
+    buffer = _Buffer(chunks)
+    decoder = json.JSONDecoder()
+    if not _find_array(buffer, decoder, keys):
+        return
+    if buffer.peek() == ']':
+        return
+    while True:
+        yield buffer.decode_value(decoder)
+        if buffer.expect(',]') == ']':
+            return
+
+
+def iter_response_items(response, keys=DEFAULT_KEYS, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield the variants of a streamed requests response (one made with
+    stream=True) without reading the whole body into memory.
+    """
+    try:
+        for item in iter_json_items(response.iter_content(chunk_size), keys=keys):
+            yield item
+    finally:
+        response.close()
+
+
+def write_ndjson(items, stream, dumps=json.dumps):
+    """Write each item to stream as one line of JSON. Returns the number of
+    items written.
+    """
+    count = 0
+    for item in items:
+        stream.write(dumps(item))
+        stream.write('\n')
+        count += 1
+    return count
@@ -0,0 +1,95 @@
+"""Streaming multipart/form-data bodies for genome uploads.
+
+requests builds the whole multipart body in memory before sending it.
+MultipartEncoder instead yields the body piece by piece, reading the file
+as it goes, so memory use is the reader's buffer whatever the file size.
+Form fields that depend on the file contents (such as a checksum computed
+during the upload) can be written after the file part; as long as their
+sizes are known in advance, so is the length of the whole body, and it is
+sent with a Content-Length rather than chunked.
+"""
+
+import hashlib
+import os
+import uuid
+
+from fabric_client.checksum import HashingReader
+
+
+def _field_part(boundary, name, value):
+    return ('--{}\r\nContent-Disposition: form-data; name="{}"\r\n\r\n{}\r\n'
+            .format(boundary, name, value).encode('utf-8'))
+
+
+class MultipartEncoder(object):
+    """A form with `fields`, one file part read from `reader`, then the
+    fields returned by calling trailing_fields() once the file has been
+    read, produced block by block as it is iterated.
+
+    `len` is the body's length in bytes, which requests sends as the
+    Content-Length. It is known when the reader has a len() and
+    trailing_sizes gives the length of each trailing field's value;
+    otherwise it is None and the body is sent chunked.
+    """
+
+    def __init__(self, fields, file_field, file_name, reader, trailing_fields=None,
+                 trailing_sizes=None):
+        self.boundary = uuid.uuid4().hex
+        self.content_type = 'multipart/form-data; boundary={}'.format(self.boundary)
+        self.reader = reader
+        self.trailing_fields = trailing_fields
+        self._head = b''.join(
+            [_field_part(self.boundary, name, value) for name, value in fields.items()] +
+            [('--{}\r\nContent-Disposition: form-data; name="{}"; filename="{}"\r\n'
+              'Content-Type: application/octet-stream\r\n\r\n'
+              .format(self.boundary, file_field, os.path.basename(file_name)).encode('utf-8'))])
+        self._file_size = len(reader) if hasattr(reader, '__len__') else None
+        self._tail_size = None
+        if trailing_fields is None:
+            self._tail_size = len(self._tail({}))
+        elif trailing_sizes is not None:
+            self._tail_size = len(self._tail(dict((name, ' ' * size) for name, size
+                                                  in trailing_sizes.items())))
+        self.len = None
+        if self._file_size is not None and self._tail_size is not None:
+            self.len = len(self._head) + self._file_size + self._tail_size
+
+    def _tail(self, trailing):
+        return b''.join([b'\r\n'] +
+                        [_field_part(self.boundary, name, value)
+                         for name, value in trailing.items()] +
+                        ['--{}--\r\n'.format(self.boundary).encode('utf-8')])
+
+    def __iter__(self):
+        yield self._head
+        sent = 0
+        for block in self.reader:
+            sent += len(block)
+            yield block
+        tail = self._tail(self.trailing_fields() if self.trailing_fields else {})
+        # A Content-Length already sent cannot be taken back
+        if self.len is not None and (sent != self._file_size or len(tail) != self._tail_size):
+            raise IOError('Multipart body for {} changed length while it was sent'
+                          .format(self.boundary))
+        yield tail
+
+
+def multipart_stream(fields, file_field, file_name, reader, trailing_fields=None,
+                     trailing_sizes=None):
+    """Return (content_type, body) for a MultipartEncoder with these
+    arguments, for passing to requests as the Content-Type header and data.
+    """
+    body = MultipartEncoder(fields, file_field, file_name, reader, trailing_fields,
+                            trailing_sizes)
+    return body.content_type, body
+
+
+def hashing_multipart_stream(fields, file_field, file_name, file_handle,
+                             checksum_field='checksum', algorithm='md5'):
+    """multipart_stream() whose last field carries the checksum of the file,
+    computed while the file part is streamed.
+    """
+    reader = HashingReader(file_handle, algorithms=(algorithm,))
+    return multipart_stream(fields, file_field, file_name, reader,
+                            trailing_fields=lambda: {checksum_field: reader.hexdigest(algorithm)},
+                            trailing_sizes={checksum_field: hashlib.new(algorithm).digest_size * 2})
@@ -0,0 +1,102 @@
+"""Lazy iteration over offset/limit paginated endpoints, with prefetching.
+
+iter_pages() walks an endpoint page by page. While the caller works through
+one page, the next `prefetch` pages are already being fetched on background
+threads, so the caller rarely waits on the network. At most prefetch + 1
+pages are held at any time, however large the listing is.
+
+A page shorter than the limit asked for does not end the listing, since the
+server may cap the page size: the walk ends on an empty page, or once the
+listing's meta (total_count or next, see page_items()) says it is complete.
+"""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_PAGE_SIZE = 1000
+DEFAULT_PREFETCH = 2
+
+
+class Page(list):
+    """The items of one page, with what the server said about the whole
+    listing: total (its meta.total_count) and has_next (whether its meta.next
+    names another page), each None when the server did not say.
+    """
+    total = None
+    has_next = None
+
+
+def page_items(payload, key='objects'):
+    """Return the list of items in one page of JSON results, which the API
+    returns either as a bare list or as a dict holding the list under key,
+    as a Page carrying the listing's meta.
+    """
+    if isinstance(payload, list):
+        return Page(payload)
+    page = Page(payload.get(key) or [])
+    meta = payload.get('meta') or {}
+    if isinstance(meta.get('total_count'), int):
+        page.total = meta['total_count']
+    if 'next' in meta:
+        page.has_next = bool(meta['next'])
+    return page
+
+
+def _is_last(page, end):
+    """Whether page, ending at offset end, is the last by its meta.
+    """
+    total = getattr(page, 'total', None)
+    if total is not None and end >= total:
+        return True
+    return getattr(page, 'has_next', None) is False
+
+
+def iter_pages(fetch_page, page_size=DEFAULT_PAGE_SIZE, offset=0, prefetch=DEFAULT_PREFETCH):
+    """Yield the lists of items returned by fetch_page(offset, limit) for
+    successive offsets, stopping on an empty page or a page its meta marks
+    as the last. After a short page the walk goes on from just past it,
+    asking for pages of the size the server returned.
+    """
+    executor = ThreadPoolExecutor(max_workers=prefetch) if prefetch >= 1 else None
+    pending = deque()
+    next_offset = offset
+    limit = page_size
+    try:
+        while True:
+            # Keep the current page and the next `prefetch` pages in flight
+            while len(pending) < max(prefetch, 0) + 1:
+                future = (executor.submit(fetch_page, next_offset, limit)
+                          if executor is not None else None)
+                pending.append((next_offset, limit, future))
+                next_offset += limit
+            page_offset, page_limit, future = pending.popleft()
+            page = future.result() if future is not None else fetch_page(page_offset, page_limit)
+            if not page:
+                return
+            yield page
+            end = page_offset + len(page)
+            if _is_last(page, end):
+                return
+            if len(page) < page_limit:
+                # The server returns at most len(page) items a page; the
+                # pages already asked for would leave gaps
+                for _, _, stale in pending:
+                    if stale is not None:
+                        stale.cancel()
+                pending.clear()
+                limit = len(page)
+                next_offset = end
+    finally:
+        for _, _, future in pending:
+            if future is not None:
+                future.cancel()
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+
+def iter_items(fetch_page, page_size=DEFAULT_PAGE_SIZE, offset=0, prefetch=DEFAULT_PREFETCH):
+    """Yield every item across all pages, one at a time.
+    """
+    for page in iter_pages(fetch_page, page_size=page_size, offset=offset, prefetch=prefetch):
+        for item in page:
+            yield item
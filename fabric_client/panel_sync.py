@@ -0,0 +1,227 @@
+"""Sync a catalog of panel definitions to the workspace's panels.
+
+A catalog is a directory of JSON files, one per panel:
+
+    {"name": "Cardio", "test_code": "CARDIO-1", "description": "...",
+     "gene_symbols": ["MYH7", "MYBPC3", "TNNT2"]}
+
+methodology, limitations and fda_disclosure may also be given. Definitions
+are matched to existing panels by test_code, or by name when a definition
+has none. sync_panels() lists `/panels/` once, diffs every definition
+against it locally, and then creates, edits and adds genes to only the
+panels that differ, concurrently, so running it twice changes nothing the
+second time.
+
+The panel listing does not include genes, so a state file in the catalog
+directory records a digest of the gene list last applied to each panel.
+Panels whose genes match their digest need no further request; the others
+have their regions fetched and only the missing genes added, in chunks.
+Genes are only ever added: genes on a panel but not in its definition are
+reported, never removed.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+
+from fabric_client.bulk import DEFAULT_WORKERS, bulk_apply
+from fabric_client.pagination import iter_items, page_items
+from fabric_client.session import FABRIC_API_URL
+
+PANEL_FIELDS = ('name', 'description', 'methodology', 'limitations', 'fda_disclosure',
+                'test_code')
+STATE_FILE_NAME = '.panel_sync.json'
+# Gene symbols sent per request when adding genes to a panel
+GENE_CHUNK_SIZE = 500
+LISTING_PAGE_SIZE = 1000
+
+
+def normalize_genes(gene_symbols):
+    """Sorted, de-duplicated, upper-case gene symbols, from a list or a
+    comma-separated string.
+    """
+    if isinstance(gene_symbols, str):
+        gene_symbols = gene_symbols.split(',')
+    return sorted(set(gene.strip().upper() for gene in gene_symbols or [] if gene.strip()))
+
+
+def gene_digest(gene_symbols):
+    return hashlib.sha1(','.join(normalize_genes(gene_symbols)).encode('utf-8')).hexdigest()
+
+
+def panel_key(panel):
+    """Identity of a panel for matching: its test code, else its name.
+    """
+    if panel.get('test_code'):
+        return 'test_code', panel['test_code']
+    return 'name', panel.get('name')
+
+
+def load_panel_definitions(directory):
+    """Read every *.json panel definition in directory, sorted by file name.
+    """
+    definitions = []
+    keys = {}
+    for file_name in sorted(os.listdir(directory)):
+        if not file_name.endswith('.json') or file_name.startswith('.'):
+            continue
+        with open(os.path.join(directory, file_name)) as f:
+            definition = json.load(f)
+        if not definition.get('name'):
+            raise ValueError("{}: panel definitions need a name".format(file_name))
+        key = panel_key(definition)
+        if key in keys:
+            raise ValueError("{}: same {} as {}".format(file_name, key[0], keys[key]))
+        keys[key] = file_name
+        definition['gene_symbols'] = normalize_genes(definition.get('gene_symbols'))
+        definition['file_name'] = file_name
+        definitions.append(definition)
+    return definitions
+
+
+class PanelSyncState(object):
+    """Digest of the gene list last applied to each panel, by panel id.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.digests = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.digests = json.load(f)
+
+    def matches(self, panel_id, gene_symbols):
+        return self.digests.get(str(panel_id)) == gene_digest(gene_symbols)
+
+    def record(self, panel_id, gene_symbols):
+        self.digests[str(panel_id)] = gene_digest(gene_symbols)
+
+    def save(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=STATE_FILE_NAME + '.')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(self.digests, f, indent=2, sort_keys=True)
+            os.replace(temp_path, self.path)
+        except Exception:
+            os.remove(temp_path)
+            raise
+
+
+def list_panels(session, base_url=FABRIC_API_URL, **kwargs):
+    """Return every panel in the workspace. One request for catalogs of up
+    to LISTING_PAGE_SIZE panels.
+    """
+    url = "{}/panels/".format(base_url)
+
+    def fetch_page(offset, limit):
+        result = session.get(url, params={'offset': offset, 'limit': limit}, **kwargs)
+        result.raise_for_status()
+        return page_items(result.json())
+
+    return list(iter_items(fetch_page, page_size=LISTING_PAGE_SIZE, prefetch=0))
+
+
+def plan_panel_sync(definitions, panels, state):
+    """Diff definitions against the listed panels. Returns one change per
+    definition that needs any request: a dict with the definition, the
+    existing panel (None to create it), the metadata fields that differ,
+    and whether its genes must be checked.
+    """
+    existing = {}
+    for panel in panels:
+        existing.setdefault(panel_key(panel), panel)
+    changes = []
+    for definition in definitions:
+        panel = existing.get(panel_key(definition))
+        if panel is None:
+            changes.append({'definition': definition, 'panel': None,
+                            'fields': [field for field in PANEL_FIELDS if definition.get(field)],
+                            'check_genes': bool(definition['gene_symbols'])})
+            continue
+        fields = [field for field in PANEL_FIELDS
+                  if field in definition and definition[field] != panel.get(field)]
+        if 'gene_symbols' in panel:
+            check_genes = normalize_genes(panel['gene_symbols']) != definition['gene_symbols']
+        else:
+            check_genes = not state.matches(panel['id'], definition['gene_symbols'])
+        if fields or check_genes:
+            changes.append({'definition': definition, 'panel': panel, 'fields': fields,
+                            'check_genes': check_genes})
+    return changes
+
+
+def panel_gene_symbols(payload):
+    """Gene symbols in a `/panels/<id>/regions` response.
+    """
+    if isinstance(payload, dict) and 'gene_symbols' in payload:
+        return normalize_genes(payload['gene_symbols'])
+    return normalize_genes(region.get('gene_symbol') for region in page_items(payload)
+                           if isinstance(region, dict) and region.get('gene_symbol'))
+
+
+def apply_panel_change(session, change, base_url=FABRIC_API_URL, **kwargs):
+    """Make the requests for one planned change. Returns a dict with the
+    panel id, what was done, and the genes added and left over.
+    """
+    definition = change['definition']
+    panel = change['panel']
+    payload = dict((field, (panel or {}).get(field)) for field in PANEL_FIELDS)
+    payload.update((field, definition[field]) for field in PANEL_FIELDS if field in definition)
+    outcome = {'panel_id': panel and panel['id'], 'action': None, 'genes_added': 0,
+               'extra_genes': []}
+
+    if panel is None:
+        result = session.post("{}/panels/".format(base_url), data=json.dumps(payload), **kwargs)
+        result.raise_for_status()
+        outcome['panel_id'] = result.json()['id']
+        outcome['action'] = 'created'
+    elif change['fields']:
+        result = session.put("{}/panels/{}".format(base_url, panel['id']),
+                             data=json.dumps(payload), **kwargs)
+        result.raise_for_status()
+        outcome['action'] = 'updated'
+
+    if change['check_genes']:
+        url = "{}/panels/{}/regions".format(base_url, outcome['panel_id'])
+        present = []
+        if panel is not None:
+            result = session.get(url, **kwargs)
+            result.raise_for_status()
+            present = panel_gene_symbols(result.json())
+        missing = sorted(set(definition['gene_symbols']) - set(present))
+        for start in range(0, len(missing), GENE_CHUNK_SIZE):
+            chunk = missing[start:start + GENE_CHUNK_SIZE]
+            result = session.post(url, data=json.dumps({'gene_symbols': ','.join(chunk)}),
+                                  **kwargs)
+            result.raise_for_status()
+        outcome['genes_added'] = len(missing)
+        outcome['extra_genes'] = sorted(set(present) - set(definition['gene_symbols']))
+        outcome['action'] = outcome['action'] or ('genes added' if missing else 'genes checked')
+    return outcome
+
+
+def sync_panels(session, definitions, state, base_url=FABRIC_API_URL, workers=DEFAULT_WORKERS,
+                rate=None, dry_run=False, on_result=None, **kwargs):
+    """Bring the workspace's panels in line with definitions. Returns the
+    planned changes and the BulkSummary of applying them (None on a dry
+    run). on_result(change, outcome, error) is called as each change is
+    applied. The state file is saved when done.
+    """
+    changes = plan_panel_sync(definitions, list_panels(session, base_url, **kwargs), state)
+    if dry_run or not changes:
+        return changes, None
+
+    def record(change, outcome, error):
+        if error is None and change['check_genes']:
+            state.record(outcome['panel_id'], change['definition']['gene_symbols'])
+        if on_result:
+            on_result(change, outcome, error)
+
+    try:
+        summary = bulk_apply(lambda change: apply_panel_change(session, change, base_url, **kwargs),
+                             changes, workers=workers, rate=rate, on_result=record)
+    finally:
+        state.save()
+    return changes, summary
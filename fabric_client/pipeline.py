@@ -0,0 +1,101 @@
+"""Compress a plain VCF to BGZF while it is being uploaded.
+
+BgzfPipeline is a request body that runs three overlapping stages:
+
+    read        a thread reads the file in batches of BGZF-sized blocks
+    compress    a pool of threads turns each batch into BGZF blocks (zlib
+                releases the GIL, so the threads compress in parallel)
+    send        the thread sending the request takes the compressed
+                batches, in file order, as the body's chunks
+
+The stages are joined by a queue holding at most queue_size batches that
+have been read but not yet sent, so however large the file and however
+slow the network or the compression, memory use is capped at roughly
+(queue_size + 2) batches. The output is a valid bgzip file, ending with the
+BGZF end-of-file block. Its length is not known up front, so it is sent
+chunked.
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fabric_client.bgzf import BLOCK_SIZE, DEFAULT_LEVEL, EOF_BLOCK, compress_block
+
+# About 1 MB of input per batch
+DEFAULT_BATCH_BLOCKS = 16
+
+
+def compress_batch(data, level=DEFAULT_LEVEL):
+    """Return data as consecutive BGZF blocks.
+    """
+    view = memoryview(data)
+    return b''.join(compress_block(view[start:start + BLOCK_SIZE], level)
+                    for start in range(0, len(data), BLOCK_SIZE))
+
+
+class BgzfPipeline(object):
+    """Iterable request body: file_handle, read from its current position,
+    BGZF-compressed by `workers` threads (by default one per CPU).
+
+    After the upload, bytes_in and bytes_out hold the file bytes read and
+    compressed bytes sent, and compress_wait the seconds the sender spent
+    waiting for compression rather than sending.
+    """
+
+    def __init__(self, file_handle, workers=None, level=DEFAULT_LEVEL,
+                 batch_blocks=DEFAULT_BATCH_BLOCKS, queue_size=None):
+        self.file_handle = file_handle
+        self.workers = workers or os.cpu_count() or 1
+        self.level = level
+        self.batch_size = batch_blocks * BLOCK_SIZE
+        self.queue_size = queue_size or 2 * self.workers
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.compress_wait = 0.0
+
+    def _read(self, executor, batches, stop):
+        try:
+            while not stop.is_set():
+                data = self.file_handle.read(self.batch_size)
+                if not data:
+                    break
+                self.bytes_in += len(data)
+                batches.put(executor.submit(compress_batch, data, self.level))
+            batches.put(None)
+        except Exception as e:
+            batches.put(e)
+
+    def __iter__(self):
+        batches = queue.Queue(self.queue_size)
+        stop = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+        reader = threading.Thread(target=self._read, args=(executor, batches, stop))
+        reader.daemon = True
+        reader.start()
+        try:
+            while True:
+                batch = batches.get()
+                if batch is None:
+                    break
+                if isinstance(batch, Exception):
+                    raise batch
+                start = time.time()
+                compressed = batch.result()
+                self.compress_wait += time.time() - start
+                self.bytes_out += len(compressed)
+                yield compressed
+            self.bytes_out += len(EOF_BLOCK)
+            yield EOF_BLOCK
+        finally:
+            # The upload may have stopped early; free a reader blocked on
+            # a full queue so that it sees stop and exits
+            stop.set()
+            while reader.is_alive():
+                try:
+                    batches.get_nowait()
+                except queue.Empty:
+                    reader.join(0.05)
+            executor.shutdown(wait=False, cancel_futures=True)
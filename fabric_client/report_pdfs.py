@@ -0,0 +1,124 @@
+"""Bulk export of clinical report PDFs.
+
+export_report_pdfs() downloads many reports' PDFs concurrently over the
+pooled session, streaming each to disk with save_response() as
+<report id>_<file name from Content-Disposition>. A manifest in the output
+directory records the report version each PDF was made from, so a later
+export skips every report whose version has not changed.
+"""
+
+import json
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from fabric_client.downloads import DEFAULT_CHUNK_SIZE, content_disposition_filename, save_response
+from fabric_client.session import FABRIC_API_URL
+
+MANIFEST_NAME = '.pdf_manifest.json'
+# Save the manifest after this many downloads, so an interrupted run keeps its progress
+MANIFEST_SAVE_EVERY = 50
+DEFAULT_WORKERS = 8
+
+
+class PdfManifest(object):
+    """Record of the report version behind each exported PDF.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = os.path.join(directory, MANIFEST_NAME)
+        self._lock = threading.Lock()
+        self.entries = {}
+        self.unsaved = 0
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                self.entries = json.load(f)
+
+    def is_current(self, report_id, version, kind):
+        """Whether the PDF on disk was made from this version of the report.
+        """
+        entry = self.entries.get(str(report_id))
+        return (entry is not None and entry['version'] == version and entry['kind'] == kind
+                and os.path.exists(os.path.join(self.directory, entry['file_name'])))
+
+    def record(self, report_id, version, kind, file_name, size):
+        with self._lock:
+            self.entries[str(report_id)] = {'version': version, 'kind': kind,
+                                            'file_name': file_name, 'bytes': size}
+            self.unsaved += 1
+            if self.unsaved >= MANIFEST_SAVE_EVERY:
+                self._save()
+
+    def save(self):
+        with self._lock:
+            self._save()
+
+    def _save(self):
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix=MANIFEST_NAME + '.')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(self.entries, f, indent=2, sort_keys=True)
+            os.replace(temp_path, self.path)
+        except Exception:
+            os.remove(temp_path)
+            raise
+        self.unsaved = 0
+
+
+def export_report_pdf(session, report, directory, manifest, base_url=FABRIC_API_URL,
+                      preview=False, force=False, chunk_size=DEFAULT_CHUNK_SIZE, **kwargs):
+    """Download one report's PDF into directory unless the manifest shows it
+    is current. report is the report's JSON, or any dict with its id (and
+    version, without which it is always downloaded). Returns (report id,
+    outcome, bytes written), where outcome is downloaded, skipped or
+    failed: <reason>.
+    """
+    report_id = report['id']
+    version = report.get('version')
+    kind = 'preview' if preview else 'approved'
+    if not force and version is not None and manifest.is_current(report_id, version, kind):
+        return report_id, 'skipped', 0
+
+    url = "{}/reports/{}/{}".format(base_url, report_id,
+                                    'pdf_preview' if preview else 'pdf_report')
+    response = session.get(url, stream=True, **kwargs)
+    if response.status_code != 200:
+        response.close()
+        return report_id, 'failed: HTTP {}'.format(response.status_code), 0
+
+    # Reports can share a Content-Disposition file name, so the id keeps them apart
+    file_name = '{}_{}'.format(report_id,
+                               content_disposition_filename(response, 'report.pdf'))
+    size = save_response(response, os.path.join(directory, file_name), chunk_size=chunk_size)
+    manifest.record(report_id, version, kind, file_name, size)
+    return report_id, 'downloaded', size
+
+
+def export_report_pdfs(session, reports, directory, workers=DEFAULT_WORKERS, on_result=None,
+                       **kwargs):
+    """Export the PDFs of reports concurrently, passing each (report id,
+    outcome, bytes) to on_result as it completes, in order. Returns the list
+    of results. Other keyword arguments go to export_report_pdf().
+    """
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    manifest = PdfManifest(directory)
+
+    def export(report):
+        try:
+            return export_report_pdf(session, report, directory, manifest, **kwargs)
+        except Exception as e:
+            return report['id'], 'failed: {}'.format(e), 0
+
+    results = []
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for result in executor.map(export, reports):
+                if on_result:
+                    on_result(*result)
+                results.append(result)
+    finally:
+        manifest.save()
+    return results
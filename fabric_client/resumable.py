@@ -0,0 +1,214 @@
+"""Resumable, chunked genome uploads backed by an on-disk journal.
+
+The file is sent as a series of PUT requests to the same upload URL, each
+carrying one fixed-size chunk and a Content-Range header. The server answers
+308 with a Range header while the upload is incomplete and 200/201 with the
+genome JSON once the last chunk lands; this is the same protocol used by
+common resumable-upload services.
+
+Every chunk the server acknowledges is appended to a journal file and
+fsynced, so a re-run after a crash or a dropped connection picks up from the
+last acknowledged offset instead of re-sending the whole VCF.
+
+If checksum_algorithm is given, the file's digest is computed from the chunks
+as they are read and sent as the checksum parameter of the final chunk.
+
+Chunks are sent with the session governor's retries turned off (see
+governor.py): a failed or throttled chunk is retried here, after asking the
+server how much of it arrived, so a chunk is never attempted more than
+max_retries + 1 times.
+"""
+
+import hashlib
+import json
+import os
+import random
+import time
+import uuid
+
+import requests
+
+from fabric_client.checksum import update_from_file
+from fabric_client.governor import retry_after
+
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+RESUME_INCOMPLETE = 308
+TOO_MANY_REQUESTS = 429
+
+
+class UploadInterrupted(Exception):
+    """Raised when a chunk still fails after all retries. The journal keeps
+    the acknowledged offset, so the upload can be resumed by running it again.
+    """
+
+    def __init__(self, message, offset):
+        super(UploadInterrupted, self).__init__(message)
+        self.offset = offset
+
+
+class UploadJournal(object):
+    """Append-only record of the chunks the server has acknowledged.
+
+    The first line describes the upload (file, size, modification time,
+    chunk size, url, upload id); each following line is one acknowledged
+    chunk. If the file or settings no longer match, the journal is discarded
+    and the upload starts again from zero.
+    """
+
+    def __init__(self, path, file_name, url, chunk_size):
+        stat = os.stat(file_name)
+        self.path = path
+        self.header = {'file_name': os.path.abspath(file_name),
+                       'size': stat.st_size,
+                       'mtime': stat.st_mtime,
+                       'chunk_size': chunk_size,
+                       'url': url}
+        self.upload_id = None
+        self.offset = 0
+
+    def load(self):
+        """Read an existing journal, or start a new one. Returns the offset
+        of the first byte the server has not acknowledged.
+        """
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                lines = [line for line in f.read().splitlines() if line]
+            header = json.loads(lines[0]) if lines else {}
+            upload_id = header.pop('upload_id', None)
+            if header == self.header and upload_id:
+                self.upload_id = upload_id
+                for line in lines[1:]:
+                    try:
+                        chunk = json.loads(line)
+                    except ValueError:
+                        # A torn final line from a crash mid-write
+                        break
+                    self.offset = chunk['end']
+                return self.offset
+
+        self.upload_id = uuid.uuid4().hex
+        self.offset = 0
+        header = dict(self.header, upload_id=self.upload_id)
+        with open(self.path, 'w') as f:
+            f.write(json.dumps(header) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        return self.offset
+
+    def record(self, start, end):
+        """Durably record that bytes [start, end) were acknowledged.
+        """
+        with open(self.path, 'a') as f:
+            f.write(json.dumps({'start': start, 'end': end}) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self.offset = end
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def _acknowledged_end(response):
+    """Parse the Range header of a 308 response ("bytes=0-N") into the
+    offset just past the last byte the server holds.
+    """
+    range_header = response.headers.get('Range')
+    if not range_header:
+        return 0
+    return int(range_header.split('-')[-1]) + 1
+
+
+def _backoff(attempt, base=0.5, cap=30.0):
+    """Exponential backoff with full jitter.
+    """
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def resumable_upload(session, url, file_name, journal_path=None,
+                     chunk_size=DEFAULT_CHUNK_SIZE, max_retries=5,
+                     checksum_algorithm=None, **kwargs):
+    """Upload file_name to url in chunk_size pieces through session (a
+    FabricSession), resuming from journal_path if a previous attempt was
+    interrupted. With checksum_algorithm set, the final chunk carries the
+    file's digest.
+
+    Returns the final response. Raises UploadInterrupted if a chunk cannot
+    be delivered after max_retries attempts.
+    """
+    journal = UploadJournal(journal_path or file_name + '.upload-journal',
+                            file_name, url, chunk_size)
+    offset = journal.load()
+    total = journal.header['size']
+    params = dict(kwargs.pop('params', None) or {}, upload_id=journal.upload_id)
+    headers = kwargs.pop('headers', None) or {}
+
+    digest = hashlib.new(checksum_algorithm) if checksum_algorithm else None
+    # The digest always covers bytes [0, hashed_to) of the file
+    hashed = {'to': 0}
+
+    def put(body, content_range, extra_params=None):
+        chunk_headers = dict(headers, **{'Content-Range': content_range})
+        chunk_params = dict(params, **(extra_params or {}))
+        return session.put(url, data=body, params=chunk_params, headers=chunk_headers,
+                           retry=False, **kwargs)
+
+    def send_chunk(file_handle):
+        end = min(offset + chunk_size, total)
+        if digest is not None and offset > hashed['to']:
+            # Resuming: hash the acknowledged prefix locally, without sending it
+            update_from_file(digest, file_handle, hashed['to'], offset)
+            hashed['to'] = offset
+        file_handle.seek(offset)
+        body = file_handle.read(end - offset)
+        extra_params = None
+        if digest is not None:
+            if end > hashed['to']:
+                digest.update(memoryview(body)[hashed['to'] - offset:])
+                hashed['to'] = end
+            if end == total:
+                extra_params = {'checksum': digest.hexdigest()}
+        if offset < total:
+            return put(body, 'bytes {}-{}/{}'.format(offset, end - 1, total), extra_params)
+        # Nothing left to send: an empty file, or every byte acknowledged but
+        # the final response lost. Ask the server to finish the upload
+        return put(body, 'bytes */{}'.format(total), extra_params)
+
+    with open(file_name, 'rb') as file_handle:
+        failures = 0
+        while True:
+            try:
+                response = send_chunk(file_handle)
+            except (requests.ConnectionError, requests.Timeout):
+                response = None
+
+            if (response is None or response.status_code >= 500 or
+                    response.status_code == TOO_MANY_REQUESTS or
+                    (response.status_code == RESUME_INCOMPLETE and
+                     _acknowledged_end(response) <= offset)):
+                failures += 1
+                if failures > max_retries:
+                    raise UploadInterrupted(
+                        'Upload of {} interrupted at byte {} of {}'.format(file_name, offset, total),
+                        offset)
+                delay = retry_after(response) if response is not None else None
+                time.sleep(_backoff(failures) if delay is None else delay)
+                # The chunk may or may not have landed; ask the server where it is
+                try:
+                    response = put(b'', 'bytes */{}'.format(total))
+                except (requests.ConnectionError, requests.Timeout):
+                    continue
+                if response.status_code >= 500 or response.status_code == TOO_MANY_REQUESTS:
+                    continue
+
+            if response.status_code != RESUME_INCOMPLETE:
+                if response.ok:
+                    journal.remove()
+                return response
+
+            acknowledged = _acknowledged_end(response)
+            if acknowledged > offset:
+                failures = 0
+            if acknowledged != offset:
+                journal.record(offset, acknowledged)
+                offset = acknowledged
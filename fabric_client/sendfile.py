@@ -0,0 +1,96 @@
+"""Send genome files as raw request bodies without copying them through Python.
+
+Given an open file as the body, urllib3 reads it 16 KB at a time into new
+bytes objects and writes each one to the socket. A FileBody passed as the
+body instead goes out in one call once the headers are sent: over plain
+http with nothing to hash, os.sendfile() hands the file to the socket
+inside the kernel; otherwise (https, or a checksum computed on the way) it
+is read with readinto() into one reused buffer and sent from a memoryview
+of it, as HashingReader does.
+
+FabricSession mounts the connection pools below, which recognise a
+FileBody. Sent through any other connection it is read like a normal file.
+"""
+
+import os
+import socket
+import ssl
+
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from fabric_client.checksum import DEFAULT_BUFFER_SIZE, HashingReader
+
+
+class FileBody(HashingReader):
+    """The rest of file_handle, from its current position, as a request
+    body. With algorithms given, the file is hashed as it is sent (see
+    hexdigest()), which rules out sendfile.
+    """
+
+    def __init__(self, file_handle, algorithms=(), buffer_size=DEFAULT_BUFFER_SIZE):
+        super(FileBody, self).__init__(file_handle, algorithms=algorithms,
+                                       buffer_size=buffer_size)
+        self.offset = file_handle.tell()
+
+    def send_to(self, sock):
+        """Write the body to sock. Returns the number of bytes sent.
+        """
+        if (not self.hashes and hasattr(os, 'sendfile') and isinstance(sock, socket.socket) and
+                not isinstance(sock, ssl.SSLSocket)):
+            # Also moves the file position past what was sent
+            sent = sock.sendfile(self.file_handle, self.offset, len(self))
+            self.bytes_read += sent
+        else:
+            sent = 0
+            for block in self:
+                sock.sendall(block)
+                sent += len(block)
+        if sent != len(self):
+            # A Content-Length already sent cannot be taken back
+            raise IOError('{} changed size while it was sent: {} of {} bytes'.format(
+                getattr(self.file_handle, 'name', 'File'), sent, len(self)))
+        return sent
+
+
+class _FileBodyConnectionMixin(object):
+    """Send a FileBody request body with FileBody.send_to() once urllib3
+    has written the request line and headers.
+    """
+
+    def request(self, method, url, body=None, headers=None, **kwargs):
+        if not isinstance(body, FileBody) or kwargs.get('chunked'):
+            return super(_FileBodyConnectionMixin, self).request(method, url, body=body,
+                                                                 headers=headers, **kwargs)
+        headers = dict(headers or {})
+        if not any(name.lower() == 'content-length' for name in headers):
+            headers['Content-Length'] = str(len(body))
+        super(_FileBodyConnectionMixin, self).request(method, url, body=None, headers=headers,
+                                                      **kwargs)
+        self.send_file(body)
+
+    def send_file(self, body):
+        return body.send_to(self.sock)
+
+
+class FileBodyHTTPConnection(_FileBodyConnectionMixin, HTTPConnection):
+    pass
+
+
+class FileBodyHTTPSConnection(_FileBodyConnectionMixin, HTTPSConnection):
+    pass
+
+
+class FileBodyHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = FileBodyHTTPConnection
+
+
+class FileBodyHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = FileBodyHTTPSConnection
+
+
+def mount_file_body_pools(adapter):
+    """Make adapter open connections that send FileBody bodies directly.
+    """
+    adapter.poolmanager.pool_classes_by_scheme = {'http': FileBodyHTTPConnectionPool,
+                                                  'https': FileBodyHTTPSConnectionPool}
@@ -0,0 +1,119 @@
+"""Shared, pooled HTTP session for the Fabric API example scripts.
+
+Calling requests.get/post/put directly opens a new TCP+TLS connection for
+every call. Routing all calls through one keep-alive requests.Session lets
+urllib3 reuse connections, which matters once a batch job issues thousands
+of calls per run.
+
+The number of connections kept open per host defaults to 10 and can be
+tuned with the FABRIC_API_POOL_SIZE environment variable, or per call to
+get_session().
+
+Every request goes through the session's Governor (see governor.py), which
+applies the per-endpoint-class rate and concurrency limits and retries
+throttled or failed requests when that is safe. With FABRIC_API_TRACE set,
+every request is also timed phase by phase and logged (see tracing.py).
+Request bodies wrapped in a FileBody are sent straight from the file (see
+sendfile.py).
+"""
+
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.auth import HTTPBasicAuth
+
+from fabric_client.governor import Governor
+from fabric_client.sendfile import mount_file_body_pools
+from fabric_client.tracing import Tracer
+
+FABRIC_API_URL = os.environ.get('FABRIC_API_URL', 'https://api.fabricgenomics.com')
+DEFAULT_POOL_SIZE = 10
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def default_pool_size():
+    """Return the per-host pool size, honouring FABRIC_API_POOL_SIZE.
+    """
+    try:
+        return max(1, int(os.environ.get('FABRIC_API_POOL_SIZE', DEFAULT_POOL_SIZE)))
+    except ValueError:
+        return DEFAULT_POOL_SIZE
+
+
+def auth_from_env():
+    """Build basic auth from FABRIC_API_LOGIN and FABRIC_API_PASSWORD,
+    or return None if either is unset.
+    """
+    login = os.environ.get('FABRIC_API_LOGIN')
+    password = os.environ.get('FABRIC_API_PASSWORD')
+    if login is None or password is None:
+        return None
+    return HTTPBasicAuth(login, password)
+
+
+class FabricSession(requests.Session):
+    """A requests.Session with a sized connection pool and the API user's
+    credentials attached. governor and tracer default to ones configured
+    from the environment; pass False to send requests ungoverned or
+    untraced. A request made with retry=False is still governed but never
+    retried by the governor.
+    """
+
+    def __init__(self, pool_size=None, auth=None, governor=None, tracer=None):
+        super(FabricSession, self).__init__()
+        self.pool_size = None
+        self.tracer = Tracer.from_env() if tracer is None else tracer
+        self.resize_pool(pool_size or default_pool_size())
+        self.auth = auth if auth is not None else auth_from_env()
+        self.governor = Governor.from_env() if governor is None else governor
+
+    def request(self, method, url, retry=True, **kwargs):
+        send = super(FabricSession, self).request
+        if self.tracer:
+            send = self.tracer.traced(send)
+        if not self.governor:
+            return send(method, url, **kwargs)
+        return self.governor.call(send, method, url, retry=retry, **kwargs)
+
+    def resize_pool(self, pool_size):
+        """Mount fresh adapters keeping up to pool_size connections per host.
+        """
+        for old_adapter in self.adapters.values():
+            old_adapter.close()
+        adapter = HTTPAdapter(pool_maxsize=pool_size, pool_block=True)
+        if self.tracer:
+            self.tracer.instrument(adapter)
+        else:
+            mount_file_body_pools(adapter)
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
+        self.pool_size = pool_size
+
+
+def get_session(pool_size=None):
+    """Return the process-wide session, creating it on first use.
+
+    If pool_size is larger than the current pool, the pool grows so that
+    pool_size threads can hold a connection to the same host at once.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = FabricSession(pool_size=pool_size)
+        elif pool_size and pool_size > _session.pool_size:
+            _session.resize_pool(pool_size)
+        return _session
+
+
+def close_session():
+    """Close the process-wide session and drop its pooled connections.
+    """
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
@@ -0,0 +1,376 @@
+"""Per-request timing traces for API calls.
+
+With FABRIC_API_TRACE set to a file name (or "-" for stderr), every request
+a FabricSession sends is written to that file as one line when it
+completes, whatever script sent it. Each line times the phases of the
+request:
+
+    queued      waiting for the governor (rate limit, in-flight cap, pause
+                or retry backoff)
+    connect     DNS lookup and TCP connect, on a new connection only
+    tls         TLS handshake, on a new https connection only
+    send        writing the request line, headers and body
+    first_byte  from the end of the request until the response headers
+                arrive, i.e. server processing time plus one round trip
+    transfer    reading the response body; for streamed responses this
+                ends when the body has been read or the response closed
+
+along with the status, bytes sent (request headers and body) and received
+(response body as sent on the wire), whether the connection was reused,
+and the attempt number: retries by the governor are separate lines that
+share a trace_id.
+
+FABRIC_API_TRACE_FORMAT picks the line format: "jsonl" (the default), a
+flat JSON object per request, or "otlp", one OpenTelemetry
+ExportTraceServiceRequest in its JSON encoding per request, as written by
+the collector's file exporter and read by its otlpjsonfile receiver. Lines
+are appended, so several scripts can share one trace file.
+
+Example usage:
+    FABRIC_API_TRACE=trace.jsonl python upload_genomes_folder.py 1 genomes/
+"""
+
+import atexit
+import os
+import sys
+import threading
+import time
+import uuid
+from urllib.parse import urlparse
+
+import simplejson as json
+from urllib3.connection import HTTPSConnection
+
+from fabric_client.sendfile import (FileBodyHTTPConnection, FileBodyHTTPConnectionPool,
+                                    FileBodyHTTPSConnection, FileBodyHTTPSConnectionPool)
+
+PHASES = ('queued', 'connect', 'tls', 'send', 'first_byte', 'transfer')
+FORMATS = ('jsonl', 'otlp')
+SERVICE_NAME = 'fabric_api_scripts'
+# OpenTelemetry SpanKind CLIENT and StatusCode ERROR
+OTLP_CLIENT_KIND = 3
+OTLP_STATUS_ERROR = 2
+
+_local = threading.local()
+_env_tracer = None
+_env_lock = threading.Lock()
+
+
+def _current_span():
+    return getattr(_local, 'span', None)
+
+
+class Span(object):
+    """Timings of one attempt at one request.
+    """
+
+    def __init__(self, tracer, method, url, trace_id, attempt, queued):
+        self.tracer = tracer
+        self.method = method.upper()
+        self.url = url
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.attempt = attempt
+        self.start = time.time()
+        self.phases = {'queued': queued}
+        self.status = None
+        self.error = None
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.response = None
+        self.response_at = None
+        self.released = False
+        self.finished = False
+
+    def add(self, phase, seconds):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def finish(self, error=None):
+        """Close the span and hand it to the tracer; later calls do nothing.
+        """
+        with self.tracer._lock:
+            if self.finished:
+                return
+            self.finished = True
+            self.tracer._open.discard(self)
+        end = time.time()
+        if error is not None:
+            self.error = '{}: {}'.format(type(error).__name__, error)
+        if self.response_at is not None:
+            self.add('transfer', end - self.response_at)
+        self.end = end
+        self.tracer.emit(self)
+
+    def as_dict(self):
+        parsed = urlparse(self.url)
+        return {'trace_id': self.trace_id,
+                'span_id': self.span_id,
+                'method': self.method,
+                # The query string is left out, as it can carry sample labels
+                'url': '{}://{}{}'.format(parsed.scheme, parsed.netloc, parsed.path),
+                'start': round(self.start, 6),
+                'duration': round(self.end - self.start, 6),
+                'phases': dict((phase, round(self.phases[phase], 6)) for phase in PHASES
+                               if phase in self.phases),
+                'status': self.status,
+                'error': self.error,
+                'attempt': self.attempt,
+                'bytes_sent': self.bytes_sent,
+                'bytes_received': self.bytes_received,
+                'connection_reused': 'connect' not in self.phases,
+                'pid': os.getpid()}
+
+
+class _CountingReader(object):
+    """Count the bytes read through a socket file into counter.bytes_received.
+    """
+
+    def __init__(self, fp, counter):
+        self._fp = fp
+        self._counter = counter
+
+    def read(self, *args):
+        data = self._fp.read(*args)
+        self._counter.bytes_received += len(data)
+        return data
+
+    def readline(self, *args):
+        data = self._fp.readline(*args)
+        self._counter.bytes_received += len(data)
+        return data
+
+    def readinto(self, buffer):
+        count = self._fp.readinto(buffer)
+        self._counter.bytes_received += count or 0
+        return count
+
+    def __getattr__(self, name):
+        return getattr(self._fp, name)
+
+
+def otlp_span(record):
+    """Convert a jsonl trace record to an OTLP/JSON span.
+    """
+    def attribute(key, value):
+        if isinstance(value, bool):
+            return {'key': key, 'value': {'boolValue': value}}
+        if isinstance(value, int):
+            return {'key': key, 'value': {'intValue': str(value)}}
+        if isinstance(value, float):
+            return {'key': key, 'value': {'doubleValue': value}}
+        return {'key': key, 'value': {'stringValue': str(value)}}
+
+    parsed = urlparse(record['url'])
+    attributes = [attribute('http.request.method', record['method']),
+                  attribute('url.full', record['url']),
+                  attribute('server.address', parsed.hostname or ''),
+                  attribute('http.request.resend_count', record['attempt']),
+                  attribute('fabric.bytes_sent', record['bytes_sent']),
+                  attribute('fabric.bytes_received', record['bytes_received']),
+                  attribute('fabric.connection_reused', record['connection_reused'])]
+    if record['status'] is not None:
+        attributes.append(attribute('http.response.status_code', record['status']))
+    if record['error']:
+        attributes.append(attribute('error.type', record['error'].split(':')[0]))
+    for phase, seconds in sorted(record['phases'].items()):
+        attributes.append(attribute('fabric.phase.{}'.format(phase), seconds))
+    span = {'traceId': record['trace_id'],
+            'spanId': record['span_id'],
+            'name': record['method'],
+            'kind': OTLP_CLIENT_KIND,
+            'startTimeUnixNano': str(int(record['start'] * 1e9)),
+            'endTimeUnixNano': str(int((record['start'] + record['duration']) * 1e9)),
+            'attributes': attributes,
+            'status': {}}
+    if record['error'] or (record['status'] or 0) >= 400:
+        span['status'] = {'code': OTLP_STATUS_ERROR}
+    return span
+
+
+class Tracer(object):
+    """Write a line per request attempt to stream, in format ("jsonl" or
+    "otlp").
+    """
+
+    def __init__(self, stream, format='jsonl'):
+        if format not in FORMATS:
+            raise ValueError('Unknown trace format {!r}; use one of {}'.format(
+                format, ', '.join(FORMATS)))
+        self.stream = stream
+        self.format = format
+        self._lock = threading.Lock()
+        self._open = set()
+        self.resource = {'attributes': [
+            {'key': 'service.name', 'value': {'stringValue': SERVICE_NAME}},
+            {'key': 'process.pid', 'value': {'intValue': str(os.getpid())}},
+            {'key': 'process.command', 'value': {'stringValue': os.path.basename(sys.argv[0])
+                                                 if sys.argv and sys.argv[0] else 'python'}}]}
+
+    @classmethod
+    def from_env(cls):
+        """The process-wide Tracer configured by FABRIC_API_TRACE and
+        FABRIC_API_TRACE_FORMAT, or None if tracing is off.
+        """
+        global _env_tracer
+        path = os.environ.get('FABRIC_API_TRACE')
+        if not path:
+            return None
+        with _env_lock:
+            if _env_tracer is None:
+                stream = sys.stderr if path == '-' else open(path, 'a')
+                _env_tracer = cls(stream, os.environ.get('FABRIC_API_TRACE_FORMAT', 'jsonl'))
+                atexit.register(_env_tracer.close)
+            return _env_tracer
+
+    def emit(self, span):
+        record = span.as_dict()
+        if self.format == 'otlp':
+            record = {'resourceSpans': [{'resource': self.resource, 'scopeSpans': [
+                {'scope': {'name': 'fabric_client.tracing'}, 'spans': [otlp_span(record)]}]}]}
+        line = json.dumps(record) + '\n'
+        with self._lock:
+            self.stream.write(line)
+            self.stream.flush()
+
+    def traced(self, send):
+        """Wrap send(method, url, **kwargs) so that each call is traced as
+        one attempt of the same request.
+        """
+        state = {'trace_id': uuid.uuid4().hex, 'attempt': 0, 'ready_at': time.time()}
+
+        def traced_send(method, url, **kwargs):
+            span = Span(self, method, url, state['trace_id'], state['attempt'],
+                        time.time() - state['ready_at'])
+            state['attempt'] += 1
+            with self._lock:
+                self._open.add(span)
+            _local.span = span
+            try:
+                response = send(method, url, **kwargs)
+            except BaseException as e:
+                span.finish(error=e)
+                raise
+            finally:
+                _local.span = None
+                state['ready_at'] = time.time()
+            span.status = response.status_code
+            # A streamed body may still be unread; then the connection pool
+            # finishes the span when the connection comes back
+            if not kwargs.get('stream') or span.released or span.response is None:
+                span.finish()
+            return response
+
+        return traced_send
+
+    def instrument(self, adapter):
+        """Make adapter open connections that report their phase timings.
+        """
+        adapter.poolmanager.pool_classes_by_scheme = {'http': TracedHTTPConnectionPool,
+                                                      'https': TracedHTTPSConnectionPool}
+
+    def close(self):
+        """Write out spans still open, such as streamed responses never read
+        to the end, and close the stream.
+        """
+        with self._lock:
+            spans = list(self._open)
+        for span in spans:
+            span.finish()
+        if self.stream not in (sys.stdout, sys.stderr):
+            self.stream.close()
+
+
+class _TracedConnectionMixin(object):
+    """Record connect, TLS, send and first byte times into the current
+    thread's span.
+    """
+
+    _fabric_span = None
+
+    def _new_conn(self):
+        span = _current_span()
+        start = time.time()
+        sock = super(_TracedConnectionMixin, self)._new_conn()
+        if span is not None:
+            span.add('connect', time.time() - start)
+        return sock
+
+    def connect(self):
+        span = _current_span()
+        start = time.time()
+        connected = span.phases.get('connect', 0.0) if span is not None else 0.0
+        super(_TracedConnectionMixin, self).connect()
+        if span is not None and isinstance(self, HTTPSConnection):
+            span.add('tls', time.time() - start - (span.phases['connect'] - connected))
+
+    def request(self, *args, **kwargs):
+        span = _current_span()
+        if span is None:
+            return super(_TracedConnectionMixin, self).request(*args, **kwargs)
+        self._fabric_span = span
+        start = time.time()
+        before = span.phases.get('connect', 0.0) + span.phases.get('tls', 0.0)
+        try:
+            return super(_TracedConnectionMixin, self).request(*args, **kwargs)
+        finally:
+            # An http connection is opened lazily, while the request is sent
+            during = span.phases.get('connect', 0.0) + span.phases.get('tls', 0.0) - before
+            span.add('send', time.time() - start - during)
+
+    def send(self, data):
+        super(_TracedConnectionMixin, self).send(data)
+        span = self._fabric_span
+        if span is not None and not hasattr(data, 'read'):
+            span.bytes_sent += len(data)
+
+    def send_file(self, body):
+        sent = super(_TracedConnectionMixin, self).send_file(body)
+        if self._fabric_span is not None:
+            self._fabric_span.bytes_sent += sent
+        return sent
+
+    def getresponse(self, *args, **kwargs):
+        span = self._fabric_span
+        start = time.time()
+        response = super(_TracedConnectionMixin, self).getresponse(*args, **kwargs)
+        if span is not None:
+            span.response_at = time.time()
+            span.add('first_byte', span.response_at - start)
+            span.response = response
+            # Count the body as it is read off the socket: urllib3's tell()
+            # leaves out chunked bodies, and lags the read that releases the
+            # connection
+            if getattr(response._fp, 'fp', None) is not None:
+                response._fp.fp = _CountingReader(response._fp.fp, span)
+        return response
+
+
+class TracedHTTPConnection(_TracedConnectionMixin, FileBodyHTTPConnection):
+    pass
+
+
+class TracedHTTPSConnection(_TracedConnectionMixin, FileBodyHTTPSConnection):
+    pass
+
+
+class _TracedPoolMixin(object):
+    """Finish a connection's span once its response has been read and the
+    connection is handed back to the pool.
+    """
+
+    def _put_conn(self, conn):
+        span = getattr(conn, '_fabric_span', None)
+        if span is not None:
+            conn._fabric_span = None
+            span.released = True
+            if span.status is not None:
+                span.finish()
+        return super(_TracedPoolMixin, self)._put_conn(conn)
+
+
+class TracedHTTPConnectionPool(_TracedPoolMixin, FileBodyHTTPConnectionPool):
+    ConnectionCls = TracedHTTPConnection
+
+
+class TracedHTTPSConnectionPool(_TracedPoolMixin, FileBodyHTTPSConnectionPool):
+    ConnectionCls = TracedHTTPSConnection
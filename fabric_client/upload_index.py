@@ -0,0 +1,154 @@
+"""Local content-addressed index of uploaded genomes.
+
+Re-running an upload after a partial failure used to send every VCF again
+and leave duplicate genomes in the project. UploadIndex records, in a small
+SQLite database, the genome the API returned for each (file digest,
+project, API URL); upload_once() looks a file up there first and returns
+the recorded genome without sending anything when the same content was
+already uploaded to that project. Only uploads that returned a genome_id
+are recorded.
+
+Digests are SHA-256 of the file contents. They are remembered by path,
+size, modification time and inode, so an unchanged file is not even read
+again on a re-run. The database lives next to the response cache, in
+FABRIC_API_CACHE_DIR (else ~/.cache/fabric_api).
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from fabric_client.cache import default_cache_dir
+from fabric_client.checksum import file_digest
+from fabric_client.session import FABRIC_API_URL
+
+INDEX_FILE_NAME = 'uploads.sqlite3'
+DIGEST_ALGORITHM = 'sha256'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS uploads (
+    digest TEXT NOT NULL,
+    project_id TEXT NOT NULL,
+    api_url TEXT NOT NULL,
+    genome_id TEXT NOT NULL,
+    genome TEXT NOT NULL,
+    uploaded_at REAL NOT NULL,
+    PRIMARY KEY (digest, project_id, api_url)
+)
+"""
+
+_DIGEST_SCHEMA = """
+CREATE TABLE IF NOT EXISTS digests (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    digest TEXT NOT NULL
+)
+"""
+
+
+class UploadIndex(object):
+    """SQLite-backed map from (file digest, project) to the genome record
+    the API returned when that content was uploaded to base_url.
+    """
+
+    def __init__(self, directory=None, base_url=FABRIC_API_URL):
+        self.directory = directory or default_cache_dir()
+        self.base_url = base_url
+        self.hits = 0
+        self.misses = 0
+        self.bytes_skipped = 0
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        self.path = os.path.join(self.directory, INDEX_FILE_NAME)
+        self._lock = threading.Lock()
+        # Other upload processes may share the file, so wait on their locks
+        self._db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        with self._db:
+            self._db.execute(_SCHEMA)
+            self._db.execute(_DIGEST_SCHEMA)
+
+    def close(self):
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def digest(self, path):
+        """SHA-256 of the file at path, read only if the file is new or has
+        changed since its digest was last computed.
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        with self._lock:
+            row = self._db.execute('SELECT size, mtime_ns, inode, digest FROM digests '
+                                   'WHERE path = ?', (path,)).fetchone()
+        if row is not None and tuple(row[:3]) == (stat.st_size, stat.st_mtime_ns, stat.st_ino):
+            return row[3]
+        digest = file_digest(path, DIGEST_ALGORITHM)
+        with self._lock, self._db:
+            self._db.execute('INSERT OR REPLACE INTO digests VALUES (?, ?, ?, ?, ?)',
+                             (path, stat.st_size, stat.st_mtime_ns, stat.st_ino, digest))
+        return digest
+
+    def lookup(self, digest, project_id):
+        """Return the genome recorded for digest in project_id, or None.
+        """
+        with self._lock:
+            row = self._db.execute(
+                'SELECT genome FROM uploads WHERE digest = ? AND project_id = ? AND api_url = ?',
+                (digest, str(project_id), self.base_url)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def record(self, digest, project_id, genome):
+        """Remember that digest was uploaded to project_id as genome, the
+        JSON object the API returned.
+        """
+        with self._lock, self._db:
+            self._db.execute('INSERT OR REPLACE INTO uploads VALUES (?, ?, ?, ?, ?, ?)',
+                             (digest, str(project_id), self.base_url, str(genome['genome_id']),
+                              json.dumps(genome), time.time()))
+
+    def forget(self, digest, project_id):
+        """Drop the record for digest in project_id, for instance after the
+        genome was deleted from the project.
+        """
+        with self._lock, self._db:
+            self._db.execute('DELETE FROM uploads WHERE digest = ? AND project_id = ? '
+                             'AND api_url = ?', (digest, str(project_id), self.base_url))
+
+
+def upload_once(index, project_id, path, upload):
+    """Return the genome for the file at path in project_id: the one
+    recorded in index if the same content was uploaded there before,
+    otherwise the JSON object returned by calling upload(), which is
+    recorded if it has a genome_id. With index None, just call upload().
+    """
+    if index is None:
+        return upload()
+    digest = index.digest(path)
+    genome = index.lookup(digest, project_id)
+    if genome is not None:
+        index.hits += 1
+        index.bytes_skipped += os.path.getsize(path)
+        return genome
+    index.misses += 1
+    genome = upload()
+    if isinstance(genome, dict) and genome.get('genome_id') is not None:
+        index.record(digest, project_id, genome)
+    return genome
+
+
+def open_upload_index(no_dedup=False):
+    """Return the default UploadIndex, or None when deduplication is
+    turned off with no_dedup (the scripts' --no_dedup option).
+    """
+    if no_dedup:
+        return None
+    return UploadIndex()
@@ -0,0 +1,143 @@
+"""Upload helpers shared by the genome upload scripts.
+
+upload_file() streams a file from disk as a request body (straight from the
+file, see sendfile.py, unless progress percentages are reported) and records
+how long the transfer took; upload_in_parallel() runs many uploads on a
+bounded worker pool and returns each one's result or error in input order,
+so one failed file does not lose the others.
+"""
+
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from fabric_client.sendfile import FileBody
+
+
+class UploadsFailed(Exception):
+    """Raised when some files of a batch failed to upload. results holds
+    what the successful uploads returned, failures (item, error) pairs.
+    """
+
+    def __init__(self, message, results, failures):
+        super(UploadsFailed, self).__init__(message)
+        self.results = results
+        self.failures = failures
+
+
+class UploadProgress(object):
+    """Thread-safe per-file progress reporting to stderr.
+
+    A line is written when a file starts, each time it crosses another
+    `step` percent, and when it finishes. With step None only the start and
+    finish lines are written, so the file can still be sent with sendfile.
+    """
+
+    def __init__(self, stream=None, step=10):
+        self.stream = stream or sys.stderr
+        self.step = step
+        self._lock = threading.Lock()
+
+    def _write(self, message):
+        with self._lock:
+            self.stream.write(message)
+            self.stream.flush()
+
+    def start(self, name, total):
+        self._write("uploading {} ({:.1f} MB)...\n".format(name, total / 1e6))
+
+    def update(self, name, sent, total, last_percent):
+        """Report progress if another step was crossed; return the
+        percentage last reported.
+        """
+        percent = int(100 * sent / total) if total else 100
+        percent -= percent % self.step
+        if percent > last_percent and percent < 100:
+            self._write("{}: {}%\n".format(name, percent))
+            return percent
+        return last_percent
+
+    def finish(self, name, stats):
+        self._write("{}: done, {:.2f} MB/s\n".format(name, stats['mb_per_second']))
+
+
+class ProgressFile(object):
+    """File wrapper that reports bytes read to an UploadProgress.
+
+    It exposes __len__ so requests sends a Content-Length header instead of
+    falling back to chunked transfer encoding.
+    """
+
+    def __init__(self, file_handle, name, total, progress):
+        self.file_handle = file_handle
+        self.name = name
+        self.total = total
+        self.progress = progress
+        self.sent = 0
+        self._last_percent = 0
+
+    def __len__(self):
+        return self.total
+
+    def read(self, size=-1):
+        chunk = self.file_handle.read(size)
+        self.sent += len(chunk)
+        self._last_percent = self.progress.update(self.name, self.sent, self.total,
+                                                  self._last_percent)
+        return chunk
+
+
+def transfer_stats(file_name, size, seconds):
+    """Summarize one upload's size, duration and throughput.
+    """
+    return {'file_name': file_name,
+            'bytes': size,
+            'seconds': round(seconds, 3),
+            'mb_per_second': round(size / 1e6 / seconds, 3) if seconds else None}
+
+
+def upload_file(session, method, url, path, progress=None, **kwargs):
+    """Stream the file at path as the body of a request to url.
+    Returns the response along with its transfer_stats().
+    """
+    size = os.path.getsize(path)
+    name = os.path.basename(path)
+    start = time.time()
+    with open(path, 'rb') as file_handle:
+        body = FileBody(file_handle)
+        if progress is not None:
+            progress.start(name, size)
+            if progress.step:
+                # Counting the bytes means reading them in Python, not sendfile
+                body = ProgressFile(file_handle, name, size, progress)
+        response = session.request(method, url, data=body, **kwargs)
+    stats = transfer_stats(name, size, time.time() - start)
+    if progress is not None:
+        progress.finish(name, stats)
+    return response, stats
+
+
+def _call(upload, item):
+    try:
+        return upload(item), None
+    except Exception as e:
+        return None, e
+
+
+def upload_in_parallel(items, upload, workers=1):
+    """Call upload(item) for every item on at most `workers` threads.
+    Returns a (result, error) pair per item, in the same order as items,
+    with error None for the uploads that succeeded; a failure does not stop
+    the other uploads.
+    """
+    if workers <= 1:
+        return [_call(upload, item) for item in items]
+    results = [None] * len(items)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = dict((executor.submit(_call, upload, item), position)
+                       for position, item in enumerate(items))
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+    return results
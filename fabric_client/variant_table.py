@@ -0,0 +1,266 @@
+"""Compact column store for large report variant listings.
+
+A whole-genome report can hold millions of variants. As a list of JSON dicts
+every variant carries its own dict, key references and boxed numbers, which
+costs several hundred bytes each. VariantTable keeps only the columns
+needed to select variants: positions and scores in typed arrays, and the
+low-cardinality text columns (chromosome, ref, alt, status) interned once
+and stored as small integer codes. Filters run over the arrays with
+C-level iterators and return row indices (or a new table holding just those
+rows), so no per-variant dicts are built until rows are written out.
+"""
+
+import math
+import operator
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import compress, islice, repeat
+
+# Column name -> key in the API's variant JSON
+DEFAULT_FIELDS = {'id': 'id',
+                  'chrom': 'chromosome',
+                  'start': 'start_on_chrom',
+                  'end': 'end_on_chrom',
+                  'ref': 'ref',
+                  'alt': 'alt',
+                  'status': 'status',
+                  'score': 'score'}
+
+NAN = float('nan')
+
+CATEGORICAL_COLUMNS = ('chrom', 'ref', 'alt', 'status')
+NUMERIC_COLUMNS = (('id', 'q'), ('start', 'q'), ('end', 'q'), ('score', 'd'))
+COLUMNS = ('id', 'chrom', 'start', 'end', 'ref', 'alt', 'status', 'score')
+
+
+class Categories(object):
+    """Interned values of one categorical column, shared by every table
+    derived from the same source.
+    """
+
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+
+    def code(self, value):
+        try:
+            return self.codes[value]
+        except KeyError:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+            return code
+
+    def lookup(self, values):
+        """Return the set of codes for values that have been seen.
+        """
+        return set(self.codes[value] for value in values if value in self.codes)
+
+
+def code_mask(codes, values):
+    """Return one 0/1 byte per categorical code in values, set where the code
+    is in codes.
+    """
+    if isinstance(values, array) and values.typecode == 'B':
+        table = bytearray(256)
+        for code in codes:
+            if code < 256:
+                table[code] = 1
+        return values.tobytes().translate(table)
+    return bytes(map(codes.__contains__, values))
+
+
+class VariantTable(object):
+    """Columnar variant container with chromosome, position and status
+    filters.
+    """
+
+    def __init__(self, fields=None, categories=None):
+        self.fields = dict(DEFAULT_FIELDS, **(fields or {}))
+        if categories is None:
+            categories = dict((name, Categories()) for name in CATEGORICAL_COLUMNS)
+        self.categories = categories
+        self.columns = dict((name, array(typecode)) for name, typecode in NUMERIC_COLUMNS)
+        # Codes start as single bytes, which filters can match with
+        # bytes.translate, and widen if a column outgrows 256 values
+        for name in CATEGORICAL_COLUMNS:
+            self.columns[name] = array('B')
+        self._chrom_index = None
+
+    @classmethod
+    def from_variants(cls, variants, fields=None):
+        """Build a table from an iterable of variant dicts, consuming it one
+        variant at a time.
+        """
+        table = cls(fields=fields)
+        table.extend(variants)
+        return table
+
+    def __len__(self):
+        return len(self.columns['start'])
+
+    def append(self, variant):
+        """Add one variant dict.
+        """
+        self.extend((variant,))
+
+    def extend(self, variants):
+        """Add variant dicts from an iterable. Missing ids and positions are
+        stored as -1 and missing scores as NaN.
+        """
+        columns = self.columns
+        numeric = [(self.fields[name], columns[name].append, NAN if typecode == 'd' else -1)
+                   for name, typecode in NUMERIC_COLUMNS]
+        categorical = [(name, self.fields[name], self.categories[name].code)
+                       for name in CATEGORICAL_COLUMNS]
+        for variant in variants:
+            get = variant.get
+            for key, append, missing in numeric:
+                value = get(key)
+                append(missing if value is None else value)
+            for name, key, code in categorical:
+                value = code(get(key))
+                try:
+                    columns[name].append(value)
+                except OverflowError:
+                    columns[name] = array('I', columns[name])
+                    columns[name].append(value)
+        self._chrom_index = None
+
+    def nbytes(self):
+        """Approximate memory held by the column arrays, in bytes.
+        """
+        return sum(column.buffer_info()[1] * column.itemsize
+                   for column in self.columns.values())
+
+    def row(self, index):
+        """Return one variant as a dict of column values.
+        """
+        columns = self.columns
+        variant = {}
+        for name in COLUMNS:
+            value = columns[name][index]
+            if name in CATEGORICAL_COLUMNS:
+                value = self.categories[name].values[value]
+            elif name == 'score' and math.isnan(value):
+                value = None
+            variant[name] = value
+        return variant
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("VariantTable index out of range")
+        return self.row(index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self.row(index)
+
+    def take(self, rows):
+        """Return a new table holding the given row indices, in order.
+        """
+        table = VariantTable(fields=self.fields, categories=self.categories)
+        if not isinstance(rows, (array, range, list)):
+            rows = array('q', rows)
+        for name, column in self.columns.items():
+            table.columns[name] = array(column.typecode, map(column.__getitem__, rows))
+        return table
+
+    def _chrom_rows(self, code):
+        """Return (rows, starts, max_span) for one chromosome code, with rows
+        sorted by start position. Built once per table on first use.
+        """
+        if self._chrom_index is None:
+            self._chrom_index = {}
+        if code not in self._chrom_index:
+            columns = self.columns
+            starts = columns['start']
+            rows = array('q', compress(range(len(self)), code_mask((code,), columns['chrom'])))
+            sorted_starts = array('q', map(starts.__getitem__, rows))
+            # Reports usually arrive in position order, so sort only if needed
+            if not all(map(operator.le, sorted_starts, islice(sorted_starts, 1, None))):
+                rows = array('q', sorted(rows, key=starts.__getitem__))
+                sorted_starts = array('q', map(starts.__getitem__, rows))
+            spans = map(operator.sub, map(columns['end'].__getitem__, rows), sorted_starts)
+            self._chrom_index[code] = (rows, sorted_starts, max(spans, default=0))
+        return self._chrom_index[code]
+
+    def _overlapping(self, chrom_codes, start, end):
+        """Row indices on the given chromosomes overlapping [start, end].
+        """
+        found = []
+        for code in chrom_codes:
+            rows, starts, max_span = self._chrom_rows(code)
+            low = 0 if start is None else bisect_left(starts, start - max_span)
+            high = len(rows) if end is None else bisect_right(starts, end)
+            candidates = rows[low:high]
+            if start is not None:
+                ends = self.columns['end']
+                candidates = compress(candidates,
+                                      map(start.__le__, map(ends.__getitem__, candidates)))
+            found.extend(candidates)
+        return sorted(found)
+
+    def select(self, chrom=None, start=None, end=None, status=None, min_score=None):
+        """Return the indices of the rows matching every given criterion, in
+        row order, as an array.
+
+        chrom and status take one value or a collection of values. start and
+        end select variants overlapping that range, and min_score drops
+        variants scored below it (or not scored at all).
+        """
+        columns = self.columns
+        if chrom is not None:
+            if isinstance(chrom, str):
+                chrom = (chrom,)
+            chrom_codes = self.categories['chrom'].lookup(chrom)
+
+        indexed = chrom is not None and (start is not None or end is not None)
+        if indexed:
+            # Narrow to the overlapping rows with the per-chromosome index,
+            # then test the remaining criteria on those rows only
+            rows = self._overlapping(chrom_codes, start, end)
+
+            def column(name):
+                return map(columns[name].__getitem__, rows)
+        else:
+            rows = range(len(self))
+
+            def column(name):
+                return columns[name]
+
+        # Each mask holds one 0/1 byte per row
+        masks = []
+        if chrom is not None and not indexed:
+            masks.append(code_mask(chrom_codes, column('chrom')))
+        if start is not None and not indexed:
+            masks.append(bytes(map(start.__le__, column('end'))))
+        if end is not None and not indexed:
+            masks.append(bytes(map(end.__ge__, column('start'))))
+        if status is not None:
+            if isinstance(status, str):
+                status = (status,)
+            status_codes = self.categories['status'].lookup(status)
+            masks.append(code_mask(status_codes, column('status')))
+        if min_score is not None:
+            masks.append(bytes(map(operator.le, repeat(min_score), column('score'))))
+
+        if masks:
+            combined = int.from_bytes(masks[0], 'little')
+            for mask in masks[1:]:
+                combined &= int.from_bytes(mask, 'little')
+            rows = compress(rows, combined.to_bytes(len(rows), 'little'))
+        return array('q', rows)
+
+    def filter(self, **criteria):
+        """Return the variants matching the select() criteria as a new table.
+        """
+        return self.take(self.select(**criteria))
+
+    def rows(self, indices):
+        """Yield the given rows as dicts of column values.
+        """
+        for index in indices:
+            yield self.row(index)
+
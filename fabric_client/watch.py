@@ -0,0 +1,148 @@
+"""Watch many reports (or jobs) until each reaches a terminal status.
+
+Polling every id at a fixed interval spends almost all of its requests on
+ids whose status has not changed. StatusWatcher instead keeps a separate
+interval per id. The interval doubles, up to max_interval, each time a check
+finds the same status, and drops back to min_interval when the status
+changes, because one transition is often followed by the next. Every delay
+is jittered so that ids started together drift apart, and ids that fall due
+within a short window are checked together in one concurrent batch over the
+pooled session. An id is dropped as soon as it reaches a terminal status.
+"""
+
+import heapq
+import os
+import random
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_MIN_INTERVAL = 30.0
+DEFAULT_MAX_INTERVAL = 600.0
+DEFAULT_BACKOFF_FACTOR = 2.0
+DEFAULT_WORKERS = 8
+
+
+def jittered(interval):
+    """Spread a delay over [interval / 2, interval].
+    """
+    return interval / 2.0 + random.uniform(0, interval / 2.0)
+
+
+class StatusWatcher(object):
+    """Poll fetch_status(id) for a set of ids with per-id adaptive backoff.
+
+    on_change(id, old_status, new_status) is called for the first status
+    seen for each id (old_status None) and for every change after that.
+    fetch_status may raise; the error is reported on stderr and the id is
+    backed off like an unchanged one.
+
+    An id is done once its status is one of terminal_statuses or, given
+    in_progress_statuses, once it has a status that is not one of those.
+    """
+
+    def __init__(self, fetch_status, terminal_statuses, on_change=None,
+                 min_interval=DEFAULT_MIN_INTERVAL, max_interval=DEFAULT_MAX_INTERVAL,
+                 factor=DEFAULT_BACKOFF_FACTOR, workers=DEFAULT_WORKERS,
+                 clock=time.time, sleep=time.sleep, in_progress_statuses=None):
+        self.fetch_status = fetch_status
+        self.terminal_statuses = set(terminal_statuses)
+        self.in_progress_statuses = (set(in_progress_statuses)
+                                     if in_progress_statuses is not None else None)
+        self.on_change = on_change
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.factor = factor
+        self.workers = workers
+        self.clock = clock
+        self.sleep = sleep
+        self.requests = 0
+        self.errors = 0
+
+    def is_terminal(self, status):
+        """Whether an id in status needs no more polling. None, for an id
+        whose status could not be read yet, never is.
+        """
+        if status in self.terminal_statuses:
+            return True
+        return (self.in_progress_statuses is not None and status is not None and
+                status not in self.in_progress_statuses)
+
+    def _check(self, executor, batch, statuses, intervals):
+        """Fetch one batch of ids concurrently. Returns the ids to poll again.
+        """
+        futures = [(item_id, executor.submit(self.fetch_status, item_id)) for item_id in batch]
+        again = []
+        for item_id, future in futures:
+            self.requests += 1
+            try:
+                status = future.result()
+            except Exception as e:
+                self.errors += 1
+                sys.stderr.write("Checking {} failed: {}\n".format(item_id, e))
+                status = statuses.get(item_id)
+            old_status = statuses.get(item_id)
+            if status != old_status:
+                statuses[item_id] = status
+                if self.on_change:
+                    self.on_change(item_id, old_status, status)
+                intervals[item_id] = self.min_interval
+            else:
+                intervals[item_id] = min(self.max_interval, intervals[item_id] * self.factor)
+            if not self.is_terminal(status):
+                again.append(item_id)
+        return again
+
+    def watch(self, ids, timeout=None, initial=None):
+        """Poll until every id is in a terminal status, or timeout seconds
+        have passed. initial optionally maps ids to statuses already known,
+        so that only later changes are reported. Returns a dict of the last
+        status seen for each id.
+        """
+        statuses = dict(initial or {})
+        intervals = dict((item_id, self.min_interval) for item_id in ids)
+        # (due time, order, id); order keeps the heap from comparing ids
+        queue = [(0.0, order, item_id) for order, item_id in enumerate(ids)]
+        heapq.heapify(queue)
+        order = len(queue)
+        deadline = None if timeout is None else self.clock() + timeout
+        # Ids falling due this close together share one batch
+        window = self.min_interval / 4.0
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            while queue:
+                now = self.clock()
+                if deadline is not None and now >= deadline:
+                    break
+                if queue[0][0] > now:
+                    wake = queue[0][0]
+                    if deadline is not None:
+                        wake = min(wake, deadline)
+                    self.sleep(wake - now)
+                    continue
+                batch = []
+                while queue and queue[0][0] <= now + window:
+                    batch.append(heapq.heappop(queue)[2])
+                for item_id in self._check(executor, batch, statuses, intervals):
+                    due = self.clock() + jittered(intervals[item_id])
+                    heapq.heappush(queue, (due, order, item_id))
+                    order += 1
+        return statuses
+
+
+def hook_command(command, id_variable='REPORT_ID'):
+    """Return an on_change callback running a shell command, with the id and
+    statuses passed in the id_variable, OLD_STATUS and NEW_STATUS environment
+    variables. The first status seen for an id is not a change and does not
+    run the command.
+    """
+    def run(item_id, old_status, new_status):
+        if old_status is None:
+            return
+        env = dict(os.environ, OLD_STATUS=old_status or '', NEW_STATUS=new_status or '')
+        env[id_variable] = str(item_id)
+        returncode = subprocess.call(command, shell=True, env=env)
+        if returncode:
+            sys.stderr.write("Hook command exited with {} for {}\n".format(returncode, item_id))
+    return run
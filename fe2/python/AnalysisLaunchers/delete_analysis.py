@@ -5,12 +5,15 @@
 """
 
 import os
-import requests
 from requests.auth import HTTPBasicAuth
 import sys
 import simplejson as json
 import argparse
 
+# Route API calls through the shared, pooled session in fabric_client
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..'))
+from fabric_client import get_session
+
 # Load environment variables for request authentication parameters
 if "FABRIC_API_PASSWORD" not in os.environ:
     sys.exit("FABRIC_API_PASSWORD environment variable missing")
@@ -22,6 +25,7 @@ FABRIC_API_LOGIN = os.environ['FABRIC_API_LOGIN']
 FABRIC_API_PASSWORD = os.environ['FABRIC_API_PASSWORD']
 FABRIC_API_URL = os.environ.get('FABRIC_API_URL', 'https://api.fabricgenomics.com')
 auth = HTTPBasicAuth(FABRIC_API_LOGIN, FABRIC_API_PASSWORD)
+session = get_session()
 
 
 def delete_analysis(args):
@@ -30,7 +34,7 @@ def delete_analysis(args):
 
     url = '{}/analysis/{}'.format(FABRIC_API_URL, args.id)
 
-    result = requests.delete(url, auth=auth)
+    result = session.delete(url, auth=auth)
 
     return result.text
 
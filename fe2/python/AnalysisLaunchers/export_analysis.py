@@ -2,15 +2,30 @@
     Export analysis by id
     Example usages:
         python export_analysis.py --id 1802 --filter_id 1234  --format JSON
+        python export_analysis.py --id 1802 --filter_id 1234  --all --page_size 1000
+        python export_analysis.py --id 1802 --filter_id 1234  --ndjson
+
+    With --all (JSON format only), every variant is written as one JSON object per
+    line. Pages are fetched lazily, with the next --prefetch pages requested in the
+    background.
+
+    With --ndjson (JSON format only), the export is fetched in a single request but
+    parsed as it arrives, writing one JSON object per line without holding the
+    whole response in memory.
 """
 
 import os
-import requests
 from requests.auth import HTTPBasicAuth
 import sys
 import simplejson as json
 import argparse
 
+# Route API calls through the shared, pooled session in fabric_client
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..'))
+from fabric_client import get_session
+from fabric_client.jsonstream import iter_response_items, write_ndjson
+from fabric_client.pagination import DEFAULT_PAGE_SIZE, DEFAULT_PREFETCH, iter_items, page_items
+
 # Load environment variables for request authentication parameters
 if "FABRIC_API_PASSWORD" not in os.environ:
     sys.exit("FABRIC_API_PASSWORD environment variable missing")
@@ -22,6 +37,7 @@ FABRIC_API_LOGIN = os.environ['FABRIC_API_LOGIN']
 FABRIC_API_PASSWORD = os.environ['FABRIC_API_PASSWORD']
 FABRIC_API_URL = os.environ.get('FABRIC_API_URL', 'https://api.fabricgenomics.com')
 auth = HTTPBasicAuth(FABRIC_API_LOGIN, FABRIC_API_PASSWORD)
+session = get_session()
 
 
 def export_analysis(args):
@@ -33,11 +49,47 @@ def export_analysis(args):
     else:
         url = "{}/analysis/{}/variants".format(FABRIC_API_URL, args.id)
 
-    result = requests.post(url, auth=auth, data=json.dumps(vars(args)))
+    result = session.post(url, auth=auth, data=json.dumps(vars(args)))
 
     return result.text
 
 
+def stream_analysis_variants(args):
+    """Yield the variants of an analysis export, decoded incrementally from
+    the response body.
+    """
+    if args.structural:
+        url = "{}/analysis/{}/structural_variants".format(FABRIC_API_URL, args.id)
+    else:
+        url = "{}/analysis/{}/variants".format(FABRIC_API_URL, args.id)
+
+    payload = dict(vars(args), format='JSON')
+    result = session.post(url, auth=auth, data=json.dumps(payload), stream=True)
+    if result.status_code != 200:
+        sys.exit(result.text)
+
+    return iter_response_items(result)
+
+
+def iter_analysis_variants(args, page_size=DEFAULT_PAGE_SIZE, prefetch=DEFAULT_PREFETCH):
+    """Yield every variant of an analysis export, page by page, while the
+    next `prefetch` pages are fetched in the background.
+    """
+    if args.structural:
+        url = "{}/analysis/{}/structural_variants".format(FABRIC_API_URL, args.id)
+    else:
+        url = "{}/analysis/{}/variants".format(FABRIC_API_URL, args.id)
+    get_session(pool_size=prefetch + 1)
+
+    def fetch_page(offset, limit):
+        payload = dict(vars(args), offset=offset, limit=limit, format='JSON')
+        result = session.post(url, auth=auth, data=json.dumps(payload))
+        result.raise_for_status()
+        return page_items(result.json())
+
+    return iter_items(fetch_page, page_size=page_size, offset=args.offset or 0, prefetch=prefetch)
+
+
 def main():
     """Main function. Get analyses or one analysis by ID.
     """
@@ -62,12 +114,42 @@ def main():
         "--structural", dest="structural", action="store_true", default=False
     )
     parser.add_argument("--verbose", dest="verbose", action="store_true", default=True)
+    parser.add_argument(
+        "--all", dest="all", action="store_true", default=False,
+        help="fetch every variant, one page at a time (JSON format only)"
+    )
+    parser.add_argument(
+        "--ndjson", dest="ndjson", action="store_true", default=False,
+        help="parse the export as it arrives, one variant per line (JSON format only)"
+    )
+    parser.add_argument(
+        "--page_size", metavar="Variants per page", type=int, default=DEFAULT_PAGE_SIZE
+    )
+    parser.add_argument(
+        "--prefetch", metavar="Pages fetched ahead", type=int, default=DEFAULT_PREFETCH
+    )
 
     args = parser.parse_args()
 
     if not (args.filter_id or args.panel_id or args.gene_set_id):
         exit(parser.parse_args(["-h"]))
 
+    # The paging options are not part of the export request itself
+    all_variants = vars(args).pop("all")
+    page_size = vars(args).pop("page_size")
+    prefetch = vars(args).pop("prefetch")
+    ndjson = vars(args).pop("ndjson")
+
+    if all_variants:
+        for variant in iter_analysis_variants(args, page_size=page_size, prefetch=prefetch):
+            sys.stdout.write(json.dumps(variant))
+            sys.stdout.write("\n")
+        return
+
+    if ndjson:
+        write_ndjson(stream_analysis_variants(args), sys.stdout, dumps=json.dumps)
+        return
+
     results = export_analysis(args)
 
     if args.verbose:
@@ -5,15 +5,29 @@ python get_variant_report_variants.py 12345 --target_variants '[{"chromosome": "
 python get_variant_report_variants.py 12345 --bed_file variants.bed
 python get_variant_report_variants.py 12345 --variant_location "chr1:1635004-1635004"
 python get_variant_report_variants.py 12345 --variant_id 54321
+python get_variant_report_variants.py 12345 --all --page_size 1000 --prefetch 2
+python get_variant_report_variants.py 12345 --all --chrom 1 --start_on_chrom 1000000 --end_on_chrom 2000000
+
+With --all, every variant in the report is written as one JSON object per line. Pages are
+fetched lazily, with the next --prefetch pages requested in the background.
+
+Adding --chrom, --start_on_chrom, --end_on_chrom, --status or --min_score loads the report
+into a compact VariantTable and writes only the matching variants, with the table's columns
+(id, chrom, start, end, ref, alt, status, score).
 """
 
 import os
-import requests
 from requests.auth import HTTPBasicAuth
 import sys
 import json
 import argparse
 
+# Route API calls through the shared, pooled session in fabric_client
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..'))
+from fabric_client import get_session
+from fabric_client.pagination import DEFAULT_PAGE_SIZE, DEFAULT_PREFETCH, iter_items, page_items
+from fabric_client.variant_table import VariantTable
+
 # Load environment variables for request authentication parameters
 if "FABRIC_API_PASSWORD" not in os.environ:
     sys.exit("FABRIC_API_PASSWORD environment variable missing")
@@ -25,6 +39,7 @@ FABRIC_API_LOGIN = os.environ['FABRIC_API_LOGIN']
 FABRIC_API_PASSWORD = os.environ['FABRIC_API_PASSWORD']
 FABRIC_API_URL = os.environ.get('FABRIC_API_URL', 'https://api.fabricgenomics.com')
 auth = HTTPBasicAuth(FABRIC_API_LOGIN, FABRIC_API_PASSWORD)
+session = get_session()
 
 
 def get_variant_report_variant(variant_report_id,
@@ -43,7 +58,7 @@ def get_variant_report_variant(variant_report_id,
     # If target variants JSON is specified, post with the target variants JSON
     if target_variants:
         headers= {'content-type': 'application/json'}
-        result = requests.post(url, auth=auth, data=target_variants, headers=headers)
+        result = session.post(url, auth=auth, data=target_variants, headers=headers)
         return result
     else:
         if not bed_file_path:
@@ -59,7 +74,7 @@ def get_variant_report_variant(variant_report_id,
                 if limit:
                     url = "{}&limit={}".format(url, limit)
             sys.stdout.flush()
-            result = requests.get(url, auth=auth)
+            result = session.get(url, auth=auth)
             return result
         elif bed_file_path:
             # If BED file is specified, post using the target variants bed file as the payload
@@ -67,10 +82,26 @@ def get_variant_report_variant(variant_report_id,
                 sys.exit("BED file path does not point to a real file.")
             with open(bed_file_path,'rb') as payload:
                 headers = {'content-type': 'application/x-www-form-urlencoded'}
-                result = requests.post(url, auth=auth, data=payload, headers=headers)
+                result = session.post(url, auth=auth, data=payload, headers=headers)
                 return result
 
 
+def iter_variant_report_variants(variant_report_id, offset=0, page_size=DEFAULT_PAGE_SIZE,
+                                 prefetch=DEFAULT_PREFETCH):
+    """Yield every variant in a variant report, page by page, while the
+    next `prefetch` pages are fetched in the background.
+    """
+    url = "{}/variant_reports/{}/variants".format(FABRIC_API_URL, variant_report_id)
+    get_session(pool_size=prefetch + 1)
+
+    def fetch_page(page_offset, limit):
+        result = session.get(url, auth=auth, params={'offset': page_offset, 'limit': limit})
+        result.raise_for_status()
+        return page_items(result.json())
+
+    return iter_items(fetch_page, page_size=page_size, offset=offset, prefetch=prefetch)
+
+
 def main():
     """Main function. Patch a report variant.
     """
@@ -82,6 +113,21 @@ def main():
     parser.add_argument('--variant_location', metavar='variant_location', type=str)
     parser.add_argument('--offset', metavar='offset', type=int)
     parser.add_argument('--limit', metavar='limit', type=int)
+    parser.add_argument('--all', dest='all', action='store_true', default=False,
+                        help='fetch every variant, one page at a time')
+    parser.add_argument('--page_size', metavar='page_size', type=int, default=DEFAULT_PAGE_SIZE)
+    parser.add_argument('--prefetch', metavar='pages', type=int, default=DEFAULT_PREFETCH,
+                        help='number of pages fetched ahead in the background with --all')
+    parser.add_argument('--chrom', metavar='chrom', type=str,
+                        help='with --all, keep variants on these chromosomes (comma-separated)')
+    parser.add_argument('--start_on_chrom', metavar='start_on_chrom', type=int,
+                        help='with --all, keep variants ending at or after this position')
+    parser.add_argument('--end_on_chrom', metavar='end_on_chrom', type=int,
+                        help='with --all, keep variants starting at or before this position')
+    parser.add_argument('--status', metavar='status', type=str,
+                        help='with --all, keep variants with these statuses (comma-separated)')
+    parser.add_argument('--min_score', metavar='min_score', type=float,
+                        help='with --all, keep variants scored at least this high')
     args = parser.parse_args()
 
     variant_report_id = args.variant_report_id
@@ -92,10 +138,30 @@ def main():
     offset = args.offset
     limit = args.limit
 
+    if args.all:
+        variants = iter_variant_report_variants(variant_report_id,
+                                                offset=offset or 0,
+                                                page_size=args.page_size,
+                                                prefetch=args.prefetch)
+        filters = {'chrom': args.chrom.split(',') if args.chrom else None,
+                   'start': args.start_on_chrom,
+                   'end': args.end_on_chrom,
+                   'status': args.status.split(',') if args.status else None,
+                   'min_score': args.min_score}
+        if any(value is not None for value in filters.values()):
+            # Hold the report as typed columns rather than one dict per variant
+            table = VariantTable.from_variants(variants)
+            variants = table.rows(table.select(**filters))
+        for variant in variants:
+            sys.stdout.write(json.dumps(variant))
+            sys.stdout.write('\n')
+        return
+
     if not (variant_id or variant_location) and not (offset or limit) and not (bed_file_path or target_variants):
         sys.exit("Variant ID or location must be specified to retrieve a variant, "
                  "or offset and limit must be specified to fetch a batch of variants,"
-                 "or a BED file must be posted to fetch a group of variants,"
+                 "or a BED file must be posted to fetch a group of variants, "
+                 "or --all must be specified to fetch every variant, "
                  "or target variants JSON (e.g. [{\"chromosome\": \"chr1\", \"start_on_chrom\": "
                  "1635004, \"end_on_chrom\": 1635004}] must be specified")
 
@@ -5,11 +5,14 @@ by genome ID or vaast report ID.
 import csv
 import simplejson as json
 import os
-import requests
 from requests.auth import HTTPBasicAuth
 import sys
 import argparse
 
+# Route API calls through the shared, pooled session in fabric_client
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..'))
+from fabric_client import get_session
+
 # Load environment variables for request authentication parameters
 if "FABRIC_API_PASSWORD" not in os.environ:
     sys.exit("FABRIC_API_PASSWORD environment variable missing")
@@ -21,6 +24,7 @@ FABRIC_API_LOGIN = os.environ['FABRIC_API_LOGIN']
 FABRIC_API_PASSWORD = os.environ['FABRIC_API_PASSWORD']
 FABRIC_API_URL = os.environ.get('FABRIC_API_URL', 'https://api.fabricgenomics.com')
 auth = HTTPBasicAuth(FABRIC_API_LOGIN, FABRIC_API_PASSWORD)
+session = get_session()
 
 
 def launch_analysis(report_type,
@@ -49,7 +53,7 @@ def launch_analysis(report_type,
                     'hpo_terms': hpo_terms,
                     'proband_vaast_report_id': proband_vaast_report_id}
 
-    result = requests.post(url, auth=auth, data=json.dumps(data_payload))
+    result = session.post(url, auth=auth, data=json.dumps(data_payload))
     return result.json()
 
 
@@ -1,13 +1,20 @@
 """Get all assay_types in a workspace.
+
+Responses are kept in the local response cache (see fabric_client/cache.py);
+pass --no-cache to always fetch from the API.
 """
 
 import argparse
 import os
-import requests
 from requests.auth import HTTPBasicAuth
 import sys
 import simplejson as json
 
+# Route API calls through the shared, pooled session in fabric_client
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..'))
+from fabric_client import get_session
+from fabric_client.cache import cached_get, open_cache
+
 # Load environment variables for request authentication parameters
 if "FABRIC_API_PASSWORD" not in os.environ:
     sys.exit("FABRIC_API_PASSWORD environment variable missing")
@@ -19,9 +26,10 @@ FABRIC_API_LOGIN = os.environ['FABRIC_API_LOGIN']
 FABRIC_API_PASSWORD = os.environ['FABRIC_API_PASSWORD']
 FABRIC_API_URL = os.environ.get('FABRIC_API_URL', 'https://api.fabricgenomics.com')
 auth = HTTPBasicAuth(FABRIC_API_LOGIN, FABRIC_API_PASSWORD)
+session = get_session()
 
 
-def get_assay_type(assay_type_id):
+def get_assay_type(assay_type_id, cache=None):
     """Fetch all the assay_types associated with the api user's workspace
     """
 
@@ -29,11 +37,11 @@ def get_assay_type(assay_type_id):
     url = "{}/assay_types/{}".format(FABRIC_API_URL, assay_type_id)
 
     # Get request and return json object of an assay type
-    result = requests.get(url, auth=auth)
+    result = cached_get(session, url, cache, auth=auth)
     return result.json()
 
 
-def get_assay_types():
+def get_assay_types(cache=None):
     """Fetch all the assay_types associated with the api user's workspace
     """
 
@@ -41,7 +49,7 @@ def get_assay_types():
     url = "{}/assay_types".format(FABRIC_API_URL)
 
     # Get request and return json object of assay types
-    result = requests.get(url, auth=auth)
+    result = cached_get(session, url, cache, auth=auth)
     return result.json()
 
 
@@ -50,16 +58,19 @@ def main():
     """
     parser = argparse.ArgumentParser(description='Upload a genome.')
     parser.add_argument('--assay_type_id', metavar='assay_type_id')
+    parser.add_argument('--no-cache', dest='no_cache', action='store_true', default=False,
+                        help='always fetch from the API instead of the local response cache')
     args = parser.parse_args()
 
     assay_type_id = args.assay_type_id
+    cache = open_cache(args.no_cache)
 
     if assay_type_id:
-        assay_type = get_assay_type(assay_type_id)
+        assay_type = get_assay_type(assay_type_id, cache=cache)
         sys.stdout.write(json.dumps(assay_type, indent=4))
 
     else:
-        json_response = get_assay_types()
+        json_response = get_assay_types(cache=cache)
         sys.stdout.write(json.dumps(json_response, indent=4))
 
 if __name__ == "__main__":
@@ -4,11 +4,14 @@
 import csv
 import simplejson as json
 import os
-import requests
 from requests.auth import HTTPBasicAuth
 import sys
 import argparse
 
+# Route API calls through the shared, pooled session in fabric_client
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..'))
+from fabric_client import get_session
+
 # Load environment variables for request authentication parameters
 if "FABRIC_API_PASSWORD" not in os.environ:
     sys.exit("FABRIC_API_PASSWORD environment variable missing")
@@ -20,6 +23,7 @@ FABRIC_API_LOGIN = os.environ['FABRIC_API_LOGIN']
 FABRIC_API_PASSWORD = os.environ['FABRIC_API_PASSWORD']
 FABRIC_API_URL = os.environ.get('FABRIC_API_URL', 'https://api.fabricgenomics.com')
 auth = HTTPBasicAuth(FABRIC_API_LOGIN, FABRIC_API_PASSWORD)
+session = get_session()
 
 
 def add_genomes_to_clinical_report(clinical_report_id,
@@ -58,7 +62,7 @@ def add_genomes_to_clinical_report(clinical_report_id,
                     'hpo_terms': json.dumps(hpo_terms) if hpo_terms else None}
 
     sys.stdout.write("Attaching genomes to clinical report...\n")
-    result = requests.put(url, auth=auth, data=json.dumps(data_payload))
+    result = session.put(url, auth=auth, data=json.dumps(data_payload))
     return result.json()
 
 
@@ -159,7 +163,7 @@ def main():
     sys.stdout.write("\n")
 
     if "clinical_report" not in family_report_json.keys():
-        print family_report_json
+        print(family_report_json)
         sys.exit("Failed to launch. Check report parameters for correctness.")
     clinical_report = family_report_json['clinical_report']
     sys.stdout.write('Launched Family Report:\n'
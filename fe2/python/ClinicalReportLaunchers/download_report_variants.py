@@ -3,12 +3,16 @@ Get a clinical report selected variants, this only works for non-panel reports
 """
 
 import os
-import requests
 from requests.auth import HTTPBasicAuth
 import sys
 import simplejson as json
 import argparse
 
+# Route API calls through the shared, pooled session in fabric_client
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..'))
+from fabric_client import get_session
+from fabric_client.downloads import content_disposition_filename, save_response
+
 # Load environment variables for request authentication parameters
 if "FABRIC_API_PASSWORD" not in os.environ:
     sys.exit("FABRIC_API_PASSWORD environment variable missing")
@@ -20,6 +24,7 @@ FABRIC_API_LOGIN = os.environ['FABRIC_API_LOGIN']
 FABRIC_API_PASSWORD = os.environ['FABRIC_API_PASSWORD']
 FABRIC_API_URL = os.environ.get('FABRIC_API_URL', 'https://api.fabricgenomics.com')
 auth = HTTPBasicAuth(FABRIC_API_LOGIN, FABRIC_API_PASSWORD)
+session = get_session()
 
 
 def get_report_selectable_variants(clinical_report_id):
@@ -30,7 +35,7 @@ def get_report_selectable_variants(clinical_report_id):
     url = url.format(FABRIC_API_URL, clinical_report_id)
 
     # If target variants JSON is specified, post with the target variants JSON
-    result = requests.get(url, params={'limit': 10000, 'format': 'vcf'}, auth=auth)
+    result = session.get(url, params={'limit': 10000, 'format': 'vcf'}, auth=auth, stream=True)
     return result
 
 
@@ -48,13 +53,13 @@ def main():
     response = get_report_selectable_variants(cr_id)
 
     if response.status_code == 200:
-        contents = response.content
-        filename = response.headers.get('content-disposition').split('filename=')[-1]
-
-        with open (os.path.join(dest_path, filename), 'w') as target_file:
-            target_file.write(contents)
+        filename = content_disposition_filename(response,
+                                                'report_{}_variants.vcf'.format(cr_id))
+        # Stream the VCF to disk as bytes rather than holding it in memory
+        save_response(response, os.path.join(dest_path, filename))
     else:
-        print(response.text)
+        sys.stdout.write(response.text)
+        sys.stdout.write('\n')
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,125 @@
+"""Download the PDFs of many clinical reports at once.
+Example usages:
+    python export_report_pdfs.py pdfs/ --ids 5327,5328,5329
+    python export_report_pdfs.py pdfs/ --ids_file report_ids.txt --workers 16
+    python export_report_pdfs.py pdfs/ --query "status=APPROVED" --preview
+
+Reports are either listed by id or selected with a /reports/ query string, whose
+results are read page by page. PDFs are downloaded concurrently and streamed to disk,
+each written to a temporary file and renamed into place once complete, as
+<report id>_<file name given by the API>. The output directory keeps a manifest of the
+report version each PDF was made from, and reports whose version has not changed since
+the last export are skipped unless --force is given.
+"""
+
+import os
+from requests.auth import HTTPBasicAuth
+import sys
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+# Route API calls through the shared, pooled session in fabric_client
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..'))
+from fabric_client import get_session
+from fabric_client.downloads import DEFAULT_CHUNK_SIZE
+from fabric_client.pagination import iter_items, page_items
+from fabric_client.report_pdfs import DEFAULT_WORKERS, export_report_pdfs
+
+# Load environment variables for request authentication parameters
+if "FABRIC_API_PASSWORD" not in os.environ:
+    sys.exit("FABRIC_API_PASSWORD environment variable missing")
+
+if "FABRIC_API_LOGIN" not in os.environ:
+    sys.exit("FABRIC_API_LOGIN environment variable missing")
+
+FABRIC_API_LOGIN = os.environ['FABRIC_API_LOGIN']
+FABRIC_API_PASSWORD = os.environ['FABRIC_API_PASSWORD']
+FABRIC_API_URL = os.environ.get('FABRIC_API_URL', 'https://api.fabricgenomics.com')
+auth = HTTPBasicAuth(FABRIC_API_LOGIN, FABRIC_API_PASSWORD)
+session = get_session()
+
+def get_report(report_id):
+    """Fetch one report's JSON, for its version. If the lookup fails, the
+    PDF is still fetched, just without the version check.
+    """
+    url = "{}/reports/{}".format(FABRIC_API_URL, report_id)
+    try:
+        result = session.get(url, auth=auth)
+        result.raise_for_status()
+        return result.json()
+    except Exception as e:
+        sys.stderr.write("Could not look up report {}: {}\n".format(report_id, e))
+        return {'id': report_id}
+
+
+def query_reports(query):
+    """Return every report matching a /reports/ query string, reading the
+    listing page by page.
+    """
+    url = "{}/reports/?{}".format(FABRIC_API_URL, query)
+
+    def fetch_page(offset, limit):
+        result = session.get(url, auth=auth, params={'offset': offset, 'limit': limit})
+        result.raise_for_status()
+        return page_items(result.json())
+
+    return list(iter_items(fetch_page))
+
+
+def print_result(report_id, outcome, size):
+    sys.stdout.write("{}\t{}\t{}\n".format(report_id, outcome, size))
+    sys.stdout.flush()
+
+
+def main():
+    """Main function. Export PDFs for a list of reports or a report query.
+    """
+    parser = argparse.ArgumentParser(description='Download the PDFs of many clinical reports.')
+    parser.add_argument('directory', metavar='directory', type=str)
+    parser.add_argument('--ids', metavar='report_ids', type=str,
+                        help='comma-separated report ids')
+    parser.add_argument('--ids_file', metavar='ids_file', type=str,
+                        help='file with one report id per line')
+    parser.add_argument('--query', metavar='query', type=str,
+                        help='/reports/ query string, e.g. "accession_id=ABC&genome_id=103"')
+    parser.add_argument('--preview', dest='preview', action='store_true', default=False,
+                        help='download draft preview PDFs instead of approved ones')
+    parser.add_argument('--workers', metavar='workers', type=int, default=DEFAULT_WORKERS)
+    parser.add_argument('--chunk_size', metavar='KB', type=int, default=DEFAULT_CHUNK_SIZE // 1024,
+                        help='write buffer size in KB')
+    parser.add_argument('--force', dest='force', action='store_true', default=False,
+                        help='download even if the report version has not changed')
+    args = parser.parse_args()
+
+    report_ids = []
+    if args.ids:
+        report_ids.extend(int(report_id) for report_id in args.ids.split(','))
+    if args.ids_file:
+        with open(args.ids_file) as f:
+            report_ids.extend(int(line) for line in f if line.strip())
+    if not (report_ids or args.query):
+        sys.exit("Report ids (--ids or --ids_file) or a --query must be specified")
+
+    get_session(pool_size=args.workers)
+    reports = query_reports(args.query) if args.query else []
+    if report_ids:
+        # The PDF alone doesn't say which version it came from, so look the
+        # reports up first, concurrently
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            reports.extend(executor.map(get_report, report_ids))
+
+    results = export_report_pdfs(session, reports, args.directory, workers=args.workers,
+                                 on_result=print_result, base_url=FABRIC_API_URL, auth=auth,
+                                 preview=args.preview, force=args.force,
+                                 chunk_size=args.chunk_size * 1024)
+    failed = [result for result in results if result[1].startswith('failed')]
+    sys.stderr.write("{} downloaded, {} skipped, {} failed\n".format(
+        sum(1 for result in results if result[1] == 'downloaded'),
+        sum(1 for result in results if result[1] == 'skipped'),
+        len(failed)))
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
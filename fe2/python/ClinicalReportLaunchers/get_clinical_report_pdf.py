@@ -4,15 +4,21 @@ Example usages:
     python get_clinical_report_pdf.py 5327 . --preview True
  Fetch an approved report PDF:
     python get_clinical_report_pdf.py 5327 .
+
+ To download many reports' PDFs at once, use export_report_pdfs.py.
 """
 
 import os
-import requests
 from requests.auth import HTTPBasicAuth
 import sys
 import simplejson as json
 import argparse
 
+# Route API calls through the shared, pooled session in fabric_client
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..'))
+from fabric_client import get_session
+from fabric_client.downloads import content_disposition_filename, save_response
+
 # Load environment variables for request authentication parameters
 if "FABRIC_API_PASSWORD" not in os.environ:
     sys.exit("FABRIC_API_PASSWORD environment variable missing")
@@ -24,6 +30,7 @@ FABRIC_API_LOGIN = os.environ['FABRIC_API_LOGIN']
 FABRIC_API_PASSWORD = os.environ['FABRIC_API_PASSWORD']
 FABRIC_API_URL = os.environ.get('FABRIC_API_URL', 'https://api.fabricgenomics.com')
 auth = HTTPBasicAuth(FABRIC_API_LOGIN, FABRIC_API_PASSWORD)
+session = get_session()
 
 
 def get_clinical_report_pdf(cr_id, preview=False):
@@ -37,7 +44,7 @@ def get_clinical_report_pdf(cr_id, preview=False):
     url = url.format(FABRIC_API_URL, cr_id)
 
     sys.stdout.flush()
-    result = requests.get(url, auth=auth)
+    result = session.get(url, auth=auth, stream=True)
     return result
 
 
@@ -57,13 +64,12 @@ def main():
     response = get_clinical_report_pdf(cr_id, preview=preview)
 
     if response.status_code == 200:
-        contents = response.content
-        filename = response.headers.get('content-disposition').split('filename=')[-1]
-
-        with open (os.path.join(dest_path, filename), 'w') as target_file:
-            target_file.write(contents)
+        filename = content_disposition_filename(response, 'report_{}.pdf'.format(cr_id))
+        # Stream to disk rather than holding the whole PDF in memory
+        save_response(response, os.path.join(dest_path, filename))
     else:
-        print response.text
+        sys.stdout.write(response.text)
+        sys.stdout.write('\n')
 
 if __name__ == "__main__":
     main()
@@ -52,12 +52,15 @@ Sample output:
 """
 
 import os
-import requests
 from requests.auth import HTTPBasicAuth
 import sys
 import simplejson as json
 import argparse
 
+# Route API calls through the shared, pooled session in fabric_client
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..'))
+from fabric_client import get_session
+
 # Load environment variables for request authentication parameters
 if "FABRIC_API_PASSWORD" not in os.environ:
     sys.exit("FABRIC_API_PASSWORD environment variable missing")
@@ -69,6 +72,7 @@ FABRIC_API_LOGIN = os.environ['FABRIC_API_LOGIN']
 FABRIC_API_PASSWORD = os.environ['FABRIC_API_PASSWORD']
 FABRIC_API_URL = os.environ.get('FABRIC_API_URL', 'https://api.fabricgenomics.com')
 auth = HTTPBasicAuth(FABRIC_API_LOGIN, FABRIC_API_PASSWORD)
+session = get_session()
 
 
 def get_clinical_reports(accession_id, genome_id, external_id, genome_name):
@@ -92,7 +96,7 @@ def get_clinical_reports(accession_id, genome_id, external_id, genome_name):
     url = url.format(FABRIC_API_URL)
 
     sys.stdout.flush()
-    result = requests.get(url, auth=auth)
+    result = session.get(url, auth=auth)
     return result.json()
 
 
@@ -115,7 +119,8 @@ def main():
     genome_name = args.n
 
     json_response = get_clinical_reports(accession_id, genome_id, external_id, genome_name)
-    print json.dumps(json_response, indent=4)
+    sys.stdout.write(json.dumps(json_response, indent=4))
+    sys.stdout.write('\n')
 
 if __name__ == "__main__":
     main()
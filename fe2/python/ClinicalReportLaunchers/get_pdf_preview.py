@@ -3,12 +3,16 @@ Usage: post_patient_fields.py 2029 '{"Patient Name": "Eric", "Gender": "Male", "
 """
 
 import os
-import requests
 from requests.auth import HTTPBasicAuth
 import sys
 import json
 import argparse
 
+# Route API calls through the shared, pooled session in fabric_client
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..'))
+from fabric_client import get_session
+from fabric_client.downloads import DEFAULT_CHUNK_SIZE, save_response
+
 # Load environment variables for request authentication parameters
 if "FABRIC_API_PASSWORD" not in os.environ:
     sys.exit("FABRIC_API_PASSWORD environment variable missing")
@@ -20,9 +24,10 @@ FABRIC_API_LOGIN = os.environ['FABRIC_API_LOGIN']
 FABRIC_API_PASSWORD = os.environ['FABRIC_API_PASSWORD']
 FABRIC_API_URL = os.environ.get('FABRIC_API_URL', 'https://api.fabricgenomics.com')
 auth = HTTPBasicAuth(FABRIC_API_LOGIN, FABRIC_API_PASSWORD)
+session = get_session()
 
 
-def pdf_preview(cr_id):
+def pdf_preview(cr_id, chunk_size=DEFAULT_CHUNK_SIZE):
     """Use the Omicia API to fill in custom patient fields for a clinical report
     """
     # Construct request
@@ -32,10 +37,10 @@ def pdf_preview(cr_id):
     sys.stdout.write("Getting a PDF Preview...")
     sys.stdout.write("\n\n")
     sys.stdout.flush()
-    response = requests.get(url, auth=auth)
-    with open('report_{}.pdf'.format(cr_id), 'wb') as pdf_file:
-        for block in response.iter_content(1024):
-            pdf_file.write(block)
+    response = session.get(url, auth=auth, stream=True)
+    if response.status_code != 200:
+        sys.exit(response.text)
+    save_response(response, 'report_{}.pdf'.format(cr_id), chunk_size=chunk_size)
     sys.stdout.write("wrote report_{}.pdf\n".format(cr_id))
 
 
@@ -44,11 +49,13 @@ def main():
     """
     parser = argparse.ArgumentParser(description='Get PDF preview for current report.')
     parser.add_argument('c', metavar='clinical_report_id', type=int)
+    parser.add_argument('--chunk_size', metavar='KB', type=int, default=DEFAULT_CHUNK_SIZE // 1024,
+                        help='download block size in KB')
     args = parser.parse_args()
 
     cr_id = args.c
 
-    pdf_preview(cr_id)
+    pdf_preview(cr_id, chunk_size=args.chunk_size * 1024)
 
 if __name__ == "__main__":
     main()
@@ -5,12 +5,15 @@ python get_report_selectable_variants.py 12345 --target_variants '[{"chromosome"
 """
 
 import os
-import requests
 from requests.auth import HTTPBasicAuth
 import sys
 import json
 import argparse
 
+# Route API calls through the shared, pooled session in fabric_client
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..'))
+from fabric_client import get_session
+
 # Load environment variables for request authentication parameters
 if "FABRIC_API_PASSWORD" not in os.environ:
     sys.exit("FABRIC_API_PASSWORD environment variable missing")
@@ -22,6 +25,7 @@ FABRIC_API_LOGIN = os.environ['FABRIC_API_LOGIN']
 FABRIC_API_PASSWORD = os.environ['FABRIC_API_PASSWORD']
 FABRIC_API_URL = os.environ.get('FABRIC_API_URL', 'https://api.fabricgenomics.com')
 auth = HTTPBasicAuth(FABRIC_API_LOGIN, FABRIC_API_PASSWORD)
+session = get_session()
 
 def get_report_selectable_variants(clinical_report_id, target_variants=None):
     """Get report variants by location, id or simply all.
@@ -37,7 +41,7 @@ def get_report_selectable_variants(clinical_report_id, target_variants=None):
     # If target variants JSON is specified, post with the target variants JSON
     if target_variants:
         headers = {'content-type': 'application/json'}
-        result = requests.post(url, auth=auth, data=json.dumps(target_variants), headers=headers)
+        result = session.post(url, auth=auth, data=json.dumps(target_variants), headers=headers)
         return result
 
 
@@ -1,10 +1,28 @@
 """Query for a report by id to see its status.
+Example usages:
+    python get_report_status.py 1542
+    python get_report_status.py 1542 1543 1544 --watch
+    python get_report_status.py --ids_file report_ids.txt --watch --on_change "./notify.sh"
+
+With --watch, every report is polled until it reaches one of the --until statuses,
+or by default until it is no longer WAITING or RUNNING, so that reports that fail
+or are already FINAL end the watch too. Each report is checked less often while its
+status stays the same (from --min_interval up to --max_interval seconds), and
+reports due at about the same time are checked together. Each status change is
+printed, and --on_change runs a shell command with REPORT_ID, OLD_STATUS and
+NEW_STATUS set.
 """
 
 import os
-import requests
 from requests.auth import HTTPBasicAuth
 import sys
+import argparse
+
+# Route API calls through the shared, pooled session in fabric_client
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..'))
+from fabric_client import get_session
+from fabric_client.watch import (DEFAULT_MAX_INTERVAL, DEFAULT_MIN_INTERVAL, DEFAULT_WORKERS,
+                                 StatusWatcher, hook_command)
 
 #Load environment variables for request authentication parameters
 if "FABRIC_API_PASSWORD" not in os.environ:
@@ -17,6 +35,10 @@ FABRIC_API_LOGIN = os.environ['FABRIC_API_LOGIN']
 FABRIC_API_PASSWORD = os.environ['FABRIC_API_PASSWORD']
 FABRIC_API_URL = os.environ.get('FABRIC_API_URL', 'https://api.fabricgenomics.com')
 auth = HTTPBasicAuth(FABRIC_API_LOGIN, FABRIC_API_PASSWORD)
+session = get_session()
+
+# Statuses of a report that is still being generated
+IN_PROGRESS_STATUSES = ('WAITING', 'RUNNING')
 
 
 def get_report(report_id):
@@ -27,27 +49,103 @@ def get_report(report_id):
     url = url.format(FABRIC_API_URL,
                      report_id)
 
-    result = requests.get(url, auth=auth)
+    result = session.get(url, auth=auth)
     return result.json()
 
 
-def main(argv):
-    """Main function. Retrieve a report's status by id.
+def get_report_status(report_id):
+    """Return a report's status, raising an error if it can't be read.
     """
-    if len(argv) < 1:
-        sys.exit("Usage: python get_report.py <report_id>")
-    report_id = argv[0]
-
     json_response = get_report(report_id)
-
-    # Access the JSON object's 'status' attribute
     try:
-        sys.stdout.write("Report Status: {}\n".format(json_response['status']))
+        return json_response['status']
     except KeyError:
-        if json_response['description']:
-            sys.stderr.write('Error: {}\n'.format(json_response['description']))
+        raise ValueError(json_response.get('description') or 'Something went wrong...')
+
+
+def watch_reports(report_ids, until, min_interval, max_interval, workers, on_change=None,
+                  timeout=None):
+    """Poll reports until each reaches one of the until statuses, or with
+    until empty, until each leaves IN_PROGRESS_STATUSES, printing every
+    change. Returns the last status seen for each report and the ids of the
+    reports still unfinished.
+    """
+    def report_change(report_id, old_status, new_status):
+        if old_status is None:
+            sys.stdout.write("Report {}: {}\n".format(report_id, new_status))
+        else:
+            sys.stdout.write("Report {}: {} -> {}\n".format(report_id, old_status, new_status))
+        sys.stdout.flush()
+        if on_change:
+            on_change(report_id, old_status, new_status)
+
+    get_session(pool_size=workers)
+    watcher = StatusWatcher(get_report_status, until, on_change=report_change,
+                            min_interval=min_interval, max_interval=max_interval,
+                            workers=workers,
+                            in_progress_statuses=None if until else IN_PROGRESS_STATUSES)
+    statuses = watcher.watch(report_ids, timeout=timeout)
+    sys.stderr.write("Made {} status requests for {} reports\n".format(watcher.requests,
+                                                                      len(report_ids)))
+    pending = [report_id for report_id in report_ids
+               if not watcher.is_terminal(statuses.get(report_id))]
+    return statuses, pending
+
+
+def main():
+    """Main function. Retrieve the status of one or more reports by id, once or until done.
+    """
+    parser = argparse.ArgumentParser(description='Get or watch the status of clinical reports.')
+    parser.add_argument('report_ids', metavar='report_id', type=int, nargs='*')
+    parser.add_argument('--ids_file', metavar='ids_file', type=str,
+                        help='file with one report id per line')
+    parser.add_argument('--watch', dest='watch', action='store_true', default=False,
+                        help='poll until every report reaches one of the --until statuses')
+    parser.add_argument('--until', metavar='statuses', type=str,
+                        help='comma-separated statuses that end the watch for a report; by '
+                             'default any status other than {}'.format(
+                                 ' and '.join(IN_PROGRESS_STATUSES)))
+    parser.add_argument('--min_interval', metavar='seconds', type=float,
+                        default=DEFAULT_MIN_INTERVAL)
+    parser.add_argument('--max_interval', metavar='seconds', type=float,
+                        default=DEFAULT_MAX_INTERVAL)
+    parser.add_argument('--workers', metavar='workers', type=int, default=DEFAULT_WORKERS,
+                        help='status checks made at once')
+    parser.add_argument('--on_change', metavar='command', type=str,
+                        help='shell command run on each status change')
+    parser.add_argument('--timeout', metavar='seconds', type=float,
+                        help='give up watching after this long')
+    args = parser.parse_args()
+
+    report_ids = list(args.report_ids)
+    if args.ids_file:
+        with open(args.ids_file) as f:
+            report_ids.extend(int(line) for line in f if line.strip())
+    if not report_ids:
+        sys.exit("Usage: python get_report_status.py <report_id> [<report_id> ...]")
+
+    if args.watch:
+        until = [status.strip() for status in args.until.split(',')] if args.until else []
+        on_change = hook_command(args.on_change) if args.on_change else None
+        statuses, pending = watch_reports(report_ids, until, args.min_interval,
+                                          args.max_interval, args.workers,
+                                          on_change=on_change, timeout=args.timeout)
+        if pending:
+            sys.exit("{} reports did not reach {}".format(
+                len(pending), args.until or 'a final status'))
+        return
+
+    for report_id in report_ids:
+        # Access the JSON object's 'status' attribute
+        try:
+            status = get_report_status(report_id)
+        except ValueError as e:
+            sys.stderr.write('Error: {}\n'.format(e))
+            continue
+        if len(report_ids) == 1:
+            sys.stdout.write("Report Status: {}\n".format(status))
         else:
-            sys.stderr.write('Something went wrong...')
+            sys.stdout.write("Report {} Status: {}\n".format(report_id, status))
 
 if __name__ == "__main__":
-    main(sys.argv[1:])
\ No newline at end of file
+    main()
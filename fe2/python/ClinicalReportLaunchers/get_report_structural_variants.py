@@ -3,15 +3,23 @@ Usages: python get_report_variants.py 1542
         python get_report_variants.py 1542 --status "FAILED_CONFIRMATION,REVIEWED"
         python get_report_variants.py 1542 --status "CONFIRMED" --format "VCF"
         python get_report_variants.py 1542 --chr "Y" --start_on_chrom 1339 --status "REVIEWED"
+        python get_report_structural_variants.py 1542 --format "VCF" --bgzip > sv.vcf.gz
+
+VCF downloads are streamed straight to stdout in --chunk_size blocks, and with --bgzip
+are BGZF-compressed on the way.
 """
 
 import os
-import requests
 from requests.auth import HTTPBasicAuth
 import sys
 import json
 import argparse
-import urllib
+
+# Route API calls through the shared, pooled session in fabric_client
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..'))
+from fabric_client import get_session
+from fabric_client.downloads import DEFAULT_CHUNK_SIZE, write_response
+from fabric_client.jsonstream import iter_response_items
 
 # Load environment variables for request authentication parameters
 if "FABRIC_API_PASSWORD" not in os.environ:
@@ -24,9 +32,11 @@ FABRIC_API_LOGIN = os.environ['FABRIC_API_LOGIN']
 FABRIC_API_PASSWORD = os.environ['FABRIC_API_PASSWORD']
 FABRIC_API_URL = os.environ.get('FABRIC_API_URL', 'https://api.fabricgenomics.com')
 auth = HTTPBasicAuth(FABRIC_API_LOGIN, FABRIC_API_PASSWORD)
+session = get_session()
 
 
-def get_cr_variants(cr_id, statuses, _format, chrom, start_on_chrom, end_on_chrom, extended=False):
+def get_cr_variants(cr_id, statuses, _format, chrom, start_on_chrom, end_on_chrom, extended=False,
+                    stream=False):
     """Use the Omicia API to get report variants that meet the filtering criteria.
     """
     params = []
@@ -51,16 +61,14 @@ def get_cr_variants(cr_id, statuses, _format, chrom, start_on_chrom, end_on_chro
     if _format in ["VCF", "CSV"]:
         params.append(('format', _format))
 
-    # Do seq allows for the multiple values for one parameter name, as could be the case for the
-    # status or to_report parameters.
-    data = urllib.urlencode(params, doseq=True)
-
     # Construct request
-    url = "{}/reports/{}/structural_variants?{}"
-    url = url.format(FABRIC_API_URL, cr_id, data)
+    url = "{}/reports/{}/structural_variants"
+    url = url.format(FABRIC_API_URL, cr_id)
 
+    # A list of pairs allows for multiple values for one parameter name, as could be the case
+    # for the status parameter.
     sys.stdout.flush()
-    result = requests.get(url, auth=auth)
+    result = session.get(url, auth=auth, params=params, stream=stream)
     return result
 
 
@@ -78,6 +86,10 @@ def main():
                                                                    'X', 'Y', 'M'])
     parser.add_argument('--start_on_chrom', metavar='start_on_chrom', type=int)
     parser.add_argument('--end_on_chrom', metavar='end_on_chrom', type=int)
+    parser.add_argument('--chunk_size', metavar='KB', type=int, default=DEFAULT_CHUNK_SIZE // 1024,
+                        help='download block size in KB for VCF')
+    parser.add_argument('--bgzip', dest='bgzip', action='store_true', default=False,
+                        help='BGZF-compress VCF output')
 
     args = parser.parse_args()
 
@@ -90,19 +102,19 @@ def main():
 
     statuses = status.split(",") if status else None
 
-    response = get_cr_variants(cr_id, statuses, _format, chrom, start_on_chrom, end_on_chrom)
-    if _format == 'VCF':
-        for block in response.iter_content(1024):
-            sys.stdout.write(block)
+    response = get_cr_variants(cr_id, statuses, _format, chrom, start_on_chrom, end_on_chrom,
+                               stream=True)
+    if response.status_code != 200:
+        sys.exit(response.text)
+    elif _format == 'VCF':
+        sys.stdout.flush()
+        write_response(response, sys.stdout.fileno(), chunk_size=args.chunk_size * 1024,
+                       bgzip=args.bgzip)
     else:
-        try:
-            response_json = response.json()
-            variants = response_json['objects']
-            for variant in variants:
-                sys.stdout.write(json.dumps(variant, indent=4))
-                sys.stdout.write('\n')
-        except KeyError:
-            sys.stderr.write(response.json())
+        # Parse the variants as they arrive rather than loading the whole report
+        for variant in iter_response_items(response, keys=('objects',)):
+            sys.stdout.write(json.dumps(variant, indent=4))
+            sys.stdout.write('\n')
 
 
 if __name__ == "__main__":
@@ -3,15 +3,28 @@ Usages: python get_report_variants.py 1542
         python get_report_variants.py 1542 --status "FAILED_CONFIRMATION,REVIEWED"
         python get_report_variants.py 1542 --status "CONFIRMED" --format "VCF"
         python get_report_variants.py 1542 --chr "Y" --start_on_chrom 1339 --status "REVIEWED"
+        python get_report_variants.py 1542 --ndjson > variants.ndjson
+        python get_report_variants.py 1542 --format "VCF" --bgzip > variants.vcf.gz
+
+With --ndjson (JSON format only), the response is parsed as it arrives and each
+variant is written as one JSON object per line, so memory use stays flat even
+for whole-genome reports.
+
+VCF and CSV downloads are streamed straight to stdout in --chunk_size blocks. With
+--bgzip they are BGZF-compressed on the way, ready for tabix.
 """
 
 import os
-import requests
 from requests.auth import HTTPBasicAuth
 import sys
 import json
 import argparse
-import urllib
+
+# Route API calls through the shared, pooled session in fabric_client
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..'))
+from fabric_client import get_session
+from fabric_client.downloads import DEFAULT_CHUNK_SIZE, write_response
+from fabric_client.jsonstream import iter_response_items, write_ndjson
 
 # Load environment variables for request authentication parameters
 if "FABRIC_API_PASSWORD" not in os.environ:
@@ -24,10 +37,11 @@ FABRIC_API_LOGIN = os.environ['FABRIC_API_LOGIN']
 FABRIC_API_PASSWORD = os.environ['FABRIC_API_PASSWORD']
 FABRIC_API_URL = os.environ.get('FABRIC_API_URL', 'https://api.fabricgenomics.com')
 auth = HTTPBasicAuth(FABRIC_API_LOGIN, FABRIC_API_PASSWORD)
+session = get_session()
 
 
 def get_cr_variants(cr_id, statuses, to_reports, _format, chrom, start_on_chrom, end_on_chrom, alt,
-                    extended=False):
+                    extended=False, stream=False):
     """Use the Omicia API to get report variants that meet the filtering criteria.
     """
     params = []
@@ -60,15 +74,13 @@ def get_cr_variants(cr_id, statuses, to_reports, _format, chrom, start_on_chrom,
     if _format in ["VCF", "CSV"]:
         params.append(('format', _format))
 
-    # Do seq allows for the multiple values for one parameter name, as could be the case for the
-    # status or to_report parameters.
-    data = urllib.urlencode(params, doseq=True)
-
     # Construct request
-    url = "{}/reports/{}/variants?{}"
-    url = url.format(FABRIC_API_URL, cr_id, data)
+    url = "{}/reports/{}/variants"
+    url = url.format(FABRIC_API_URL, cr_id)
 
-    result = requests.get(url, auth=auth)
+    # A list of pairs allows for multiple values for one parameter name, as could be the case
+    # for the status or to_report parameters.
+    result = session.get(url, auth=auth, params=params, stream=stream)
     return result
 
 
@@ -89,6 +101,12 @@ def main():
     parser.add_argument('--start_on_chrom', metavar='start_on_chrom', type=int)
     parser.add_argument('--end_on_chrom', metavar='end_on_chrom', type=int)
     parser.add_argument('--alt', metavar='alt', type=str, choices=['A', 'T', 'C', 'G'])
+    parser.add_argument('--ndjson', dest='ndjson', action='store_true', default=False,
+                        help='stream variants as one JSON object per line (JSON format only)')
+    parser.add_argument('--chunk_size', metavar='KB', type=int, default=DEFAULT_CHUNK_SIZE // 1024,
+                        help='download block size in KB for VCF and CSV')
+    parser.add_argument('--bgzip', dest='bgzip', action='store_true', default=False,
+                        help='BGZF-compress VCF and CSV output')
 
     args = parser.parse_args()
 
@@ -101,6 +119,7 @@ def main():
     start_on_chrom = args.start_on_chrom
     end_on_chrom = args.end_on_chrom
     alt = args.alt
+    ndjson = args.ndjson and _format == 'JSON'
 
     statuses = status.split(",") if status else None
     to_reports = to_report.split(",") if to_report else None
@@ -113,13 +132,18 @@ def main():
                                start_on_chrom,
                                end_on_chrom,
                                alt,
-                               extended=extended=='true')
-    if _format == 'CSV':
-        for block in response.iter_content(1024):
-            sys.stdout.write(block)
-    elif _format == 'VCF':
-        for block in response.iter_content(1024):
-            sys.stdout.write(block)
+                               extended=extended=='true',
+                               stream=ndjson or _format in ['VCF', 'CSV'])
+    if ndjson:
+        if response.status_code != 200:
+            sys.exit(response.text)
+        write_ndjson(iter_response_items(response), sys.stdout)
+    elif _format in ['VCF', 'CSV']:
+        if response.status_code != 200:
+            sys.exit(response.text)
+        sys.stdout.flush()
+        write_response(response, sys.stdout.fileno(), chunk_size=args.chunk_size * 1024,
+                       bgzip=args.bgzip)
     else:
         try:
             response_json = response.json()
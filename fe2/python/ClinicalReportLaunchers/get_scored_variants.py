@@ -1,14 +1,22 @@
 """
 Get a clinical report's scored variants.
+Usages: python get_scored_variants.py 1542
+        python get_scored_variants.py 1542 --ndjson > scored_variants.ndjson
+
+With --ndjson, the response is parsed as it arrives and each variant is written
+as one JSON object per line, so memory use stays flat even for large reports.
 """
 
 import os
-import requests
 from requests.auth import HTTPBasicAuth
 import sys
 import json
 import argparse
-import urllib
+
+# Route API calls through the shared, pooled session in fabric_client
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..'))
+from fabric_client import get_session
+from fabric_client.jsonstream import iter_response_items, write_ndjson
 
 # Load environment variables for request authentication parameters
 if "FABRIC_API_PASSWORD" not in os.environ:
@@ -21,21 +29,20 @@ FABRIC_API_LOGIN = os.environ['FABRIC_API_LOGIN']
 FABRIC_API_PASSWORD = os.environ['FABRIC_API_PASSWORD']
 FABRIC_API_URL = os.environ.get('FABRIC_API_URL', 'https://api.fabricgenomics.com')
 auth = HTTPBasicAuth(FABRIC_API_LOGIN, FABRIC_API_PASSWORD)
+session = get_session()
 
 
-def get_cr_scored_variants(cr_id, scoring_status=None, audit_log=None):
+def get_cr_scored_variants(cr_id, scoring_status=None, audit_log=None, stream=False):
     params = []
     if scoring_status:
         params.append(('scoring_status', scoring_status))
     if audit_log:
         params.append(('audit_log', audit_log))
 
-    data = urllib.urlencode(params)
-
-    url = "{}/reports/{}/variants/scored?{}"
-    url = url.format(FABRIC_API_URL, cr_id, data)
+    url = "{}/reports/{}/variants/scored"
+    url = url.format(FABRIC_API_URL, cr_id)
 
-    result = requests.get(url, auth=auth)
+    result = session.get(url, auth=auth, params=params, stream=stream)
     return result
 
 def main():
@@ -50,14 +57,22 @@ def main():
                         choices=['scored', 'scoring', 'classified'],
                         default=None)
     parser.add_argument('--audit_log', metavar='status', type=str, choices=['true'], default=None)
+    parser.add_argument('--ndjson', dest='ndjson', action='store_true', default=False,
+                        help='stream variants as one JSON object per line')
 
     args = parser.parse_args()
 
     cr_id = args.cr_id
     scoring_status = args.scoring_status
     audit_log = args.audit_log
+    ndjson = args.ndjson
 
-    response = get_cr_scored_variants(cr_id, scoring_status, audit_log)
+    response = get_cr_scored_variants(cr_id, scoring_status, audit_log, stream=ndjson)
+    if ndjson:
+        if response.status_code != 200:
+            sys.exit(response.text)
+        write_ndjson(iter_response_items(response), sys.stdout)
+        return
     try:
         response_json = response.json()
         sys.stdout.write(json.dumps(response_json, indent=4))
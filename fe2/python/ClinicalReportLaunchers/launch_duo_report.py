@@ -1,5 +1,5 @@
 """Create a new family report from an new genome duo. This requires putting all
-three family genomes in a folder along with a descriptor file titled 'family_manifest.csv,'
+three family genomes in a folder along with a descriptor file titled 'duo_manifest.csv,'
 which should have the following format:
 
 filename,label,external_id,sex,format,affected,relation
@@ -30,10 +30,13 @@ line endings are newlines (\n) and not the deprecated carriage returns (\r)
 import csv
 import json
 import os
-import requests
 from requests.auth import HTTPBasicAuth
 import sys
 
+# Route API calls through the shared, pooled session in fabric_client
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..'))
+from fabric_client import get_session
+
 _MANIFEST_FILENAME = 'duo_manifest.csv'
 
 #Load environment variables for request authentication parameters
@@ -47,6 +50,7 @@ FABRIC_API_LOGIN = os.environ['FABRIC_API_LOGIN']
 FABRIC_API_PASSWORD = os.environ['FABRIC_API_PASSWORD']
 FABRIC_API_URL = os.environ.get('FABRIC_API_URL', 'https://api.fabricgenomics.com')
 auth = HTTPBasicAuth(FABRIC_API_LOGIN, FABRIC_API_PASSWORD)
+session = get_session()
 
 
 # A map between the row numbers and fields from the patient information csv
@@ -70,7 +74,7 @@ def generate_patient_info_json(patient_info_file_name):
     generate and return a JSON object representing its contents.
     """
     patient_info = {}
-    with open(patient_info_file_name, 'rU') as f:
+    with open(patient_info_file_name) as f:
         reader = csv.reader(f)
         next(reader, None)  # Skip the header
         for i, row in enumerate(reader):
@@ -91,7 +95,7 @@ def add_fields_to_cr(cr_id, patient_fields):
     sys.stdout.write("Adding custom patient fields to report...")
     sys.stdout.write("\n\n")
     sys.stdout.flush()
-    result = requests.post(url, auth=auth, data=url_payload)
+    result = session.post(url, auth=auth, data=url_payload)
     return result.json()
 
 
@@ -107,9 +111,9 @@ def get_family_manifest_info(family_folder):
         1: 'related'
     }
 
-    # First check to make sure there is in fact a family_manifest.csv file
-    if 'family_manifest.csv' not in os.listdir(family_folder):
-        sys.exit("No family_manifest.csv file in folder provided.")
+    # First check to make sure there is in fact a duo_manifest.csv file
+    if _MANIFEST_FILENAME not in os.listdir(family_folder):
+        sys.exit("No {} file in folder provided.".format(_MANIFEST_FILENAME))
 
     with open(os.path.join(family_folder, _MANIFEST_FILENAME)) as f:
         reader = csv.reader(f)
@@ -146,7 +150,7 @@ def launch_duo_report(related_genome_id, duo_relation, duo_affected,
                    'accession_id': accession_id}
 
     sys.stdout.write("Launching family report...\n")
-    result = requests.post(url, auth=auth, data=json.dumps(url_payload))
+    result = session.post(url, auth=auth, data=json.dumps(url_payload))
 
     return result.json()
 
@@ -165,7 +169,7 @@ def upload_genome(project_id, genome_info, family_folder):
     # Upload genome
     with open(family_folder + "/" + genome_info['genome_filename'], 'rb') as file_handle:
         # Post request and store newly uploaded genome's information
-        result = requests.put(url, data=file_handle, params=payload, auth=auth)
+        result = session.put(url, data=file_handle, params=payload, auth=auth)
         sys.stdout.write(".")
         sys.stdout.flush()
         return result.json()["genome_id"]
@@ -250,7 +254,7 @@ def main(argv):
     sys.stdout.write("\n")
 
     if "clinical_report" not in family_report_json.keys():
-        print family_report_json
+        print(family_report_json)
         sys.exit("Failed to launch. Check report parameters for correctness.")
     clinical_report = family_report_json['clinical_report']
 
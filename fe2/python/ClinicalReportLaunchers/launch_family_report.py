@@ -26,15 +26,25 @@ Ordering Physician,Paul Billings
 
 If you are having trouble with using either csv file, make sure its
 line endings are newlines (\n) and not the deprecated carriage returns (\r)
+
+Genomes whose files were already uploaded to the project from this machine
+(for instance by a run that failed before launching the report) are not
+sent again; their recorded genome ids are reused (see
+fabric_client/upload_index.py).
 """
 
 import csv
 import json
 import os
-import requests
 from requests.auth import HTTPBasicAuth
 import sys
 
+# Route API calls through the shared, pooled session in fabric_client
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..'))
+from fabric_client import get_session
+from fabric_client.sendfile import FileBody
+from fabric_client.upload_index import UploadIndex, upload_once
+
 #Load environment variables for request authentication parameters
 if "FABRIC_API_PASSWORD" not in os.environ:
     sys.exit("FABRIC_API_PASSWORD environment variable missing")
@@ -46,6 +56,8 @@ FABRIC_API_LOGIN = os.environ['FABRIC_API_LOGIN']
 FABRIC_API_PASSWORD = os.environ['FABRIC_API_PASSWORD']
 FABRIC_API_URL = os.environ.get('FABRIC_API_URL', 'https://api.fabricgenomics.com')
 auth = HTTPBasicAuth(FABRIC_API_LOGIN, FABRIC_API_PASSWORD)
+session = get_session()
+upload_index = UploadIndex(base_url=FABRIC_API_URL)
 
 
 # A map between the row numbers and fields from the patient information csv
@@ -69,7 +81,7 @@ def generate_patient_info_json(patient_info_file_name):
     generate and return a JSON object representing its contents.
     """
     patient_info = {}
-    with open(patient_info_file_name, 'rU') as f:
+    with open(patient_info_file_name) as f:
         reader = csv.reader(f)
         next(reader, None)  # Skip the header
         for i, row in enumerate(reader):
@@ -90,7 +102,7 @@ def add_fields_to_cr(cr_id, patient_fields):
     sys.stdout.write("Adding custom patient fields to report...")
     sys.stdout.write("\n\n")
     sys.stdout.flush()
-    result = requests.post(url, auth=auth, data=url_payload)
+    result = session.post(url, auth=auth, data=url_payload)
     return result.json()
 
 
@@ -145,7 +157,7 @@ def launch_family_report(mother_genome_id, father_genome_id,
                    'accession_id': accession_id}
 
     sys.stdout.write("Launching family report...\n")
-    result = requests.post(url, auth=auth, data=json.dumps(url_payload))
+    result = session.post(url, auth=auth, data=json.dumps(url_payload))
 
     return result.json()
 
@@ -161,13 +173,18 @@ def upload_genome(project_id, genome_info, family_folder):
                'assembly_version': 'hg19',
                'format': genome_info['format']}
 
-    # Upload genome
-    with open(family_folder + "/" + genome_info['genome_filename'], 'rb') as file_handle:
-        # Post request and store newly uploaded genome's information
-        result = requests.put(url, data=file_handle, params=payload, auth=auth)
-        sys.stdout.write(".")
-        sys.stdout.flush()
-        return result.json()["genome_id"]
+    file_name = family_folder + "/" + genome_info['genome_filename']
+
+    def upload():
+        with open(file_name, 'rb') as file_handle:
+            # Post request and return newly uploaded genome's information
+            return session.put(url, data=FileBody(file_handle), params=payload, auth=auth).json()
+
+    # Upload genome, unless this file was already uploaded to the project
+    genome = upload_once(upload_index, project_id, file_name, upload)
+    sys.stdout.write(".")
+    sys.stdout.flush()
+    return genome["genome_id"]
 
 
 def upload_genomes_to_project(project_id, family_folder):
@@ -245,7 +262,7 @@ def main(argv):
     sys.stdout.write("\n")
 
     if "clinical_report" not in family_report_json.keys():
-        print family_report_json
+        print(family_report_json)
         sys.exit("Failed to launch. Check report parameters for correctness.")
     clinical_report = family_report_json['clinical_report']
 
@@ -23,10 +23,14 @@ import argparse
 import csv
 import json
 import os
-import requests
 from requests.auth import HTTPBasicAuth
 import sys
 
+# Route API calls through the shared, pooled session in fabric_client
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..'))
+from fabric_client import get_session
+from fabric_client.sendfile import FileBody
+
 #Load environment variables for request authentication parameters
 if "FABRIC_API_PASSWORD" not in os.environ:
     sys.exit("FABRIC_API_PASSWORD environment variable missing")
@@ -38,6 +42,7 @@ FABRIC_API_LOGIN = os.environ['FABRIC_API_LOGIN']
 FABRIC_API_PASSWORD = os.environ['FABRIC_API_PASSWORD']
 FABRIC_API_URL = os.environ.get('FABRIC_API_URL', 'https://api.fabricgenomics.com')
 auth = HTTPBasicAuth(FABRIC_API_LOGIN, FABRIC_API_PASSWORD)
+session = get_session()
 
 # A map between the row numbers and fields from the patient information csv
 patient_info_row_map = {
@@ -60,7 +65,7 @@ def generate_patient_info_json(patient_info_file_name):
     generate and return a JSON object representing its contents.
     """
     patient_info = {}
-    with open(patient_info_file_name, 'rU') as f:
+    with open(patient_info_file_name) as f:
         reader = csv.reader(f)
         next(reader, None)  # Skip the header
         for i, row in enumerate(reader):
@@ -81,7 +86,7 @@ def add_fields_to_cr(cr_id, patient_fields):
     sys.stdout.write("Adding custom patient fields to report...")
     sys.stdout.write("\n\n")
     sys.stdout.flush()
-    result = requests.post(url, auth=auth, data=url_payload)
+    result = session.post(url, auth=auth, data=url_payload)
     return result.json()
 
 
@@ -100,7 +105,7 @@ def launch_panel_report(genome_id, filter_id, panel_id, accession_id):
     sys.stdout.write("Launching report...")
     sys.stdout.write("\n\n")
     sys.stdout.flush()
-    result = requests.post(url, auth=auth, data=json.dumps(url_payload))
+    result = session.post(url, auth=auth, data=json.dumps(url_payload))
 
     return result.json()
 
@@ -117,7 +122,7 @@ def upload_genome_to_project(project_id, label, sex, file_name):
     sys.stdout.write("Uploading genome...\n")
     with open(file_name, 'rb') as file_handle:
         #Post request and return id of newly uploaded genome
-        result = requests.put(url, auth=auth, data=file_handle)
+        result = session.put(url, auth=auth, data=FileBody(file_handle))
         return result.json()["genome_id"]
 
 
@@ -4,10 +4,13 @@
 import argparse
 import json
 import os
-import requests
 from requests.auth import HTTPBasicAuth
 import sys
 
+# Route API calls through the shared, pooled session in fabric_client
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..'))
+from fabric_client import get_session
+
 #Load environment variables for request authentication parameters
 if "FABRIC_API_PASSWORD" not in os.environ:
     sys.exit("FABRIC_API_PASSWORD environment variable missing")
@@ -19,6 +22,7 @@ FABRIC_API_LOGIN = os.environ['FABRIC_API_LOGIN']
 FABRIC_API_PASSWORD = os.environ['FABRIC_API_PASSWORD']
 FABRIC_API_URL = os.environ.get('FABRIC_API_URL', 'https://api.fabricgenomics.com')
 auth = HTTPBasicAuth(FABRIC_API_LOGIN, FABRIC_API_PASSWORD)
+session = get_session()
 
 
 def launch_panel_report(filter_id, panel_id, accession_id, project_id):
@@ -37,7 +41,7 @@ def launch_panel_report(filter_id, panel_id, accession_id, project_id):
     sys.stdout.write("Launching report...")
     sys.stdout.write("\n\n")
     sys.stdout.flush()
-    result = requests.post(url, auth=auth, data=json.dumps(url_payload))
+    result = session.post(url, auth=auth, data=json.dumps(url_payload))
     return result.json()
 
 
@@ -61,7 +65,7 @@ def main():
                                         accession_id,
                                         project_id)
     if "clinical_report" not in json_response.keys():
-        print json_response
+        print(json_response)
         sys.exit("Failed to launch. Check report parameters for correctness.")
     clinical_report = json_response['clinical_report']
 
@@ -3,12 +3,15 @@ Usage: python patch_report_variant.py 1542 --status "FAILED_CONFIRMATION"
 """
 
 import os
-import requests
 from requests.auth import HTTPBasicAuth
 import sys
 import json
 import argparse
 
+# Route API calls through the shared, pooled session in fabric_client
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..'))
+from fabric_client import get_session
+
 # Load environment variables for request authentication parameters
 if "FABRIC_API_PASSWORD" not in os.environ:
     sys.exit("FABRIC_API_PASSWORD environment variable missing")
@@ -20,6 +23,7 @@ FABRIC_API_LOGIN = os.environ['FABRIC_API_LOGIN']
 FABRIC_API_PASSWORD = os.environ['FABRIC_API_PASSWORD']
 FABRIC_API_URL = os.environ.get('FABRIC_API_URL', 'https://api.fabricgenomics.com')
 auth = HTTPBasicAuth(FABRIC_API_LOGIN, FABRIC_API_PASSWORD)
+session = get_session()
 
 
 def patch_cr_variant(cr_id, report_variant_id, patch_values):
@@ -38,7 +42,7 @@ def patch_cr_variant(cr_id, report_variant_id, patch_values):
                               for attribute in patch_attributes]
     headers = {"content-type": "application/json-patch+json"}
     sys.stdout.flush()
-    result = requests.patch(url, auth=auth, json=url_payload, headers=headers)
+    result = session.patch(url, auth=auth, json=url_payload, headers=headers)
     return result
 
 
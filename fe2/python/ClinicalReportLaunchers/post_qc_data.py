@@ -3,12 +3,15 @@ Usage: post_qc_data.py 2029 '{"Cluster Density": "170", "Clusters PF": ".82"}'
 """
 
 import os
-import requests
 from requests.auth import HTTPBasicAuth
 import sys
 import json
 import argparse
 
+# Route API calls through the shared, pooled session in fabric_client
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..'))
+from fabric_client import get_session
+
 #Load environment variables for request authentication parameters
 if "FABRIC_API_PASSWORD" not in os.environ:
     sys.exit("FABRIC_API_PASSWORD environment variable missing")
@@ -20,6 +23,7 @@ FABRIC_API_LOGIN = os.environ['FABRIC_API_LOGIN']
 FABRIC_API_PASSWORD = os.environ['FABRIC_API_PASSWORD']
 FABRIC_API_URL = os.environ.get('FABRIC_API_URL', 'https://api.fabricgenomics.com')
 auth = HTTPBasicAuth(FABRIC_API_LOGIN, FABRIC_API_PASSWORD)
+session = get_session()
 
 
 def add_fields_to_cr(cr_id, qc_fields):
@@ -35,7 +39,7 @@ def add_fields_to_cr(cr_id, qc_fields):
     sys.stdout.flush()
     # If patient information was not provided, make a post request to reports
     # without a patient information parameter in the url
-    result = requests.post(url, auth=auth, data=url_payload)
+    result = session.post(url, auth=auth, data=url_payload)
     return result.json()
 
 
@@ -51,7 +55,8 @@ def main():
     qc_fields = args.f
 
     json_response = add_fields_to_cr(cr_id, qc_fields)
-    print json.dumps(json_response, indent=4)
+    sys.stdout.write(json.dumps(json_response, indent=4))
+    sys.stdout.write('\n')
 
 if __name__ == "__main__":
     main()
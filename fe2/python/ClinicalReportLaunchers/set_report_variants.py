@@ -15,12 +15,15 @@ chr7	87160618	rs2032582	A	C	1484.13	CONFIRMED	.	GT:GQ:AD	1/1:5000.00:.,.
 """
 
 import os
-import requests
 from requests.auth import HTTPBasicAuth
 import sys
 import json
 import argparse
 
+# Route API calls through the shared, pooled session in fabric_client
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..'))
+from fabric_client import get_session
+
 #Load environment variables for request authentication parameters
 if "FABRIC_API_PASSWORD" not in os.environ:
     sys.exit("FABRIC_API_PASSWORD environment variable missing")
@@ -32,6 +35,7 @@ FABRIC_API_LOGIN = os.environ['FABRIC_API_LOGIN']
 FABRIC_API_PASSWORD = os.environ['FABRIC_API_PASSWORD']
 FABRIC_API_URL = os.environ.get('FABRIC_API_URL', 'https://api.fabricgenomics.com')
 auth = HTTPBasicAuth(FABRIC_API_LOGIN, FABRIC_API_PASSWORD)
+session = get_session()
 
 
 def set_cr_variants(cr_id, file_name, _format):
@@ -44,7 +48,7 @@ def set_cr_variants(cr_id, file_name, _format):
     sys.stderr.write("Uploading vcf file...\n")
     with open(file_name, 'rb') as file_handle:
         #Post request
-        result = requests.put(url, auth=auth, data=file_handle)
+        result = session.put(url, auth=auth, data=file_handle)
         return result.json()
 
 def main():
@@ -2,12 +2,15 @@
 """
 
 import os
-import requests
 from requests.auth import HTTPBasicAuth
 import sys
 import json
 import argparse
 
+# Route API calls through the shared, pooled session in fabric_client
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..'))
+from fabric_client import get_session
+
 # Load environment variables for request authentication parameters
 if "FABRIC_API_PASSWORD" not in os.environ:
     sys.exit("FABRIC_API_PASSWORD environment variable missing")
@@ -19,6 +22,7 @@ FABRIC_API_LOGIN = os.environ['FABRIC_API_LOGIN']
 FABRIC_API_PASSWORD = os.environ['FABRIC_API_PASSWORD']
 FABRIC_API_URL = os.environ.get('FABRIC_API_URL', 'https://api.fabricgenomics.com')
 auth = HTTPBasicAuth(FABRIC_API_LOGIN, FABRIC_API_PASSWORD)
+session = get_session()
 
 
 def update_cr_status(cr_id, status):
@@ -34,7 +38,7 @@ def update_cr_status(cr_id, status):
     headers = {"content-type": "application/json-patch+json"}
 
     sys.stdout.flush()
-    result = requests.patch(url, auth=auth, json=url_payload, headers=headers)
+    result = session.patch(url, auth=auth, json=url_payload, headers=headers)
     return result
 
 
@@ -3,11 +3,14 @@
 
 import os
 import json
-import requests
 from requests.auth import HTTPBasicAuth
 import sys
 import argparse
 
+# Route API calls through the shared, pooled session in fabric_client
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..'))
+from fabric_client import get_session
+
 # Load environment variables for request authentication parameters
 if "FABRIC_API_PASSWORD" not in os.environ:
     sys.exit("FABRIC_API_PASSWORD environment variable missing")
@@ -19,6 +22,7 @@ FABRIC_API_LOGIN = os.environ['FABRIC_API_LOGIN']
 FABRIC_API_PASSWORD = os.environ['FABRIC_API_PASSWORD']
 FABRIC_API_URL = os.environ.get('FABRIC_API_URL', 'https://api.fabricgenomics.com')
 auth = HTTPBasicAuth(FABRIC_API_LOGIN, FABRIC_API_PASSWORD)
+session = get_session()
 
 
 def add_genome_to_clinical_report(clinical_report_id,
@@ -36,7 +40,7 @@ def add_genome_to_clinical_report(clinical_report_id,
     sys.stdout.write("Adding genome(s) to report...")
     sys.stdout.write("\n\n")
     sys.stdout.flush()
-    result = requests.put(url, auth=auth, data=json.dumps(url_payload))
+    result = session.put(url, auth=auth, data=json.dumps(url_payload))
     return result.json()
 
 
@@ -53,7 +57,7 @@ def upload_genome_to_project(project_id, label, sex, file_format, file_name, ext
     sys.stdout.write("Uploading genome...\n")
     with open(file_name, 'rb') as file_handle:
         #Post request and return id of newly uploaded genome
-        result = requests.put(url, auth=auth, data=file_handle)
+        result = session.put(url, auth=auth, data=file_handle)
         return result.json()
 
 
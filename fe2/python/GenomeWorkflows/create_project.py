@@ -3,11 +3,14 @@
 
 import argparse
 import os
-import requests
 from requests.auth import HTTPBasicAuth
 import sys
 import simplejson as json
 
+# Route API calls through the shared, pooled session in fabric_client
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..'))
+from fabric_client import get_session
+
 # Load environment variables for request authentication parameters
 if "FABRIC_API_PASSWORD" not in os.environ:
     sys.exit("FABRIC_API_PASSWORD environment variable missing")
@@ -19,6 +22,7 @@ FABRIC_API_LOGIN = os.environ['FABRIC_API_LOGIN']
 FABRIC_API_PASSWORD = os.environ['FABRIC_API_PASSWORD']
 FABRIC_API_URL = os.environ.get('FABRIC_API_URL', 'https://api.fabricgenomics.com')
 auth = HTTPBasicAuth(FABRIC_API_LOGIN, FABRIC_API_PASSWORD)
+session = get_session()
 
 
 def create_project(name, description, share_role):
@@ -38,7 +42,7 @@ def create_project(name, description, share_role):
                'share_role': share_role}
 
     # Post request and return newly created project's id
-    result = requests.post(url, data=payload, auth=auth)
+    result = session.post(url, data=payload, auth=auth)
     return result.json()
 
 
@@ -2,11 +2,14 @@
 """
 import argparse
 import os
-import requests
 from requests.auth import HTTPBasicAuth
 import sys
 import simplejson as json
 
+# Route API calls through the shared, pooled session in fabric_client
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..'))
+from fabric_client import get_session
+
 # Load environment variables for request authentication parameters
 if "OMICIA_API_PASSWORD" not in os.environ:
     sys.exit("OMICIA_API_PASSWORD environment variable missing")
@@ -18,6 +21,7 @@ OMICIA_API_LOGIN = os.environ['OMICIA_API_LOGIN']
 OMICIA_API_PASSWORD = os.environ['OMICIA_API_PASSWORD']
 OMICIA_API_URL = os.environ.get('OMICIA_API_URL', 'https://api.fabricgenomics.com')
 auth = HTTPBasicAuth(OMICIA_API_LOGIN, OMICIA_API_PASSWORD)
+session = get_session()
 
 
 def delete_genome(genome_id):
@@ -26,7 +30,7 @@ def delete_genome(genome_id):
     url = "{}/genomes/{}"
 
     url = url.format(OMICIA_API_URL, genome_id)
-    result = requests.delete(url, auth=auth)
+    result = session.delete(url, auth=auth)
     original_response = result.json()
 
     return original_response
@@ -1,11 +1,19 @@
 """List all projects
+
+Responses are kept in the local response cache (see fabric_client/cache.py);
+pass --no-cache to always fetch from the API.
 """
 
 import os
-import requests
 from requests.auth import HTTPBasicAuth
 import sys
 import json
+import argparse
+
+# Route API calls through the shared, pooled session in fabric_client
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..'))
+from fabric_client import get_session
+from fabric_client.cache import cached_get, open_cache
 
 # Load environment variables for request authentication parameters
 if "FABRIC_API_PASSWORD" not in os.environ:
@@ -18,9 +26,10 @@ FABRIC_API_LOGIN = os.environ['FABRIC_API_LOGIN']
 FABRIC_API_PASSWORD = os.environ['FABRIC_API_PASSWORD']
 FABRIC_API_URL = os.environ.get('FABRIC_API_URL', 'https://api.fabricgenomics.com')
 auth = HTTPBasicAuth(FABRIC_API_LOGIN, FABRIC_API_PASSWORD)
+session = get_session()
 
 
-def list_projects():
+def list_projects(cache=None):
     """
       list all projects
     """
@@ -28,14 +37,19 @@ def list_projects():
     url = "{}/projects/"
     url = url.format(FABRIC_API_URL)
 
-    result = requests.get(url, auth=auth)
+    result = cached_get(session, url, cache, auth=auth)
     return result.json()
 
 
 def main():
     """main function, lists all projects 
     """
-    json_response = list_projects()
+    parser = argparse.ArgumentParser(description='List all projects.')
+    parser.add_argument('--no-cache', dest='no_cache', action='store_true', default=False,
+                        help='always fetch from the API instead of the local response cache')
+    args = parser.parse_args()
+
+    json_response = list_projects(cache=open_cache(args.no_cache))
     try:
         sys.stdout.write("Projects\n")
         sys.stdout.write(json.dumps(json_response, indent=2))
@@ -1,12 +1,29 @@
 """Upload a genome to an existing project.
+
+With --resumable the VCF is sent in fixed-size chunks and every acknowledged
+chunk is recorded in a journal file next to it (or at --journal). If the
+upload is interrupted, running the same command again resumes from the last
+acknowledged byte.
+
+Without --checksum, the VCF's checksum (--checksum_algorithm, md5 by default)
+is computed while the file is uploaded, in the same read pass. Resumable
+uploads send it with the final chunk. A single PUT has to name its checksum
+before the body, so it is set on the new genome afterwards. With --checksum
+given, a single PUT is sent straight from the file by the kernel.
 """
 import argparse
 import os
-import requests
 from requests.auth import HTTPBasicAuth
 import sys
 import simplejson as json
 
+# Route API calls through the shared, pooled session in fabric_client
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..'))
+from fabric_client import get_session
+from fabric_client.checksum import DEFAULT_ALGORITHM
+from fabric_client.resumable import DEFAULT_CHUNK_SIZE, UploadInterrupted, resumable_upload
+from fabric_client.sendfile import FileBody
+
 # Load environment variables for request authentication parameters
 if "FABRIC_API_PASSWORD" not in os.environ:
     sys.exit("FABRIC_API_PASSWORD environment variable missing")
@@ -18,10 +35,27 @@ FABRIC_API_LOGIN = os.environ['FABRIC_API_LOGIN']
 FABRIC_API_PASSWORD = os.environ['FABRIC_API_PASSWORD']
 FABRIC_API_URL = os.environ.get('FABRIC_API_URL', 'https://api.fabricgenomics.com')
 auth = HTTPBasicAuth(FABRIC_API_LOGIN, FABRIC_API_PASSWORD)
+session = get_session()
+
+
+def set_genome_checksum(genome, checksum):
+    """Record the checksum computed during an upload on the new genome.
+    Returns the updated genome, or genome unchanged if the edit failed.
+    """
+    genome_id = genome.get('genome_id')
+    url = "{}/genomes/{}".format(FABRIC_API_URL, genome_id)
+    result = session.put(url, auth=auth, data=json.dumps({'checksum': checksum}))
+    if not result.ok:
+        sys.stderr.write("Could not set the checksum of genome {} to {}: {}\n".format(
+            genome_id, checksum, result.text))
+        return genome
+    return dict(genome, checksum=checksum)
 
 
 def upload_genome_to_project(project_id, label, sex, file_name, bam_file,
-                             external_id=None, checksum=None, verbose=False):
+                             external_id=None, checksum=None, verbose=False,
+                             resumable=False, chunk_size=DEFAULT_CHUNK_SIZE, journal=None,
+                             checksum_algorithm=DEFAULT_ALGORITHM):
     """Use the Omicia API to add a genome, in vcf format, to a project.
     Returns the newly uploaded genome's id.
     """
@@ -36,31 +70,46 @@ def upload_genome_to_project(project_id, label, sex, file_name, bam_file,
     if bam_file is not None:
         url = "{}&bam_file={}".format(url, bam_file)
 
-    with open(file_name, 'rb') as file_handle:
-        # Post request and return id of newly uploaded genome
-        result = requests.put(url, auth=auth, data=file_handle)
+    if resumable:
+        try:
+            result = resumable_upload(session, url, file_name, journal_path=journal,
+                                      chunk_size=chunk_size, auth=auth,
+                                      checksum_algorithm=None if checksum else checksum_algorithm)
+        except UploadInterrupted as e:
+            sys.exit("{}. Run the same command again to resume.".format(e))
+        original_response = result.json()
+    else:
+        with open(file_name, 'rb') as file_handle:
+            # Hash the file in the same pass that uploads it, unless the
+            # checksum is known and the kernel can send the file itself
+            body = FileBody(file_handle, algorithms=() if checksum else (checksum_algorithm,))
+            # Post request and return id of newly uploaded genome
+            result = session.put(url, auth=auth, data=body)
         original_response = result.json()
-        genome_id = original_response.get('genome_id')
+        if not checksum and result.ok:
+            original_response = set_genome_checksum(original_response,
+                                                    body.hexdigest(checksum_algorithm))
+    genome_id = original_response.get('genome_id')
 
     if verbose:
         url = "{}/genomes".format(FABRIC_API_URL)
-        result = requests.get(url, auth=auth)
+        result = session.get(url, auth=auth)
 
         sys.stderr.write(result.text)
         sys.stderr.write('\n')
 
         url = "{}/genomes/{}".format(FABRIC_API_URL, genome_id)
-        result = requests.get(url, auth=auth)
+        result = session.get(url, auth=auth)
         sys.stderr.write(str(result.json()))
         sys.stderr.write('\n')
 
         url = "{}/projects/{}/genomes".format(FABRIC_API_URL, project_id)
-        result = requests.get(url, auth=auth)
+        result = session.get(url, auth=auth)
         sys.stderr.write(str(result.json()))
         sys.stderr.write('\n')
 
         url = "{}/projects/{}/genomes/{}".format(FABRIC_API_URL, project_id, genome_id)
-        result = requests.get(url, auth=auth)
+        result = session.get(url, auth=auth)
         sys.stderr.write(str(result.json()))
         sys.stderr.write('\n')
 
@@ -79,6 +128,16 @@ def main():
     parser.add_argument('--checksum', metavar='checksum')
     parser.add_argument('--bam_file', metavar='bam_file')
     parser.add_argument('--verbose', dest='verbose', action='store_true', default=False)
+    parser.add_argument('--resumable', dest='resumable', action='store_true', default=False,
+                        help='upload in chunks that can be resumed after a failure')
+    parser.add_argument('--chunk_size', metavar='MB', type=int,
+                        default=DEFAULT_CHUNK_SIZE // (1024 * 1024),
+                        help='chunk size in MB for resumable uploads')
+    parser.add_argument('--journal', metavar='journal_file',
+                        help='journal file for resumable uploads, defaults to <file_name>.upload-journal')
+    parser.add_argument('--checksum_algorithm', metavar='algorithm', default=DEFAULT_ALGORITHM,
+                        choices=['md5', 'sha256'],
+                        help='checksum computed during the upload when --checksum is not given')
     args = parser.parse_args()
 
     project_id = args.project_id
@@ -91,7 +150,11 @@ def main():
 
     json_response = upload_genome_to_project(project_id, label, sex, file_name, bam_file,
                                              external_id=external_id, checksum=checksum,
-                                             verbose=args.verbose)
+                                             verbose=args.verbose,
+                                             resumable=args.resumable,
+                                             chunk_size=args.chunk_size * 1024 * 1024,
+                                             journal=args.journal,
+                                             checksum_algorithm=args.checksum_algorithm)
     try:
         sys.stdout.write(json.dumps(json_response, indent=4))
     except KeyError:
@@ -1,12 +1,28 @@
 """Upload multiple genomes to an existing project from a folder.
+
+Plain .vcf files are bgzip-compressed on the fly as they are sent, on
+--compress_workers threads (one per CPU by default), so they take a
+fraction of the upload bandwidth; --no_compress sends them as they are.
+
+A file whose contents were already uploaded to the project from this
+machine is not sent again: the genome recorded for it in the local upload
+index (see fabric_client/upload_index.py) is returned instead, so a re-run
+after a partial failure only uploads what is missing. --no_dedup uploads
+every file regardless.
 """
 import argparse
 import os
-import requests
 from requests.auth import HTTPBasicAuth
 import sys
 import simplejson as json
 
+# Route API calls through the shared, pooled session in fabric_client
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..'))
+from fabric_client import get_session
+from fabric_client.pipeline import BgzfPipeline
+from fabric_client.sendfile import FileBody
+from fabric_client.upload_index import open_upload_index, upload_once
+
 # Load environment variables for request authentication parameters
 if "FABRIC_API_PASSWORD" not in os.environ:
     sys.exit("FABRIC_API_PASSWORD environment variable missing")
@@ -18,6 +34,7 @@ FABRIC_API_LOGIN = os.environ['FABRIC_API_LOGIN']
 FABRIC_API_PASSWORD = os.environ['FABRIC_API_PASSWORD']
 FABRIC_API_URL = os.environ.get('FABRIC_API_URL', 'https://api.fabricgenomics.com')
 auth = HTTPBasicAuth(FABRIC_API_LOGIN, FABRIC_API_PASSWORD)
+session = get_session()
 
 
 def get_genome_files(folder):
@@ -34,9 +51,11 @@ def get_genome_files(folder):
     return genome_files
 
 
-def upload_genomes_to_project(project_id, folder):
+def upload_genomes_to_project(project_id, folder, compress=True, compress_workers=None,
+                              index=None):
     """upload all of the genomes in the given folder to the project with
-    the given project id
+    the given project id, compressing plain VCFs unless compress is False
+    and skipping those recorded in index as already uploaded there
     """
     # List where returned genome JSON information will be stored
     genome_json_objects = []
@@ -48,10 +67,21 @@ def upload_genomes_to_project(project_id, folder):
                          genome_file["genome_label"],
                          genome_file["genome_sex"])
 
-        with open(folder + "/" + genome_file["name"], 'rb') as file_handle:
-            # Post request and store id of newly uploaded genome
-            result = requests.put(url, auth=auth, data=file_handle)
-            genome_json_objects.append(result.json())
+        file_name = folder + "/" + genome_file["name"]
+
+        def upload():
+            with open(file_name, 'rb') as file_handle:
+                if compress and genome_file["name"].endswith('.vcf'):
+                    body = BgzfPipeline(file_handle, workers=compress_workers)
+                else:
+                    body = FileBody(file_handle)
+                # Post request and return the newly uploaded genome
+                return session.put(url, auth=auth, data=body).json()
+
+        genome_json_objects.append(upload_once(index, project_id, file_name, upload))
+    if index is not None and index.hits:
+        sys.stderr.write("{} genomes already uploaded, {:.1f} MB not sent\n".format(
+            index.hits, index.bytes_skipped / 1e6))
     return genome_json_objects
 
 
@@ -61,12 +91,23 @@ def main():
     parser = argparse.ArgumentParser(description='Upload a folder of genomes.')
     parser.add_argument('project_id', metavar='project_id')
     parser.add_argument('folder', metavar='folder')
+    parser.add_argument('--no_compress', dest='compress', action='store_false', default=True,
+                        help='send plain .vcf files uncompressed')
+    parser.add_argument('--compress_workers', metavar='threads', type=int,
+                        help='threads compressing each plain .vcf, defaults to one per CPU')
+    parser.add_argument('--no_dedup', dest='no_dedup', action='store_true', default=False,
+                        help='upload files even if their contents were uploaded before')
     args = parser.parse_args()
 
     project_id = args.project_id
     folder = args.folder
 
-    genome_objects = upload_genomes_to_project(project_id, folder)
+    index = open_upload_index(args.no_dedup)
+    genome_objects = upload_genomes_to_project(project_id, folder, compress=args.compress,
+                                               compress_workers=args.compress_workers,
+                                               index=index)
+    if index is not None:
+        index.close()
 
     sys.stdout.write(json.dumps(genome_objects, indent=4))
 
@@ -14,15 +14,30 @@ TR4091_exome.vcf,abc2,56,female
 TR4092_exome.vcf,abc3,57,unspecified
 TR4093_exome.vcf,abc4,58,female
 TR4094_exome.vcf,abc5,59,male
+
+Pass --workers N to upload up to N genomes at a time, and --summary FILE to
+write the returned genome objects, in manifest order, each with its
+upload's throughput under "upload_stats". Uploads are also capped by the
+session's governor at FABRIC_API_MAX_UPLOADS in flight (8 by default; see
+fabric_client/governor.py), so raise that too for more than 8 workers.
+Each file's start and finish are reported on stderr; --progress also
+reports every 10%, at the cost of sending the files through Python rather
+than with sendfile. A file that fails to upload is reported on stderr, the
+other files are still uploaded, and the script exits with an error.
 """
 import argparse
 import csv
 import os
-import requests
 from requests.auth import HTTPBasicAuth
 import sys
 import simplejson as json
 
+# Route API calls through the shared, pooled session in fabric_client
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..'))
+from fabric_client import get_session
+from fabric_client.uploads import (UploadProgress, UploadsFailed, upload_file,
+                                   upload_in_parallel)
+
 # Load environment variables for request authentication parameters
 if "FABRIC_API_PASSWORD" not in os.environ:
     sys.exit("FABRIC_API_PASSWORD environment variable missing")
@@ -34,6 +49,7 @@ FABRIC_API_LOGIN = os.environ['FABRIC_API_LOGIN']
 FABRIC_API_PASSWORD = os.environ['FABRIC_API_PASSWORD']
 FABRIC_API_URL = os.environ.get('FABRIC_API_URL', 'https://api.fabricgenomics.com')
 auth = HTTPBasicAuth(FABRIC_API_LOGIN, FABRIC_API_PASSWORD)
+session = get_session()
 
 
 def get_manifest_info(folder):
@@ -58,35 +74,67 @@ def get_manifest_info(folder):
     return manifest_info
 
 
-def upload_genomes_to_project(project_id, folder):
+def upload_genome_file(project_id, folder, genome_file_name, genome_attrs, progress=None):
+    """Upload one genome from the folder. Returns the genome JSON object
+    along with the transfer's throughput stats.
+    """
+    url = "{}/projects/{}/genomes?genome_label={}&genome_sex={}&external_id={}&assembly_version=hg19"
+    url = url.format(FABRIC_API_URL,
+                     project_id,
+                     genome_attrs["genome_label"],
+                     genome_attrs["genome_sex"],
+                     genome_attrs["external_id"])
+
+    # Put request and store newly uploaded genome's information
+    result, stats = upload_file(session, 'PUT', url, folder + "/" + genome_file_name,
+                                progress=progress, auth=auth)
+    # An error comes back as JSON too, so it must not pass for a genome
+    result.raise_for_status()
+    return result.json(), stats
+
+
+def upload_genomes_to_project(project_id, folder, workers=1, summary_file=None,
+                              progress=False):
     """upload all of the genomes in the given folder to the project with
-    the given project id
+    the given project id, at most `workers` at a time. Raises UploadsFailed,
+    holding the genomes that were uploaded, if any file failed.
     """
     # Assuming there is a manifest file, generate an object containing its info
     manifest_info = get_manifest_info(folder)
 
+    # Make sure every worker can hold its own connection to the API
+    get_session(pool_size=workers)
+    reporter = UploadProgress(step=10 if progress else None)
+
+    def upload(genome_file_name):
+        return upload_genome_file(project_id, folder, genome_file_name,
+                                  manifest_info[genome_file_name], progress=reporter)
+
+    # Results come back in manifest order, whatever order the uploads finish in
+    file_names = list(manifest_info.keys())
+    results = upload_in_parallel(file_names, upload, workers=workers)
+
     # List where returned genome JSON information will be stored
     genome_json_objects = []
-
-    # Upload each genome to the desired project
-    for genome_file_name in manifest_info.keys():
-        genome_attrs = manifest_info[genome_file_name]
-        url = "{}/projects/{}/genomes?genome_label={}&genome_sex={}&external_id={}&assembly_version=hg19"
-        url = url.format(FABRIC_API_URL,
-                         project_id,
-                         genome_attrs["genome_label"],
-                         genome_attrs["genome_sex"],
-                         genome_attrs["external_id"])
-        sys.stderr.write("uploading {}...".format(genome_file_name))
-        sys.stderr.flush()
-
-        with open(folder + "/" + genome_file_name, 'rb') as file_handle:
-            # Post request and store newly uploaded genome's information
-            result = requests.put(url, auth=auth, data=file_handle)
-            genome_json_objects.append(result.json())
-
-        sys.stderr.write("*\n")
-        sys.stderr.flush()
+    failures = []
+    summary = []
+    for genome_file_name, (result, error) in zip(file_names, results):
+        if error is not None:
+            failures.append((genome_file_name, error))
+            continue
+        genome_json, stats = result
+        genome_json_objects.append(genome_json)
+        summary.append(dict(genome_json, upload_stats=stats))
+
+    if summary_file:
+        with open(summary_file, 'w') as f:
+            f.write(json.dumps(summary, indent=4))
+
+    for genome_file_name, error in failures:
+        sys.stderr.write("Failed to upload {}: {}\n".format(genome_file_name, error))
+    if failures:
+        raise UploadsFailed("{} of {} genomes failed to upload".format(
+            len(failures), len(file_names)), genome_json_objects, failures)
 
     return genome_json_objects
 
@@ -98,12 +146,27 @@ def main():
     parser = argparse.ArgumentParser(description='Upload a folder of genomes.')
     parser.add_argument('project_id', metavar='project_id')
     parser.add_argument('folder', metavar='folder')
+    parser.add_argument('--workers', metavar='workers', type=int, default=1,
+                        help='number of genomes to upload at the same time; no more than '
+                             'FABRIC_API_MAX_UPLOADS (8 by default) are sent at once')
+    parser.add_argument('--summary', metavar='summary_file',
+                        help='write a JSON summary with per-file throughput to this file')
+    parser.add_argument('--progress', dest='progress', action='store_true', default=False,
+                        help='report each file\'s progress every 10%%')
     args = parser.parse_args()
 
     project_id = args.project_id
     folder = args.folder
 
-    genome_objects = upload_genomes_to_project(project_id, folder)
+    try:
+        genome_objects = upload_genomes_to_project(project_id, folder,
+                                                   workers=max(1, args.workers),
+                                                   summary_file=args.summary,
+                                                   progress=args.progress)
+    except UploadsFailed as e:
+        # Still output the genomes that were uploaded
+        sys.stdout.write(json.dumps(e.results, indent=4))
+        sys.exit(str(e))
 
     # Output genome labels, ids, external ids, and sizes
     sys.stdout.write(json.dumps(genome_objects, indent=4))
@@ -0,0 +1,116 @@
+"""Watch a drop folder and upload every genome written into it to a project.
+
+Runs until interrupted (Ctrl-C or SIGTERM, after which the uploads in
+progress finish), in place of the interactive shell/upload_folder.sh loop.
+A .vcf, .vcf.gz or .vcf.bz2 file is uploaded once it is completely
+written: as soon as a <file name>.done marker appears next to it, or, unless
+--require_done is given, once its size has not changed for --settle
+seconds. Up to --workers files are uploaded at a time, and each uploaded
+file (with its marker) is moved into the archive folder. Each upload is
+written to stdout as a line of JSON.
+
+Genome labels, sexes and external ids come from a manifest in the layout of
+upload_genomes_folder_with_manifest.py (by default manifest.csv in the drop
+folder, re-read when it changes), else from --label_pattern, a regular
+expression matched against the file name whose named groups label, sex and
+external_id fill in those fields. Without either, the label is the file
+name without its extension. Files neither one describes are left until
+they are.
+
+Files whose contents were already uploaded to the project from this
+machine are archived without being sent again (see
+fabric_client/upload_index.py); pass --no_dedup to always upload.
+
+Example usage:
+    python watch_genomes_folder.py 1 /data/dropbox /data/uploaded \\
+        --label_pattern '(?P<label>[^_]+)_(?P<sex>male|female)'
+"""
+import argparse
+import os
+from requests.auth import HTTPBasicAuth
+import signal
+import sys
+import threading
+
+# Route API calls through the shared, pooled session in fabric_client
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..'))
+from fabric_client import get_session
+from fabric_client.ingest import (DEFAULT_POLL_INTERVAL, DEFAULT_RETRY_SECONDS,
+                                  DEFAULT_SETTLE_SECONDS, DEFAULT_WORKERS, DropFolder,
+                                  FilenameRule, GenomeAttributes, Ingester)
+from fabric_client.upload_index import open_upload_index
+
+# Load environment variables for request authentication parameters
+if "FABRIC_API_PASSWORD" not in os.environ:
+    sys.exit("FABRIC_API_PASSWORD environment variable missing")
+
+if "FABRIC_API_LOGIN" not in os.environ:
+    sys.exit("FABRIC_API_LOGIN environment variable missing")
+
+FABRIC_API_LOGIN = os.environ['FABRIC_API_LOGIN']
+FABRIC_API_PASSWORD = os.environ['FABRIC_API_PASSWORD']
+FABRIC_API_URL = os.environ.get('FABRIC_API_URL', 'https://api.fabricgenomics.com')
+auth = HTTPBasicAuth(FABRIC_API_LOGIN, FABRIC_API_PASSWORD)
+
+
+def main():
+    """Main function. Upload genomes from a drop folder as they arrive.
+    """
+    parser = argparse.ArgumentParser(description='Upload genomes written into a folder.')
+    parser.add_argument('project_id', metavar='project_id')
+    parser.add_argument('folder', metavar='drop_folder')
+    parser.add_argument('archive', metavar='archive_folder')
+    parser.add_argument('--manifest', metavar='manifest_file',
+                        help='genome attributes by file name, defaults to manifest.csv in the '
+                             'drop folder')
+    parser.add_argument('--label_pattern', metavar='regex',
+                        help='file name pattern with label, sex and external_id groups')
+    parser.add_argument('--sex', metavar='sex', default='unspecified',
+                        help='genome sex when neither the manifest nor the pattern gives one')
+    parser.add_argument('--workers', metavar='workers', type=int, default=DEFAULT_WORKERS,
+                        help='number of genomes to upload at the same time')
+    parser.add_argument('--settle', metavar='seconds', type=float,
+                        default=DEFAULT_SETTLE_SECONDS,
+                        help='how long a file without a .done marker must stay unchanged')
+    parser.add_argument('--require_done', dest='require_done', action='store_true',
+                        default=False, help='only upload files that have a .done marker')
+    parser.add_argument('--poll', metavar='seconds', type=float, default=DEFAULT_POLL_INTERVAL,
+                        help='how often to look for new files')
+    parser.add_argument('--retry', metavar='seconds', type=float,
+                        default=DEFAULT_RETRY_SECONDS,
+                        help='how long to wait before retrying a failed upload')
+    parser.add_argument('--once', dest='once', action='store_true', default=False,
+                        help='upload the files that are ready now, then exit')
+    parser.add_argument('--no_dedup', dest='no_dedup', action='store_true', default=False,
+                        help='upload files even if their contents were uploaded before')
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.folder):
+        sys.exit("{} is not a folder".format(args.folder))
+
+    workers = max(1, args.workers)
+    manifest = args.manifest or os.path.join(args.folder, 'manifest.csv')
+    attributes = GenomeAttributes(
+        manifest_path=manifest,
+        rule=FilenameRule(args.label_pattern, sex=args.sex)
+        if args.label_pattern or not args.manifest else None)
+    index = open_upload_index(args.no_dedup)
+    ingester = Ingester(get_session(pool_size=workers), args.project_id,
+                        DropFolder(args.folder, settle_seconds=args.settle,
+                                   require_done=args.require_done),
+                        args.archive, attributes, workers=workers, index=index,
+                        retry_seconds=args.retry, base_url=FABRIC_API_URL, auth=auth)
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    signal.signal(signal.SIGINT, lambda signum, frame: stop.set())
+    sys.stderr.write("Watching {} for genomes...\n".format(args.folder))
+    ingester.run(stop=stop, poll_interval=args.poll, once=args.once)
+    sys.stderr.write("Uploaded {} genomes, {} failed attempts\n".format(ingester.ingested,
+                                                                        ingester.failed))
+    if index is not None:
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
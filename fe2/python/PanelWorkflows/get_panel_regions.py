@@ -1,13 +1,20 @@
 """Get the genes in a panel.
+
+Responses are kept in the local response cache (see fabric_client/cache.py);
+pass --no-cache to always fetch from the API.
 """
 
 import os
-import requests
 from requests.auth import HTTPBasicAuth
 import sys
 import simplejson as json
 import argparse
 
+# Route API calls through the shared, pooled session in fabric_client
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..'))
+from fabric_client import get_session
+from fabric_client.cache import cached_get, open_cache
+
 # Load environment variables for request authentication parameters
 if "FABRIC_API_PASSWORD" not in os.environ:
     sys.exit("FABRIC_API_PASSWORD environment variable missing")
@@ -19,9 +26,10 @@ FABRIC_API_LOGIN = os.environ['FABRIC_API_LOGIN']
 FABRIC_API_PASSWORD = os.environ['FABRIC_API_PASSWORD']
 FABRIC_API_URL = os.environ.get('FABRIC_API_URL', 'https://api.fabricgenomics.com')
 auth = HTTPBasicAuth(FABRIC_API_LOGIN, FABRIC_API_PASSWORD)
+session = get_session()
 
 
-def get_panel_regions(panel_id):
+def get_panel_regions(panel_id, cache=None):
     """Use the Omicia API to get the regions for a panel.
     """
     # Construct request
@@ -29,7 +37,7 @@ def get_panel_regions(panel_id):
     url = url.format(FABRIC_API_URL, panel_id)
 
     sys.stdout.flush()
-    result = requests.get(url, auth=auth)
+    result = cached_get(session, url, cache, auth=auth)
     return result.json()
 
 
@@ -38,11 +46,13 @@ def main():
     """
     parser = argparse.ArgumentParser(description='Get Panel Regions.')
     parser.add_argument('p', metavar='panel_id', type=int)
+    parser.add_argument('--no-cache', dest='no_cache', action='store_true', default=False,
+                        help='always fetch from the API instead of the local response cache')
     args = parser.parse_args()
 
     panel_id = args.p
 
-    json_response = get_panel_regions(panel_id)
+    json_response = get_panel_regions(panel_id, cache=open_cache(args.no_cache))
     panel_regions = json_response
 
     sys.stdout.write(json.dumps(panel_regions, indent=4))
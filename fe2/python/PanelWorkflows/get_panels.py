@@ -1,13 +1,20 @@
 """Get a list of panels, either all or filtered by some attribute.
+
+Responses are kept in the local response cache (see fabric_client/cache.py);
+pass --no-cache to always fetch from the API.
 """
 
 import os
-import requests
 from requests.auth import HTTPBasicAuth
 import sys
 import json
 import argparse
 
+# Route API calls through the shared, pooled session in fabric_client
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..'))
+from fabric_client import get_session
+from fabric_client.cache import cached_get, open_cache
+
 # Load environment variables for request authentication parameters
 if "FABRIC_API_PASSWORD" not in os.environ:
     sys.exit("FABRIC_API_PASSWORD environment variable missing")
@@ -19,9 +26,10 @@ FABRIC_API_LOGIN = os.environ['FABRIC_API_LOGIN']
 FABRIC_API_PASSWORD = os.environ['FABRIC_API_PASSWORD']
 FABRIC_API_URL = os.environ.get('FABRIC_API_URL', 'https://api.fabricgenomics.com')
 auth = HTTPBasicAuth(FABRIC_API_LOGIN, FABRIC_API_PASSWORD)
+session = get_session()
 
 
-def get_panels(panel_name, panel_description, panel_test_code):
+def get_panels(panel_name, panel_description, panel_test_code, cache=None):
     """Use the Omicia API to get all panels, or get panels by name, description, or test code.
     """
     # Construct request
@@ -37,7 +45,7 @@ def get_panels(panel_name, panel_description, panel_test_code):
     url = url.format(FABRIC_API_URL)
 
     sys.stdout.flush()
-    result = requests.get(url, auth=auth)
+    result = cached_get(session, url, cache, auth=auth)
     return result.json()
 
 
@@ -48,6 +56,8 @@ def main():
     parser.add_argument('--n', metavar='panel_name', type=str)
     parser.add_argument('--d', metavar='panel_description', type=str)
     parser.add_argument('--t', metavar='panel_test_code', type=str)
+    parser.add_argument('--no-cache', dest='no_cache', action='store_true', default=False,
+                        help='always fetch from the API instead of the local response cache')
 
     args = parser.parse_args()
 
@@ -55,7 +65,8 @@ def main():
     panel_description = args.d
     panel_test_code = args.t
 
-    json_response = get_panels(panel_name, panel_description, panel_test_code)
+    json_response = get_panels(panel_name, panel_description, panel_test_code,
+                               cache=open_cache(args.no_cache))
     panel_ids = json.dumps(json_response, indent=4)
 
     sys.stdout.write('{}'.format(panel_ids))
@@ -1,13 +1,30 @@
 """Post a panel
+Example usages:
+    python post_panel.py --n "Cardio" --d "Cardiomyopathy genes" --t CARDIO-1 --g "MYH7,TNNT2"
+    python post_panel.py --i 1234 --g "MYBPC3"
+    python post_panel.py --sync panels/ --workers 8
+    python post_panel.py --sync panels/ --dry_run
+
+With --sync, every *.json panel definition in a directory (name, test_code,
+description, gene_symbols, ...) is compared against one listing of the workspace's
+panels, and only the panels and genes that differ are created or added, concurrently.
+Running it again on an unchanged catalog makes no changes. See fabric_client/panel_sync.py
+for the definition format.
 """
 
 import os
-import requests
 from requests.auth import HTTPBasicAuth
 import sys
 import json
 import argparse
 
+# Route API calls through the shared, pooled session in fabric_client
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..'))
+from fabric_client import get_session
+from fabric_client.bulk import DEFAULT_WORKERS, write_summary
+from fabric_client.panel_sync import (STATE_FILE_NAME, PanelSyncState, load_panel_definitions,
+                                      sync_panels)
+
 #Load environment variables for request authentication parameters
 if "FABRIC_API_PASSWORD" not in os.environ:
     sys.exit("FABRIC_API_PASSWORD environment variable missing")
@@ -19,6 +36,7 @@ FABRIC_API_LOGIN = os.environ['FABRIC_API_LOGIN']
 FABRIC_API_PASSWORD = os.environ['FABRIC_API_PASSWORD']
 FABRIC_API_URL = os.environ.get('FABRIC_API_URL', 'https://api.fabricgenomics.com')
 auth = HTTPBasicAuth(FABRIC_API_LOGIN, FABRIC_API_PASSWORD)
+session = get_session()
 
 
 def post_panel(name, description, methodology=None,
@@ -40,7 +58,7 @@ def post_panel(name, description, methodology=None,
     sys.stdout.flush()
     # If patient information was not provided, make a post request to reports
     # without a patient information parameter in the url
-    result = requests.post(url, auth=auth, data=url_payload)
+    result = session.post(url, auth=auth, data=url_payload)
     return result.json()
 
 
@@ -63,7 +81,7 @@ def put_panel(panel_id, name, description, methodology=None,
     sys.stdout.flush()
     # If patient information was not provided, make a post request to reports
     # without a patient information parameter in the url
-    result = requests.put(url, auth=auth, data=url_payload)
+    result = session.put(url, auth=auth, data=url_payload)
     return result.json()
 
 
@@ -78,10 +96,48 @@ def add_gene_symbols_to_panel(panel_id, gene_symbols):
     sys.stdout.write("Adding regions to panel...")
     sys.stdout.write("\n\n")
     sys.stdout.flush()
-    result = requests.post(url, auth=auth, data=url_payload)
+    result = session.post(url, auth=auth, data=url_payload)
     return result.json()
 
 
+def sync_panel_catalog(directory, state_file=None, workers=DEFAULT_WORKERS, rate=None,
+                       dry_run=False):
+    """Sync a directory of panel definitions to the workspace, printing one
+    line per panel changed. Returns the BulkSummary, or None if nothing was
+    applied.
+    """
+    try:
+        definitions = load_panel_definitions(directory)
+    except ValueError as e:
+        sys.exit(str(e))
+    state = PanelSyncState(state_file or os.path.join(directory, STATE_FILE_NAME))
+
+    def print_result(change, outcome, error):
+        name = change['definition']['name']
+        if error is not None:
+            sys.stdout.write("{}\tfailed: {}\n".format(name, error))
+            return
+        sys.stdout.write("{}\t{}\t{}\t+{} genes\n".format(
+            name, outcome['panel_id'], outcome['action'], outcome['genes_added']))
+        if outcome['extra_genes']:
+            sys.stdout.write("{}\tnot in definition: {}\n".format(
+                name, ','.join(outcome['extra_genes'])))
+        sys.stdout.flush()
+
+    changes, summary = sync_panels(session, definitions, state, FABRIC_API_URL, workers=workers,
+                                   rate=rate, dry_run=dry_run, on_result=print_result, auth=auth)
+    if dry_run:
+        for change in changes:
+            sys.stdout.write("{}\t{}\t{}\n".format(
+                change['definition']['name'],
+                'create' if change['panel'] is None else change['panel']['id'],
+                ', '.join(change['fields'] + (['genes'] if change['check_genes'] else []))))
+    sys.stdout.write("{} panels defined, {} to change\n".format(len(definitions), len(changes)))
+    if summary:
+        write_summary(summary, label='Applied', stream=sys.stdout)
+    return summary
+
+
 def main():
     """Main function. Create or edit a panel.
     """
@@ -97,8 +153,25 @@ def main():
     parser.add_argument('--f', metavar='fda_disclosure')
     parser.add_argument('--t', metavar='test_code')
     parser.add_argument('--g', metavar='gene_symbols')
+    parser.add_argument('--sync', metavar='directory',
+                        help='sync a directory of panel definitions to the workspace')
+    parser.add_argument('--state_file', metavar='state_file',
+                        help='sync state file (default: {} in the directory)'.format(STATE_FILE_NAME))
+    parser.add_argument('--workers', metavar='workers', type=int, default=DEFAULT_WORKERS)
+    parser.add_argument('--rate', metavar='per_second', type=float,
+                        help='maximum panels changed per second')
+    parser.add_argument('--dry_run', dest='dry_run', action='store_true', default=False,
+                        help='show what --sync would change without changing it')
     args = parser.parse_args()
 
+    if args.sync:
+        get_session(pool_size=args.workers)
+        summary = sync_panel_catalog(args.sync, state_file=args.state_file, workers=args.workers,
+                                     rate=args.rate, dry_run=args.dry_run)
+        if summary and summary.failed:
+            sys.exit(1)
+        return
+
     name = args.n
     description = args.d
     panel_id = args.i
@@ -141,7 +214,7 @@ def main():
     if gene_symbols:
         json_response = add_gene_symbols_to_panel(panel_id, gene_symbols)
         meta = json_response
-        for attribute, value in meta.iteritems():
+        for attribute, value in meta.items():
             sys.stdout.write('{} : {}\n'.format(attribute, value))
 
 if __name__ == "__main__":
@@ -1,9 +1,16 @@
 """
 Upload a spreadhseet of condiiton genes to prime a workspace
+Example usages:
+    python upload_condition_genes.py condition_genes.csv.gz --check
+    python upload_condition_genes.py condition_genes.csv.gz --index --workers 8 --rate 20
+
+With --index, every existing condition-gene pair is loaded once into a local index
+and rows already in the workspace (or repeated in the file) are skipped without a
+request. The remaining rows are created concurrently by --workers threads, at most
+--rate creates per second, and a summary is printed at the end.
 """
 
 import os
-import requests
 import gzip
 from requests.auth import HTTPBasicAuth
 import sys
@@ -11,6 +18,12 @@ import logging
 import argparse
 from csv import DictReader
 
+# Route API calls through the shared, pooled session in fabric_client
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..'))
+from fabric_client import get_session
+from fabric_client.bulk import DEFAULT_WORKERS, bulk_apply, write_summary
+from fabric_client.condition_genes import condition_gene_key, load_condition_gene_index
+
 _LOGGER = logging.getLogger(__name__)
 
 # Load environment variables for request authentication parameters
@@ -24,6 +37,7 @@ FABRIC_API_LOGIN = os.environ['FABRIC_API_LOGIN']
 FABRIC_API_PASSWORD = os.environ['FABRIC_API_PASSWORD']
 FABRIC_API_URL = os.environ.get('FABRIC_API_URL', 'https://api.fabricgenomics.com')
 auth = HTTPBasicAuth(FABRIC_API_LOGIN, FABRIC_API_PASSWORD)
+session = get_session()
 
 
 def parse_null(value):
@@ -34,9 +48,35 @@ def check_first(cui, gene_symbol):
     # Construct request
     url = "{}/condition_genes/?cui={}&gene_symbol={}"
     url = url.format(FABRIC_API_URL, cui, gene_symbol)
-    result = requests.get(url, auth=auth)
+    result = session.get(url, auth=auth)
     result_dict = result.json()
-    return len(result_dict.get('objects')) > 1
+    return len(result_dict.get('objects')) > 0
+
+
+def row_payload(row):
+    """Build the create payload for one spreadsheet row.
+    """
+    return {
+        'CUI': parse_null(row.get('cui')),
+        'gene_symbol': row.get('gene_symbol'),
+        'condition': row.get('condition'),
+        'inheritance': parse_null(row.get('inheritance')),
+        'prevalence': parse_null(row.get('prevalence')),
+        'penetrance': parse_null(row.get('penetrance')),
+        'notes': parse_null(row.get('notes')),
+        'age_of_onset': parse_null(row.get('age_of_onset')),
+        'pmids': parse_null(row.get('pmids'))
+    }
+
+
+def create_condition_gene(payload):
+    """Create one condition-gene, raising on failure.
+    """
+    url = "{}/condition_genes/".format(FABRIC_API_URL)
+    result = session.post(url, json=payload, auth=auth)
+    if result.status_code != 200:
+        raise ValueError(result.text)
+    return result.json()
 
 
 def upload_condition_genes(filename, check):
@@ -47,7 +87,7 @@ def upload_condition_genes(filename, check):
     url = url.format(FABRIC_API_URL)
 
     _LOGGER.info("Opening {}".format(filename))
-    with gzip.open(filename, 'rb') as file:
+    with gzip.open(filename, 'rt') as file:
         reader = DictReader(file)
         for row in reader:
             cui = parse_null(row.get('cui'))
@@ -58,18 +98,8 @@ def upload_condition_genes(filename, check):
 
             _LOGGER.info("Creating record for CUI: {} and gene: {}".format(cui, gene_symbol))
 
-            payload = {
-                'CUI': cui,
-                'gene_symbol': gene_symbol,
-                'condition': row.get('condition'),
-                'inheritance': parse_null(row.get('inheritance')),
-                'prevalence': parse_null(row.get('prevalence')),
-                'penetrance': parse_null(row.get('penetrance')),
-                'notes': parse_null(row.get('notes')),
-                'age_of_onset': parse_null(row.get('age_of_onset')),
-                'pmids': parse_null(row.get('pmids'))
-            }
-            result = requests.post(url, json=payload, auth=auth)
+            payload = row_payload(row)
+            result = session.post(url, json=payload, auth=auth)
             if result.status_code == 200:
                 _LOGGER.info("Created condition-gene: {}".format(result.json))
             else:
@@ -77,6 +107,47 @@ def upload_condition_genes(filename, check):
 
     _LOGGER.info("Done with {}".format(filename))
 
+
+def upload_condition_genes_indexed(filename, workers=DEFAULT_WORKERS, rate=None):
+    """Create the rows of filename that are not in the workspace yet,
+    checking them against a local index rather than one request per row.
+    Returns the BulkSummary of the creates.
+    """
+    _LOGGER.info("Loading existing condition-genes")
+    index = load_condition_gene_index(session, FABRIC_API_URL, auth=auth)
+    _LOGGER.info("Found {} existing condition-genes".format(len(index)))
+    skipped = {'existing': 0, 'repeated': 0}
+    seen = set()
+
+    def new_payloads():
+        _LOGGER.info("Opening {}".format(filename))
+        with gzip.open(filename, 'rt') as file:
+            for row in DictReader(file):
+                key = condition_gene_key(parse_null(row.get('cui')), row.get('gene_symbol'))
+                if key in seen:
+                    skipped['repeated'] += 1
+                    continue
+                seen.add(key)
+                if key in index:
+                    skipped['existing'] += 1
+                    continue
+                yield row_payload(row)
+
+    def log_result(payload, result, error):
+        if error is None:
+            _LOGGER.info("Created condition-gene: {}".format(result))
+        else:
+            _LOGGER.warning("Error creating CUI: {} and gene: {}! {}".format(
+                payload['CUI'], payload['gene_symbol'], error))
+
+    summary = bulk_apply(create_condition_gene, new_payloads(), workers=workers, rate=rate,
+                         on_result=log_result)
+    sys.stdout.write("Skipped {} rows already present and {} repeated rows\n".format(
+        skipped['existing'], skipped['repeated']))
+    write_summary(summary, label='Created', stream=sys.stdout)
+    return summary
+
+
 def main():
     """Main function. Get the regions in a panel and print out their gene symbols.
     """
@@ -84,6 +155,12 @@ def main():
     parser.add_argument('f', metavar='file', type=str)
     parser.add_argument("--check", help="Check first for gene/CUI presence",
                         action="store_true")
+    parser.add_argument("--index", help="Check rows against a local index of existing condition-genes",
+                        action="store_true")
+    parser.add_argument("--workers", metavar="workers", type=int, default=DEFAULT_WORKERS,
+                        help="Concurrent creates with --index")
+    parser.add_argument("--rate", metavar="per_second", type=float, default=20.0,
+                        help="Maximum creates per second with --index (0 for no limit)")
     parser.add_argument("--verbose", help="Enable logging",
                         action="store_true")
 
@@ -93,7 +170,13 @@ def main():
         logging.basicConfig(level=logging.INFO)
     _LOGGER.info("Running script with args: verbose {} check {}".format(args.verbose, args.check))
 
-    upload_condition_genes(args.f, args.check)
+    if args.index:
+        get_session(pool_size=args.workers)
+        summary = upload_condition_genes_indexed(args.f, workers=args.workers, rate=args.rate)
+        if summary.failed:
+            sys.exit(1)
+    else:
+        upload_condition_genes(args.f, args.check)
 
 
 if __name__ == "__main__":
@@ -1,15 +1,26 @@
 """
 Request creation of a new job. Requires an accession id. Returns a unique ID that can
 be used to launch secondary analysis processes.
+
+Example usages:
+    python create_job.py --a ACC123
+    python create_job.py --a ACC123 --state_file jobs_state.json
+
+With --state_file, the new job's UUID is added to a local state file that
+find_job.py --track polls until every job finishes.
 """
 
 import os
-import requests
 from requests.auth import HTTPBasicAuth
 import sys
 import json
 import argparse
 
+# Route API calls through the shared, pooled session in fabric_client
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..'))
+from fabric_client import get_session
+from fabric_client.jobs import JobStateFile
+
 # Load environment variables for request authentication parameters
 if "FABRIC_API_PASSWORD" not in os.environ:
     sys.exit("FABRIC_API_PASSWORD environment variable missing")
@@ -21,6 +32,7 @@ FABRIC_API_LOGIN = os.environ['FABRIC_API_LOGIN']
 FABRIC_API_PASSWORD = os.environ['FABRIC_API_PASSWORD']
 FABRIC_API_URL = os.environ.get('FABRIC_API_URL', 'https://api.fabricgenomics.com')
 auth = HTTPBasicAuth(FABRIC_API_LOGIN, FABRIC_API_PASSWORD)
+session = get_session()
 
 
 def create_job(accession_id):
@@ -33,7 +45,7 @@ def create_job(accession_id):
     }
     url = path.format(FABRIC_API_URL)
 
-    result = requests.post(url, json=payload, auth=auth)
+    result = session.post(url, json=payload, auth=auth)
     return result.json()
 
 
@@ -42,12 +54,22 @@ def main():
     """
     parser = argparse.ArgumentParser(description='Get panel')
     parser.add_argument('--a', metavar='accession_id', type=str)
+    parser.add_argument('--state_file', metavar='state_file', type=str,
+                        help='record the new job in this job tracker state file')
 
     args = parser.parse_args()
 
     accession_id = args.a
 
     json_response = create_job(accession_id)
+
+    if args.state_file:
+        if 'uuid' not in json_response:
+            sys.exit("Job was not created: {}".format(json.dumps(json_response)))
+        state = JobStateFile(args.state_file)
+        state.add(json_response['uuid'], accession_id=accession_id)
+        state.save()
+
     panel_ids = json.dumps(json_response, indent=4)
 
     sys.stdout.write('{}'.format(panel_ids))
@@ -1,14 +1,33 @@
 """
 Find a job by uuid
+
+Example usages:
+    python find_job.py --uuid 0b6f9a1e-...
+    python find_job.py --track jobs_state.json
+    python find_job.py --track jobs_state.json --report
+
+With --track, every unfinished job in a state file written by create_job.py
+--state_file is polled until it reaches one of the --until statuses. Jobs are
+checked concurrently over one connection pool, each less often while its
+status stays the same (from --min_interval up to --max_interval seconds).
+Status changes are printed and saved to the state file, and a summary of
+throughput and time spent in each status is written at the end. --report
+prints the summary from the state file without polling.
 """
 
 import os
-import requests
 from requests.auth import HTTPBasicAuth
 import sys
 import json
 import argparse
 
+# Route API calls through the shared, pooled session in fabric_client
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..'))
+from fabric_client import get_session
+from fabric_client.jobs import (DEFAULT_TERMINAL_STATUSES, JobStateFile, fetch_job_status,
+                                job_report, track_jobs)
+from fabric_client.watch import DEFAULT_MAX_INTERVAL, DEFAULT_MIN_INTERVAL, DEFAULT_WORKERS
+
 # Load environment variables for request authentication parameters
 if "FABRIC_API_PASSWORD" not in os.environ:
     sys.exit("FABRIC_API_PASSWORD environment variable missing")
@@ -20,6 +39,7 @@ FABRIC_API_LOGIN = os.environ['FABRIC_API_LOGIN']
 FABRIC_API_PASSWORD = os.environ['FABRIC_API_PASSWORD']
 FABRIC_API_URL = os.environ.get('FABRIC_API_URL', 'https://api.fabricgenomics.com')
 auth = HTTPBasicAuth(FABRIC_API_LOGIN, FABRIC_API_PASSWORD)
+session = get_session()
 
 
 def find_job(uuid):
@@ -33,18 +53,69 @@ def find_job(uuid):
 
     url = path.format(FABRIC_API_URL, uuid)
 
-    result = requests.get(url, params=params, auth=auth)
+    result = session.get(url, params=params, auth=auth)
     return result.json()
 
 
+def print_change(uuid, old_status, new_status):
+    """Write one job status change to stdout.
+    """
+    sys.stdout.write("Job {}: {} -> {}\n".format(uuid, old_status, new_status))
+    sys.stdout.flush()
+
+
+def track(state_file, until, min_interval, max_interval, workers, timeout=None):
+    """Poll every unfinished job in the state file until it finishes, then
+    write a throughput and time-in-state summary.
+    """
+    state = JobStateFile(state_file)
+    get_session(pool_size=workers)
+    watcher = track_jobs(state,
+                         lambda uuid: fetch_job_status(session, uuid, FABRIC_API_URL, auth=auth),
+                         terminal_statuses=until,
+                         on_change=print_change,
+                         timeout=timeout,
+                         min_interval=min_interval,
+                         max_interval=max_interval,
+                         workers=workers)
+    sys.stderr.write("Made {} status requests\n".format(watcher.requests))
+    return state
+
+
 def main():
     """Main function. Get panels. All, or by name, description or test code.
     """
     parser = argparse.ArgumentParser(description='Get panel')
     parser.add_argument('--uuid', metavar='uuid', type=str)
+    parser.add_argument('--track', metavar='state_file', type=str,
+                        help='poll every unfinished job in this state file until done')
+    parser.add_argument('--report', dest='report', action='store_true', default=False,
+                        help='with --track, only summarize the state file')
+    parser.add_argument('--until', metavar='statuses', type=str,
+                        default=','.join(DEFAULT_TERMINAL_STATUSES),
+                        help='comma-separated statuses in which a job is finished')
+    parser.add_argument('--min_interval', metavar='seconds', type=float,
+                        default=DEFAULT_MIN_INTERVAL)
+    parser.add_argument('--max_interval', metavar='seconds', type=float,
+                        default=DEFAULT_MAX_INTERVAL)
+    parser.add_argument('--workers', metavar='workers', type=int, default=DEFAULT_WORKERS,
+                        help='job lookups made at once')
+    parser.add_argument('--timeout', metavar='seconds', type=float,
+                        help='stop polling after this long')
 
     args = parser.parse_args()
 
+    if args.track:
+        until = [status.strip() for status in args.until.split(',')]
+        if args.report:
+            state = JobStateFile(args.track)
+        else:
+            state = track(args.track, until, args.min_interval, args.max_interval,
+                          args.workers, timeout=args.timeout)
+        sys.stdout.write(json.dumps(job_report(state, until), indent=4))
+        sys.stdout.write('\n')
+        return
+
     uuid = args.uuid
 
     json_response = find_job(uuid)
@@ -13,6 +13,9 @@
 #
 #   3) Make the script executable: chmod +x upload_folder.sh
 #
+#  This script asks for each label interactively. To upload unattended as
+#  files arrive, run fe2/python/GenomeWorkflows/watch_genomes_folder.py.
+#
 
 display_usage() {
     echo "Upload all VCF files to Opal (include .vcf, .vcf.gz or .vcf.bz2)"
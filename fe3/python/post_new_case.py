@@ -16,7 +16,9 @@ WGS cases:
 The test ID --test_id is optional for WGS and MT_PANEL.
 WGS and MT_PANEL may be specified together. One or two family members can be added
 
-Optionally upload all vcfs for the case.
+Optionally upload all vcfs for the case. The vcfs of all members are uploaded at the
+same time once the case container exists. Unless --checksum is given, each vcf's
+md5 checksum is computed while it is uploaded and sent along with it.
 
 Optionally, include a file containing patient information to populate patient information fields.
 This file should be a csv formatted. If custom fields are set up in the workspace the dictionary
@@ -46,6 +48,19 @@ f2_dob,1964-12-21
 f2_sex,MALE
 
 IF PHI for family members is included in the file make sure to use the matching f1 and f2 parameters for the command line options!
+
+Batch mode: post_new_case.py --batch manifest.csv [ --concurrency 4 ] [ --results batch_results.json ]
+
+Creates one case per row of the manifest in a single process, several at a time over one
+connection pool. The header names the command line options without dashes; analysis and
+hpo_terms take space-separated values and file paths are relative to the manifest. The
+results file lists, for each case, its accession, case_container_id and upload status.
+
+example:
+
+analysis,test_id,accession,sex,hpo_terms,genome,vcf,f1_accession,f1_sex,f1_relationship,f1_genome,f1_vcf
+PANEL,12,JD1,MALE,,JD1,JD1.vcf.gz,,,,,
+WGS,,JD2,FEMALE,HP:0000018 HP:0000252,JD2,JD2.vcf.gz,JD2-M,FEMALE,MOTHER,JD2-M,JD2-M.vcf.gz
 """
 
 ## phi_template to map phi keys to phi sections
@@ -75,13 +90,19 @@ phi_template = {
 }
 
 import argparse
+import asyncio
 import csv
 import json
 import os
-import requests
 from requests.auth import HTTPBasicAuth
 import sys
 
+# Route API calls through the shared, pooled session in fabric_client
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from fabric_client import get_session
+from fabric_client.aio import AsyncCaseContainerClient
+from fabric_client.case_containers import case_container_payload, post_case_container, post_member_genome
+
 #Load environment variables for request authentication parameters
 if "FABRIC_API_PASSWORD" not in os.environ:
 	sys.exit("FABRIC_API_PASSWORD environment variable missing\n")
@@ -93,6 +114,7 @@ FABRIC_API_LOGIN = os.environ['FABRIC_API_LOGIN']
 FABRIC_API_PASSWORD = os.environ['FABRIC_API_PASSWORD']
 FABRIC_API_URL = os.environ.get('FABRIC_API_URL', 'https://api.fabricgenomics.com')
 auth = HTTPBasicAuth(FABRIC_API_LOGIN, FABRIC_API_PASSWORD)
+session = get_session()
 
 
 def read_patient_info(patient_info_file):
@@ -104,7 +126,7 @@ def read_patient_info(patient_info_file):
 		reader = csv.reader(f)
 		next(reader, None)  # Skip the header
 		for i, row in enumerate(reader):
-			if row[0] in phi_template:
+			if len(row) >= 2 and row[0] in phi_template:
 				section = phi_template[row[0]]
 				if section in ("patient", "sample", "order", "report"):
 					if "proband" not in patient_info:
@@ -141,20 +163,13 @@ def format_member_object(relationship, accession, sex, affected, phi=None):
 def create_case_container(analysis_types, test_id, members, hpo_ids, platform, assembly_version="b38"):
 	"""Create a new case container
 	"""
-	# Construct url and request
-	url = "{}/case_containers".format(FABRIC_API_URL)
-	url_payload = {"analysis_types": analysis_types,
-				   "assembly_version": assembly_version,
-				   "members": members,
-				   "hpo_terms": hpo_ids}
-	if platform:
-		url_payload["sequencing_platform"] = platform
-	if test_id:
-		url_payload["test_id"] = test_id
+	# Construct payload and request
+	url_payload = case_container_payload(analysis_types, test_id, members, hpo_ids, platform,
+										 assembly_version=assembly_version)
 
 	sys.stdout.write("Creating case container ...\n")
 	sys.stdout.flush()
-	result = requests.post(url, auth=auth, data=json.dumps(url_payload))
+	result = post_case_container(session, url_payload, base_url=FABRIC_API_URL, auth=auth)
 	if result.status_code == 200:
 		print(json.dumps(result.json(), indent=4))
 		return result.json()
@@ -169,17 +184,21 @@ def upload_genome_to_url(url, genome_name, vcf_file, assembly_version="b38", pla
 	# Construct request
 	# example: 'url': 'https://api-test.omicia-remote.com/case_containers/460897/members/1855/genome'
 	sys.stdout.write("Uploading {}  ...\n".format(url))
-	payload = {"genome_name": genome_name,
-			   "assembly_version": assembly_version}
-	if checksum:
-		payload["checksum"] = checksum
-	if platform:
-		payload["sequencing_platform"] = platform
+	# The form is streamed from disk; without a checksum, it is computed during the upload
+	result = post_member_genome(session, url, genome_name, vcf_file,
+								assembly_version=assembly_version,
+								platform=platform,
+								checksum=checksum,
+								auth=auth)
+	return upload_succeeded(result)
 
-	vcf = {"genome_file": open(vcf_file ,'rb')}
-
-	result = requests.post(url, auth=auth, data=payload, files=vcf)
 
+def upload_succeeded(result):
+	"""Check a genome upload response, reporting any error.
+	"""
+	if isinstance(result, Exception):
+		sys.stderr.write("{}\n".format(result))
+		return None
 	if result.status_code == 201:
 		return True
 	else:
@@ -187,9 +206,275 @@ def upload_genome_to_url(url, genome_name, vcf_file, assembly_version="b38", pla
 		return None
 
 
+async def upload_genomes_to_urls(uploads):
+	"""Upload the genomes of all members at the same time.
+	uploads is a list of dicts of upload_genome_to_url arguments;
+	returns True or None for each upload, in the same order.
+	"""
+	async with AsyncCaseContainerClient(session, base_url=FABRIC_API_URL,
+										max_concurrency=len(uploads)) as client:
+		for upload in uploads:
+			sys.stdout.write("Uploading {}  ...\n".format(upload["url"]))
+		results = await client.upload_genomes(uploads, auth=auth)
+	return [upload_succeeded(result) for result in results]
+
+
+class CaseError(Exception):
+	"""Raised when the options for a case are missing or inconsistent.
+	"""
+
+
+def build_case(options):
+	"""Validate the options for one case, completed from its patient_info_file,
+	and format its members. options holds the command line option values by name.
+	Returns a dictionary describing the case; raises CaseError if it is invalid.
+	"""
+	options = dict(options)
+	analysis_types = options["analysis"]
+	if not analysis_types:
+		raise CaseError("missing --analysis")
+
+	### Parse patient_info_file for PHI
+	patient_info = {}
+	if options.get("patient_info_file") != None:
+		patient_info = read_patient_info(options["patient_info_file"])
+
+		#get get required options from PHI if not provided in command line
+		proband_patient = patient_info.get("proband", {}).get("patient", {})
+		for item in ("accession", "sex"):
+			if item in proband_patient:
+				if not options[item]:
+					options[item] = proband_patient[item]
+				del proband_patient[item]
+		for item in ("f1_accession", "f1_sex", "f1_affected", "f2_accession", "f2_sex", "f2_affected"):
+			new = item.split("_")
+			if new[0] in patient_info:
+				if new[1] in patient_info[new[0]]["family"]:
+					if not options[item]:
+						options[item] = patient_info[new[0]]["family"][new[1]]
+					del patient_info[new[0]]["family"][new[1]]
+	for member in ("proband", "f1", "f2"):
+		patient_info.setdefault(member, {})
+
+	### Check all required entries
+	if not options["accession"]:
+		raise CaseError("missing --accession <identifier>, must be provided either in the PHI info file or as command line option")
+	if not options["sex"]:
+		raise CaseError("The sex must be provided either in the PHI info file or as command line option")
+
+	if options["test_id"] is not None and not isinstance(options["test_id"], int):
+		raise CaseError("--test_id must be a number, not {}".format(options["test_id"]))
+
+	if 'PANEL' in analysis_types:
+		if len(analysis_types)>1:
+			raise CaseError("--analysis PANEL can not be specified with other analyses")
+		if not options["test_id"]:
+			raise CaseError("missing --test_id")
+
+	family_options = [options[prefix + "_" + item] for prefix in ("f1", "f2")
+					  for item in ("relationship", "sex", "accession", "affected", "genome", "vcf", "checksum")]
+	if 'WGS' not in analysis_types:
+		if options["hpo_terms"]:
+			raise CaseError("Only WGS analysis type accepts HPO terms")
+		if any(family_options):
+			raise CaseError("Only WGS analysis type accepts family members. Check patient_info_file if provided.")
+
+	if 'WGS' in analysis_types:
+		if not options["hpo_terms"]:
+			raise CaseError("Missing --hpo_terms required for WGS analysis")
+
+		for prefix in ("f1", "f2"):
+			if (options[prefix + "_relationship"] or options[prefix + "_sex"] or
+					options[prefix + "_accession"] or options[prefix + "_affected"]):
+				if not (options[prefix + "_relationship"] and options[prefix + "_sex"] and options[prefix + "_accession"]):
+					raise CaseError("--{0}_relationship, --{0}_sex and --{0}_accession need to be specified for family member {0}".format(prefix))
+
+			if options[prefix + "_checksum"] or options[prefix + "_genome"] or options[prefix + "_vcf"]:
+				if not (options[prefix + "_genome"] and options[prefix + "_vcf"]):
+					raise CaseError("--{0}_genome and --{0}_vcf are required".format(prefix))
+				if not options[prefix + "_relationship"]:
+					raise CaseError("--{0}_vcf needs family member {0} to be specified".format(prefix))
+
+	### Format members data object, and note which members have a vcf to upload
+	members = [format_member_object("PROBAND",
+									options["accession"],
+									options["sex"],
+									True,
+									patient_info["proband"])]
+	uploads = []
+	if options["vcf"]:
+		uploads.append({"member_index": 0,
+						"relationship": "PROBAND",
+						"genome_name": options["genome"],
+						"vcf_file": options["vcf"],
+						"checksum": options["checksum"]})
+
+	for prefix in ("f1", "f2"):
+		if options[prefix + "_relationship"]:
+			members.append(format_member_object(options[prefix + "_relationship"],
+												options[prefix + "_accession"],
+												options[prefix + "_sex"],
+												options[prefix + "_affected"],
+												patient_info[prefix]))
+			if options[prefix + "_vcf"]:
+				uploads.append({"member_index": len(members) - 1,
+								"relationship": options[prefix + "_relationship"],
+								"genome_name": options[prefix + "_genome"],
+								"vcf_file": options[prefix + "_vcf"],
+								"checksum": options[prefix + "_checksum"]})
+
+	for upload in uploads:
+		if not os.path.isfile(upload["vcf_file"]):
+			raise CaseError("vcf file {} not found".format(upload["vcf_file"]))
+
+	return {"accession": options["accession"],
+			"analysis_types": analysis_types,
+			"test_id": options["test_id"],
+			"assembly_version": options["assembly"],
+			"hpo_terms": options["hpo_terms"],
+			"platform": options["platform"],
+			"members": members,
+			"uploads": uploads}
+
+
+def member_uploads(case, json_response):
+	"""Pair each vcf of a case with its member's upload url from the
+	case container response. Returns upload_genome_to_url arguments.
+	"""
+	uploads = []
+	for upload in case["uploads"]:
+		member_url = json_response.get('urls')[upload["member_index"]]
+		uploads.append({"url": member_url.get('url'),
+						"genome_name": upload["genome_name"],
+						"vcf_file": upload["vcf_file"],
+						"assembly_version": case["assembly_version"],
+						"platform": case["platform"],
+						"checksum": upload["checksum"]})
+	return uploads
+
+
+def read_batch_manifest(manifest_file):
+	"""Read a --batch manifest, returning the options for each case.
+	Relative file paths are resolved against the manifest's folder.
+	"""
+	folder = os.path.dirname(os.path.abspath(manifest_file))
+	multi_valued = ("analysis", "hpo_terms")
+	paths = ("vcf", "f1_vcf", "f2_vcf", "patient_info_file")
+	flags = ("f1_affected", "f2_affected")
+	cases = []
+	with open(manifest_file, 'r') as f:
+		for row in csv.DictReader(f):
+			options = dict.fromkeys(("analysis", "test_id", "genome", "vcf", "patient_info_file",
+									 "accession", "sex", "hpo_terms", "checksum", "platform"))
+			for prefix in ("f1", "f2"):
+				for item in ("accession", "sex", "affected", "relationship", "genome", "vcf", "checksum"):
+					options[prefix + "_" + item] = None
+			options["assembly"] = "b38"
+			for key, value in row.items():
+				value = (value or "").strip()
+				if not key or not value:
+					continue
+				key = key.strip()
+				if key in multi_valued:
+					value = value.split()
+				elif key == "test_id":
+					# Anything else is reported by build_case
+					value = int(value) if value.isdigit() else value
+				elif key in paths:
+					value = os.path.join(folder, value)
+				elif key in flags:
+					value = value.lower() in ("true", "yes", "1")
+				options[key] = value
+			cases.append(options)
+	return cases
+
+
+async def create_cases(cases, concurrency):
+	"""Create the case containers of many cases and upload their vcfs, with at
+	most `concurrency` cases in flight. Returns one result per case, in order.
+	"""
+	semaphore = asyncio.Semaphore(concurrency)
+
+	async def submit(client, case, result):
+		async with semaphore:
+			url_payload = case_container_payload(case["analysis_types"], case["test_id"], case["members"],
+												 case["hpo_terms"], case["platform"],
+												 assembly_version=case["assembly_version"])
+			try:
+				response = await client.create_case_container(url_payload, auth=auth)
+			except Exception as e:
+				response = e
+			if getattr(response, "status_code", None) != 200:
+				result["status"] = "create_failed"
+				result["error"] = getattr(response, "text", str(response))
+				sys.stderr.write("{}: could not create case container\n".format(case["accession"]))
+				return
+			json_response = response.json()
+			result["case_container_id"] = json_response.get("case_container_id")
+			result["status"] = "created"
+			sys.stderr.write("{}: created case container {}\n".format(case["accession"], result["case_container_id"]))
+
+			uploads = member_uploads(case, json_response)
+			if uploads:
+				result["member_ids"] = [json_response.get('urls')[upload["member_index"]].get('member_id')
+										for upload in case["uploads"]]
+				responses = await client.upload_genomes(uploads, auth=auth)
+				failed = [upload["relationship"] for upload, response in zip(case["uploads"], responses)
+						  if getattr(response, "status_code", None) != 201]
+				if failed:
+					result["status"] = "upload_failed"
+					result["error"] = "failed to upload {} vcf".format(", ".join(failed))
+				else:
+					result["status"] = "uploaded"
+				sys.stderr.write("{}: {}\n".format(case["accession"], result["status"]))
+
+	async def create_one(client, options):
+		result = {"accession": options.get("accession"),
+				  "case_container_id": None,
+				  "status": "invalid",
+				  "member_ids": [],
+				  "error": None}
+		# A bad row or a failed case is recorded in its result, so that it
+		# cannot stop the rest of the batch
+		try:
+			case = build_case(options)
+		except Exception as e:
+			result["error"] = str(e) if isinstance(e, CaseError) else "{}: {}".format(type(e).__name__, e)
+			sys.stderr.write("{}: invalid case, {}\n".format(result["accession"], result["error"]))
+			return result
+		result["accession"] = case["accession"]
+		try:
+			await submit(client, case, result)
+		except Exception as e:
+			result["status"] = "upload_failed" if result["case_container_id"] else "create_failed"
+			result["error"] = "{}: {}".format(type(e).__name__, e)
+			sys.stderr.write("{}: {}\n".format(case["accession"], result["error"]))
+		return result
+
+	# Each case uploads up to three vcfs at once, over one shared connection pool
+	async with AsyncCaseContainerClient(session, base_url=FABRIC_API_URL,
+										max_concurrency=concurrency * 3) as client:
+		return await asyncio.gather(*[create_one(client, options) for options in cases])
+
+
+def run_batch(manifest_file, results_file, concurrency):
+	"""Create every case in a --batch manifest and write the results file.
+	Returns the number of cases that failed.
+	"""
+	cases = read_batch_manifest(manifest_file)
+	sys.stderr.write("Creating {} cases, {} at a time ...\n".format(len(cases), concurrency))
+	results = asyncio.run(create_cases(cases, max(1, concurrency)))
+	with open(results_file, 'w') as f:
+		f.write(json.dumps(results, indent=4))
+	failed = [result for result in results if result["status"] not in ("created", "uploaded")]
+	sys.stdout.write("{} of {} cases succeeded, results written to {}\n".format(
+		len(results) - len(failed), len(results), results_file))
+	return len(failed)
+
+
 def main(argv):
 	parser = argparse.ArgumentParser(description='Create a new case_container and upload all vcf files to the container. Optionally, include a file containing PHI.')
-	parser.add_argument('--analysis', metavar='type', required=True, choices=["PANEL", "WGS", "MT_PANEL"], type=str, nargs='+', help='allowed values are PANEL, or WGS and/or MT_PANEL.')
+	parser.add_argument('--analysis', metavar='type', choices=["PANEL", "WGS", "MT_PANEL"], type=str, nargs='+', help='allowed values are PANEL, or WGS and/or MT_PANEL.')
 	parser.add_argument('--test_id', metavar='id', type=int, help='unique numerical ID (int) for the test in Fabric, must be an existing test in the workspace.')
 	parser.add_argument('--assembly', metavar='version', default="b38", choices=["b38"], type=str, help='only allowed value is b38. Defaults to b38.')
 	parser.add_argument('--genome', metavar='name', help='label for the proband genome shown in projects.')
@@ -199,7 +484,7 @@ def main(argv):
 	parser.add_argument('--accession', metavar='identifier', type=str, help='unique identifier for the proband sample, can also be provided through the patient_info_file.')
 	parser.add_argument('--sex', metavar='[MALE,FEMALE,UNSPECIFIED]', choices=["MALE", "FEMALE", "UNSPECIFIED"], type=str, help='proband sex, allowed values are MALE, FEMALE or UNSPECIFIED, can also be provided through the patient_info_file.')
 	parser.add_argument('--hpo_terms', metavar='term', type=str, nargs='+', help='one or multiple HPO term IDs, e.g. HP:0000018.')
-	parser.add_argument('--checksum', metavar='checksum', help='optional checksum for the proband vcf file.')
+	parser.add_argument('--checksum', metavar='checksum', help='optional checksum for the proband vcf file, computed during the upload if omitted.')
 	parser.add_argument('--platform', metavar='ONT', choices=["ONT"], type=str, help='optional sequencing platform. Allowed value is ONT. Defaults to Illumina.')
 
 	parser.add_argument('--f1_accession', metavar='identifier', type=str, help='unique identifier for family member 1, can also be obtained from patient_info_file.')
@@ -218,138 +503,35 @@ def main(argv):
 	parser.add_argument('--f2_vcf', metavar='file.vcf.gz', type=str, help='vcf file for family member 1, including path.')
 	parser.add_argument('--f2_checksum', metavar='checksum', help='optional checksum for the family member 2 vcf file.')
 
-
-	args = parser.parse_args()
-
-	analysis_types = args.analysis
-	test_id = args.test_id
-	assembly_version = args.assembly
-
-	genome_name = args.genome
-	vcf = args.vcf
-	patient_info_file = args.patient_info_file
-	hpo_terms = args.hpo_terms
-	checksum = args.checksum
-	platform = args.platform
-
-	options = {}
-	options["accession"] = args.accession
-	options["sex"] = args.sex
-	options["f1_accession"] = args.f1_accession
-	options["f1_sex"] = args.f1_sex
-	options["f1_affected"] = args.f1_affected
-	f1_relationship = args.f1_relationship
-	f1_genome_name = args.f1_genome
-	f1_vcf = args.f1_vcf
-	f1_checksum = args.f1_checksum
-
-	options["f2_accession"] = args.f2_accession
-	options["f2_sex"] = args.f2_sex
-	options["f2_affected"] = args.f2_affected
-	f2_relationship = args.f2_relationship
-	f2_genome_name = args.f2_genome
-	f2_vcf = args.f2_vcf
-	f2_checksum = args.f2_checksum
+	parser.add_argument('--batch', metavar='manifest.csv', type=str, help='create one case per row of this csv file instead of a single case from the command line options. Its header holds the option names without dashes, e.g. analysis,test_id,accession,sex,vcf,genome,f1_vcf.')
+	parser.add_argument('--concurrency', metavar='N', type=int, default=4, help='number of cases created at the same time in --batch mode. Defaults to 4.')
+	parser.add_argument('--results', metavar='results.json', type=str, default='batch_results.json', help='file the --batch results are written to. Defaults to batch_results.json.')
 
 
-	### Parse patient_info_file for PHI
-	patient_info = {}
-	if patient_info_file != None:
-		patient_info = read_patient_info(patient_info_file)
-		
-		#get get required options from PHI if not provided in command line
-		for item in ("accession", "sex"):
-			if item in patient_info["proband"]["patient"]:
-				if not options[item]:
-					options[item] = patient_info["proband"]["patient"][item]
-				del patient_info["proband"]["patient"][item]
-		for item in ("f1_accession", "f1_sex", "f1_affected", "f2_accession", "f2_sex", "f2_affected"):
-			new = item.split("_")
-			if new[0] in patient_info:
-				if new[1] in patient_info[new[0]]["family"]:
-					if not options[item]:
-						options[item] = patient_info[new[0]]["family"][new[1]]
-					del patient_info[new[0]]["family"][new[1]]
-	else:
-		patient_info["proband"] = {}
-		patient_info["f1"] = {}
-		patient_info["f2"] = {}
-
-	### Check all required entries 
-	if not options["accession"]:
-		sys.exit("missing --accession <identifier>, must be provided either in the PHI info file or as command line option\n")
-	if not options["sex"]:
-		sys.exit("The sex must be provided either in the PHI info file or as command line option\n")
+	args = parser.parse_args()
 
-	if 'PANEL' in analysis_types:
-		if len(analysis_types)>1:
-			parser.error("--analysis PANEL can not be specified with other analyses")
-		if not test_id:
-			parser.error("missing --test_id")
+	### Create many cases from a manifest
+	if args.batch:
+		failed = run_batch(args.batch, args.results, args.concurrency)
+		if failed:
+			sys.exit(f"ERROR: {failed} cases failed, see {args.results}\n")
+		return
 
-	if 'WGS' not in analysis_types:
-		if hpo_terms:
-			parser.error("Only WGS analysis type accepts HPO terms")
-		if (f1_relationship or options["f1_sex"] or options["f1_accession"] or options["f1_affected"] or f1_genome_name or f1_vcf or f1_checksum or
-		    f2_relationship or options["f2_sex"] or options["f2_accession"] or options["f2_affected"] or f2_genome_name or f2_vcf or f2_checksum):
-			parser.error("Only WGS analysis type accepts family members. Check patient_info_file if provided.")
+	try:
+		case = build_case(vars(args))
+	except CaseError as e:
+		parser.error(str(e))
 
-	if 'WGS' in analysis_types:
-		if not hpo_terms:
-			parser.error("Missing --hpo_terms required for WGS analysis")
-
-		if f1_relationship or options["f1_sex"] or options["f1_accession"] or options["f1_affected"]:
-			if not (f1_relationship and options["f1_sex"] and options["f1_accession"]): 
-				parser.error("--f1_relationship, --f1_sex and --f1_accession need to be specified for family member f1")
-
-		if f2_relationship or options["f2_sex"] or options["f2_accession"] or options["f2_affected"]:
-			if not (f2_relationship and options["f2_sex"] and options["f2_accession"]): 
-				parser.error("--f2_relationship, --f2_sex and --f2_accession need to be specified for family member f2")
-
-		if f1_checksum or f1_genome_name or f1_vcf:
-			if not (f1_genome_name and f1_vcf):
-				parser.error("--f1_genome and --f1_vcf are required")
-
-		if f2_checksum or f2_genome_name or f2_vcf:
-			if not (f2_genome_name and f2_vcf):
-				parser.error("--f2_genome and --f2_vcf are required")
-
-
-	### Format members data object
-	members = []
-	proband = format_member_object("PROBAND",
-								   options["accession"],
-								   options["sex"], 
-								   True, 
-								   patient_info["proband"])
-	members.append(proband)
-
-	if f1_relationship:
-		f1 = format_member_object(f1_relationship, 
-								  options["f1_accession"],
-								  options["f1_sex"], 
-								  options["f1_affected"], 
-								  patient_info["f1"])
-		members.append(f1)
-
-	if f2_relationship:
-		f2 = format_member_object(f2_relationship, 
-								  options["f2_accession"],
-								  options["f2_sex"], 
-								  options["f2_affected"], 
-								  patient_info["f2"])
-		members.append(f2)
-
-	#sys.stdout.write(f"Members: {members}\n")
+	#sys.stdout.write(f"Members: {case['members']}\n")
 	
 	
 	### Create case_container
-	json_response = create_case_container(analysis_types,
-										  test_id,
-										  members,
-										  hpo_terms,
-										  platform,
-										  assembly_version=assembly_version)
+	json_response = create_case_container(case["analysis_types"],
+										  case["test_id"],
+										  case["members"],
+										  case["hpo_terms"],
+										  case["platform"],
+										  assembly_version=case["assembly_version"])
 	if not json_response:
 		sys.exit("ERROR: Could not create case container\n")
 
@@ -357,48 +539,17 @@ def main(argv):
 	sys.stdout.write(f"\nSUCCESS: created case container {case_id}\n")
 
 
-	### Upload any genomes
+	### Upload any genomes, all members at the same time
 	success = True
-	member_ids = []
-
-	if vcf:
-		proband_url = json_response.get('urls')[0].get('url')
-		member_ids.append(json_response.get('urls')[0].get('member_id'))
-		genome = upload_genome_to_url(proband_url,
-									  genome_name,
-									  vcf,
-									  assembly_version=assembly_version,
-									  platform=platform,
-									  checksum=checksum)
-		if not genome:
-			sys.stderr.write("ERROR: Failed to upload PROBAND vcf to case container\n")
-			success = False
-		
-	if f1_vcf:
-		f1_url = json_response.get('urls')[1].get('url')
-		member_ids.append(json_response.get('urls')[1].get('member_id'))
-		genome = upload_genome_to_url(f1_url,
-									  f1_genome_name,
-									  f1_vcf,
-									  assembly_version=assembly_version,
-									  platform=platform,
-									  checksum=checksum)
-		if not genome:
-			sys.stderr.write(f"ERROR: Failed to upload {f1_relationship} vcf to case container\n")
-			success = False
-
-	if f2_vcf:
-		f2_url = json_response.get('urls')[2].get('url')
-		member_ids.append(json_response.get('urls')[2].get('member_id'))
-		genome = upload_genome_to_url(f2_url,
-									  f2_genome_name,
-									  f2_vcf,
-									  assembly_version=assembly_version,
-									  platform=platform,
-									  checksum=checksum)
-		if not genome:
-			sys.stderr.write(f"ERROR: Failed to upload {f2_relationship} vcf to case container\n")
-			success = False
+	member_ids = [json_response.get('urls')[upload["member_index"]].get('member_id')
+				  for upload in case["uploads"]]
+	uploads = member_uploads(case, json_response)
+
+	if uploads:
+		for upload, genome in zip(case["uploads"], asyncio.run(upload_genomes_to_urls(uploads))):
+			if not genome:
+				sys.stderr.write(f"ERROR: Failed to upload {upload['relationship']} vcf to case container\n")
+				success = False
 
 	if member_ids:
 		if success: